@@ -12,6 +12,27 @@ Comandos disponíveis:
     - test-all: Executa os testes automatizados
     - system-info: Exibe informações do sistema
     - check-env: Verifica o ambiente de execução (dependências, variáveis, etc.)
+    - export: Exporta as memórias para um arquivo (JSONL comprimido ou binário)
+    - import: Importa memórias de um arquivo exportado
+    - quantization-report: Compara recall e latência da busca quantizada com a busca exata
+    - reembed: Migra as memórias para outro modelo ou dimensão de embeddings
+    - serve: Executa o serviço HTTP assíncrono (POST /chat com streaming SSE, GET /memories, /health)
+    - batch: Processa um arquivo JSONL de conversas em lote (paralelo, com checkpoints)
+    - memory-benchmark: Mede o crescimento de memória por turno da camada web, sem serviços externos
+
+Argumentos adicionais são repassados ao script do comando (setup, all, export,
+import, quantization-report, reembed, serve, batch e memory-benchmark); nos
+demais comandos, são recusados. Por exemplo:
+    python run.py export --output memorias.jsonl.gz --user-id alice
+    python run.py setup --partitions 16
+    python run.py setup --quantization binary
+    python run.py setup --fts
+    python run.py setup --listing-index
+    python run.py reembed --model text-embedding-3-small --dims 512 --switch
+    python run.py serve --port 8000 --workers 8
+    python run.py batch --input conversas.jsonl --workers 8
+    python run.py run --profile 10
+    python run.py memory-benchmark --turns 5000
 """
 
 import os
@@ -25,6 +46,10 @@ import platform
 # Informações da versão
 __version__ = "1.0.0"
 
+# Comandos que repassam os argumentos desconhecidos ao próprio script
+FORWARDING_COMMANDS = ('setup', 'all', 'export', 'import', 'quantization-report', 'reembed', 'serve',
+                       'batch', 'memory-benchmark')
+
 def display_banner():
     """Exibe o banner do utilitário"""
     banner = f"""
@@ -257,11 +282,18 @@ def main():
     Função principal que processa os argumentos da linha de comando e executa
     as operações correspondentes.
     """
-    parser = argparse.ArgumentParser(description='Script unificado para executar o Voxy-Mem0.')
-    parser.add_argument('command', choices=['test', 'setup', 'run', 'web', 'all', 'test-all', 'system-info', 'check-env'],
-                        help='Comando a ser executado: test, setup, run, web, all, test-all, system-info ou check-env')
+    parser = argparse.ArgumentParser(description='Script unificado para executar o Voxy-Mem0.',
+                                     allow_abbrev=False)
+    parser.add_argument('command', choices=['test', 'setup', 'run', 'web', 'all', 'test-all', 'system-info', 'check-env',
+                                            'export', 'import', 'quantization-report', 'reembed', 'serve',
+                                            'batch', 'memory-benchmark'],
+                        help='Comando a ser executado: test, setup, run, web, all, test-all, system-info, check-env, '
+                             'export, import, quantization-report, reembed, serve, batch ou memory-benchmark')
     parser.add_argument('--interactive', '-i', action='store_true',
                         help='Executa em modo interativo (pergunta antes de cada passo)')
+    parser.add_argument('--profile', type=int, nargs='?', const=1, metavar='N',
+                        help='Perfila um a cada N turnos do chat (run, web e batch; padrão: todos) e grava '
+                             'as pilhas em logs/profiles')
 
     # Verifica se há argumentos na linha de comando
     if len(sys.argv) == 1:
@@ -269,11 +301,22 @@ def main():
         parser.print_help()
         return 0
 
-    args = parser.parse_args()
+    # Argumentos desconhecidos são repassados ao script do comando, se ele os aceitar
+    args, extra_args = parser.parse_known_args()
+    if extra_args and args.command not in FORWARDING_COMMANDS:
+        parser.error(f"argumentos não reconhecidos para '{args.command}': {' '.join(extra_args)}")
 
     # Exibe o banner
     display_banner()
 
+    # O perfil é repassado aos scripts pelo ambiente
+    if args.profile is not None:
+        if args.profile < 1:
+            print("❌ --profile deve ser maior que zero")
+            return 1
+        os.environ['PROFILE_EVERY'] = str(args.profile)
+        print(f"🔬 Perfil ativado: um a cada {args.profile} turno(s), em {os.getenv('PROFILE_DIR', 'logs/profiles')}")
+
     # Processa o comando system-info separadamente pois não precisa das verificações iniciais
     if args.command == 'system-info':
         show_system_info()
@@ -299,6 +342,42 @@ def main():
 
     script_dir = os.path.dirname(os.path.abspath(__file__))
 
+    if args.command in ('export', 'import'):
+        action = 'Exportando' if args.command == 'export' else 'Importando'
+        print(f"\n===== {action} memórias =====")
+        transfer_script = os.path.join(script_dir, 'utils', 'memory_transfer.py')
+        return 0 if run_script(transfer_script, [args.command] + extra_args) else 1
+
+    if args.command == 'quantization-report':
+        print("\n===== Relatório da busca quantizada =====")
+        report_script = os.path.join(script_dir, 'utils', 'quantization_report.py')
+        return 0 if run_script(report_script, extra_args) else 1
+
+    if args.command == 'reembed':
+        print("\n===== Migrando embeddings das memórias =====")
+        reembed_script = os.path.join(script_dir, 'utils', 'reembed.py')
+        return 0 if run_script(reembed_script, extra_args) else 1
+
+    if args.command == 'batch':
+        print("\n===== Processando conversas em lote =====")
+        batch_script = os.path.join(script_dir, 'utils', 'batch.py')
+        return 0 if run_script(batch_script, extra_args) else 1
+
+    if args.command == 'memory-benchmark':
+        print("\n===== Medindo o uso de memória por turno =====")
+        benchmark_script = os.path.join(script_dir, 'utils', 'memory_benchmark.py')
+        return 0 if run_script(benchmark_script, extra_args) else 1
+
+    if args.command == 'serve':
+        print("\n===== Executando o serviço HTTP do Voxy-Mem0 =====")
+        missing = [module for module in ('starlette', 'uvicorn') if importlib.util.find_spec(module) is None]
+        if missing:
+            print(f"❌ Dependências do serviço HTTP em falta: {', '.join(missing)}")
+            print(f"⚠️ Instale com: pip install {' '.join(missing)}")
+            return 1
+        server_script = os.path.join(script_dir, 'voxy_server.py')
+        return 0 if run_script(server_script, extra_args) else 1
+
     # Executa o comando escolhido
     if args.command == 'test' or args.command == 'all':
         print("\n===== Testando conexão com o banco de dados =====")
@@ -314,7 +393,7 @@ def main():
     if args.command == 'setup' or args.command == 'all':
         print("\n===== Configurando banco de dados =====")
         setup_script = os.path.join(script_dir, 'utils', 'setup_supabase.py')
-        if not run_script(setup_script):
+        if not run_script(setup_script, extra_args):
             if args.interactive:
                 response = input("\nA configuração falhou. Deseja tentar executar o assistente mesmo assim? (s/n) ").strip().lower()
                 if response not in ['s', 'sim', 'y', 'yes']:
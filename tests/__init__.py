@@ -1,3 +1,15 @@
 """
 Pacote de testes para o assistente Voxy-Mem0
-""" 
\ No newline at end of file
+"""
+
+class FakeClock:
+    """Relógio controlado pelos testes (pode ser usado também como função de espera)."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
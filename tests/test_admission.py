@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o controle de admissão (limites, fila justa e recusas).
+Execute com: python -m unittest tests.test_admission
+"""
+
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests import FakeClock
+from voxy_admission import (
+    REJECTED_QUEUE_FULL,
+    REJECTED_RATE_LIMITED,
+    REJECTED_TIMEOUT,
+    AdmissionController,
+    AdmissionRejected,
+    admission_report,
+    parse_weights,
+)
+from voxy_metrics import metrics
+
+class TestAdmissionController(unittest.TestCase):
+    """Testes para o AdmissionController"""
+
+    def setUp(self):
+        """Zera as métricas e cria um relógio controlado"""
+        metrics.reset()
+        self.clock = FakeClock()
+
+    def make(self, **options):
+        """Cria um controlador sem limite por usuário, salvo indicação em contrário"""
+        options.setdefault("user_rate_per_minute", 0)
+        return AdmissionController(clock=self.clock, **options)
+
+    def test_user_rate_limit(self):
+        """Verifica se rajadas acima do limite do usuário são recusadas com retry-after"""
+        controller = self.make(max_concurrency=10, user_rate_per_minute=60, user_burst=2)
+        for _ in range(2):
+            controller.release(controller.enqueue("alice"))
+
+        with self.assertRaises(AdmissionRejected) as context:
+            controller.enqueue("alice")
+        self.assertEqual(context.exception.reason, REJECTED_RATE_LIMITED)
+        self.assertAlmostEqual(context.exception.retry_after, 1.0)
+
+        # Outros usuários não são afetados
+        controller.release(controller.enqueue("bob"))
+
+    def test_queue_full_is_rejected(self):
+        """Verifica a recusa imediata quando a fila está cheia"""
+        controller = self.make(max_concurrency=1, max_queue=1)
+        controller.enqueue("alice")
+        controller.enqueue("bob")
+
+        with self.assertRaises(AdmissionRejected) as context:
+            controller.enqueue("carol")
+        self.assertEqual(context.exception.reason, REJECTED_QUEUE_FULL)
+        self.assertGreaterEqual(context.exception.retry_after, 1.0)
+
+    def test_fair_scheduling_across_users(self):
+        """Verifica se a rajada de um usuário não passa à frente dos demais"""
+        controller = self.make(max_concurrency=1, max_queue=10)
+        running = controller.enqueue("alice")
+        burst = [controller.enqueue("alice") for _ in range(3)]
+        bob = controller.enqueue("bob")
+
+        order = []
+        current = running
+        for _ in range(4):
+            controller.release(current)
+            current = next(t for t in burst + [bob] if t.admitted_at is not None and t not in order)
+            order.append(current)
+
+        self.assertEqual([t.user_id for t in order], ["alice", "bob", "alice", "alice"])
+
+    def test_weights(self):
+        """Verifica se usuários com peso maior recebem mais vagas"""
+        controller = self.make(max_concurrency=1, max_queue=10, weights={"vip": 2.0})
+        running = controller.enqueue("outro")
+        tickets = [controller.enqueue("outro") for _ in range(2)] + [controller.enqueue("vip") for _ in range(2)]
+
+        order = []
+        current = running
+        for _ in range(4):
+            controller.release(current)
+            current = next(t for t in tickets if t.admitted_at is not None and t not in order)
+            order.append(current)
+
+        self.assertEqual([t.user_id for t in order][:3], ["outro", "vip", "vip"])
+
+    def test_idle_buckets_are_evicted(self):
+        """Verifica se baldes cheios são descartados e se o número de baldes é limitado"""
+        controller = self.make(max_concurrency=10, user_rate_per_minute=60, user_burst=2, max_users=3)
+        for user_id in ("alice", "bob"):
+            controller.release(controller.enqueue(user_id))
+        self.clock.now = 1.0
+        controller.release(controller.enqueue("carol"))
+        self.assertEqual(list(controller._buckets), ["carol"])
+
+        for index in range(5):
+            controller.release(controller.enqueue(f"user_{index}"))
+        self.assertEqual(len(controller._buckets), 3)
+        self.assertEqual(metrics.get("admission.buckets.evicted"), 5)
+
+        # Um balde ainda em uso não é descartado: o limite continua valendo
+        controller = self.make(max_concurrency=10, user_rate_per_minute=60, user_burst=1)
+        controller.release(controller.enqueue("alice"))
+        controller.release(controller.enqueue("bob"))
+        with self.assertRaises(AdmissionRejected):
+            controller.enqueue("alice")
+
+    def test_weights_from_env(self):
+        """Verifica a leitura dos pesos da fila a partir do ambiente"""
+        self.assertEqual(parse_weights(" vip=2, lento = 0.5 ,"), {"vip": 2.0, "lento": 0.5})
+        self.assertEqual(parse_weights(""), {})
+        for text in ("vip", "vip=0", "=2", "vip=abc"):
+            with self.assertRaises(ValueError):
+                parse_weights(text)
+
+        with patch.dict(os.environ, {"ADMISSION_USER_WEIGHTS": "vip=3", "ADMISSION_MAX_USERS": "50"}):
+            controller = AdmissionController.from_env()
+        self.assertEqual(controller.weights, {"vip": 3.0})
+        self.assertEqual(controller.max_users, 50)
+
+    def test_queue_timeout(self):
+        """Verifica se pedidos que esperam demais são recusados e saem da fila"""
+        controller = self.make(max_concurrency=1, max_queue=1)
+        running = controller.enqueue("alice")
+        waiting = controller.enqueue("bob")
+
+        with self.assertRaises(AdmissionRejected) as context:
+            controller.wait(waiting, timeout=0.01)
+        self.assertEqual(context.exception.reason, REJECTED_TIMEOUT)
+
+        controller.release(running)
+        self.assertIsNone(waiting.admitted_at)
+        self.assertEqual(controller.stats()["queued"], 0)
+
+    def test_queue_time_metrics(self):
+        """Verifica o registro do tempo de fila"""
+        controller = self.make(max_concurrency=1, max_queue=1)
+        running = controller.enqueue("alice")
+        waiting = controller.enqueue("bob")
+        self.clock.now = 2.0
+        controller.release(running)
+
+        report = admission_report()
+        self.assertEqual(report["admitted"], 2)
+        self.assertAlmostEqual(report["avg_queue_time"], 1.0)
+        self.assertEqual(report["queue_time_le_5"], 1)
+        controller.release(waiting)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Testes do processamento em lote de conversas (utils/batch.py).
+"""
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.batch import LineTracker, parse_shard, run_batch, user_hash
+from voxy_ratelimit import TokenBucket
+
+class TestBatch(unittest.TestCase):
+    """Testes para o processamento em lote"""
+
+    def setUp(self):
+        """Cria um arquivo de entrada temporário"""
+        self.directory = tempfile.mkdtemp()
+        self.input = os.path.join(self.directory, "conversas.jsonl")
+        self.output = os.path.join(self.directory, "resultados.jsonl")
+        self.checkpoint = os.path.join(self.directory, "checkpoint.json")
+        self.seen = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_input(self, turns, extra_lines=()):
+        with open(self.input, "w", encoding="utf-8") as f:
+            for turn in turns:
+                f.write(json.dumps(turn) + "\n")
+            for line in extra_lines:
+                f.write(line + "\n")
+
+    def read_output(self):
+        with open(self.output, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def process(self, turn):
+        """Simula o agente com latência variável"""
+        time.sleep(0.001 * (len(turn["message"]) % 3))
+        with self.lock:
+            self.seen.append((turn["user_id"], turn["message"]))
+        return {"response": f"eco: {turn['message']}"}
+
+    def test_preserves_order_per_user(self):
+        """Verifica se os turnos de cada usuário são processados na ordem do arquivo"""
+        turns = [{"user_id": f"user_{i % 5}", "message": f"mensagem {i}"} for i in range(60)]
+        self.write_input(turns)
+
+        stats = run_batch(self.input, self.output, self.process, self.checkpoint, workers=4, checkpoint_every=7)
+
+        self.assertEqual(stats["processed"], 60)
+        self.assertEqual(stats["failed"], 0)
+        for user in {turn["user_id"] for turn in turns}:
+            expected = [turn["message"] for turn in turns if turn["user_id"] == user]
+            self.assertEqual([message for seen_user, message in self.seen if seen_user == user], expected)
+        self.assertEqual(sorted(result["line"] for result in self.read_output()), list(range(1, 61)))
+        with open(self.checkpoint, "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["watermark"], 60)
+
+    def test_invalid_lines_and_errors_are_reported(self):
+        """Verifica se linhas inválidas e falhas do processamento viram resultados de erro"""
+        self.write_input([{"user_id": "alice", "message": "falhe"}, {"user_id": "bob", "message": "oi"}],
+                         extra_lines=["{não é json", "", json.dumps({"user_id": "carol"})])
+
+        def process(turn):
+            if turn["message"] == "falhe":
+                raise RuntimeError("erro simulado")
+            return {"response": "ok"}
+
+        stats = run_batch(self.input, self.output, process, self.checkpoint, workers=2)
+
+        self.assertEqual(stats, {"processed": 1, "failed": 3, "resumed": 0})
+        errors = {result["line"]: result["error"] for result in self.read_output() if result["status"] == "error"}
+        self.assertEqual(errors[1], "erro simulado")
+        self.assertIn("Linha inválida", errors[3])
+        self.assertIn("Linha inválida", errors[5])
+
+    def test_resumes_from_checkpoint(self):
+        """Verifica se uma nova execução pula as linhas registradas no checkpoint"""
+        turns = [{"user_id": "alice", "message": f"mensagem {i}"} for i in range(10)]
+        self.write_input(turns[:5])
+        flushes = []
+        run_batch(self.input, self.output, self.process, self.checkpoint, workers=1,
+                  before_checkpoint=lambda: flushes.append(True))
+        self.assertTrue(flushes)
+
+        # Linhas concluídas fora de ordem também são lembradas
+        with open(self.checkpoint, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        checkpoint["done"] = [7]
+        with open(self.checkpoint, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+
+        self.write_input(turns)
+        self.seen = []
+        stats = run_batch(self.input, self.output, self.process, self.checkpoint, workers=1)
+
+        self.assertEqual(stats["resumed"], 6)
+        self.assertEqual([message for _, message in self.seen], ["mensagem 5", "mensagem 6", "mensagem 8", "mensagem 9"])
+        self.assertEqual(stats["processed"], 9)
+
+    def test_checkpoint_of_other_input_is_rejected(self):
+        """Verifica se um checkpoint de outro arquivo ou parte não é reaproveitado"""
+        self.write_input([{"user_id": "alice", "message": "oi"}])
+        run_batch(self.input, self.output, self.process, self.checkpoint, workers=1)
+
+        with self.assertRaises(ValueError):
+            run_batch(self.input, self.output, self.process, self.checkpoint, workers=1, shard=(1, 2))
+
+    def test_shards_split_users(self):
+        """Verifica se as partes processam conjuntos disjuntos de usuários"""
+        turns = [{"user_id": f"user_{i}", "message": "oi"} for i in range(20)]
+        self.write_input(turns)
+
+        users = []
+        for index in range(2):
+            self.seen = []
+            run_batch(self.input, self.output, self.process, os.path.join(self.directory, f"c{index}.json"),
+                      workers=2, shard=(index, 2))
+            users.append({user for user, _ in self.seen})
+            self.assertTrue(all(user_hash(user) % 2 == index for user in users[index]))
+
+        self.assertEqual(users[0] | users[1], {turn["user_id"] for turn in turns})
+        self.assertFalse(users[0] & users[1])
+
+    def test_rate_limit_is_applied(self):
+        """Verifica se cada turno consome uma ficha do limite de turnos"""
+        self.write_input([{"user_id": f"user_{i}", "message": "oi"} for i in range(5)])
+        bucket = TokenBucket(rate=1.0, capacity=10.0, clock=lambda: 0.0)
+
+        run_batch(self.input, self.output, self.process, self.checkpoint, workers=2, requests_limit=bucket)
+
+        self.assertEqual(bucket.try_acquire(5.0), 0.0)
+        self.assertGreater(bucket.try_acquire(1.0), 0.0)
+
+    def test_line_tracker_watermark(self):
+        """Verifica se a marca d'água só avança sobre linhas contíguas concluídas"""
+        tracker = LineTracker()
+        for line in (1, 2, 4):
+            tracker.mark(line)
+        self.assertEqual(tracker.snapshot(), (0, [1, 2, 4]))
+        tracker.mark(0)
+        self.assertEqual(tracker.snapshot(), (3, [4]))
+        self.assertTrue(tracker.is_done(4))
+        self.assertFalse(tracker.is_done(3))
+
+    def test_parse_shard(self):
+        """Verifica a validação do argumento --shard"""
+        self.assertEqual(parse_shard("1/4"), (1, 4))
+        for value in ("4/4", "-1/2", "1", "a/b"):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+if __name__ == '__main__':
+    unittest.main()
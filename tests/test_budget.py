@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o prazo por turno, o modo degradado e o disjuntor da busca de memórias.
+Execute com: python -m unittest tests.test_budget
+"""
+
+import unittest
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests import FakeClock
+from voxy_agent import chat_with_memories
+from voxy_budget import (
+    BREAKER_CLOSED,
+    BREAKER_HALF_OPEN,
+    BREAKER_OPEN,
+    PATH_DEGRADED,
+    CircuitBreaker,
+    TurnBudget,
+    degraded_report,
+)
+from voxy_metrics import metrics
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Testes para o CircuitBreaker"""
+
+    def setUp(self):
+        metrics.reset()
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        """Verifica se o disjuntor abre após falhas seguidas e suspende as chamadas"""
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, BREAKER_CLOSED)
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, BREAKER_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(metrics.get("budget.breaker_opened"), 1)
+
+    def test_single_trial_after_reset_timeout(self):
+        """Verifica se, após o tempo de espera, apenas uma chamada de teste é permitida"""
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.clock.now = 10
+
+        self.assertEqual(self.breaker.state, BREAKER_HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, BREAKER_OPEN)
+        self.clock.now = 20
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, BREAKER_CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+class TestTurnBudget(unittest.TestCase):
+    """Testes para o TurnBudget"""
+
+    def setUp(self):
+        metrics.reset()
+        self.budget = TurnBudget(deadline=5.0, retrieval_budget=0.05,
+                                 breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.budget.close()
+
+    def slow_fetch(self):
+        """Simula um armazenamento travado"""
+        self.release.wait(5)
+        return {"results": [{"memory": "atrasada"}], "path": "vector"}
+
+    def test_slow_retrieval_is_degraded(self):
+        """Verifica se a busca lenta é abandonada no prazo e a resposta segue sem memórias"""
+        result = self.budget.retrieve("alice", self.slow_fetch, limit=5)
+
+        self.assertEqual(result["path"], PATH_DEGRADED)
+        self.assertEqual(result["results"], [])
+        self.assertIn("excedeu", result["degraded"])
+        self.assertEqual(metrics.get("budget.timeouts"), 1)
+
+    def test_cache_fallback_and_breaker(self):
+        """Verifica o uso do cache local e a suspensão da busca com o disjuntor aberto"""
+        memories = [{"memory": f"fato {i}"} for i in range(3)]
+        self.assertEqual(self.budget.retrieve("alice", lambda: {"results": memories, "path": "vector"}, 5)["results"],
+                         memories)
+
+        failing = MagicMock(side_effect=RuntimeError("conexão recusada"))
+        result = self.budget.retrieve("alice", failing, limit=2)
+        self.assertEqual(result["results"], memories[:2])
+        self.assertIn("conexão recusada", result["degraded"])
+
+        self.budget.retrieve("alice", failing, limit=2)
+        self.assertEqual(self.budget.breaker.state, BREAKER_OPEN)
+        result = self.budget.retrieve("alice", failing, limit=5)
+        self.assertEqual(failing.call_count, 2)
+        self.assertEqual(result["results"], memories)
+
+        report = degraded_report()
+        self.assertEqual(report["turns"], 4)
+        self.assertEqual(report["degraded"], 3)
+        self.assertEqual(report["skipped"], 1)
+        self.assertEqual(report["cache_fallbacks"], 3)
+
+        self.budget.forget("alice")
+        self.assertEqual(self.budget.retrieve("alice", failing, limit=5)["results"], [])
+
+    def test_late_result_after_forget_is_not_cached(self):
+        """Verifica se uma busca concluída depois de `forget` não devolve ao cache as memórias apagadas"""
+        self.assertEqual(self.budget.retrieve("alice", self.slow_fetch, limit=5)["path"], PATH_DEGRADED)
+        self.budget.forget("alice")
+
+        # Conclui a busca atrasada e aguarda o callback que atualizaria o cache
+        executor = self.budget._pool()
+        self.release.set()
+        executor.shutdown(wait=True)
+        self.budget.close()
+
+        result = self.budget.retrieve("alice", MagicMock(side_effect=RuntimeError("conexão recusada")), limit=5)
+        self.assertEqual(result["results"], [])
+
+    def test_generation_gets_remaining_time(self):
+        """Verifica se a geração recebe o tempo restante do prazo, com um mínimo"""
+        with patch('voxy_budget.time.monotonic', return_value=101.0):
+            self.assertAlmostEqual(self.budget.generation_timeout(100.0), 4.0)
+            self.assertAlmostEqual(self.budget.generation_timeout(90.0), 1.0)
+
+    def test_invalid_configuration(self):
+        """Verifica a validação do prazo e do orçamento da busca"""
+        with self.assertRaises(ValueError):
+            TurnBudget(deadline=1.0, retrieval_budget=2.0)
+        with patch.dict(os.environ, {"TURN_DEADLINE_SECONDS": "10", "TURN_RETRIEVAL_BUDGET_SECONDS": "0.5"}):
+            budget = TurnBudget.from_env()
+        self.assertTrue(budget.enabled)
+        self.assertFalse(TurnBudget().enabled)
+
+    def test_chat_answers_without_memories(self):
+        """Verifica se o chat responde dentro do prazo com o armazenamento travado"""
+        mock_memory = MagicMock()
+        mock_memory.search.side_effect = lambda **kwargs: self.slow_fetch()
+        mock_openai = MagicMock()
+        mock_openai.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="Resposta sem memórias"))])
+
+        response = chat_with_memories("Qual é o meu restaurante favorito?", "alice", mock_openai, mock_memory,
+                                      buffer=MagicMock(pending_memories=MagicMock(return_value=[])),
+                                      budget=self.budget)
+
+        self.assertEqual(response, "Resposta sem memórias")
+        timeout = mock_openai.chat.completions.create.call_args.kwargs["timeout"]
+        self.assertGreater(timeout, 4.0)
+        self.assertLessEqual(timeout, 5.0)
+        self.assertEqual(degraded_report()["degraded"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
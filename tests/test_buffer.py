@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para a extração de memórias em janelas.
+Execute com: python -m unittest tests.test_buffer
+"""
+
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests import FakeClock
+from voxy_buffer import ExtractionBuffer, MAX_PENDING_WINDOWS
+
+class TestExtractionBuffer(unittest.TestCase):
+    """Testes para o buffer de turnos pendentes"""
+
+    def setUp(self):
+        """Cria um buffer com janela de três turnos"""
+        self.clock = FakeClock()
+        self.save = MagicMock(return_value=True)
+        self.buffer = ExtractionBuffer(self.save, window=3, idle_timeout=60, clock=self.clock)
+
+    def test_window_flush(self):
+        """Verifica se memory.add é chamado uma vez por janela completa"""
+        self.assertIsNone(self.buffer.add_turn("alice", "Moro em Lisboa", "Legal!"))
+        self.assertIsNone(self.buffer.add_turn("alice", "Tenho um gato", "Que bom!"))
+        self.save.assert_not_called()
+
+        self.assertTrue(self.buffer.add_turn("alice", "Trabalho com design", "Interessante!"))
+
+        self.save.assert_called_once()
+        messages, user_id = self.save.call_args.args
+        self.assertEqual(user_id, "alice")
+        self.assertEqual(len(messages), 6)
+        self.assertEqual(messages[0], {"role": "user", "content": "Moro em Lisboa"})
+        self.assertEqual(self.buffer.pending("alice"), [])
+
+    def test_pending_turns_visible(self):
+        """Verifica se os turnos pendentes ficam disponíveis para o prompt, por usuário"""
+        self.buffer.add_turn("alice", "Moro em Lisboa", "Legal!")
+        self.buffer.add_turn("bob", "Moro no Porto", "Legal!")
+
+        self.assertEqual(self.buffer.pending_memories("alice"), ["Moro em Lisboa"])
+        self.assertEqual(self.buffer.pending_memories("bob"), ["Moro no Porto"])
+
+    def test_idle_flush(self):
+        """Verifica se apenas os usuários inativos são salvos após o tempo limite"""
+        self.buffer.add_turn("alice", "Moro em Lisboa", "Legal!")
+        self.clock.now = 50
+        self.buffer.add_turn("bob", "Moro no Porto", "Legal!")
+        self.clock.now = 61
+
+        flushed = self.buffer.flush_idle()
+
+        self.assertEqual(list(flushed), ["alice"])
+        self.assertEqual(self.buffer.pending_memories("bob"), ["Moro no Porto"])
+
+    def test_close_flushes_everything(self):
+        """Verifica se o fim da sessão salva todos os turnos pendentes"""
+        self.buffer.add_turn("alice", "Moro em Lisboa", "Legal!")
+        self.buffer.add_turn("bob", "Moro no Porto", "Legal!")
+
+        self.buffer.close()
+
+        self.assertEqual(self.save.call_count, 2)
+        self.assertFalse(self.buffer.flush("alice"))
+
+    def test_failed_save_keeps_turns(self):
+        """Verifica se os turnos de um envio que falhou continuam pendentes e são reenviados"""
+        self.save.side_effect = [RuntimeError("banco indisponível"), True]
+        self.buffer.add_turn("alice", "Moro em Lisboa", "Legal!")
+
+        self.assertFalse(self.buffer.flush("alice"))
+        self.assertEqual(self.buffer.pending_memories("alice"), ["Moro em Lisboa"])
+
+        self.buffer.add_turn("alice", "Tenho um gato", "Que bom!")
+        self.assertTrue(self.buffer.flush("alice"))
+
+        messages, _ = self.save.call_args.args
+        self.assertEqual([message["content"] for message in messages if message["role"] == "user"],
+                         ["Moro em Lisboa", "Tenho um gato"])
+        self.assertEqual(self.buffer.pending("alice"), [])
+
+    def test_failed_saves_are_bounded(self):
+        """Verifica se falhas seguidas não acumulam turnos sem limite"""
+        self.save.side_effect = RuntimeError("banco indisponível")
+        for index in range(30):
+            self.buffer.add_turn("alice", f"fato {index}", "ok")
+
+        pending = self.buffer.pending_memories("alice")
+        self.assertEqual(len(pending), 3 * MAX_PENDING_WINDOWS)
+        self.assertEqual(pending[-1], "fato 29")
+
+    def test_invalid_window(self):
+        """Verifica se janelas inválidas são recusadas"""
+        with self.assertRaises(ValueError):
+            ExtractionBuffer(self.save, window=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Orçamento de chamadas por turno do chat.
+
+Executa `chat_with_memories` e as funções de `web/utils/api.py` contra
+clientes instrumentados, com a `Memory.search` real do mem0, e verifica o
+número exato de chamadas de embeddings, buscas vetoriais, textuais e de
+entidades, chamadas ao LLM de chat, `memory.add` e leituras do banco por
+turno, além do volume de log. Uma mudança que
+acrescente chamadas ao caminho do chat falha aqui, em vez de chegar à
+produção; se o aumento for intencional, atualize o orçamento no teste.
+
+Execute com: python -m unittest tests.test_call_budget
+"""
+
+import unittest
+import os
+import io
+import sys
+import logging
+from collections import Counter
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from mem0 import Memory
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voxy_engine
+from utils.memory_benchmark import load_web_api
+from voxy_agent import chat_with_memories, save_memories
+from voxy_budget import CircuitBreaker, TurnBudget
+from voxy_buffer import ExtractionBuffer
+from voxy_engine import VoxyEngine
+from voxy_metrics import metrics
+from voxy_store import OutputData, VoxyVectorStore
+
+# Configuração padrão do caminho do chat (sem depender do ambiente de quem executa os testes)
+DEFAULT_ENV = {
+    "MEMORY_RETRIEVAL_MODE": "vector",
+    "MEMORY_RETRIEVAL_GATE": "true",
+    "MEMORY_EXTRACTION_GATE": "true",
+    "MEMORY_EXTRACTION_WINDOW": "1",
+    "PROMPT_LAYOUT": "inline",
+    "MODEL_ROUTER": "false",
+    "TURN_DEADLINE_SECONDS": "0",
+    "DEDUP_WINDOW_SECONDS": "5",
+    "MODEL_CHOICE": "gpt-4o-mini",
+}
+
+# Mensagens com fatos (busca e extração) e triviais (nenhuma das duas)
+FACT_MESSAGE = "Eu moro em Lisboa e trabalho com design de interfaces"
+TRIVIAL_MESSAGE = "ok, obrigado!"
+
+# Orçamento de log por turno: bytes das mensagens e bytes impressos no console
+# (o número de registros é verificado de forma exata em cada teste)
+LOG_BYTES_PER_TURN = 320
+CONSOLE_BYTES_PER_TURN = 640
+
+class CountingStore(VoxyVectorStore):
+    """Armazenamento vetorial em memória que conta buscas, leituras textuais e conexões."""
+
+    def __init__(self, calls: Counter):
+        self.calls = calls
+        self.collection_name = "voxy_memories"
+        self.facts = {}
+        self.pool = SimpleNamespace(getconn=self._getconn, putconn=lambda conn: None)
+
+    def _getconn(self):
+        self.calls["db_connections"] += 1
+        return MagicMock()
+
+    def _records(self, user_id, top_k):
+        return [OutputData(id=str(index), score=0.9, payload={"data": fact, "user_id": user_id})
+                for index, fact in enumerate(self.facts.get(user_id, [])[:top_k])]
+
+    def search(self, query, vectors, top_k=5, filters=None):
+        self.calls["vector_searches"] += 1
+        return self._records(filters["user_id"], top_k)
+
+    def lexical_search(self, query, top_k=5, filters=None):
+        self.calls["lexical_searches"] += 1
+        return self._records(filters["user_id"], top_k)
+
+    def keyword_search(self, query, top_k=5, filters=None):
+        # Gancho da busca híbrida do mem0: só conta quando o armazenamento realmente consulta o banco
+        results = super().keyword_search(query, top_k, filters)
+        if results is not None:
+            self.calls["keyword_searches"] += 1
+        return results
+
+class CountingEntityStore:
+    """Coleção de entidades do mem0 que conta as buscas do reforço por entidades."""
+
+    def __init__(self, calls: Counter):
+        self.calls = calls
+
+    def search(self, query, vectors, top_k=5, filters=None):
+        self.calls["entity_searches"] += 1
+        return []
+
+def extract_entities(text):
+    """Substituto determinístico do spaCy: nomes próprios são as palavras capitalizadas fora do início."""
+    return [("PROPN", word.strip(".,!?")) for word in text.split()[1:] if word[:1].isupper()]
+
+class InstrumentedMemory(Memory):
+    """mem0 com embeddings, armazenamento vetorial e coleção de entidades instrumentados.
+
+    A busca é a `Memory.search` do mem0 instalado (embedding, busca vetorial,
+    busca textual híbrida e reforço por entidades); o `add` é simulado.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self.vector_store = CountingStore(self.calls)
+        self.collection_name = self.vector_store.collection_name
+        self.embedding_model = SimpleNamespace(embed=self._embed, embed_batch=self._embed_batch)
+        self._entity_store = CountingEntityStore(self.calls)
+        self.reranker = None
+        self.api_version = "v1.1"
+
+    def _embed(self, text, memory_action=None):
+        self.calls["embeddings"] += 1
+        return [0.1, 0.2, 0.3]
+
+    def _embed_batch(self, texts, memory_action=None):
+        self.calls["embeddings"] += 1
+        return [[0.1, 0.2, 0.3] for _ in texts]
+
+    def search(self, query, user_id, limit=100, **kwargs):
+        # O Voxy passa user_id/limit; o restante é a busca real do mem0
+        return super().search(query, top_k=limit, filters={"user_id": user_id})
+
+    def add(self, messages, user_id, **kwargs):
+        # As chamadas internas do mem0 (extração e embeddings dos fatos) custam o mesmo a cada `add`
+        self.calls["add"] += 1
+        facts = [message["content"] for message in messages if message["role"] == "user"]
+        self.vector_store.facts.setdefault(user_id, []).extend(facts)
+        return {"results": [{"id": str(index), "memory": fact, "event": "ADD"} for index, fact in enumerate(facts)]}
+
+class InstrumentedChat:
+    """Substituto do cliente OpenAI que conta as chamadas ao modelo de chat."""
+
+    def __init__(self, calls: Counter, reply: str = "Anotado, obrigado por contar!"):
+        self.calls = calls
+        self.reply = reply
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        self.calls["llm"] += 1
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.reply))],
+                                         usage=None)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))], usage=None)
+
+class LogCounter(logging.Handler):
+    """Conta os registros e os bytes das mensagens formatadas."""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = 0
+        self.bytes = 0
+
+    def emit(self, record):
+        self.records += 1
+        self.bytes += len(record.getMessage().encode("utf-8"))
+
+class CallBudgetTestCase(unittest.TestCase):
+    """Base dos testes: ambiente padrão, clientes instrumentados e contagem de log"""
+
+    def setUp(self):
+        """Aplica o ambiente padrão e instala a contagem de log"""
+        env = patch.dict(os.environ, DEFAULT_ENV)
+        env.start()
+        self.addCleanup(env.stop)
+        # Telemetria do mem0 desligada e extração de entidades sem depender do spaCy instalado
+        for target, value in (("mem0.memory.main.MEM0_TELEMETRY", False),
+                              ("mem0.memory.telemetry.MEM0_TELEMETRY", False),
+                              ("mem0.memory.main.extract_entities", extract_entities)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        metrics.reset()
+        self.memory = InstrumentedMemory()
+        self.calls = self.memory.calls
+        self.openai = InstrumentedChat(self.calls)
+        self.log = LogCounter()
+        logger = logging.getLogger("voxy-agent")
+        logger.addHandler(self.log)
+        self.addCleanup(logger.removeHandler, self.log)
+        self.console = io.StringIO()
+
+    def turn(self, message, user_id="alice", **options):
+        """Executa um turno, com o console capturado"""
+        with redirect_stdout(self.console):
+            return chat_with_memories(message, user_id, self.openai, self.memory, **options)
+
+    def assertCalls(self, **expected):
+        """Verifica as contagens exatas (as omitidas devem ser zero)"""
+        self.assertEqual({name: count for name, count in self.calls.items() if count}, expected)
+
+    def assertLogBudget(self, turns, records):
+        """Verifica o número de registros de log e o volume de log e de console dentro do orçamento"""
+        self.assertEqual(self.log.records, records)
+        self.assertLessEqual(self.log.bytes, LOG_BYTES_PER_TURN * turns)
+        self.assertLessEqual(len(self.console.getvalue().encode("utf-8")), CONSOLE_BYTES_PER_TURN * turns)
+
+class TestChatCallBudget(CallBudgetTestCase):
+    """Orçamento de `chat_with_memories`"""
+
+    def test_turn_with_facts(self):
+        """Um turno com fatos: a busca do mem0 (embedding da consulta, busca vetorial e reforço pela
+        entidade "Lisboa"), uma chamada ao LLM e um add, sem a busca textual híbrida"""
+        self.turn(FACT_MESSAGE)
+
+        self.assertCalls(embeddings=2, vector_searches=1, entity_searches=1, llm=1, add=1)
+        self.assertEqual(self.calls["keyword_searches"], 0)
+        self.assertLogBudget(turns=1, records=4)
+
+    def test_trivial_turn(self):
+        """Uma mensagem trivial dispensa a busca e a extração: apenas a chamada ao LLM"""
+        self.turn(TRIVIAL_MESSAGE)
+
+        self.assertCalls(llm=1)
+        self.assertLogBudget(turns=1, records=4)
+
+    def test_streaming_turn(self):
+        """O streaming não muda o número de chamadas"""
+        self.turn(FACT_MESSAGE, on_token=lambda token: None)
+
+        self.assertCalls(embeddings=2, vector_searches=1, entity_searches=1, llm=1, add=1)
+
+    def test_budget_does_not_grow_with_memories(self):
+        """Com muitas memórias do usuário, cada turno continua com uma única busca"""
+        self.memory.vector_store.facts["alice"] = [f"Fato número {index} sobre a alice" for index in range(200)]
+
+        for index in range(5):
+            self.turn(f"{FACT_MESSAGE} desde {2010 + index}")
+
+        self.assertCalls(embeddings=10, vector_searches=5, entity_searches=5, llm=5, add=5)
+        self.assertLogBudget(turns=5, records=20)
+
+    def test_log_does_not_grow_with_payloads(self):
+        """Respostas e memórias longas não são copiadas para o log"""
+        self.openai.reply = "resposta longa " * 1000
+        self.memory.vector_store.facts["alice"] = ["memória longa " * 200] * 5
+
+        self.turn(FACT_MESSAGE + " " + "detalhe " * 300)
+
+        self.assertLogBudget(turns=1, records=4)
+
+    def test_extraction_window(self):
+        """Com janela de 3 turnos, três turnos fazem três buscas e um único add"""
+        buffer = ExtractionBuffer(lambda messages, user_id: save_memories(self.memory, messages, user_id), window=3)
+
+        for index in range(3):
+            self.turn(f"{FACT_MESSAGE} há {index + 2} anos", buffer=buffer)
+
+        self.assertCalls(embeddings=6, vector_searches=3, entity_searches=3, llm=3, add=1)
+        self.assertLogBudget(turns=3, records=11)
+
+    def test_lexical_first(self):
+        """Com resultados textuais suficientes, a recuperação não calcula embeddings"""
+        self.memory.vector_store.facts["alice"] = [f"Fato {index}" for index in range(5)]
+
+        with patch.dict(os.environ, {"MEMORY_RETRIEVAL_MODE": "lexical_first"}):
+            self.turn(FACT_MESSAGE)
+
+        self.assertCalls(lexical_searches=1, llm=1, add=1)
+
+    def test_open_breaker_skips_search(self):
+        """Com o disjuntor aberto, o turno degradado não tenta a busca"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        budget = TurnBudget(deadline=5, retrieval_budget=1, breaker=breaker)
+        self.addCleanup(budget.close)
+
+        self.turn(FACT_MESSAGE, budget=budget)
+
+        self.assertCalls(llm=1, add=1)
+
+    def test_save_memories(self):
+        """A extração é um único add, sem buscas para contar as memórias"""
+        messages = [{"role": "user", "content": FACT_MESSAGE}, {"role": "assistant", "content": "Anotado!"}]
+
+        self.assertTrue(save_memories(self.memory, messages, "alice"))
+
+        self.assertCalls(add=1)
+
+class TestWebApiCallBudget(CallBudgetTestCase):
+    """Orçamento das funções de `web/utils/api.py`"""
+
+    def setUp(self):
+        """Registra um motor com os clientes instrumentados como motor do processo"""
+        super().setUp()
+        self.api = load_web_api()
+        buffer = ExtractionBuffer(lambda messages, user_id: save_memories(self.memory, messages, user_id))
+        engine = VoxyEngine(self.openai, self.memory, buffer=buffer, database_url="local")
+        previous = voxy_engine._engine
+        voxy_engine._engine = engine
+        self.addCleanup(setattr, voxy_engine, "_engine", previous)
+
+    def process(self, message, user_id="alice", **options):
+        """Processa uma mensagem pela API, com o console capturado"""
+        with redirect_stdout(self.console):
+            return self.api.process_message(message, user_id, **options)
+
+    def test_process_message(self):
+        """A API não acrescenta chamadas ao turno do chat"""
+        self.process(FACT_MESSAGE)
+
+        self.assertCalls(embeddings=2, vector_searches=1, entity_searches=1, llm=1, add=1)
+        self.assertLogBudget(turns=1, records=5)
+
+    def test_repeated_message_is_deduplicated(self):
+        """A mesma mensagem repetida dentro da janela de deduplicação não é processada de novo"""
+        first = self.process(FACT_MESSAGE)
+        second = self.process(FACT_MESSAGE)
+
+        self.assertEqual(first, second)
+        self.assertCalls(embeddings=2, vector_searches=1, entity_searches=1, llm=1, add=1)
+
+    def test_memory_listing(self):
+        """Listar memórias é uma leitura do banco, sem embeddings nem busca vetorial"""
+        page = {"records": [("1", {"data": "Mora em Lisboa", "user_id": "alice"})], "next_cursor": None, "total": 1}
+
+        def fake_listing(*args, **kwargs):
+            self.calls["db_queries"] += 1
+            return page
+
+        with patch("voxy_engine.list_user_memories", side_effect=fake_listing):
+            memories = self.api.get_user_memories("alice")
+            listing = self.api.list_user_memories("alice")
+            # Páginas repetidas dentro da janela reaproveitam a leitura
+            self.api.list_user_memories("alice")
+
+        self.assertEqual(memories[0]["memory"], "Mora em Lisboa")
+        self.assertEqual(listing["total"], 1)
+        self.assertCalls(db_connections=2, db_queries=2)
+
+    def test_end_session_with_empty_buffer(self):
+        """Encerrar uma sessão sem turnos pendentes não chama o mem0"""
+        self.api.end_session("alice")
+
+        self.assertCalls()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o agrupamento das chamadas de embeddings.
+Execute com: python -m unittest tests.test_embeddings
+"""
+
+import unittest
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_embeddings import (
+    EmbeddingBatcher,
+    batch_options_from_env,
+    batch_size_bucket,
+    embedding_batch_report,
+    install_batcher,
+    openai_batch_function,
+)
+from voxy_metrics import metrics
+
+def embed_concurrently(batcher, texts):
+    """Chama `embed` em paralelo, uma thread por texto"""
+    results = {}
+    errors = {}
+
+    def call(text):
+        try:
+            results[text] = batcher.embed(text)
+        except Exception as e:
+            errors[text] = e
+
+    threads = [threading.Thread(target=call, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+class TestEmbeddingBatcher(unittest.TestCase):
+    """Testes para o EmbeddingBatcher"""
+
+    def setUp(self):
+        """Zera as métricas e cria uma função de lote simulada"""
+        metrics.reset()
+        self.batches = []
+
+    def fake_batch(self, texts):
+        """Retorna o comprimento de cada texto como vetor"""
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def test_concurrent_calls_share_requests(self):
+        """Verifica se chamadas simultâneas são reunidas e cada uma recebe o próprio vetor"""
+        batcher = EmbeddingBatcher(self.fake_batch, max_batch=4, max_wait=0.2)
+        texts = ["a" * i for i in range(1, 9)]
+
+        results, errors = embed_concurrently(batcher, texts)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(results, {text: [float(len(text))] for text in texts})
+        self.assertEqual(sorted(text for batch in self.batches for text in batch), sorted(texts))
+        self.assertLess(len(self.batches), len(texts))
+        self.assertTrue(all(len(batch) <= 4 for batch in self.batches))
+        report = embedding_batch_report()
+        self.assertEqual(report["inputs"], 8)
+        self.assertEqual(report["requests"], len(self.batches))
+        self.assertEqual(sum(report["histogram"].values()), len(self.batches))
+
+    def test_single_call_is_sent_after_wait(self):
+        """Verifica se uma chamada isolada é enviada sozinha após a espera"""
+        batcher = EmbeddingBatcher(self.fake_batch, max_batch=8, max_wait=0.001)
+
+        self.assertEqual(batcher.embed("olá"), [3.0])
+        self.assertEqual(self.batches, [["olá"]])
+        self.assertEqual(embedding_batch_report()["histogram"], {"1": 1})
+
+    def test_errors_reach_every_caller(self):
+        """Verifica se o erro da requisição chega a todas as chamadas do lote"""
+        batcher = EmbeddingBatcher(MagicMock(side_effect=RuntimeError("limite excedido")), max_batch=3, max_wait=0.2)
+
+        results, errors = embed_concurrently(batcher, ["a", "b", "c"])
+
+        self.assertEqual(results, {})
+        self.assertEqual({str(error) for error in errors.values()}, {"limite excedido"})
+        self.assertEqual(len(errors), 3)
+
+    def test_invalid_options(self):
+        """Verifica a validação do tamanho do lote e da espera"""
+        with self.assertRaises(ValueError):
+            EmbeddingBatcher(self.fake_batch, max_batch=0)
+        with self.assertRaises(ValueError):
+            EmbeddingBatcher(self.fake_batch, max_wait=-1)
+        with patch.dict(os.environ, {"EMBEDDING_BATCH_SIZE": "abc"}):
+            with self.assertRaises(ValueError):
+                batch_options_from_env()
+        with patch.dict(os.environ, {"EMBEDDING_BATCH_SIZE": "32", "EMBEDDING_BATCH_WAIT_MS": "10"}):
+            self.assertEqual(batch_options_from_env(), (32, 0.01))
+
+    def test_batch_size_buckets(self):
+        """Verifica as faixas do histograma"""
+        self.assertEqual([batch_size_bucket(size) for size in (1, 2, 3, 4, 5, 16, 64, 65, 500)],
+                         ["1", "2", "3-4", "3-4", "5-8", "9-16", "33-64", "65+", "65+"])
+
+class TestOpenAIBatching(unittest.TestCase):
+    """Testes da integração com o embedder do mem0"""
+
+    def test_openai_batch_function_orders_results(self):
+        """Verifica se uma lista de textos é enviada em uma requisição e os vetores voltam na ordem"""
+        client = MagicMock()
+        client.embeddings.create.return_value = SimpleNamespace(data=[
+            SimpleNamespace(index=1, embedding=[2.0]), SimpleNamespace(index=0, embedding=[1.0])])
+
+        vectors = openai_batch_function(client, "text-embedding-3-small", 512)(["um\ndois", "três"])
+
+        self.assertEqual(vectors, [[1.0], [2.0]])
+        client.embeddings.create.assert_called_once_with(input=["um dois", "três"], model="text-embedding-3-small",
+                                                         encoding_format="float", dimensions=512)
+
+    def test_install_batcher_replaces_embed(self):
+        """Verifica se o embed do mem0 passa pelo agrupador apenas quando ativado"""
+        memory = MagicMock()
+        original = memory.embedding_model.embed
+        self.assertIsNone(install_batcher(memory, "text-embedding-3-small", 1536, 1, 0.005))
+        self.assertIs(memory.embedding_model.embed, original)
+
+        memory.embedding_model.client.embeddings.create.return_value = SimpleNamespace(
+            data=[SimpleNamespace(index=0, embedding=[0.5])])
+        batcher = install_batcher(memory, "text-embedding-3-small", 1536, 16, 0.001)
+
+        self.assertIsInstance(batcher, EmbeddingBatcher)
+        self.assertEqual(memory.embedding_model.embed("oi", memory_action="search"), [0.5])
+
+if __name__ == '__main__':
+    unittest.main()
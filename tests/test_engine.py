@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o motor compartilhado (inicialização única e serialização por usuário).
+Execute com: python -m unittest tests.test_engine
+"""
+
+import unittest
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voxy_engine
+from voxy_buffer import ExtractionBuffer
+from voxy_engine import VoxyEngine, get_engine
+
+def run_threads(target, args_list):
+    """Executa `target` em uma thread por conjunto de argumentos e aguarda todas"""
+    threads = [threading.Thread(target=target, args=args) for args in args_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+class TestVoxyEngine(unittest.TestCase):
+    """Testes para o VoxyEngine"""
+
+    def setUp(self):
+        """Cria um motor com clientes simulados"""
+        self.engine = VoxyEngine(MagicMock(), MagicMock(), buffer=ExtractionBuffer(MagicMock()))
+        self.active = {}
+        self.overlaps = []
+        self.lock = threading.Lock()
+
+    def fake_chat(self, message, user_id, **kwargs):
+        """Simula uma mensagem lenta e registra sobreposições por usuário"""
+        with self.lock:
+            self.active[user_id] = self.active.get(user_id, 0) + 1
+            self.overlaps.append((user_id, self.active[user_id], sum(self.active.values())))
+        time.sleep(0.05)
+        with self.lock:
+            self.active[user_id] -= 1
+        return f"resposta para {message}"
+
+    def test_same_user_is_serialized(self):
+        """Verifica se mensagens do mesmo usuário nunca são processadas ao mesmo tempo"""
+        with patch('voxy_engine.chat_with_memories', side_effect=self.fake_chat):
+            run_threads(self.engine.process_message, [(f"msg {i}", "alice") for i in range(4)])
+
+        self.assertEqual(max(same for _, same, _ in self.overlaps), 1)
+        self.assertGreaterEqual(self.engine.stats()["processed"], 4)
+        self.assertEqual(self.engine.stats()["in_flight"], 0)
+
+    def test_different_users_run_in_parallel(self):
+        """Verifica se usuários diferentes são processados em paralelo"""
+        with patch('voxy_engine.chat_with_memories', side_effect=self.fake_chat):
+            run_threads(self.engine.process_message, [("oi", f"user_{i}") for i in range(4)])
+
+        self.assertGreater(max(total for _, _, total in self.overlaps), 1)
+        self.assertGreater(self.engine.stats()["peak_in_flight"], 1)
+        self.assertEqual(self.engine._user_locks.waiting(), {})
+
+    def test_list_memories_reads_collection(self):
+        """Verifica se a listagem lê a coleção diretamente, sem buscas com embeddings"""
+        page = {"records": [("m1", {"data": "Mora em Lisboa", "user_id": "alice", "created_at": "2025"})],
+                "next_cursor": None, "total": 1}
+        with patch.object(self.engine, 'connection') as mock_connection, \
+             patch('voxy_engine.list_user_memories', return_value=page) as mock_list:
+            result = self.engine.list_memories("alice", limit=10)
+
+        mock_list.assert_called_once_with(mock_connection.return_value.__enter__.return_value,
+                                          self.engine.collection_name, "alice", 10, None, True, True)
+        self.assertEqual(result["results"][0]["memory"], "Mora em Lisboa")
+        self.assertEqual(result["results"][0]["user_id"], "alice")
+        self.assertEqual(result["total"], 1)
+        self.engine.memory.search.assert_not_called()
+
+    def test_total_only_on_first_page(self):
+        """Verifica se o total é contado apenas na primeira página"""
+        page = {"records": [], "next_cursor": None, "total": None}
+        with patch.object(self.engine, 'connection'), \
+             patch('voxy_engine.list_user_memories', return_value=page) as mock_list:
+            self.engine.list_memories("alice", limit=10, cursor="abc")
+            self.engine.list_memories("alice", limit=10, cursor="abc", with_total=True)
+
+        self.assertEqual([call.args[-1] for call in mock_list.call_args_list], [False, True])
+
+    def test_delete_memories_discards_buffer(self):
+        """Verifica se a limpeza total também descarta os turnos ainda não salvos"""
+        self.engine.buffer.window = 10
+        self.engine.buffer.add_turn("alice", "Moro em Lisboa", "Anotado")
+        with patch.object(self.engine, 'connection') as mock_connection, \
+             patch('voxy_engine.delete_user_memories', return_value=3) as mock_delete:
+            deleted = self.engine.delete_memories("alice")
+
+        self.assertEqual(deleted, 3)
+        mock_delete.assert_called_once_with(mock_connection.return_value.__enter__.return_value,
+                                            self.engine.collection_name, "alice", None, 1000, None)
+        self.assertEqual(self.engine.buffer.pending("alice"), [])
+        self.engine.buffer.save.assert_not_called()
+
+    def test_delete_old_memories_keeps_buffer(self):
+        """Verifica se a limpeza por idade calcula o limite e preserva os turnos recentes"""
+        self.engine.buffer.window = 10
+        self.engine.buffer.add_turn("alice", "Moro em Lisboa", "Anotado")
+        with patch.object(self.engine, 'connection'), \
+             patch('voxy_engine.delete_user_memories', return_value=0) as mock_delete:
+            self.engine.delete_memories("alice", older_than_days=30)
+
+        older_than = mock_delete.call_args[0][3]
+        age = voxy_engine.datetime.now(voxy_engine.timezone.utc) - older_than
+        self.assertAlmostEqual(age.total_seconds(), 30 * 86400, delta=60)
+        self.assertEqual(len(self.engine.buffer.pending("alice")), 2)
+
+    def test_ingest_turn_uses_extraction_buffer(self):
+        """Verifica se turnos já respondidos vão ao buffer de extração sem chamar o modelo de chat"""
+        self.engine.buffer.save.return_value = True
+        with patch('voxy_engine.chat_with_memories') as mock_chat:
+            added = self.engine.ingest_turn("alice", "Eu moro em Lisboa e trabalho como engenheira", "Anotado!")
+
+        self.assertTrue(added)
+        mock_chat.assert_not_called()
+        self.engine.buffer.save.assert_called_once()
+        self.assertFalse(self.engine.ingest_turn("alice", "ok", "Certo."))
+        self.assertEqual(self.engine.buffer.save.call_count, 1)
+
+    def test_injected_extraction_gate(self):
+        """Verifica se o filtro de extração do motor é usado nas mensagens e nos turnos ingeridos"""
+        gate = MagicMock()
+        gate.should_extract.return_value = False
+        engine = VoxyEngine(MagicMock(), MagicMock(), buffer=ExtractionBuffer(MagicMock()), extraction_gate=gate)
+
+        with patch('voxy_engine.chat_with_memories') as mock_chat:
+            engine.process_message("Eu moro em Lisboa", "alice")
+        self.assertIs(mock_chat.call_args.kwargs["extraction_gate"], gate)
+
+        self.assertFalse(engine.ingest_turn("alice", "Eu moro em Lisboa e trabalho como engenheira", "Anotado!"))
+        gate.should_extract.assert_called_once()
+        engine.buffer.save.assert_not_called()
+
+    def test_background_flushes_hold_user_lock(self):
+        """Verifica se os envios de inatividade e de encerramento aguardam o turno em curso do usuário"""
+        now = [0.0]
+        seen = []
+        buffer = ExtractionBuffer(lambda messages, user_id: seen.append(self.active.get(user_id, 0)) or True,
+                                  window=3, idle_timeout=60, clock=lambda: now[0])
+        engine = VoxyEngine(MagicMock(), MagicMock(), buffer=buffer)
+        buffer.add_turn("alice", "Moro em Lisboa", "Legal!")
+        buffer.add_turn("bob", "Moro no Porto", "Legal!")
+        now[0] = 61
+
+        with patch('voxy_engine.chat_with_memories', side_effect=self.fake_chat):
+            turn = threading.Thread(target=engine.process_message, args=("oi", "alice"))
+            turn.start()
+            time.sleep(0.01)
+            buffer.flush_idle(engine.flush_user)
+            turn.join(timeout=5)
+
+        self.assertEqual(seen, [0, 0])
+        with patch.object(buffer, 'start') as mock_start:
+            engine.start()
+        mock_start.assert_called_once_with(flush=engine.flush_user)
+
+    def test_engine_is_created_once(self):
+        """Verifica se sessões simultâneas compartilham uma única inicialização"""
+        def slow_setup():
+            time.sleep(0.05)
+            return MagicMock(), MagicMock()
+
+        with patch.object(voxy_engine, '_engine', None), \
+             patch('voxy_engine.setup_memory', side_effect=slow_setup) as mock_setup, \
+             patch('voxy_engine.atexit.register'):
+            engines = []
+            run_threads(lambda: engines.append(get_engine()), [()] * 5)
+            get_engine().close()
+
+        mock_setup.assert_called_once()
+        self.assertEqual(len({id(engine) for engine in engines}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o filtro local de extração de memórias.
+Execute com: python -m unittest tests.test_gates
+"""
+
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_gates import ExtractionGate, extraction_report
+from voxy_metrics import metrics
+
+class TestExtractionGate(unittest.TestCase):
+    """Testes para o filtro de extração de fatos"""
+
+    def setUp(self):
+        """Zera as métricas antes de cada teste"""
+        metrics.reset()
+        self.gate = ExtractionGate()
+
+    def test_messages_with_facts(self):
+        """Verifica se afirmações sobre o usuário passam pela extração"""
+        for message in ["Moro em Lisboa há 3 anos", "Meu nome é Ana", "Sou alérgico a camarão",
+                        "Amanhã tenho uma entrevista", "I live in Berlin"]:
+            self.assertTrue(self.gate.should_extract(message), message)
+
+    def test_messages_without_facts(self):
+        """Verifica se mensagens triviais, perguntas e pedidos dispensam a extração"""
+        for message in ["ok, obrigado", "Qual é o meu nome?", "Recomende um filme de suspense",
+                        "What is the capital of France?"]:
+            self.assertFalse(self.gate.should_extract(message), message)
+
+    def test_report(self):
+        """Verifica a taxa de dispensa e a estimativa de tokens economizados"""
+        self.gate.should_extract("Meu nome é Ana")
+        self.gate.should_extract("Recomende um filme", [{"role": "user", "content": "Recomende um filme"},
+                                                         {"role": "assistant", "content": "Duna" * 100}])
+
+        report = extraction_report()
+        self.assertEqual(report["skip_rate"], 0.5)
+        self.assertGreater(report["tokens_saved"], 100)
+
+    def test_disabled_gate(self):
+        """Verifica se o filtro desativado sempre executa a extração"""
+        with patch.dict(os.environ, {"MEMORY_EXTRACTION_GATE": "off"}):
+            gate = ExtractionGate.from_env()
+        self.assertTrue(gate.should_extract("ok"))
+
+
+if __name__ == '__main__':
+    unittest.main()
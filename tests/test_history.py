@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o histórico de chat persistente e limitado da interface web.
+Execute com: python -m unittest tests.test_history
+"""
+
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_history import BoundedHistory, PersistentHistory, TranscriptStore
+
+class MemoryArchive:
+    """Arquivo das mensagens que saem da janela, mantido em memória."""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def append(self, session_id, messages):
+        self.sessions.setdefault(session_id, []).extend(messages)
+
+    def read(self, session_id, start, stop):
+        return self.sessions.get(session_id, [])[max(0, start):max(0, stop)]
+
+    def clear(self, session_id):
+        self.sessions.pop(session_id, None)
+
+class TestBoundedHistory(unittest.TestCase):
+    """Testes para o BoundedHistory"""
+
+    def setUp(self):
+        """Cria um histórico com janela pequena"""
+        self.archive = MemoryArchive()
+        self.history = BoundedHistory(self.archive, window=4)
+
+    def add_messages(self, count):
+        """Adiciona `count` mensagens numeradas"""
+        for i in range(count):
+            self.history.add("user" if i % 2 == 0 else "assistant", f"mensagem {i}")
+
+    def test_window_stays_bounded(self):
+        """Verifica se apenas a janela fica em memória e o restante vai para o arquivo"""
+        self.add_messages(100)
+
+        self.assertEqual(len(self.history.messages), 4)
+        self.assertEqual(self.history.archived, 96)
+        self.assertEqual(self.history.total, 100)
+        self.assertEqual(self.history.messages[-1]["content"], "mensagem 99")
+
+    def test_recent_reads_older_pages(self):
+        """Verifica se páginas anteriores são relidas do arquivo, em ordem"""
+        self.add_messages(10)
+
+        self.assertEqual([m["content"] for m in self.history.recent(2)], ["mensagem 8", "mensagem 9"])
+        self.assertEqual([m["content"] for m in self.history.recent(7)],
+                         [f"mensagem {i}" for i in range(3, 10)])
+        self.assertEqual(len(self.history.recent(50)), 10)
+
+    def test_clear_removes_archive(self):
+        """Verifica se limpar a conversa também remove as mensagens arquivadas"""
+        self.add_messages(10)
+        session_id = self.history.session_id
+
+        self.history.clear()
+
+        self.assertEqual(self.history.total, 0)
+        self.assertEqual(self.archive.read(session_id, 0, 10), [])
+        self.assertNotEqual(self.history.session_id, session_id)
+
+
+class TestPersistentHistory(unittest.TestCase):
+    """Testes para o PersistentHistory e o TranscriptStore"""
+
+    def setUp(self):
+        """Cria um histórico com janela pequena em um banco temporário"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = TranscriptStore(os.path.join(directory.name, "historico.db"))
+        self.owner = self.store.token_owner(self.store.issue_token())
+        self.history = PersistentHistory(self.store, self.owner, "alice", window=4)
+
+    def add_turns(self, count, history=None):
+        """Adiciona `count` turnos (mensagem do usuário e resposta) numerados"""
+        history = history or self.history
+        for i in range(count):
+            history.add("user", f"pergunta {i}")
+            history.add("assistant", f"resposta {i}")
+
+    def test_wal_mode(self):
+        """Verifica se o banco usa o modo WAL"""
+        mode = self.store._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_window_stays_bounded(self):
+        """Verifica se apenas a janela fica em memória e a conversa completa vai para o banco"""
+        self.add_turns(50)
+
+        self.assertEqual(len(self.history.messages), 4)
+        self.assertEqual(self.history.archived, 96)
+        self.assertEqual(self.history.total, 100)
+        self.assertEqual(self.store.count(self.owner, self.history.session_id), 100)
+        self.assertEqual(self.history.messages[-1]["content"], "resposta 49")
+
+    def test_writes_are_batched(self):
+        """Verifica se as mensagens são gravadas uma vez por resposta do assistente"""
+        self.history.add("user", "oi")
+        self.assertEqual(self.store.count(self.owner, self.history.session_id), 0)
+
+        self.history.add("assistant", "olá")
+
+        self.assertEqual(self.store.count(self.owner, self.history.session_id), 2)
+
+    def test_recent_reads_older_pages(self):
+        """Verifica se páginas anteriores são lidas do banco, em ordem, inclusive antes de gravadas"""
+        self.add_turns(5)
+        self.history.add("user", "pergunta 5")
+
+        self.assertEqual([m["content"] for m in self.history.recent(2)], ["resposta 4", "pergunta 5"])
+        self.assertEqual([m["content"] for m in self.history.recent(5)],
+                         ["pergunta 3", "resposta 3", "pergunta 4", "resposta 4", "pergunta 5"])
+        self.assertEqual(len(self.history.recent(50)), 11)
+
+    def test_reconnect_resumes_latest_conversation(self):
+        """Verifica se um dono que reconecta recupera a conversa mais recente (só a janela)"""
+        self.add_turns(5)
+
+        resumed = PersistentHistory.resume(self.store, self.owner, "alice", window=4)
+
+        self.assertEqual(resumed.session_id, self.history.session_id)
+        self.assertEqual(resumed.messages, self.history.messages)
+        self.assertEqual(resumed.total, 10)
+        self.assertEqual([m["content"] for m in resumed.recent(6)][0], "pergunta 2")
+        self.assertEqual(PersistentHistory.resume(self.store, self.owner, "bob").total, 0)
+        self.assertEqual(self.store.latest_session(self.owner), (self.history.session_id, "alice"))
+
+    def test_other_owners_cannot_read_transcripts(self):
+        """Verifica se a conversa não é aberta por outro dono, mesmo com o mesmo usuário e a mesma conversa"""
+        self.add_turns(5)
+        other = self.store.token_owner(self.store.issue_token())
+
+        self.assertEqual(PersistentHistory.resume(self.store, other, "alice").total, 0)
+        self.assertEqual(PersistentHistory(self.store, other, "alice", self.history.session_id).total, 0)
+        self.assertEqual(self.store.session_user(self.owner, self.history.session_id), "alice")
+        self.assertIsNone(self.store.session_user(other, self.history.session_id))
+
+    def test_resume_tokens(self):
+        """Verifica se apenas tokens emitidos e assinados pelo banco identificam um dono"""
+        token = self.store.issue_token()
+
+        self.assertEqual(self.store.token_owner(token), self.store.token_owner(token))
+        self.assertNotEqual(self.store.token_owner(token), self.owner)
+        for forged in (None, "", "alice", "alice.", token.split(".")[0] + ".0000", "x" + token):
+            self.assertIsNone(self.store.token_owner(forged))
+        # A chave fica no banco: tokens continuam válidos após reabri-lo
+        self.assertEqual(TranscriptStore(self.store.path).token_owner(token), self.store.token_owner(token))
+
+    def test_clear_and_new_session(self):
+        """Verifica se limpar apaga a conversa e se uma nova conversa mantém a anterior"""
+        self.add_turns(2)
+        first = self.history.session_id
+        self.history.new_session()
+        self.add_turns(1)
+        second = self.history.session_id
+
+        self.history.clear()
+
+        self.assertEqual(self.store.count(self.owner, first), 4)
+        self.assertEqual(self.store.count(self.owner, second), 0)
+        self.assertEqual(self.history.total, 0)
+
+    def test_threads_share_the_store(self):
+        """Verifica se sessões em threads diferentes gravam no mesmo banco"""
+        def run(user_id):
+            self.add_turns(10, PersistentHistory(self.store, self.owner, user_id, "conversa-" + user_id, window=4))
+
+        threads = [threading.Thread(target=run, args=(f"user_{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual([self.store.count(self.owner, f"conversa-user_{i}") for i in range(4)], [20] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
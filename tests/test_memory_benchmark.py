@@ -0,0 +1,67 @@
+"""
+Testes do benchmark de memória por turno (utils/memory_benchmark.py).
+"""
+
+import unittest
+import os
+import sys
+
+# Adiciona o diretório raiz ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.memory_benchmark import LocalChatClient, LocalMemory, run_benchmark, slope
+
+class TestMemoryBenchmark(unittest.TestCase):
+    """Testes para o benchmark de memória"""
+
+    def test_slope(self):
+        """Verifica a inclinação por mínimos quadrados"""
+        self.assertAlmostEqual(slope([(0, 10), (1, 12), (2, 14)]), 2.0)
+        self.assertEqual(slope([(0, 5), (10, 5)]), 0.0)
+        self.assertEqual(slope([(0, 5)]), 0.0)
+
+    def test_detects_growth_per_turn(self):
+        """Verifica se um processamento que retém dados a cada turno é apontado, e um estável não"""
+        retained = []
+
+        def leaky(message, user_id):
+            retained.append(bytearray(1000))
+            return "ok"
+
+        result = run_benchmark(leaky, turns=400, warmup=20, users=5, samples=8)
+
+        self.assertGreater(result["traced_growth_per_turn"], 900)
+        self.assertEqual(len(result["samples"]), 9)
+        self.assertTrue(any(__file__ in entry["site"] for entry in result["top_growth"]))
+
+        stable = run_benchmark(lambda message, user_id: "ok", turns=400, warmup=20, users=5, samples=8)
+        self.assertLess(stable["traced_growth_per_turn"], 100)
+
+    def test_concurrent_turns_run_all_users(self):
+        """Verifica se os turnos em paralelo processam todos os turnos planejados"""
+        seen = []
+        run_benchmark(lambda message, user_id: seen.append(user_id), turns=50, warmup=10,
+                      users=3, samples=2, concurrency=3)
+        self.assertEqual(len(seen), 60)
+        self.assertLessEqual(len(set(seen)), 3)
+
+    def test_local_memory_keeps_recent_facts(self):
+        """Verifica se o mem0 local guarda apenas os fatos mais recentes de cada usuário"""
+        memory = LocalMemory(max_facts=3)
+        for index in range(5):
+            memory.add([{"role": "user", "content": f"fato {index}"},
+                        {"role": "assistant", "content": "ok"}], user_id="alice")
+
+        facts = [item["memory"] for item in memory.search("fato", user_id="alice", limit=10)["results"]]
+        self.assertEqual(sorted(facts), ["fato 2", "fato 3", "fato 4"])
+        self.assertEqual(memory.search("fato", user_id="bob")["results"], [])
+
+    def test_local_chat_client(self):
+        """Verifica se o cliente local responde no formato da API de chat"""
+        client = LocalChatClient()
+        response = client.chat.completions.create(model="gpt-4o-mini",
+                                                  messages=[{"role": "user", "content": "Oi"}])
+        self.assertTrue(response.choices[0].message.content)
+
+if __name__ == '__main__':
+    unittest.main()
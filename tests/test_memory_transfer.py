@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para a exportação e importação de memórias.
+Execute com: python -m unittest tests.test_memory_transfer
+"""
+
+import unittest
+import os
+import io
+import sys
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.memory_transfer import (
+    detect_format,
+    read_binary,
+    read_jsonl,
+    write_binary,
+    write_jsonl,
+)
+from voxy_store import _copy_buffer, copy_records, format_vector, parse_vector
+
+RECORDS = [
+    ("id-1", [0.5, -1.25, 2.0], {"user_id": "alice", "data": "Gosta de café"}),
+    ("id-2", [0.0, 0.25, -0.75], {"user_id": "bob", "data": "Mora em\tLisboa\ncom \\gatos"}),
+]
+
+class TestTransferFormats(unittest.TestCase):
+    """Testes para os formatos de arquivo de exportação"""
+
+    def test_jsonl_round_trip(self):
+        """Verifica se os registros sobrevivem a uma ida e volta em JSONL"""
+        stream = io.BytesIO()
+        self.assertEqual(write_jsonl(RECORDS, stream), 2)
+
+        stream.seek(0)
+        self.assertEqual(list(read_jsonl(stream)), RECORDS)
+
+    def test_jsonl_without_vectors(self):
+        """Verifica a exportação JSONL sem vetores"""
+        stream = io.BytesIO()
+        write_jsonl([(rid, None, meta) for rid, _, meta in RECORDS], stream)
+
+        stream.seek(0)
+        self.assertTrue(all(vector is None for _, vector, _ in read_jsonl(stream)))
+
+    def test_binary_round_trip(self):
+        """Verifica se os registros sobrevivem a uma ida e volta no formato binário"""
+        stream = io.BytesIO()
+        self.assertEqual(write_binary(RECORDS, stream), 2)
+
+        stream.seek(0)
+        self.assertEqual(list(read_binary(stream)), RECORDS)
+
+    def test_binary_requires_vectors(self):
+        """Verifica se o formato binário rejeita registros sem vetor"""
+        with self.assertRaises(ValueError):
+            write_binary([("id-1", None, {})], io.BytesIO())
+
+    def test_binary_truncated(self):
+        """Verifica a detecção de arquivos binários truncados"""
+        stream = io.BytesIO()
+        write_binary(RECORDS, stream)
+        truncated = io.BytesIO(stream.getvalue()[:-3])
+
+        with self.assertRaises(ValueError):
+            list(read_binary(truncated))
+
+    def test_detect_format(self):
+        """Verifica a dedução do formato pela extensão"""
+        self.assertEqual(detect_format("memorias.vxm"), "binary")
+        self.assertEqual(detect_format("memorias.jsonl.gz"), "jsonl")
+
+
+class TestStoreHelpers(unittest.TestCase):
+    """Testes para os utilitários de acesso direto à coleção"""
+
+    def test_vector_text_round_trip(self):
+        """Verifica a conversão de vetores de/para o formato do pgvector"""
+        self.assertEqual(parse_vector(format_vector([1, 0.5, -2])), [1.0, 0.5, -2.0])
+        self.assertIsNone(parse_vector(None))
+
+    def test_copy_buffer_escapes_values(self):
+        """Verifica se tabulações e quebras de linha são escapadas para o COPY"""
+        buffer, count = _copy_buffer(RECORDS)
+        lines = buffer.getvalue().splitlines()
+
+        self.assertEqual(count, 2)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all(line.count("\t") == 2 for line in lines))
+        self.assertIn("\\\\t", lines[1])
+
+class TestCopyRecords(unittest.TestCase):
+    """Testes para a gravação de lotes com COPY"""
+
+    def setUp(self):
+        """Cria uma conexão simulada e permite renderizar SQL composto sem conexão real"""
+        patcher = patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cursor = MagicMock()
+        self.cursor.__enter__.return_value = self.cursor
+        self.conn = MagicMock()
+        self.conn.cursor.return_value = self.cursor
+
+    def executed(self):
+        """Retorna o texto das consultas executadas"""
+        return [call.args[0].as_string(self.cursor) for call in self.cursor.execute.call_args_list]
+
+    def test_default_layout_upserts(self):
+        """Verifica se a tabela padrão é mesclada com ON CONFLICT"""
+        self.assertEqual(copy_records(self.conn, "voxy_memories", RECORDS, partitioned=False), 2)
+        self.assertTrue(any("ON CONFLICT (id) DO UPDATE" in query for query in self.executed()))
+
+    def test_partitioned_layout_replaces_rows(self):
+        """Verifica se a tabela particionada (sem chave única global) troca as linhas sem ON CONFLICT"""
+        with patch('voxy_store.is_partitioned', return_value=True):
+            copy_records(self.conn, "voxy_memories", RECORDS)
+
+        queries = self.executed()
+        self.assertFalse(any("ON CONFLICT" in query for query in queries))
+        delete = next(index for index, query in enumerate(queries) if query.startswith("DELETE"))
+        insert = next(index for index, query in enumerate(queries) if query.startswith("INSERT"))
+        self.assertLess(delete, insert)
+        self.assertIn('SELECT id FROM "_staging_voxy_memories"', queries[delete])
+
+    def test_duplicate_ids_keep_last(self):
+        """Verifica se ids repetidos no lote são gravados uma única vez, com o último valor"""
+        updated = ("id-1", [1.0, 1.0, 1.0], {"user_id": "alice", "data": "Prefere chá"})
+
+        count = copy_records(self.conn, "voxy_memories", RECORDS + [updated], partitioned=True)
+
+        self.assertEqual(count, 2)
+        copied = self.cursor.copy_expert.call_args.args[1].getvalue()
+        self.assertEqual(copied.count("id-1\t"), 1)
+        self.assertIn("Prefere chá", copied)
+        self.assertNotIn("Gosta de café", copied)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o perfil de CPU dos turnos do chat.
+Execute com: python -m unittest tests.test_profiling
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import time
+from collections import Counter
+from unittest.mock import patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voxy_profiling
+from voxy_profiling import TurnProfiler, configure_profiler, profiled, summarize
+
+def busy_loop(seconds):
+    """Consome CPU pelo tempo indicado"""
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+def turn(seconds=0.05):
+    """Simula um turno"""
+    busy_loop(seconds)
+    return "ok"
+
+class TestProfiling(unittest.TestCase):
+    """Testes para o TurnProfiler"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        configure_profiler(None)
+        shutil.rmtree(self.directory)
+
+    def test_profiles_every_nth_turn(self):
+        """Verifica se apenas um a cada N turnos gera um arquivo folded"""
+        profiler = TurnProfiler(every=2, output_dir=self.directory, interval=0.001)
+        configure_profiler(profiler)
+        wrapped = profiled(turn)
+
+        with self.assertLogs("voxy-agent.profiling", level="INFO") as logs:
+            results = [wrapped() for _ in range(4)]
+
+        self.assertEqual(results, ["ok"] * 4)
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(len(files), 2)
+        self.assertTrue(all(name.endswith(".folded") for name in files))
+        with open(os.path.join(self.directory, files[0]), "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any("busy_loop" in line for line in lines))
+        self.assertIn("busy_loop", "\n".join(logs.output))
+
+    def test_disabled_profiler_calls_function(self):
+        """Verifica se, sem profiler, a função é chamada diretamente"""
+        configure_profiler(None)
+        self.assertEqual(profiled(turn)(0), "ok")
+
+    def test_summary_ranks_own_samples(self):
+        """Verifica o cálculo das amostras próprias e inclusivas"""
+        stacks = Counter({"main;chat;search": 6, "main;chat;llm": 3, "main;chat": 1})
+
+        summary = summarize(stacks, top=3)
+
+        self.assertEqual(summary[0], ("search", 6, 6))
+        self.assertEqual(summary[1], ("llm", 3, 3))
+        self.assertEqual(summary[2], ("chat", 1, 10))
+
+    def test_from_env(self):
+        """Verifica a leitura de PROFILE_EVERY"""
+        with patch.dict(os.environ, {"PROFILE_EVERY": "0"}):
+            self.assertIsNone(TurnProfiler.from_env())
+        with patch.dict(os.environ, {"PROFILE_EVERY": "5", "PROFILE_DIR": self.directory}):
+            profiler = TurnProfiler.from_env()
+        self.assertEqual((profiler.every, profiler.output_dir), (5, self.directory))
+        with patch.dict(os.environ, {"PROFILE_EVERY": "-1"}):
+            with self.assertRaises(ValueError):
+                TurnProfiler.from_env()
+
+    def test_frame_labels_have_no_separator(self):
+        """Verifica se os rótulos dos quadros não contêm o separador do formato folded"""
+        label = voxy_profiling.frame_label(sys._getframe())
+        self.assertIn("test_frame_labels_have_no_separator", label)
+        self.assertNotIn(";", label)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para a montagem do prompt e as métricas de cache de prompt.
+Execute com: python -m unittest tests.test_prompt
+"""
+
+import unittest
+import os
+import re
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_agent import chat_with_memories
+from voxy_metrics import metrics
+from voxy_prompt import (
+    PROMPT_LAYOUT_CACHED,
+    PROMPT_LAYOUT_INLINE,
+    MIN_CACHED_PREFIX_TOKENS,
+    STATIC_INSTRUCTIONS,
+    build_messages,
+    conversation_messages,
+    prompt_cache_report,
+    record_usage,
+)
+
+def make_usage(prompt_tokens, cached_tokens):
+    """Cria um `response.usage` com os tokens informados"""
+    return SimpleNamespace(prompt_tokens=prompt_tokens,
+                           prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens))
+
+class TestPromptLayout(unittest.TestCase):
+    """Testes para os layouts do prompt"""
+
+    def setUp(self):
+        """Zera as métricas"""
+        metrics.reset()
+
+    def test_cached_layout_has_static_prefix(self):
+        """Verifica se o prefixo do layout 'cached' é idêntico entre usuários e mensagens"""
+        first = build_messages("Onde eu moro?", "- Mora em Lisboa", PROMPT_LAYOUT_CACHED)
+        second = build_messages("Qual meu nome?", "- Chama-se Ana", PROMPT_LAYOUT_CACHED)
+
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(first[0]["content"], STATIC_INSTRUCTIONS)
+        self.assertIn("Mora em Lisboa", first[1]["content"])
+        self.assertEqual(first[-1], {"role": "user", "content": "Onde eu moro?"})
+
+    def test_static_prefix_reaches_cache_threshold(self):
+        """Verifica se o prefixo fixo tem tokens suficientes para entrar no cache do provedor"""
+        # Palavras e sinais são um limite inferior do número de tokens do tokenizador
+        pieces = re.findall(r"\w+|[^\w\s]", STATIC_INSTRUCTIONS)
+        self.assertGreaterEqual(len(pieces), MIN_CACHED_PREFIX_TOKENS)
+
+    def test_inline_layout_keeps_memories_in_system_prompt(self):
+        """Verifica se o layout 'inline' mantém as memórias na mensagem de sistema"""
+        messages = build_messages("Onde eu moro?", "- Mora em Lisboa", PROMPT_LAYOUT_INLINE)
+
+        self.assertEqual(len(messages), 2)
+        self.assertIn("Mora em Lisboa", messages[0]["content"])
+        with self.assertRaises(ValueError):
+            build_messages("Oi", "", "outro")
+
+    def test_static_prefix_is_not_sent_to_extraction(self):
+        """Verifica se as instruções fixas não são enviadas ao mem0"""
+        messages = build_messages("Moro em Lisboa", "", PROMPT_LAYOUT_CACHED)
+
+        self.assertEqual([m["role"] for m in conversation_messages(messages)], ["system", "user"])
+
+    def test_usage_is_recorded(self):
+        """Verifica o registro dos tokens em cache e as taxas do relatório"""
+        record_usage(make_usage(2000, 0))
+        record_usage(make_usage(2000, 1536))
+        self.assertIsNone(record_usage(None))
+
+        report = prompt_cache_report()
+        self.assertEqual(report["requests"], 2)
+        self.assertEqual(report["cached_tokens"], 1536)
+        self.assertAlmostEqual(report["cached_share"], 0.384)
+        self.assertEqual(report["hit_rate"], 0.5)
+
+    def test_chat_uses_cached_layout(self):
+        """Verifica se o agente usa o layout configurado e registra o uso de tokens"""
+        mock_memory = MagicMock()
+        mock_memory.search.return_value = {"results": [{"memory": "Mora em Lisboa"}]}
+        mock_openai = MagicMock()
+        mock_openai.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="Em Lisboa."))], usage=make_usage(1800, 1024)
+        )
+
+        with patch.dict(os.environ, {"PROMPT_LAYOUT": PROMPT_LAYOUT_CACHED}):
+            chat_with_memories("Onde eu moro?", "usuario_local", mock_openai, mock_memory)
+
+        sent = mock_openai.chat.completions.create.call_args.kwargs["messages"]
+        self.assertEqual(sent[0]["content"], STATIC_INSTRUCTIONS)
+        self.assertIn("Mora em Lisboa", sent[1]["content"])
+        self.assertEqual(prompt_cache_report()["cached_tokens"], 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
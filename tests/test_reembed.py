@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para a migração de embeddings e a limitação de taxa.
+Execute com: python -m unittest tests.test_reembed
+"""
+
+import unittest
+import os
+import sys
+import json
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests import FakeClock
+from utils.reembed import (
+    PHASE_COPIED,
+    copy_phase,
+    create_shadow,
+    create_shadow_indexes,
+    embed_records,
+    load_checkpoint,
+    make_openai_embedder,
+    save_checkpoint,
+    shadow_name,
+    verify_shadow,
+)
+from voxy_ratelimit import TokenBucket
+
+def fake_embed(texts):
+    """Gera um vetor determinístico para cada texto."""
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Testes para o balde de fichas"""
+
+    def test_waits_for_refill(self):
+        """Verifica se o balde aguarda a reposição das fichas"""
+        clock = FakeClock()
+        bucket = TokenBucket.per_minute(60, clock)
+
+        self.assertEqual(bucket.acquire(60, clock.sleep), 0.0)
+        self.assertAlmostEqual(bucket.try_acquire(1), 1.0)
+        self.assertAlmostEqual(bucket.acquire(2, clock.sleep), 2.0)
+
+    def test_requests_larger_than_capacity(self):
+        """Verifica se pedidos maiores que a capacidade não bloqueiam para sempre"""
+        bucket = TokenBucket(10, 10, FakeClock())
+        self.assertEqual(bucket.try_acquire(1000), 0.0)
+
+
+class TestReembed(unittest.TestCase):
+    """Testes para a migração de embeddings"""
+
+    def setUp(self):
+        """Cria um diretório temporário para os checkpoints"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "reembed.json")
+        self.expected = {"alias": "voxy_memories", "source": "voxy_memories", "shadow": "sombra",
+                         "embedding_model": "text-embedding-3-small", "embedding_dims": 2}
+
+    def test_shadow_name(self):
+        """Verifica o nome padrão da coleção sombra"""
+        self.assertEqual(shadow_name("voxy_memories", "text-embedding-3-small", 512),
+                         "voxy_memories_text_embedding_3_small_512")
+
+    def test_embed_records_skips_empty_text(self):
+        """Verifica se memórias sem texto são descartadas"""
+        records = [("a", None, {"data": "café"}), ("b", None, {"data": ""})]
+        self.assertEqual(embed_records(records, fake_embed), [("a", [4.0, 1.0], {"data": "café"})])
+
+    def test_checkpoint_mismatch(self):
+        """Verifica se um checkpoint de outra migração é recusado"""
+        save_checkpoint(self.path, dict(self.expected, embedding_dims=512))
+        with self.assertRaises(ValueError):
+            load_checkpoint(self.path, self.expected)
+
+    def test_copy_resumes_from_checkpoint(self):
+        """Verifica se a cópia retoma do último id e grava o progresso a cada lote"""
+        checkpoint = dict(self.expected, phase="copy", last_id="id-2", migrated=2, skipped=0)
+        save_checkpoint(self.path, checkpoint)
+        checkpoint = load_checkpoint(self.path, self.expected)
+
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value.fetchone.return_value = (5,)
+        batches = [[("id-3", None, {"data": "x"}), ("id-4", None, {"data": "yy"})],
+                   [("id-5", None, {})]]
+        with patch('utils.reembed.iter_record_batches', return_value=iter(batches)) as mock_iter, \
+             patch('utils.reembed.copy_records') as mock_copy, \
+             patch('utils.reembed.sql'):
+            checkpoint = copy_phase(conn, checkpoint, fake_embed, self.path, batch_size=2)
+
+        self.assertEqual(mock_iter.call_args[0][2], "id-2")
+        self.assertEqual(mock_copy.call_count, 2)
+        self.assertEqual(conn.commit.call_count, 2)
+        with open(self.path, encoding="utf-8") as f:
+            saved = json.load(f)
+        self.assertEqual(saved["last_id"], "id-5")
+        self.assertEqual((saved["migrated"], saved["skipped"]), (4, 1))
+        self.assertEqual(saved["phase"], PHASE_COPIED)
+
+    def test_shadow_keeps_partitioned_layout(self):
+        """Verifica se a sombra de uma origem particionada é particionada e recebe os índices da origem"""
+        layout = {"partitions": 4, "indexes": ["binary", "fts", "hnsw", "listing"]}
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        partitions = [f"_sombra_p{index}" for index in range(4)]
+
+        with patch('utils.reembed.get_dimension', return_value=None), \
+             patch('utils.reembed.create_partitioned_collection') as mock_create, \
+             patch('utils.reembed.ensure_collection') as mock_ensure, \
+             patch('utils.reembed.sql'):
+            create_shadow(conn, "sombra", 2, layout)
+        mock_create.assert_called_once_with(cursor, "sombra", "sombra", 2, 4)
+        mock_ensure.assert_not_called()
+
+        with patch('utils.reembed.create_partition_indexes') as mock_partition_indexes, \
+             patch('utils.reembed.list_partitions', return_value=partitions), \
+             patch('utils.reembed.quantized_index_sql') as mock_quantized, \
+             patch('utils.reembed.fulltext_index_sql') as mock_fulltext, \
+             patch('utils.reembed.listing_index_sql') as mock_listing, \
+             patch('utils.reembed.collection_table', side_effect=lambda name: name):
+            create_shadow_indexes(conn, "sombra", 2, layout)
+        mock_partition_indexes.assert_called_once_with(conn, "sombra", 4)
+        self.assertEqual([c.args[1] for c in mock_quantized.call_args_list],
+                         [f"ix_sombra_p{index}_vec_binary" for index in range(4)])
+        self.assertEqual(mock_quantized.call_args.args[2:], ("binary", 2))
+        self.assertEqual(mock_fulltext.call_count, 4)
+        self.assertEqual(mock_listing.call_args.args, ("_sombra_p3", "ix_sombra_p3_user_created"))
+
+    def test_verify_requires_source_layout(self):
+        """Verifica se a troca é recusada quando a sombra perdeu partições ou índices da origem"""
+        layout = {"partitions": 4, "indexes": ["fts", "halfvec", "hnsw"]}
+        conn = MagicMock()
+
+        with patch('utils.reembed.collection_layout', return_value={"partitions": 0, "indexes": ["hnsw"]}):
+            with self.assertRaisesRegex(ValueError, "partições"):
+                verify_shadow(conn, "voxy_memories", "sombra", fake_embed, layout=layout)
+        with patch('utils.reembed.collection_layout', return_value={"partitions": 4, "indexes": ["hnsw"]}):
+            with self.assertRaisesRegex(ValueError, "fts, halfvec"):
+                verify_shadow(conn, "voxy_memories", "sombra", fake_embed, layout=layout)
+
+    def test_verify_catches_up_before_counting(self):
+        """Verifica se a contagem vem logo após uma nova sincronização e tolera escritas recentes"""
+        conn = MagicMock()
+        cursor = conn.cursor.return_value.__enter__.return_value
+        cursor.fetchall.return_value = []
+        events = []
+
+        def fake_catch_up(*args):
+            events.append("catch_up")
+            return 0
+
+        cursor.execute.side_effect = lambda *args: events.append("count")
+        with patch('utils.reembed.catch_up', side_effect=fake_catch_up), patch('utils.reembed.sql'):
+            cursor.fetchone.return_value = (103, 100)
+            verify_shadow(conn, "voxy_memories", "sombra", fake_embed, max_delta=5)
+            self.assertEqual(events[:2], ["catch_up", "count"])
+
+            cursor.fetchone.return_value = (110, 100)
+            with self.assertRaisesRegex(ValueError, "100 memórias"):
+                verify_shadow(conn, "voxy_memories", "sombra", fake_embed, max_delta=5)
+
+    def test_embedder_retries_rate_limit(self):
+        """Verifica se o limite de taxa da API provoca uma nova tentativa"""
+        from openai import RateLimitError
+
+        client = MagicMock()
+        response = MagicMock(data=[MagicMock(index=1, embedding=[0.2]), MagicMock(index=0, embedding=[0.1])])
+        error = RateLimitError("limite", response=MagicMock(status_code=429), body=None)
+        client.embeddings.create.side_effect = [error, response]
+        clock = FakeClock()
+
+        embed = make_openai_embedder(client, "text-embedding-3-small", 1,
+                                     TokenBucket.per_minute(100, clock), TokenBucket.per_minute(10000, clock),
+                                     sleep=clock.sleep)
+
+        self.assertEqual(embed(["a", "b"]), [[0.1], [0.2]])
+        self.assertEqual(client.embeddings.create.call_count, 2)
+        self.assertEqual(client.embeddings.create.call_args.kwargs["dimensions"], 1)
+        self.assertGreater(clock.now, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para a recuperação de memórias (busca textual, vetorial e fusão).
+Execute com: python -m unittest tests.test_retrieval
+"""
+
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_gates import RetrievalGate
+from voxy_metrics import metrics
+from voxy_retrieval import (
+    PATH_HYBRID,
+    PATH_LEXICAL,
+    PATH_SKIPPED,
+    PATH_VECTOR,
+    RETRIEVAL_LEXICAL_FIRST,
+    reciprocal_rank_fusion,
+    retrieval_report,
+    retrieve_memories,
+)
+from mem0.vector_stores.base import VectorStoreBase
+from voxy_store import FTS_DOCUMENT, OutputData, VoxyVectorStore, build_keyword_search, collection_table
+
+def make_memory(lexical_rows, vector_results):
+    """
+    Cria uma memória simulada com o armazenamento de SQL direto.
+
+    Args:
+        lexical_rows: Textos devolvidos pela busca textual
+        vector_results: Textos devolvidos por `memory.search`
+    """
+    memory = MagicMock()
+    memory.vector_store = MagicMock(spec=VoxyVectorStore)
+    memory.vector_store.lexical_search.return_value = [
+        OutputData(id=f"lex-{i}", score=1.0, payload={"data": text, "user_id": "alice"})
+        for i, text in enumerate(lexical_rows)
+    ]
+    memory.search.return_value = {"results": [{"id": f"vec-{i}", "memory": text, "score": 0.9}
+                                              for i, text in enumerate(vector_results)]}
+    return memory
+
+class TestRetrieval(unittest.TestCase):
+    """Testes para os caminhos de recuperação de memórias"""
+
+    def setUp(self):
+        """Zera as métricas antes de cada teste"""
+        metrics.reset()
+
+    def test_lexical_hit_skips_vector_search(self):
+        """Verifica se resultados lexicais suficientes dispensam o embedding"""
+        memory = make_memory(["O telefone do João é 1234"], ["outra"])
+
+        result = retrieve_memories(memory, "telefone do João", "alice", mode=RETRIEVAL_LEXICAL_FIRST,
+                                   min_lexical_results=1)
+
+        self.assertEqual(result["path"], PATH_LEXICAL)
+        self.assertEqual(result["results"][0]["memory"], "O telefone do João é 1234")
+        self.assertEqual(result["results"][0]["user_id"], "alice")
+        memory.search.assert_not_called()
+        self.assertEqual(retrieval_report()[PATH_LEXICAL]["share"], 1.0)
+
+    def test_insufficient_lexical_results_are_fused(self):
+        """Verifica a fusão quando a busca textual não basta"""
+        memory = make_memory(["Gosta de café"], ["Mora em Lisboa", "Gosta de chá"])
+
+        result = retrieve_memories(memory, "bebidas", "alice", mode=RETRIEVAL_LEXICAL_FIRST,
+                                   min_lexical_results=2)
+
+        self.assertEqual(result["path"], PATH_HYBRID)
+        self.assertEqual(len(result["results"]), 3)
+        memory.search.assert_called_once()
+
+    def test_vector_mode(self):
+        """Verifica se o modo padrão não executa a busca textual"""
+        memory = make_memory(["Gosta de café"], ["Mora em Lisboa"])
+
+        result = retrieve_memories(memory, "onde moro?", "alice", mode="vector")
+
+        self.assertEqual(result["path"], PATH_VECTOR)
+        memory.vector_store.lexical_search.assert_not_called()
+
+    def test_lexical_error_falls_back(self):
+        """Verifica se falhas na busca textual recaem na busca vetorial"""
+        memory = make_memory([], ["Mora em Lisboa"])
+        memory.vector_store.lexical_search.side_effect = RuntimeError("sem conexão")
+
+        result = retrieve_memories(memory, "Lisboa", "alice", mode=RETRIEVAL_LEXICAL_FIRST)
+
+        self.assertEqual(result["path"], PATH_VECTOR)
+        self.assertEqual(metrics.get("retrieval.lexical_errors"), 1)
+
+    def test_reciprocal_rank_fusion(self):
+        """Verifica se memórias presentes nas duas listas sobem na fusão"""
+        lexical = [{"id": "a", "memory": "A"}, {"id": "b", "memory": "B"}]
+        vector = [{"id": "b", "memory": "B"}, {"id": "c", "memory": "C"}]
+
+        fused = reciprocal_rank_fusion([lexical, vector], limit=2)
+
+        self.assertEqual([item["id"] for item in fused], ["b", "a"])
+
+    def test_keyword_search_sql(self):
+        """Verifica se a consulta textual usa a expressão do índice e o filtro de usuário"""
+        with patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"'), \
+             patch('psycopg2.sql.Literal.as_string', new=lambda literal, context: repr(literal.wrapped)):
+            query, params = build_keyword_search(collection_table("voxy_memories"), "João", 5, {"user_id": "alice"})
+            text = query.as_string(MagicMock())
+
+        self.assertIn(FTS_DOCUMENT + " @@ query", text)
+        self.assertIn("metadata @> %s", text)
+        self.assertEqual(params[0], "João")
+        self.assertEqual(params[-1], 5)
+
+    def test_mem0_hybrid_hook_not_overridden(self):
+        """Verifica se a busca textual não é o gancho que o mem0 chama em toda busca"""
+        self.assertIs(VoxyVectorStore.keyword_search, VectorStoreBase.keyword_search)
+
+
+class TestRetrievalGate(unittest.TestCase):
+    """Testes para o filtro de mensagens triviais"""
+
+    def setUp(self):
+        """Zera as métricas antes de cada teste"""
+        metrics.reset()
+        self.gate = RetrievalGate()
+
+    def test_trivial_messages(self):
+        """Verifica se cumprimentos, agradecimentos e risadas são triviais"""
+        for message in ["Oi!", "ok, obrigado", "Valeu 👍", "kkkkk", "Bom dia, tudo bem?", "🙏"]:
+            self.assertTrue(self.gate.should_skip(message), message)
+
+    def test_messages_that_need_memories(self):
+        """Verifica se perguntas e referências ao usuário não são dispensadas"""
+        for message in ["Qual é o meu nome?", "Oi, lembra do meu cachorro?", "Ok, e o telefone do João?",
+                        "Obrigado, agora me recomende um livro de ficção científica parecido com Duna"]:
+            self.assertFalse(self.gate.should_skip(message), message)
+
+    def test_threshold_and_counters(self):
+        """Verifica o limiar configurável e os contadores de decisões"""
+        strict = RetrievalGate(threshold=0.99)
+        self.assertFalse(strict.should_skip("ok, obrigado"))
+        self.assertTrue(strict.should_skip("👍"))
+        self.assertEqual(metrics.get("gate.retrieval.skipped"), 1)
+        self.assertEqual(metrics.get("gate.retrieval.performed"), 1)
+
+    def test_skipped_retrieval(self):
+        """Verifica se a recuperação é dispensada sem consultar a memória"""
+        memory = make_memory([], ["Mora em Lisboa"])
+
+        result = retrieve_memories(memory, "ok, obrigado!", "alice", gate=self.gate)
+
+        self.assertEqual(result, {"results": [], "path": PATH_SKIPPED})
+        memory.search.assert_not_called()
+
+    def test_disabled_gate(self):
+        """Verifica se o filtro desativado nunca dispensa a busca"""
+        with patch.dict(os.environ, {"MEMORY_RETRIEVAL_GATE": "false"}):
+            gate = RetrievalGate.from_env()
+        self.assertFalse(gate.should_skip("oi"))
+
+
+if __name__ == '__main__':
+    unittest.main()
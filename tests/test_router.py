@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o roteamento de mensagens entre modelos.
+Execute com: python -m unittest tests.test_router
+"""
+
+import unittest
+import os
+import sys
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_metrics import metrics
+from voxy_router import ModelRouter, router_report
+
+class TestModelRouter(unittest.TestCase):
+    """Testes para o ModelRouter"""
+
+    def setUp(self):
+        """Zera as métricas e cria um roteador com orçamento de latência"""
+        metrics.reset()
+        self.router = ModelRouter(fast_model="rapido", large_model="grande", threshold=0.5, latency_budget=3.0)
+
+    def test_simple_messages_use_fast_model(self):
+        """Verifica se mensagens curtas e diretas vão para o modelo rápido"""
+        for message in ("Oi, tudo bem?", "Qual é o meu nome?", "Obrigado!"):
+            self.assertEqual(self.router.route(message), "rapido", message)
+
+    def test_complex_messages_use_large_model(self):
+        """Verifica se pedidos de análise, código e perguntas encadeadas vão para o modelo maior"""
+        messages = [
+            "Explique passo a passo a diferença entre processos e threads",
+            "Por que este código falha?\n```python\ndef f(x):\n    return x[0]\n```",
+            "Compare Postgres e MySQL. Qual escala melhor? E qual é mais barato?",
+        ]
+        for message in messages:
+            self.assertEqual(self.router.route(message), "grande", message)
+
+    def test_slow_large_model_raises_threshold(self):
+        """Verifica se o limiar sobe quando o modelo maior excede o orçamento de latência"""
+        message = "Explique como funciona um índice"
+        self.assertEqual(self.router.route(message), "grande")
+
+        self.router.record("grande", 8.0)
+
+        self.assertGreater(self.router.effective_threshold(), self.router.threshold)
+        self.assertEqual(self.router.route(message), "rapido")
+
+    def test_savings_are_recorded(self):
+        """Verifica a média de latência e o tempo economizado pelo modelo rápido"""
+        self.router.record("grande", 4.0)
+        self.router.record("grande", 2.0)
+        self.router.route("Oi")
+        self.router.record("rapido", 1.0)
+
+        self.assertAlmostEqual(self.router.latency("grande"), 3.6)
+        report = router_report()
+        self.assertEqual(report["fast"], 1)
+        self.assertAlmostEqual(report["saved_seconds"], 2.6)
+        self.assertEqual(report["fast_share"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
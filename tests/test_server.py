@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o serviço HTTP do Voxy-Mem0.
+Execute com: python -m unittest tests.test_server
+"""
+
+import unittest
+import os
+import sys
+import json
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_admission import AdmissionController
+
+try:
+    from starlette.testclient import TestClient
+    from voxy_server import allowed_models, create_app
+    SERVER_AVAILABLE = True
+except ImportError:
+    SERVER_AVAILABLE = False
+
+def make_engine():
+    """Cria um motor simulado que responde em dois trechos"""
+    engine = MagicMock()
+
+    def process_message(message, user_id, on_token=None, **options):
+        if on_token:
+            on_token("Olá, ")
+            on_token(user_id)
+        return f"Olá, {user_id}"
+
+    engine.process_message.side_effect = process_message
+    engine.list_memories.return_value = {"results": [{"id": "1", "memory": "Mora em Lisboa"}],
+                                         "next_cursor": "abc", "total": 2}
+    engine.stats.return_value = {"in_flight": 0}
+    engine.budget.breaker.state = "closed"
+    engine.router.fast_model = "gpt-4o-mini"
+    engine.router.large_model = "gpt-4o"
+    return engine
+
+@unittest.skipUnless(SERVER_AVAILABLE, "starlette não instalado")
+class TestServer(unittest.TestCase):
+    """Testes para as rotas do serviço HTTP"""
+
+    def setUp(self):
+        """Inicia a aplicação com o motor simulado"""
+        self.engine = make_engine()
+        self.admission = AdmissionController(max_concurrency=2, max_queue=2, user_rate_per_minute=60, user_burst=3)
+        with patch.dict(os.environ, {"SERVER_ADMIN_TOKEN": ""}):
+            self.client = TestClient(create_app(engine_factory=lambda: self.engine, admission=self.admission))
+        self.client.__enter__()
+
+    def tearDown(self):
+        """Encerra a aplicação (executa o encerramento gracioso)"""
+        self.client.__exit__(None, None, None)
+        self.engine.close.assert_called_once()
+
+    def test_chat_json(self):
+        """Verifica a resposta de /chat em JSON"""
+        response = self.client.post("/chat", json={"message": "Oi", "user_id": "alice"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"response": "Olá, alice", "user_id": "alice"})
+
+    def test_chat_stream(self):
+        """Verifica os eventos SSE de /chat"""
+        response = self.client.post("/chat", json={"message": "Oi", "user_id": "alice", "stream": True})
+
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        names = [lines[0].removeprefix("event: ") for lines in events]
+        self.assertEqual(names, ["token", "token", "done"])
+        self.assertEqual(json.loads(events[-1][1].removeprefix("data: "))["response"], "Olá, alice")
+
+    def test_chat_requires_fields(self):
+        """Verifica se mensagens sem usuário são recusadas"""
+        response = self.client.post("/chat", json={"message": "Oi"})
+
+        self.assertEqual(response.status_code, 400)
+        self.engine.process_message.assert_not_called()
+
+    def test_chat_rejects_non_text_fields(self):
+        """Verifica se mensagens e usuários que não são texto recebem 400, e não 500"""
+        for body in ({"message": ["Oi"], "user_id": "alice"}, {"message": "Oi", "user_id": 42}):
+            response = self.client.post("/chat", json=body)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("texto", response.json()["error"])
+        self.engine.process_message.assert_not_called()
+
+    def test_chat_settings(self):
+        """Verifica se o modelo e o limite de memórias chegam ao motor e são validados"""
+        self.client.post("/chat", json={"message": "Oi", "user_id": "alice", "model": "gpt-4o", "memory_limit": 3})
+
+        self.engine.process_message.assert_called_once_with("Oi", "alice", model="gpt-4o", memory_limit=3)
+        response = self.client.post("/chat", json={"message": "Oi", "user_id": "alice", "memory_limit": 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_chat_rejects_unknown_model(self):
+        """Verifica se modelos fora da lista permitida são recusados antes do processamento"""
+        response = self.client.post("/chat", json={"message": "Oi", "user_id": "alice", "model": "o1-pro"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("o1-pro", response.json()["error"])
+        self.engine.process_message.assert_not_called()
+        self.assertEqual(self.admission.stats()["active"], 0)
+
+    def test_allowed_models_from_env(self):
+        """Verifica se SERVER_ALLOWED_MODELS substitui os modelos padrão"""
+        with patch.dict(os.environ, {"SERVER_ALLOWED_MODELS": "gpt-4o, gpt-4.1"}):
+            self.assertEqual(allowed_models(self.engine), {"gpt-4o", "gpt-4.1"})
+        with patch.dict(os.environ, {"SERVER_ALLOWED_MODELS": "", "MODEL_CHOICE": "gpt-4.1-mini"}):
+            self.assertEqual(allowed_models(self.engine), {"gpt-4.1-mini", "gpt-4o-mini", "gpt-4o"})
+
+    def test_rate_limited_user_gets_retry_after(self):
+        """Verifica a recusa com 429 e Retry-After quando o usuário excede o limite"""
+        for _ in range(3):
+            self.assertEqual(self.client.post("/chat", json={"message": "Oi", "user_id": "alice"}).status_code, 200)
+
+        response = self.client.post("/chat", json={"message": "Oi", "user_id": "alice"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(self.client.post("/chat", json={"message": "Oi", "user_id": "bob"}).status_code, 200)
+        self.assertEqual(self.admission.stats()["active"], 0)
+
+    def test_memories_pagination(self):
+        """Verifica a paginação de /memories"""
+        response = self.client.get("/memories/alice?limit=1&cursor=xyz")
+
+        self.assertEqual(response.json()["next_cursor"], "abc")
+        self.engine.list_memories.assert_called_once_with("alice", 1, "xyz", True)
+        self.assertEqual(self.client.get("/memories/alice?limit=1000").status_code, 400)
+
+    def test_delete_memories_disabled_by_default(self):
+        """Verifica se, sem token de administração, a remoção pelo HTTP não existe"""
+        response = self.client.delete("/memories/alice", headers={"Authorization": "Bearer "})
+
+        self.assertEqual(response.status_code, 405)
+        self.engine.delete_memories.assert_not_called()
+
+    def test_delete_memories(self):
+        """Verifica a remoção de memórias com o token e a validação do filtro de idade"""
+        engine = make_engine()
+        engine.delete_memories.return_value = 4
+        with TestClient(create_app(engine_factory=lambda: engine, admission=self.admission,
+                                   admin_token="segredo")) as client:
+            headers = {"Authorization": "Bearer segredo"}
+            self.assertEqual(client.delete("/memories/alice").status_code, 401)
+            self.assertEqual(client.delete("/memories/alice", headers={"Authorization": "Bearer outro"}).status_code, 401)
+            response = client.delete("/memories/alice?older_than_days=30", headers=headers)
+
+            self.assertEqual(response.json()["deleted"], 4)
+            engine.delete_memories.assert_called_once_with("alice", 30.0)
+            self.assertEqual(client.delete("/memories/alice?older_than_days=ontem", headers=headers).status_code, 400)
+
+    def test_health(self):
+        """Verifica a rota de saúde"""
+        response = self.client.get("/health")
+
+        self.assertEqual(response.json()["status"], "ok")
+        self.assertEqual(response.json()["degraded"]["breaker"], "closed")
+
+
+if __name__ == '__main__':
+    unittest.main()
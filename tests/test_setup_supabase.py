@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para a migração da coleção para o layout particionado.
+Execute com: python -m unittest tests.test_setup_supabase
+"""
+
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import setup_supabase
+from utils.setup_supabase import setup_partitioned_collection, sync_changes
+
+class TestPartitionedMigration(unittest.TestCase):
+    """Testes para a sincronização final da migração"""
+
+    def setUp(self):
+        """Cria uma conexão simulada e permite renderizar SQL composto sem conexão real"""
+        patcher = patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cursor = MagicMock()
+        self.cursor.__enter__.return_value = self.cursor
+        self.cursor.fetchall.return_value = []
+        self.conn = MagicMock()
+        self.conn.cursor.return_value = self.cursor
+
+    def executed(self):
+        """Retorna o texto das consultas executadas"""
+        return [call.args[0].as_string(self.cursor) for call in self.cursor.execute.call_args_list]
+
+    def test_sync_changes_replaces_changed_ids(self):
+        """Verifica se um lote de ids alterados é removido e copiado de novo da origem"""
+        self.cursor.fetchall.return_value = [("id-1",), ("id-2",)]
+        source, target, changes = (setup_supabase.collection_table(name) for name in ("a", "b", "_a_changes"))
+
+        self.assertEqual(sync_changes(self.cursor, source, target, changes, 100), 2)
+
+        queries = self.executed()
+        self.assertIn('DELETE FROM "vecs"."_a_changes"', queries[0])
+        self.assertTrue(queries[1].startswith('DELETE FROM "vecs"."b" WHERE id = ANY'))
+        self.assertIn('SELECT id, vec, metadata FROM "vecs"."a"', queries[2])
+        self.assertEqual(self.cursor.execute.call_args.args[1], (["id-1", "id-2"],))
+
+    def test_catch_up_runs_before_the_lock(self):
+        """Verifica se as alterações são sincronizadas em lotes antes do bloqueio, que só aplica o restante"""
+        synced = iter([10, 10, 3, 2, 0])
+        events = []
+
+        def fake_sync(cursor, *args):
+            events.append("sync")
+            return next(synced)
+
+        def record(query, *args):
+            if "LOCK TABLE" in query.as_string(self.cursor):
+                events.append("lock")
+
+        self.cursor.execute.side_effect = record
+        with patch('utils.setup_supabase.psycopg2.connect', return_value=self.conn), \
+             patch('utils.setup_supabase.resolve_collection', return_value="voxy_memories"), \
+             patch('utils.setup_supabase.get_dimension', return_value=3), \
+             patch('utils.setup_supabase.is_partitioned', return_value=False), \
+             patch('utils.setup_supabase.get_collection_config', return_value=None), \
+             patch('utils.setup_supabase.create_partitioned_collection'), \
+             patch('utils.setup_supabase.create_partition_indexes'), \
+             patch('utils.setup_supabase.sync_changes', side_effect=fake_sync):
+            self.assertTrue(setup_partitioned_collection("postgres://", 4, batch_size=10))
+
+        self.assertEqual(events, ["sync", "sync", "sync", "lock", "sync", "sync"])
+        queries = self.executed()
+        self.assertTrue(any("CREATE TRIGGER" in query for query in queries))
+        self.assertFalse(any("UPDATE" in query and "<>" in query for query in queries))
+        # O gatilho só é removido depois do bloqueio, antes da troca das tabelas
+        lock = next(index for index, query in enumerate(queries) if "LOCK TABLE" in query)
+        drop = max(index for index, query in enumerate(queries) if query.startswith("DROP TRIGGER"))
+        rename = next(index for index, query in enumerate(queries) if "RENAME" in query)
+        self.assertLess(lock, drop)
+        self.assertLess(drop, rename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para a deduplicação de chamadas idênticas (single-flight).
+Execute com: python -m unittest tests.test_singleflight
+"""
+
+import unittest
+import os
+import sys
+import threading
+from unittest.mock import MagicMock
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests import FakeClock
+from voxy_metrics import metrics
+from voxy_singleflight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    """Testes para o SingleFlight"""
+
+    def setUp(self):
+        """Zera as métricas e cria um agrupador com janela de 5 segundos"""
+        metrics.reset()
+        self.clock = FakeClock()
+        self.flights = SingleFlight(window=5, clock=self.clock)
+
+    def test_concurrent_calls_share_execution(self):
+        """Verifica se chamadas simultâneas com a mesma chave executam a função uma vez"""
+        started = threading.Event()
+        release = threading.Event()
+        func = MagicMock(side_effect=lambda: (started.set(), release.wait(5), "resposta")[-1])
+        results = []
+
+        leader = threading.Thread(target=lambda: results.append(self.flights.do("k", func)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(self.flights.do("k", func))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        func.assert_called_once()
+        self.assertEqual(results, ["resposta"] * 4)
+        self.assertEqual(metrics.get("singleflight.executed"), 1)
+
+    def test_result_kept_for_window(self):
+        """Verifica se o resultado é reaproveitado apenas dentro da janela"""
+        func = MagicMock(return_value=42)
+
+        self.flights.do("k", func)
+        self.clock.now = 4.9
+        self.flights.do("k", func)
+        self.assertEqual(func.call_count, 1)
+
+        self.clock.now = 10
+        self.flights.do("k", func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_errors_are_not_cached(self):
+        """Verifica se erros não ficam guardados"""
+        func = MagicMock(side_effect=[RuntimeError("falha"), "ok"])
+
+        with self.assertRaises(RuntimeError):
+            self.flights.do("k", func)
+        self.assertEqual(self.flights.do("k", func), "ok")
+
+    def test_forget(self):
+        """Verifica o descarte de resultados por chave"""
+        func = MagicMock(return_value=[])
+        self.flights.do(("memories", "alice", 10), func)
+        self.flights.do(("memories", "bob", 10), func)
+
+        self.assertEqual(self.flights.forget(lambda key: key[1] == "alice"), 1)
+        self.flights.do(("memories", "alice", 10), func)
+        self.assertEqual(func.call_count, 3)
+
+    def test_forget_keeps_running_calls(self):
+        """Verifica se execuções em andamento não são descartadas"""
+        started = threading.Event()
+        release = threading.Event()
+        func = MagicMock(side_effect=lambda: (started.set(), release.wait(5), "resposta")[-1])
+        results = []
+
+        leader = threading.Thread(target=lambda: results.append(self.flights.do("k", func)))
+        leader.start()
+        started.wait(5)
+        self.assertEqual(self.flights.forget(lambda key: True), 0)
+        follower = threading.Thread(target=lambda: results.append(self.flights.do("k", func)))
+        follower.start()
+        release.set()
+        for thread in (leader, follower):
+            thread.join(5)
+
+        func.assert_called_once()
+        self.assertEqual(results, ["resposta"] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
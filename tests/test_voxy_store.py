@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Testes para o armazenamento vetorial com SQL direto.
+Execute com: python -m unittest tests.test_voxy_store
+"""
+
+import unittest
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+# Adiciona o diretório raiz ao path para importação
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_store import (
+    LISTING_SORT_KEY,
+    PARTITION_KEY,
+    VoxyVectorStore,
+    build_listing,
+    build_search,
+    collection_layout,
+    collection_table,
+    decode_cursor,
+    delete_user_memories,
+    encode_cursor,
+    ensure_embedding_config,
+    list_user_memories,
+    resolve_collection,
+)
+from utils.quantization_report import percentile, recall
+
+def make_store(partitioned=False, rows=None):
+    """
+    Cria um VoxyVectorStore com um pool de conexões simulado.
+
+    Returns:
+        tuple: (store, cursor) - O cursor simulado registra as consultas executadas
+    """
+    cursor = MagicMock()
+    cursor.fetchall.return_value = rows or []
+    cursor.__enter__.return_value = cursor
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    pool = MagicMock()
+    pool.getconn.return_value = conn
+
+    with patch('voxy_store.ThreadedConnectionPool', return_value=pool), \
+         patch('voxy_store.get_dimension', return_value=3), \
+         patch('voxy_store.is_partitioned', return_value=partitioned):
+        store = VoxyVectorStore("postgresql://fake", "voxy_memories", 3)
+    return store, cursor
+
+def executed_sql(cursor):
+    """Retorna o texto das consultas executadas no cursor simulado."""
+    return [call.args[0].as_string(cursor) if hasattr(call.args[0], "as_string") else call.args[0]
+            for call in cursor.execute.call_args_list]
+
+class TestVoxyVectorStore(unittest.TestCase):
+    """Testes para o VoxyVectorStore"""
+
+    def setUp(self):
+        """Permite renderizar SQL composto sem conexão real"""
+        patcher = patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_search_partitioned_filters_on_partition_key(self):
+        """Verifica se a busca no layout particionado usa a chave de particionamento"""
+        store, cursor = make_store(partitioned=True, rows=[("id-1", 0.25, {"user_id": "alice"})])
+
+        results = store.search("consulta", [0.1, 0.2, 0.3], top_k=5, filters={"user_id": "alice"})
+
+        query = executed_sql(cursor)[-1]
+        self.assertIn(PARTITION_KEY, query)
+        self.assertEqual(results[0].id, "id-1")
+        self.assertAlmostEqual(results[0].score, 0.75)
+
+    def test_search_default_layout(self):
+        """Verifica se o layout padrão não usa a chave de particionamento"""
+        store, cursor = make_store(partitioned=False)
+
+        store.search("consulta", [0.1, 0.2, 0.3], filters={"user_id": "alice"})
+
+        self.assertNotIn(PARTITION_KEY, executed_sql(cursor)[-1])
+
+    def test_insert_partitioned_replaces_rows(self):
+        """Verifica se a inserção no layout particionado remove versões anteriores"""
+        store, cursor = make_store(partitioned=True)
+
+        with patch('voxy_store.execute_values') as mock_execute_values:
+            store.insert([[0.1, 0.2, 0.3]], payloads=[{"user_id": "alice"}], ids=["id-1"])
+
+        self.assertIn("DELETE", executed_sql(cursor)[-1])
+        self.assertNotIn("ON CONFLICT", mock_execute_values.call_args[0][1])
+
+
+class TestQuantizedSearch(unittest.TestCase):
+    """Testes para a busca em dois estágios sobre índices quantizados"""
+
+    def setUp(self):
+        """Permite renderizar SQL composto sem conexão real"""
+        patcher = patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('psycopg2.sql.Literal.as_string', new=lambda literal, context: str(literal.wrapped))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render(self, query):
+        """Renderiza a consulta para inspeção"""
+        return query.as_string(MagicMock())
+
+    def test_exact_search(self):
+        """Verifica se a busca sem quantização ordena pela distância exata"""
+        query, params = build_search(collection_table("voxy_memories"), [0.1, 0.2], 5)
+
+        self.assertNotIn("candidates", self.render(query))
+        self.assertEqual(params[-1], 5)
+
+    def test_binary_search_reranks_candidates(self):
+        """Verifica se a busca binária seleciona candidatos e reordena os resultados"""
+        query, params = build_search(collection_table("voxy_memories"), [0.1, 0.2], 5,
+                                     {"user_id": "alice"}, quantization="binary", rerank_factor=4)
+        text = self.render(query)
+
+        self.assertIn("binary_quantize(vec)::bit(2)", text)
+        self.assertIn("<~>", text)
+        self.assertEqual(params[-2:], [20, 5])
+
+    def test_halfvec_search(self):
+        """Verifica se a busca halfvec usa a expressão do índice"""
+        query, _ = build_search(collection_table("voxy_memories"), [0.1, 0.2], 5, quantization="halfvec")
+
+        self.assertIn("vec::halfvec(2)", self.render(query))
+
+    def test_report_metrics(self):
+        """Verifica as métricas do relatório de quantização"""
+        self.assertEqual(recall(["a", "b"], ["b", "c"]), 0.5)
+        self.assertEqual(recall([], ["a"]), 1.0)
+        self.assertEqual(percentile([3, 1, 2], 0.5), 2)
+
+
+class TestEmbeddingConfig(unittest.TestCase):
+    """Testes para a verificação da configuração de embeddings da coleção"""
+
+    def check(self, column_dims, stored):
+        """Executa a verificação com a coleção simulada"""
+        with patch('voxy_store.connect') as mock_connect, \
+             patch('voxy_store.get_dimension', return_value=column_dims), \
+             patch('voxy_store.get_collection_config', return_value=stored), \
+             patch('voxy_store.set_collection_config') as mock_set:
+            ensure_embedding_config("postgresql://fake", "voxy_memories", "text-embedding-3-small", 512)
+        return mock_connect.return_value, mock_set
+
+    def test_new_collection_is_ignored(self):
+        """Verifica se coleções inexistentes não são alteradas"""
+        _, mock_set = self.check(None, None)
+        mock_set.assert_not_called()
+
+    def test_records_missing_config(self):
+        """Verifica se a configuração é registrada em coleções compatíveis"""
+        conn, mock_set = self.check(512, None)
+        mock_set.assert_called_once()
+        conn.commit.assert_called_once()
+
+    def test_dimension_mismatch(self):
+        """Verifica se a inicialização é recusada com dimensões diferentes"""
+        with self.assertRaises(ValueError):
+            self.check(1536, None)
+
+    def test_model_mismatch(self):
+        """Verifica se a inicialização é recusada com outro modelo"""
+        with self.assertRaises(ValueError):
+            self.check(512, {"embedding_model": "text-embedding-3-large", "embedding_dims": 512})
+
+
+class TestCollectionLayout(unittest.TestCase):
+    """Testes para a descrição do layout físico das coleções"""
+
+    def test_index_present_in_every_partition(self):
+        """Verifica se um índice só conta quando existe em todas as partições"""
+        cursor = MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.fetchall.side_effect = [
+            [("_voxy_memories_p0",), ("_voxy_memories_p1",)],
+            [("_voxy_memories_p0", "ix_voxy_memories_p0_vec_hnsw"), ("_voxy_memories_p1", "ix_voxy_memories_p1_vec_hnsw"),
+             ("_voxy_memories_p0", "ix_voxy_memories_p0_fts"), ("_voxy_memories_p1", "ix_voxy_memories_p1_fts"),
+             ("_voxy_memories_p0", "ix_voxy_memories_p0_vec_binary")],
+        ]
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+
+        self.assertEqual(collection_layout(conn, "voxy_memories"), {"partitions": 2, "indexes": ["fts", "hnsw"]})
+
+    def test_default_layout(self):
+        """Verifica o layout padrão com os índices quantizado e de listagem"""
+        cursor = MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.fetchall.side_effect = [[], [("voxy_memories", "ix_voxy_memories_vec_halfvec"),
+                                            ("voxy_memories", "ix_voxy_memories_user_created")]]
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+
+        self.assertEqual(collection_layout(conn, "voxy_memories"), {"partitions": 0, "indexes": ["halfvec", "listing"]})
+
+class TestCollectionAliases(unittest.TestCase):
+    """Testes para a resolução do nome lógico da coleção"""
+
+    def resolve(self, *results):
+        """Resolve o nome com as respostas simuladas do banco"""
+        _, cursor = make_store()
+        cursor.fetchone.side_effect = list(results)
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        with patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"'):
+            return resolve_collection(conn, "voxy_memories")
+
+    def test_without_aliases_table(self):
+        """Verifica se o nome é mantido quando não há tabela de redirecionamento"""
+        self.assertEqual(self.resolve((False,)), "voxy_memories")
+
+    def test_redirected(self):
+        """Verifica se o nome é resolvido para a tabela ativa"""
+        self.assertEqual(self.resolve((True,), ("voxy_memories_v2",)), "voxy_memories_v2")
+
+    def test_alias_not_registered(self):
+        """Verifica se nomes sem redirecionamento são mantidos"""
+        self.assertEqual(self.resolve((True,), None), "voxy_memories")
+
+
+class TestMemoryListing(unittest.TestCase):
+    """Testes para a listagem paginada por cursor"""
+
+    def setUp(self):
+        """Permite renderizar SQL composto sem conexão real"""
+        patcher = patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_page_query(self):
+        """Verifica se a primeira página filtra pelo usuário e ordena pela data de criação"""
+        query, params = build_listing(collection_table("voxy_memories"), "alice", 20)
+        text = query.as_string(MagicMock())
+
+        self.assertIn(PARTITION_KEY + " = %s", text)
+        self.assertIn(f"ORDER BY {LISTING_SORT_KEY} DESC, id DESC", text)
+        self.assertNotIn("OFFSET", text)
+        self.assertEqual(params, ["alice", 21])
+
+    def test_next_page_uses_keyset(self):
+        """Verifica se as páginas seguintes continuam a partir do cursor, sem OFFSET"""
+        cursor = encode_cursor("2025-03-14T10:00:00", "mem-9")
+        query, params = build_listing(collection_table("voxy_memories"), "alice", 20, cursor, descending=False)
+        text = query.as_string(MagicMock())
+
+        self.assertIn(f"({LISTING_SORT_KEY}, id) > (%s, %s)", text)
+        self.assertEqual(params, ["alice", "2025-03-14T10:00:00", "mem-9", 21])
+
+    def test_invalid_cursor(self):
+        """Verifica se cursores inválidos são recusados"""
+        with self.assertRaises(ValueError):
+            decode_cursor("não é um cursor")
+
+    def test_list_user_memories(self):
+        """Verifica a página, o próximo cursor e o total"""
+        _, db_cursor = make_store()
+        db_cursor.fetchall.return_value = [("m3", "c3", {"data": "C"}), ("m2", "c2", {"data": "B"}),
+                                           ("m1", "c1", {"data": "A"})]
+        db_cursor.fetchone.return_value = (3,)
+        conn = MagicMock()
+        conn.cursor.return_value = db_cursor
+
+        page = list_user_memories(conn, "voxy_memories", "alice", limit=2)
+
+        self.assertEqual([record_id for record_id, _ in page["records"]], ["m3", "m2"])
+        self.assertEqual(decode_cursor(page["next_cursor"]), ("c2", "m2"))
+        self.assertEqual(page["total"], 3)
+
+
+class TestMemoryDeletion(unittest.TestCase):
+    """Testes para a remoção em lotes"""
+
+    def setUp(self):
+        """Permite renderizar SQL composto sem conexão real"""
+        patcher = patch('psycopg2.sql.ext.quote_ident', new=lambda name, context: f'"{name}"')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db_cursor = MagicMock()
+        self.db_cursor.__enter__.return_value = self.db_cursor
+        self.conn = MagicMock()
+        self.conn.cursor.return_value = self.db_cursor
+
+    def test_deletes_in_committed_batches(self):
+        """Verifica se cada lote é uma transação separada e se o progresso é informado"""
+        self.db_cursor.fetchone.return_value = (5,)
+        # A contagem (primeira execução) retorna uma linha; os lotes removem 2, 2 e 1
+        rowcounts = iter([1, 2, 2, 1])
+        self.db_cursor.execute.side_effect = lambda *args: setattr(self.db_cursor, "rowcount", next(rowcounts, 0))
+        progress = MagicMock()
+
+        deleted = delete_user_memories(self.conn, "voxy_memories", "alice", batch_size=2, progress=progress)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(progress.call_args_list, [((2, 5),), ((4, 5),), ((5, 5),)])
+        # Contagem + três lotes, cada um confirmado
+        self.assertEqual(self.db_cursor.execute.call_count, 4)
+        self.assertEqual(self.conn.commit.call_count, 4)
+        query, params = self.db_cursor.execute.call_args_list[1][0]
+        text = query.as_string(MagicMock())
+        self.assertIn("LIMIT %s", text)
+        self.assertEqual(params, ["alice", "alice", 2])
+
+    def test_age_filter(self):
+        """Verifica se o filtro de idade entra na condição de remoção"""
+        cutoff = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self.db_cursor.fetchone.return_value = (0,)
+
+        deleted = delete_user_memories(self.conn, "voxy_memories", "alice", older_than=cutoff)
+
+        self.assertEqual(deleted, 0)
+        query, params = self.db_cursor.execute.call_args_list[0][0]
+        self.assertIn("(metadata->>'created_at')::timestamptz < %s", query.as_string(MagicMock()))
+        self.assertEqual(params, ["alice", cutoff])
+        # Nada a remover: apenas a contagem é executada
+        self.assertEqual(self.db_cursor.execute.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
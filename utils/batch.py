@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Processamento em lote de conversas (ex.: carga de conversas históricas).
+
+O arquivo de entrada é um JSONL com um turno por linha:
+
+    {"user_id": "alice", "message": "Eu moro em Lisboa", "response": "Anotado!"}
+
+Turnos com "response" já foram respondidos e só passam pela extração de
+memórias; turnos sem "response" são processados pelo agente, que gera a
+resposta. O arquivo é lido em streaming e os turnos são distribuídos entre
+threads de trabalho (o processamento é dominado pela espera de rede): todos
+os turnos de um usuário vão para a mesma thread, na ordem do arquivo, e
+usuários diferentes são processados em paralelo. Os resultados são gravados
+à medida que ficam prontos em um JSONL de saída.
+
+O progresso é gravado em um checkpoint a cada N turnos (antes disso, os
+turnos pendentes do buffer de extração são enviados ao mem0); executar o
+mesmo comando novamente retoma do último checkpoint. Turnos concluídos
+após o último checkpoint podem ser processados de novo após uma falha.
+
+Para usar vários processos ou máquinas, divida os usuários com --shard:
+cada execução processa apenas os usuários da sua parte, com checkpoint
+próprio.
+
+Uso:
+    python utils/batch.py --input conversas.jsonl [--workers 8] [--shard 0/4]
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import queue
+import logging
+import argparse
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+# Adiciona o diretório raiz ao path para importar os módulos do agente
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_gates import estimate_tokens
+from voxy_ratelimit import TokenBucket
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("batch")
+
+# Versão do utilitário
+__version__ = "1.0.0"
+
+# Padrões do processamento
+DEFAULT_WORKERS = 8
+DEFAULT_CHECKPOINT_EVERY = 100
+DEFAULT_REQUESTS_PER_MINUTE = 300
+
+# Turnos aguardando por thread de trabalho (limita a memória usada na leitura)
+WORKER_QUEUE_SIZE = 64
+
+# Função que processa um turno e retorna os campos do resultado
+ProcessFunction = Callable[[Dict], Dict]
+
+def user_hash(user_id: str) -> int:
+    """Retorna um hash estável do usuário (igual entre execuções e processos)."""
+    return zlib.crc32(user_id.encode("utf-8"))
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """
+    Interpreta o argumento --shard no formato 'K/N'.
+
+    Returns:
+        tuple: (índice da parte, número de partes)
+
+    Raises:
+        ValueError: Se o formato ou os valores forem inválidos
+    """
+    index, _, count = value.partition("/")
+    index, count = int(index), int(count)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Parte inválida: {value} (use K/N, com 0 <= K < N)")
+    return index, count
+
+class LineTracker:
+    """
+    Acompanha as linhas concluídas, que terminam fora de ordem.
+
+    Guarda a marca d'água (todas as linhas anteriores estão concluídas) e
+    as linhas concluídas depois dela; esse conjunto fica limitado ao número
+    de turnos em andamento.
+    """
+
+    def __init__(self, watermark: int = 0, done: Iterable[int] = ()):
+        self._lock = threading.Lock()
+        self.watermark = watermark
+        self._done = set(done)
+
+    def is_done(self, line: int) -> bool:
+        """Indica se a linha já foi concluída."""
+        with self._lock:
+            return line < self.watermark or line in self._done
+
+    def mark(self, line: int):
+        """Marca uma linha como concluída e avança a marca d'água."""
+        with self._lock:
+            self._done.add(line)
+            while self.watermark in self._done:
+                self._done.remove(self.watermark)
+                self.watermark += 1
+
+    def snapshot(self) -> Tuple[int, List[int]]:
+        """Retorna a marca d'água e as linhas concluídas depois dela."""
+        with self._lock:
+            return self.watermark, sorted(self._done)
+
+def load_checkpoint(path: str, expected: Dict) -> Dict:
+    """
+    Carrega o checkpoint de um processamento anterior.
+
+    Args:
+        path: Caminho do arquivo de checkpoint
+        expected: Arquivo de entrada e parte processada
+
+    Returns:
+        dict: Checkpoint (novo, se o arquivo não existir)
+
+    Raises:
+        ValueError: Se o checkpoint pertencer a outro processamento
+    """
+    if not os.path.exists(path):
+        return dict(expected, watermark=0, done=[], processed=0, failed=0)
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    mismatched = [key for key, value in expected.items() if checkpoint.get(key) != value]
+    if mismatched:
+        raise ValueError(f"O checkpoint {path} pertence a outro processamento ({', '.join(mismatched)} diferente); "
+                         f"remova-o ou use outro --checkpoint")
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    """Grava o checkpoint de forma atômica (arquivo temporário + renomeação)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(temporary, path)
+
+def parse_turn(line: str) -> Dict:
+    """
+    Valida uma linha do arquivo de entrada.
+
+    Returns:
+        dict: Turno com 'user_id', 'message' e, opcionalmente, 'response'
+
+    Raises:
+        ValueError: Se a linha não for um turno válido
+    """
+    turn = json.loads(line)
+    if not isinstance(turn, dict):
+        raise ValueError("a linha deve ser um objeto JSON")
+    for field in ("user_id", "message"):
+        if not isinstance(turn.get(field), str) or not turn[field].strip():
+            raise ValueError(f"campo '{field}' ausente ou vazio")
+    if turn.get("response") is not None and not isinstance(turn["response"], str):
+        raise ValueError("campo 'response' deve ser texto")
+    return turn
+
+def run_batch(input_path: str, output_path: str, process: ProcessFunction, checkpoint_path: str,
+              workers: int = DEFAULT_WORKERS, shard: Tuple[int, int] = (0, 1),
+              requests_limit: Optional[TokenBucket] = None, tokens_limit: Optional[TokenBucket] = None,
+              checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+              before_checkpoint: Optional[Callable[[], None]] = None) -> Dict[str, int]:
+    """
+    Processa um arquivo de turnos em paralelo, mantendo a ordem de cada usuário.
+
+    Args:
+        input_path: Arquivo JSONL de entrada
+        output_path: Arquivo JSONL de resultados (acrescentado ao retomar)
+        process: Função que processa um turno e retorna os campos do resultado
+        checkpoint_path: Arquivo de checkpoint
+        workers: Threads de trabalho
+        shard: (índice, total) da parte dos usuários processada por esta execução
+        requests_limit: Limite de turnos por minuto (opcional)
+        tokens_limit: Limite de tokens por minuto (opcional)
+        checkpoint_every: Turnos concluídos entre checkpoints
+        before_checkpoint: Chamada antes de cada checkpoint (ex.: enviar turnos pendentes ao mem0)
+
+    Returns:
+        dict: 'processed', 'failed' e 'resumed' (linhas puladas por já estarem concluídas)
+
+    Raises:
+        ValueError: Se o checkpoint pertencer a outro processamento
+    """
+    shard_index, shard_count = shard
+    checkpoint = load_checkpoint(checkpoint_path, {"input": os.path.abspath(input_path),
+                                                   "shard": f"{shard_index}/{shard_count}"})
+    tracker = LineTracker(checkpoint["watermark"], checkpoint["done"])
+    stats = {"processed": checkpoint["processed"], "failed": checkpoint["failed"], "resumed": 0}
+    if checkpoint["watermark"] or checkpoint["done"]:
+        logger.info(f"Retomando a partir da linha {checkpoint['watermark'] + 1} "
+                    f"({checkpoint['processed']} turnos já processados)")
+
+    queues = [queue.Queue(WORKER_QUEUE_SIZE) for _ in range(workers)]
+    results: queue.Queue = queue.Queue()
+    interrupted = threading.Event()
+
+    def work(turns: queue.Queue):
+        while (item := turns.get()) is not None:
+            if interrupted.is_set():
+                # Interrompido: os turnos restantes ficam para a próxima execução
+                continue
+            line, turn = item
+            text = turn["message"] + (turn.get("response") or "")
+            if requests_limit is not None:
+                requests_limit.acquire()
+            if tokens_limit is not None:
+                tokens_limit.acquire(estimate_tokens(text))
+            try:
+                results.put((line, {"line": line + 1, "user_id": turn["user_id"], "status": "ok",
+                                    **process(turn)}))
+            except Exception as e:
+                logger.error(f"Erro na linha {line + 1}: {str(e)}")
+                results.put((line, {"line": line + 1, "user_id": turn["user_id"], "status": "error",
+                                    "error": str(e)}))
+
+    def save():
+        # Turnos concluídos antes do snapshot já foram entregues ao buffer de extração
+        watermark, done = tracker.snapshot()
+        output.flush()
+        if before_checkpoint is not None:
+            before_checkpoint()
+        checkpoint.update(watermark=watermark, done=done, processed=stats["processed"], failed=stats["failed"])
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    def write():
+        since_checkpoint = 0
+        while (item := results.get()) is not None:
+            line, result = item
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            stats["processed" if result["status"] == "ok" else "failed"] += 1
+            tracker.mark(line)
+            since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                save()
+                since_checkpoint = 0
+
+    started = time.monotonic()
+    with open(input_path, "r", encoding="utf-8") as source, open(output_path, "a", encoding="utf-8") as output:
+        threads = [threading.Thread(target=work, args=(turns,), name=f"voxy-batch-{i}", daemon=True)
+                   for i, turns in enumerate(queues)]
+        writer = threading.Thread(target=write, name="voxy-batch-writer", daemon=True)
+        for thread in threads + [writer]:
+            thread.start()
+
+        try:
+            for line, text in enumerate(source):
+                if tracker.is_done(line):
+                    stats["resumed"] += 1
+                    continue
+                if not text.strip():
+                    tracker.mark(line)
+                    continue
+                try:
+                    turn = parse_turn(text)
+                except ValueError as e:
+                    results.put((line, {"line": line + 1, "status": "error", "error": f"Linha inválida: {str(e)}"}))
+                    continue
+                hashed = user_hash(turn["user_id"])
+                if hashed % shard_count != shard_index:
+                    # Usuário de outra parte
+                    tracker.mark(line)
+                    continue
+                # A mesma thread recebe todos os turnos do usuário, na ordem do arquivo
+                queues[(hashed // shard_count) % workers].put((line, turn))
+        except BaseException:
+            interrupted.set()
+            raise
+        finally:
+            for turns in queues:
+                turns.put(None)
+            for thread in threads:
+                thread.join()
+            results.put(None)
+            writer.join()
+            save()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"{stats['processed']} turnos processados e {stats['failed']} com erro "
+                f"({(stats['processed'] + stats['failed']) / max(elapsed, 1e-9):.1f} turnos/s nesta execução)")
+    return stats
+
+def make_processor(engine) -> ProcessFunction:
+    """
+    Cria a função que processa um turno com o motor do agente.
+
+    Turnos com resposta passam apenas pela extração de memórias; os demais
+    são respondidos pelo agente.
+    """
+    def process(turn: Dict) -> Dict:
+        if turn.get("response"):
+            return {"memories_added": engine.ingest_turn(turn["user_id"], turn["message"], turn["response"])}
+        return {"response": engine.process_message(turn["message"], turn["user_id"])}
+
+    return process
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Função principal que processa os argumentos da linha de comando.
+
+    Returns:
+        int: 0 em caso de sucesso, 1 caso contrário
+    """
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Processa um arquivo de conversas em lote.')
+    parser.add_argument('--input', required=True, help='Arquivo JSONL com um turno por linha')
+    parser.add_argument('--output', help='Arquivo JSONL de resultados (padrão: <entrada>.results.jsonl)')
+    parser.add_argument('--checkpoint', help='Arquivo de checkpoint (padrão: logs/batch_<entrada>.json)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Threads de trabalho (padrão: {DEFAULT_WORKERS})')
+    parser.add_argument('--shard', default="0/1",
+                        help='Parte dos usuários processada por esta execução, no formato K/N (padrão: 0/1)')
+    parser.add_argument('--requests-per-minute', type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help=f'Limite de turnos por minuto (padrão: {DEFAULT_REQUESTS_PER_MINUTE}; 0 desativa)')
+    parser.add_argument('--tokens-per-minute', type=int, default=0,
+                        help='Limite de tokens (estimados) das mensagens por minuto (padrão: 0, desativado)')
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help=f'Turnos concluídos entre checkpoints (padrão: {DEFAULT_CHECKPOINT_EVERY})')
+    args = parser.parse_args(argv)
+
+    try:
+        shard = parse_shard(args.shard)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers < 1 or args.checkpoint_every < 1:
+        parser.error("--workers e --checkpoint-every devem ser maiores que zero")
+    if not os.path.exists(args.input):
+        logger.error(f"❌ Arquivo de entrada não encontrado: {args.input}")
+        return 1
+
+    name = os.path.splitext(os.path.basename(args.input))[0]
+    suffix = f"_{shard[0]}of{shard[1]}" if shard[1] > 1 else ""
+    output_path = args.output or f"{os.path.splitext(args.input)[0]}{suffix}.results.jsonl"
+    checkpoint_path = args.checkpoint or os.path.join("logs", f"batch_{name}{suffix}.json")
+
+    from voxy_engine import VoxyEngine
+    from voxy_agent import setup_memory
+    try:
+        openai_client, memory = setup_memory()
+    except Exception as e:
+        logger.error(f"❌ Erro ao inicializar o agente: {str(e)}")
+        return 1
+
+    engine = VoxyEngine(openai_client, memory)
+    try:
+        stats = run_batch(args.input, output_path, make_processor(engine), checkpoint_path, args.workers, shard,
+                          TokenBucket.per_minute(args.requests_per_minute) if args.requests_per_minute else None,
+                          TokenBucket.per_minute(args.tokens_per_minute) if args.tokens_per_minute else None,
+                          args.checkpoint_every, before_checkpoint=engine.flush_all)
+    except Exception as e:
+        logger.error(f"❌ Erro no processamento em lote: {str(e)}")
+        logger.error("📌 DICA: Execute o mesmo comando novamente para retomar do último checkpoint.")
+        return 1
+    finally:
+        engine.close()
+
+    print(f"\n✅ {stats['processed']} turnos processados, {stats['failed']} com erro. Resultados em {output_path}")
+    return 0 if not stats["failed"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -129,10 +129,52 @@ def check_environment_variables():
     # Lista de variáveis opcionais
     optional_vars = [
         "MODEL_CHOICE",
+        "EMBEDDING_MODEL",
+        "EMBEDDING_DIMS",
+        "MEMORY_COLLECTION",
         "SUPABASE_URL",
         "SUPABASE_KEY",
         "LOG_LEVEL",
-        "DISABLE_COLORS"
+        "DISABLE_COLORS",
+        "MEMORY_STORE_LAYOUT",
+        "MEMORY_VECTOR_QUANTIZATION",
+        "MEMORY_RERANK_FACTOR",
+        "MEMORY_RETRIEVAL_MODE",
+        "MEMORY_LEXICAL_MIN_RESULTS",
+        "MEMORY_RETRIEVAL_GATE",
+        "MEMORY_RETRIEVAL_GATE_THRESHOLD",
+        "MEMORY_EXTRACTION_GATE",
+        "MEMORY_EXTRACTION_GATE_THRESHOLD",
+        "MEMORY_EXTRACTION_WINDOW",
+        "MEMORY_EXTRACTION_IDLE_SECONDS",
+        "ADMISSION_MAX_CONCURRENCY",
+        "ADMISSION_MAX_QUEUE",
+        "ADMISSION_USER_RATE_PER_MINUTE",
+        "ADMISSION_USER_BURST",
+        "ADMISSION_QUEUE_TIMEOUT",
+        "ADMISSION_USER_WEIGHTS",
+        "ADMISSION_MAX_USERS",
+        "DEDUP_WINDOW_SECONDS",
+        "MODEL_ROUTER",
+        "MODEL_ROUTER_FAST",
+        "MODEL_ROUTER_LARGE",
+        "MODEL_ROUTER_THRESHOLD",
+        "MODEL_ROUTER_LATENCY_BUDGET",
+        "SERVER_ALLOWED_MODELS",
+        "SERVER_ADMIN_TOKEN",
+        "PROMPT_LAYOUT",
+        "EMBEDDING_BATCH_SIZE",
+        "EMBEDDING_BATCH_WAIT_MS",
+        "TURN_DEADLINE_SECONDS",
+        "TURN_RETRIEVAL_BUDGET_SECONDS",
+        "MEMORY_BREAKER_FAILURES",
+        "MEMORY_BREAKER_RESET_SECONDS",
+        "PROFILE_EVERY",
+        "PROFILE_DIR",
+        "PROFILE_INTERVAL_MS",
+        "CHAT_HISTORY_WINDOW",
+        "CHAT_HISTORY_PAGE",
+        "CHAT_HISTORY_DB"
     ]
 
     # Verifica variáveis essenciais
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de uso de memória e detector de vazamentos da interface web.
+
+Executa milhares de turnos pelo caminho usado pelo Streamlit
+(`web/utils/api.process_message` → admissão → deduplicação → motor →
+`chat_with_memories` → buffer de extração) com substitutos locais do
+modelo de chat e do mem0, sem rede nem banco. Depois de um aquecimento
+(caches e buffers preenchidos), amostra periodicamente o RSS do processo
+e as alocações do Python (tracemalloc), e informa:
+
+- o crescimento por turno (inclinação da reta ajustada às amostras), das
+  alocações rastreadas e do RSS;
+- as linhas de código cujas alocações mais cresceram entre o início e o
+  fim da medição.
+
+Termina com código 1 se o crescimento das alocações por turno passar do
+limite (--max-growth-bytes), o que indica estado retido a cada turno.
+
+Uso:
+    python utils/memory_benchmark.py [--turns 5000] [--users 50] [--concurrency 4]
+"""
+
+import os
+import gc
+import sys
+import json
+import random
+import logging
+import argparse
+import threading
+import tracemalloc
+import contextlib
+import importlib.util
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Adiciona o diretório raiz ao path para importar os módulos do agente
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("memory-benchmark")
+
+# Versão do utilitário
+__version__ = "1.0.0"
+
+# Padrões do benchmark
+DEFAULT_TURNS = 5000
+DEFAULT_WARMUP = 500
+DEFAULT_USERS = 50
+DEFAULT_SAMPLES = 20
+DEFAULT_MAX_GROWTH_BYTES = 256
+
+# Fatos guardados por usuário no substituto do mem0 (o banco real fica fora do processo)
+MAX_LOCAL_FACTS = 100
+
+# Mensagens usadas nos turnos (algumas trazem fatos, outras não)
+_MESSAGES = [
+    "Oi, tudo bem?",
+    "Eu moro em {city} e trabalho como {job}.",
+    "Qual é o meu trabalho?",
+    "Meu prato favorito é {food}.",
+    "Obrigado!",
+    "Você pode me recomendar um restaurante em {city}?",
+    "Explique a diferença entre {food} e {other}, passo a passo.",
+    "Lembra onde eu moro?",
+]
+_VALUES = {
+    "city": ["Lisboa", "Porto", "São Paulo", "Recife", "Curitiba"],
+    "job": ["engenheira", "professor", "designer", "médica", "analista de dados"],
+    "food": ["bacalhau", "feijoada", "moqueca", "pastel de nata", "açaí"],
+    "other": ["risoto", "lasanha", "sushi", "tapioca", "paella"],
+}
+
+class LocalChatClient:
+    """Substituto local do cliente OpenAI (apenas `chat.completions.create`)."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict], stream: bool = False, **kwargs):
+        """Responde com um texto derivado da mensagem do usuário, no formato da API."""
+        text = f"Resposta de {model} para: {messages[-1]['content'][:80]}"
+        usage = SimpleNamespace(prompt_tokens=sum(len(m["content"]) // 4 for m in messages),
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=0))
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None),
+                         SimpleNamespace(choices=[], usage=usage)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+class LocalMemory:
+    """Substituto local do mem0: fatos por usuário em memória, busca por palavras em comum."""
+
+    def __init__(self, max_facts: int = MAX_LOCAL_FACTS):
+        self.max_facts = max_facts
+        self._lock = threading.Lock()
+        self._facts: Dict[str, List[str]] = {}
+
+    def search(self, query: str, user_id: str, limit: int = 5, **kwargs) -> Dict:
+        """Retorna os fatos do usuário com mais palavras em comum com a consulta."""
+        words = set(query.lower().split())
+        with self._lock:
+            facts = list(self._facts.get(user_id, []))
+        ranked = sorted(facts, key=lambda fact: len(words & set(fact.lower().split())), reverse=True)[:limit]
+        return {"results": [{"id": str(index), "memory": fact, "user_id": user_id, "score": 1.0}
+                            for index, fact in enumerate(ranked)]}
+
+    def add(self, messages: List[Dict], user_id: str, **kwargs) -> Dict:
+        """Guarda as mensagens do usuário como fatos, mantendo apenas os mais recentes."""
+        new = [message["content"] for message in messages if message["role"] == "user"]
+        with self._lock:
+            facts = self._facts.setdefault(user_id, [])
+            facts.extend(new)
+            del facts[:max(0, len(facts) - self.max_facts)]
+        return {"results": [{"memory": fact, "event": "ADD"} for fact in new]}
+
+def make_message(rng: random.Random) -> str:
+    """Sorteia uma mensagem de teste."""
+    template = rng.choice(_MESSAGES)
+    return template.format(**{key: rng.choice(values) for key, values in _VALUES.items()})
+
+def read_rss() -> Optional[int]:
+    """Retorna o RSS atual do processo em bytes (None se não for possível medir)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+def slope(points: Sequence[tuple]) -> float:
+    """Inclinação da reta de mínimos quadrados pelos pontos (x, y)."""
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+def run_turns(process: Callable[[str, str], str], turns: Sequence[tuple], concurrency: int):
+    """Processa os turnos (usuário, mensagem), com até `concurrency` usuários em paralelo."""
+    if concurrency == 1:
+        for user_id, message in turns:
+            process(message, user_id)
+        return
+    # Cada thread atende um subconjunto fixo de usuários, preservando a ordem de cada um
+    lanes: List[List[tuple]] = [[] for _ in range(concurrency)]
+    for user_id, message in turns:
+        lanes[hash(user_id) % concurrency].append((user_id, message))
+    threads = [threading.Thread(target=run_turns, args=(process, lane, 1)) for lane in lanes if lane]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def run_benchmark(process: Callable[[str, str], str], turns: int = DEFAULT_TURNS, warmup: int = DEFAULT_WARMUP,
+                  users: int = DEFAULT_USERS, samples: int = DEFAULT_SAMPLES, concurrency: int = 1,
+                  top: int = 10, seed: int = 42) -> Dict:
+    """
+    Executa os turnos e mede o crescimento da memória.
+
+    Args:
+        process: Função que processa (mensagem, user_id)
+        turns: Turnos medidos (após o aquecimento)
+        warmup: Turnos de aquecimento, fora da medição
+        users: Usuários distintos
+        samples: Amostras de memória durante a medição
+        concurrency: Turnos processados em paralelo
+        top: Linhas de alocação listadas
+        seed: Semente das mensagens sorteadas
+
+    Returns:
+        dict: 'turns', 'traced_growth_per_turn' e 'rss_growth_per_turn' (bytes),
+            'traced_start'/'traced_end', 'rss_start'/'rss_end', 'samples' e 'top_growth'
+    """
+    rng = random.Random(seed)
+    plan = [(f"bench_user_{rng.randrange(users)}", make_message(rng)) for _ in range(warmup + turns)]
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        run_turns(process, plan[:warmup], concurrency)
+        gc.collect()
+        baseline = tracemalloc.take_snapshot()
+        points = [(0, tracemalloc.get_traced_memory()[0], read_rss())]
+
+        step = max(1, turns // max(1, samples))
+        done = 0
+        while done < turns:
+            chunk = plan[warmup + done:warmup + min(turns, done + step)]
+            run_turns(process, chunk, concurrency)
+            done += len(chunk)
+            gc.collect()
+            points.append((done, tracemalloc.get_traced_memory()[0], read_rss()))
+
+        final = tracemalloc.take_snapshot()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    growth = [stat for stat in final.compare_to(baseline, "lineno") if stat.size_diff > 0][:top]
+    rss_points = [(turn, rss) for turn, _, rss in points if rss is not None]
+    return {
+        "turns": turns,
+        "traced_growth_per_turn": slope([(turn, traced) for turn, traced, _ in points]),
+        "rss_growth_per_turn": slope(rss_points) if rss_points else None,
+        "traced_start": points[0][1],
+        "traced_end": points[-1][1],
+        "rss_start": points[0][2],
+        "rss_end": points[-1][2],
+        "samples": [{"turn": turn, "traced": traced, "rss": rss} for turn, traced, rss in points],
+        "top_growth": [{"site": str(stat.traceback[0]), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                       for stat in growth],
+    }
+
+def load_web_api():
+    """Carrega `web/utils/api.py` (o pacote 'utils' da raiz tem o mesmo nome do da interface web)."""
+    path = os.path.join(ROOT_DIR, "web", "utils", "api.py")
+    spec = importlib.util.spec_from_file_location("voxy_web_api", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_local_engine():
+    """Cria o motor compartilhado com os substitutos locais e o registra como motor do processo."""
+    import voxy_engine
+    from voxy_agent import save_memories
+    from voxy_buffer import ExtractionBuffer
+
+    memory = LocalMemory()
+    buffer = ExtractionBuffer.from_env(lambda messages, user_id: save_memories(memory, messages, user_id))
+    engine = voxy_engine.VoxyEngine(LocalChatClient(), memory, buffer=buffer, database_url="local")
+    # `get_engine()` passa a devolver este motor, sem chamar setup_memory
+    voxy_engine._engine = engine
+    return engine
+
+def format_bytes(value: Optional[float]) -> str:
+    """Formata um tamanho em bytes para leitura."""
+    if value is None:
+        return "n/d"
+    for unit in ("B", "KB", "MB"):
+        if abs(value) < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Função principal que processa os argumentos da linha de comando.
+
+    Returns:
+        int: 0 se o crescimento por turno ficou dentro do limite, 1 caso contrário
+    """
+    parser = argparse.ArgumentParser(description='Mede o uso de memória da interface web com substitutos locais.')
+    parser.add_argument('--turns', type=int, default=DEFAULT_TURNS, help=f'Turnos medidos (padrão: {DEFAULT_TURNS})')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP,
+                        help=f'Turnos de aquecimento, fora da medição (padrão: {DEFAULT_WARMUP})')
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS, help=f'Usuários distintos (padrão: {DEFAULT_USERS})')
+    parser.add_argument('--concurrency', type=int, default=4, help='Turnos processados em paralelo (padrão: 4)')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                        help=f'Amostras de memória durante a medição (padrão: {DEFAULT_SAMPLES})')
+    parser.add_argument('--max-growth-bytes', type=float, default=DEFAULT_MAX_GROWTH_BYTES,
+                        help=f'Crescimento máximo das alocações por turno (padrão: {DEFAULT_MAX_GROWTH_BYTES})')
+    parser.add_argument('--top', type=int, default=10, help='Linhas de alocação listadas (padrão: 10)')
+    parser.add_argument('--output', help='Grava o relatório completo em JSON')
+    args = parser.parse_args(argv)
+
+    if min(args.turns, args.users, args.concurrency, args.samples) < 1 or args.warmup < 0:
+        parser.error("--turns, --users, --concurrency e --samples devem ser maiores que zero")
+
+    # Sem limites de admissão: o benchmark mede apenas a memória
+    os.environ.setdefault('ADMISSION_USER_RATE_PER_MINUTE', '1000000')
+    os.environ.setdefault('ADMISSION_USER_BURST', '1000000')
+    os.environ.setdefault('ADMISSION_QUEUE_TIMEOUT', '60')
+    # Caches com janela de tempo guardam os turnos dos últimos segundos; no ritmo do benchmark
+    # (centenas de turnos por segundo) isso pareceria crescimento, então a janela é reduzida
+    os.environ.setdefault('DEDUP_WINDOW_SECONDS', '0.1')
+
+    engine = make_local_engine()
+    api = load_web_api()
+    # Depois da importação do agente, que configura o próprio logger
+    logging.getLogger("voxy-agent").setLevel(logging.WARNING)
+    logger.info(f"Executando {args.warmup} turnos de aquecimento e {args.turns} turnos medidos "
+                f"({args.users} usuários, {args.concurrency} em paralelo)")
+    try:
+        # chat_with_memories imprime um resumo de cada turno no console
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = run_benchmark(api.process_message, args.turns, args.warmup, args.users, args.samples,
+                                   args.concurrency, args.top)
+    finally:
+        engine.close()
+
+    report["max_growth_per_turn"] = args.max_growth_bytes
+    report["passed"] = report["traced_growth_per_turn"] <= args.max_growth_bytes
+
+    print(f"\n📊 Memória após {report['turns']} turnos:")
+    print(f"   • Alocações do Python: {format_bytes(report['traced_start'])} → {format_bytes(report['traced_end'])} "
+          f"({format_bytes(report['traced_growth_per_turn'])} por turno)")
+    print(f"   • RSS: {format_bytes(report['rss_start'])} → {format_bytes(report['rss_end'])} "
+          f"({format_bytes(report['rss_growth_per_turn'])} por turno)")
+    if report["top_growth"]:
+        print("   • Linhas com maior crescimento:")
+        for entry in report["top_growth"]:
+            print(f"       {format_bytes(entry['size_diff']):>10}  {entry['count_diff']:+7d} blocos  {entry['site']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"   • Relatório gravado em {args.output}")
+
+    if not report["passed"]:
+        print(f"\n❌ Crescimento de {format_bytes(report['traced_growth_per_turn'])} por turno acima do limite "
+              f"de {format_bytes(args.max_growth_bytes)}")
+        return 1
+    print(f"\n✅ Crescimento por turno dentro do limite de {format_bytes(args.max_growth_bytes)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
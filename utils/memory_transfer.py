@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Utilitário para exportar e importar memórias do Voxy-Mem0 entre ambientes.
+
+As memórias são lidas com um cursor no servidor e gravadas em streaming,
+em JSONL (opcionalmente comprimido com gzip) ou em um formato binário
+comprimido que inclui os vetores. A importação grava em lotes com COPY,
+então o uso de memória é constante independentemente do tamanho da coleção.
+
+Uso:
+    python utils/memory_transfer.py export --output memorias.jsonl.gz [--user-id ID ...]
+    python utils/memory_transfer.py import --input memorias.jsonl.gz
+"""
+
+import os
+import sys
+import gzip
+import json
+import struct
+import logging
+import argparse
+import time
+from typing import BinaryIO, Iterable, Iterator, Optional, Sequence
+from dotenv import load_dotenv
+
+# Adiciona o diretório raiz ao path para importar o módulo voxy_store
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_store import (
+    DEFAULT_COLLECTION,
+    Record,
+    connect,
+    copy_records,
+    ensure_collection,
+    is_partitioned,
+    iter_records,
+    resolve_collection,
+)
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("memory-transfer")
+
+# Versão do utilitário
+__version__ = "1.0.0"
+
+# Formatos suportados
+FORMAT_JSONL = "jsonl"
+FORMAT_BINARY = "binary"
+
+# Cabeçalho do formato binário: assinatura + dimensão dos vetores
+BINARY_MAGIC = b"VXM1"
+_UINT32 = struct.Struct("<I")
+
+# Intervalo (em registros) entre mensagens de progresso
+PROGRESS_EVERY = 10000
+
+def detect_format(path: str) -> str:
+    """
+    Deduz o formato do arquivo pela extensão.
+
+    Args:
+        path: Caminho do arquivo
+
+    Returns:
+        str: 'binary' para arquivos .vxm, 'jsonl' para os demais
+    """
+    return FORMAT_BINARY if path.endswith(".vxm") else FORMAT_JSONL
+
+def _open(path: str, mode: str) -> BinaryIO:
+    """Abre o arquivo, usando gzip quando a extensão indicar compressão."""
+    if path.endswith(".gz") or path.endswith(".vxm"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+def write_jsonl(records: Iterable[Record], stream: BinaryIO) -> int:
+    """
+    Grava registros em JSONL, um objeto por linha.
+
+    Args:
+        records: Registros (id, vetor, metadados)
+        stream: Arquivo binário de saída
+
+    Returns:
+        int: Número de registros gravados
+    """
+    count = 0
+    for record_id, vector, metadata in records:
+        line = {"id": record_id, "metadata": metadata}
+        if vector is not None:
+            line["vector"] = vector
+        stream.write(json.dumps(line, ensure_ascii=False).encode("utf-8"))
+        stream.write(b"\n")
+        count += 1
+    return count
+
+def read_jsonl(stream: BinaryIO) -> Iterator[Record]:
+    """
+    Lê registros gravados por `write_jsonl`.
+
+    Args:
+        stream: Arquivo binário de entrada
+
+    Yields:
+        Record: Tuplas (id, vetor, metadados)
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        yield data["id"], data.get("vector"), data.get("metadata") or {}
+
+def write_binary(records: Iterable[Record], stream: BinaryIO) -> int:
+    """
+    Grava registros no formato binário.
+
+    Layout: cabeçalho `VXM1` + dimensão (uint32), seguido, para cada
+    registro, de id e metadados JSON prefixados pelo tamanho (uint32) e do
+    vetor em float32 little-endian.
+
+    Args:
+        records: Registros (id, vetor, metadados)
+        stream: Arquivo binário de saída
+
+    Returns:
+        int: Número de registros gravados
+
+    Raises:
+        ValueError: Se algum registro não possuir vetor ou tiver dimensão diferente
+    """
+    vector_struct = None
+    count = 0
+    for record_id, vector, metadata in records:
+        if vector is None:
+            raise ValueError("O formato binário exige os vetores das memórias")
+        if vector_struct is None:
+            vector_struct = struct.Struct(f"<{len(vector)}f")
+            stream.write(BINARY_MAGIC + _UINT32.pack(len(vector)))
+        elif len(vector) * 4 != vector_struct.size:
+            raise ValueError(f"Registro '{record_id}' tem dimensão diferente dos anteriores")
+
+        id_bytes = str(record_id).encode("utf-8")
+        meta_bytes = json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+        stream.write(_UINT32.pack(len(id_bytes)) + id_bytes)
+        stream.write(_UINT32.pack(len(meta_bytes)) + meta_bytes)
+        stream.write(vector_struct.pack(*vector))
+        count += 1
+    return count
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    """Lê exatamente `size` bytes, falhando em arquivos truncados."""
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("Arquivo binário truncado")
+    return data
+
+def read_binary(stream: BinaryIO) -> Iterator[Record]:
+    """
+    Lê registros gravados por `write_binary`.
+
+    Args:
+        stream: Arquivo binário de entrada
+
+    Yields:
+        Record: Tuplas (id, vetor, metadados)
+    """
+    header = stream.read(len(BINARY_MAGIC) + _UINT32.size)
+    if not header:
+        return
+    if header[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError("Arquivo não está no formato binário do Voxy-Mem0")
+    dimension = _UINT32.unpack(header[len(BINARY_MAGIC):])[0]
+    vector_struct = struct.Struct(f"<{dimension}f")
+
+    while True:
+        prefix = stream.read(_UINT32.size)
+        if not prefix:
+            return
+        if len(prefix) != _UINT32.size:
+            raise ValueError("Arquivo binário truncado")
+        id_len = _UINT32.unpack(prefix)[0]
+        record_id = _read_exact(stream, id_len).decode("utf-8")
+        meta_len = _UINT32.unpack(_read_exact(stream, _UINT32.size))[0]
+        metadata = json.loads(_read_exact(stream, meta_len))
+        vector = list(vector_struct.unpack(_read_exact(stream, vector_struct.size)))
+        yield record_id, vector, metadata
+
+def _batched(records: Iterable[Record], batch_size: int) -> Iterator[list]:
+    """Agrupa registros em listas de até `batch_size` elementos."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _log_progress(records: Iterable[Record], action: str) -> Iterator[Record]:
+    """Repassa os registros registrando o progresso periodicamente."""
+    started = time.monotonic()
+    count = 0
+    for record in records:
+        yield record
+        count += 1
+        if count % PROGRESS_EVERY == 0:
+            elapsed = time.monotonic() - started
+            logger.info(f"{count} memórias {action} ({count / max(elapsed, 1e-9):.0f}/s)")
+
+def export_memories(database_url: str, output_path: str, collection_name: str = DEFAULT_COLLECTION,
+                    user_ids: Optional[Sequence[str]] = None, fmt: Optional[str] = None,
+                    include_vectors: bool = True, batch_size: int = 1000) -> int:
+    """
+    Exporta as memórias de uma coleção para um arquivo.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        output_path: Caminho do arquivo de saída
+        collection_name: Nome da coleção
+        user_ids: Exporta apenas as memórias destes usuários (opcional)
+        fmt: 'jsonl' ou 'binary' (deduzido pela extensão se omitido)
+        include_vectors: Se False, omite os vetores (apenas JSONL)
+        batch_size: Número de linhas buscadas por ida ao servidor
+
+    Returns:
+        int: Número de memórias exportadas
+    """
+    fmt = fmt or detect_format(output_path)
+    writer = write_binary if fmt == FORMAT_BINARY else write_jsonl
+
+    conn = connect(database_url)
+    try:
+        collection_name = resolve_collection(conn, collection_name)
+        logger.info(f"Exportando coleção {collection_name} para {output_path} ({fmt})")
+        records = iter_records(conn, collection_name, user_ids=user_ids,
+                               batch_size=batch_size, include_vectors=include_vectors)
+        with _open(output_path, "wb") as stream:
+            count = writer(_log_progress(records, "exportadas"), stream)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    logger.info(f"✅ {count} memórias exportadas")
+    return count
+
+def import_memories(database_url: str, input_path: str, collection_name: str = DEFAULT_COLLECTION,
+                    fmt: Optional[str] = None, batch_size: int = 5000) -> int:
+    """
+    Importa memórias de um arquivo para uma coleção.
+
+    Cada lote é gravado com COPY e confirmado separadamente, de modo que
+    transações longas e o uso de memória ficam limitados ao tamanho do lote.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        input_path: Caminho do arquivo de entrada
+        collection_name: Nome da coleção de destino
+        fmt: 'jsonl' ou 'binary' (deduzido pela extensão se omitido)
+        batch_size: Número de registros por lote gravado
+
+    Returns:
+        int: Número de memórias importadas
+    """
+    fmt = fmt or detect_format(input_path)
+    reader = read_binary if fmt == FORMAT_BINARY else read_jsonl
+
+    conn = connect(database_url)
+    count = 0
+    try:
+        collection_name = resolve_collection(conn, collection_name)
+        logger.info(f"Importando {input_path} ({fmt}) para a coleção {collection_name}")
+        partitioned = None
+        with _open(input_path, "rb") as stream:
+            records = _log_progress(reader(stream), "importadas")
+            for batch in _batched(records, batch_size):
+                if count == 0:
+                    first_vector = batch[0][1]
+                    if not first_vector:
+                        raise ValueError("O arquivo não contém vetores; exporte novamente sem --no-vectors")
+                    ensure_collection(conn, collection_name, len(first_vector))
+                    partitioned = is_partitioned(conn, collection_name)
+                count += copy_records(conn, collection_name, batch, partitioned)
+                conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    logger.info(f"✅ {count} memórias importadas")
+    return count
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Função principal que processa os argumentos da linha de comando.
+
+    Returns:
+        int: 0 em caso de sucesso, 1 caso contrário
+    """
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Exporta e importa memórias do Voxy-Mem0.')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Exporta memórias para um arquivo')
+    export_parser.add_argument('--output', required=True,
+                               help='Arquivo de saída (.jsonl, .jsonl.gz ou .vxm)')
+    export_parser.add_argument('--user-id', action='append', dest='user_ids',
+                               help='Exporta apenas este usuário (pode ser repetido)')
+    export_parser.add_argument('--no-vectors', action='store_true',
+                               help='Não inclui os vetores (apenas JSONL)')
+
+    import_parser = subparsers.add_parser('import', help='Importa memórias de um arquivo')
+    import_parser.add_argument('--input', required=True,
+                               help='Arquivo de entrada (.jsonl, .jsonl.gz ou .vxm)')
+
+    for sub in (export_parser, import_parser):
+        sub.add_argument('--collection', default=os.getenv('MEMORY_COLLECTION', DEFAULT_COLLECTION),
+                         help=f'Nome da coleção (padrão: MEMORY_COLLECTION ou {DEFAULT_COLLECTION})')
+        sub.add_argument('--format', choices=[FORMAT_JSONL, FORMAT_BINARY],
+                         help='Formato do arquivo (padrão: deduzido pela extensão)')
+        sub.add_argument('--batch-size', type=int, default=5000,
+                         help='Registros por lote (padrão: 5000)')
+
+    args = parser.parse_args(argv)
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ Variável de ambiente DATABASE_URL não encontrada.")
+        return 1
+
+    try:
+        if args.action == 'export':
+            if args.no_vectors and (args.format or detect_format(args.output)) == FORMAT_BINARY:
+                logger.error("❌ O formato binário sempre inclui os vetores.")
+                return 1
+            export_memories(database_url, args.output, args.collection, args.user_ids,
+                            args.format, not args.no_vectors, args.batch_size)
+        else:
+            import_memories(database_url, args.input, args.collection,
+                            args.format, args.batch_size)
+    except Exception as e:
+        logger.error(f"❌ Erro na transferência de memórias: {str(e)}")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Relatório de recall e latência da busca quantizada do Voxy-Mem0.
+
+Usa vetores da própria coleção como consultas (filtradas pelo usuário dono
+da memória, como faz o agente) e compara a busca exata em float32 com a
+busca pelo índice HNSW float32 e com a busca em dois estágios sobre os
+índices halfvec e binário, medindo recall@k, latência e tamanho do índice.
+
+Uso:
+    python utils/quantization_report.py [--queries 100] [--k 5]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from typing import Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from psycopg2 import sql
+
+# Adiciona o diretório raiz ao path para importar o módulo voxy_store
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_store import (
+    DEFAULT_COLLECTION,
+    DEFAULT_RERANK_FACTOR,
+    QUANTIZATION_BINARY,
+    QUANTIZATION_HALFVEC,
+    QUANTIZATION_NONE,
+    build_search,
+    collection_table,
+    connect,
+    get_dimension,
+    is_partitioned,
+    list_partitions,
+    parse_vector,
+    resolve_collection,
+)
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("quantization-report")
+
+# Versão do utilitário
+__version__ = "1.0.0"
+
+# Modos comparados no relatório
+MODE_EXACT = "float32 (exato)"
+MODE_HNSW = "float32 (hnsw)"
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """
+    Calcula um percentil pelo método do vizinho mais próximo.
+
+    Args:
+        values: Amostras
+        fraction: Percentil desejado (0 a 1)
+
+    Returns:
+        float: Valor do percentil
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def recall(expected: Sequence[str], found: Sequence[str]) -> float:
+    """
+    Calcula a fração dos resultados esperados que foram encontrados.
+
+    Args:
+        expected: IDs da busca exata
+        found: IDs da busca avaliada
+
+    Returns:
+        float: Recall entre 0 e 1
+    """
+    if not expected:
+        return 1.0
+    return len(set(expected) & set(found)) / len(expected)
+
+def index_sizes(conn, collection_name: str) -> Dict[str, int]:
+    """
+    Soma o tamanho dos índices vetoriais da coleção por tipo.
+
+    Returns:
+        dict: Tamanho em bytes por modo ('float32 (hnsw)', 'halfvec', 'binary')
+    """
+    tables = [collection_name] + list_partitions(conn, collection_name)
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname, pg_relation_size(c.oid)
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = 'vecs' AND t.relname = ANY(%s);
+        """, (tables,))
+        rows = cursor.fetchall()
+
+    sizes = {MODE_HNSW: 0, QUANTIZATION_HALFVEC: 0, QUANTIZATION_BINARY: 0}
+    for name, size in rows:
+        if name.endswith(f"_vec_{QUANTIZATION_HALFVEC}"):
+            sizes[QUANTIZATION_HALFVEC] += size
+        elif name.endswith(f"_vec_{QUANTIZATION_BINARY}"):
+            sizes[QUANTIZATION_BINARY] += size
+        elif "hnsw" in name:
+            sizes[MODE_HNSW] += size
+    return sizes
+
+def run_query(conn, collection_name: str, vector: List[float], user_id: Optional[str], k: int,
+              partitioned: bool, mode: str, rerank_factor: int) -> Tuple[List[str], float]:
+    """
+    Executa uma busca em um dos modos do relatório.
+
+    Returns:
+        tuple: (IDs encontrados, latência em segundos)
+    """
+    quantization = mode if mode in (QUANTIZATION_HALFVEC, QUANTIZATION_BINARY) else QUANTIZATION_NONE
+    filters = {"user_id": user_id} if user_id else None
+    query, params = build_search(collection_table(collection_name), vector, k, filters,
+                                 partitioned, quantization, rerank_factor)
+    with conn.cursor() as cursor:
+        if mode == MODE_EXACT:
+            cursor.execute("SET LOCAL enable_indexscan = off;")
+        elif quantization != QUANTIZATION_NONE:
+            cursor.execute("SELECT set_config('hnsw.ef_search', %s, true);",
+                           (str(max(40, k * rerank_factor)),))
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        ids = [row[0] for row in cursor.fetchall()]
+        elapsed = time.perf_counter() - started
+    conn.rollback()
+    return ids, elapsed
+
+def build_report(database_url: str, collection_name: str = DEFAULT_COLLECTION, queries: int = 100,
+                 k: int = 5, rerank_factor: int = DEFAULT_RERANK_FACTOR,
+                 modes: Sequence[str] = (MODE_HNSW, QUANTIZATION_HALFVEC, QUANTIZATION_BINARY)) -> List[dict]:
+    """
+    Mede recall@k e latência de cada modo em relação à busca exata.
+
+    Returns:
+        list: Uma linha por modo com recall, latências (ms) e tamanho do índice (bytes)
+    """
+    conn = connect(database_url)
+    try:
+        collection_name = resolve_collection(conn, collection_name)
+        if get_dimension(conn, collection_name) is None:
+            raise ValueError(f"A coleção {collection_name} não existe")
+        partitioned = is_partitioned(conn, collection_name)
+
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL(
+                "SELECT vec::text, metadata->>'user_id' FROM {} ORDER BY random() LIMIT %s;"
+            ).format(collection_table(collection_name)), (queries,))
+            samples = [(parse_vector(vec), user_id) for vec, user_id in cursor.fetchall()]
+        conn.rollback()
+        logger.info(f"Avaliando {len(samples)} consultas (k={k}, fator de reordenação={rerank_factor})")
+
+        sizes = index_sizes(conn, collection_name)
+        all_modes = [MODE_EXACT] + list(modes)
+        latencies = {mode: [] for mode in all_modes}
+        recalls = {mode: [] for mode in all_modes}
+
+        for vector, user_id in samples:
+            expected, elapsed = run_query(conn, collection_name, vector, user_id, k,
+                                          partitioned, MODE_EXACT, rerank_factor)
+            latencies[MODE_EXACT].append(elapsed)
+            recalls[MODE_EXACT].append(1.0)
+            for mode in modes:
+                found, elapsed = run_query(conn, collection_name, vector, user_id, k,
+                                           partitioned, mode, rerank_factor)
+                latencies[mode].append(elapsed)
+                recalls[mode].append(recall(expected, found))
+    finally:
+        conn.close()
+
+    return [{
+        "mode": mode,
+        "recall": statistics.mean(recalls[mode]) if recalls[mode] else 0.0,
+        "p50_ms": percentile(latencies[mode], 0.5) * 1000 if latencies[mode] else 0.0,
+        "p95_ms": percentile(latencies[mode], 0.95) * 1000 if latencies[mode] else 0.0,
+        "index_bytes": sizes.get(mode),
+    } for mode in all_modes]
+
+def print_report(rows: List[dict], k: int):
+    """Exibe o relatório em formato de tabela."""
+    print(f"\n📊 Recall@{k} e latência por modo de busca:")
+    print("-" * 72)
+    print(f"{'Modo':<20} {'Recall':>8} {'p50 (ms)':>10} {'p95 (ms)':>10} {'Índice (MB)':>14}")
+    print("-" * 72)
+    for row in rows:
+        size = "-" if row["index_bytes"] is None else f"{row['index_bytes'] / 1024 / 1024:.1f}"
+        print(f"{row['mode']:<20} {row['recall']:>8.3f} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f} {size:>14}")
+    print("-" * 72)
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Função principal que processa os argumentos da linha de comando.
+
+    Returns:
+        int: 0 em caso de sucesso, 1 caso contrário
+    """
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Compara a busca quantizada com a busca exata em float32.')
+    parser.add_argument('--collection', default=os.getenv('MEMORY_COLLECTION', DEFAULT_COLLECTION),
+                        help=f'Nome da coleção (padrão: MEMORY_COLLECTION ou {DEFAULT_COLLECTION})')
+    parser.add_argument('--queries', type=int, default=100, help='Número de consultas (padrão: 100)')
+    parser.add_argument('--k', type=int, default=5, help='Resultados por consulta (padrão: 5)')
+    parser.add_argument('--rerank-factor', type=int,
+                        default=int(os.getenv('MEMORY_RERANK_FACTOR', DEFAULT_RERANK_FACTOR)),
+                        help='Candidatos do índice quantizado por resultado')
+    parser.add_argument('--min-recall', type=float,
+                        help='Falha se o recall de algum índice quantizado ficar abaixo deste valor')
+    args = parser.parse_args(argv)
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ Variável de ambiente DATABASE_URL não encontrada.")
+        return 1
+
+    try:
+        rows = build_report(database_url, args.collection, args.queries, args.k, args.rerank_factor)
+    except Exception as e:
+        logger.error(f"❌ Erro ao gerar o relatório: {str(e)}")
+        if "halfvec" in str(e) or "binary_quantize" in str(e):
+            logger.error("📌 DICA: A busca quantizada exige pgvector 0.7 ou superior.")
+        return 1
+
+    print_report(rows, args.k)
+
+    if args.min_recall is not None:
+        below = [row["mode"] for row in rows
+                 if row["mode"] in (QUANTIZATION_HALFVEC, QUANTIZATION_BINARY) and row["recall"] < args.min_recall]
+        if below:
+            print(f"❌ Recall abaixo de {args.min_recall}: {', '.join(below)}")
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Migração das memórias do Voxy-Mem0 para outro modelo ou dimensão de embeddings.
+
+A migração segue o padrão blue/green: as memórias da coleção ativa são
+lidas em lotes, o texto de cada memória é reprocessado pela API de
+embeddings (respeitando os limites de requisições e tokens por minuto) e
+gravado em uma coleção sombra, criada com o layout da coleção ativa
+(particionada ou não, com os mesmos índices quantizados, de busca textual
+e de listagem). O progresso é registrado em um arquivo de
+checkpoint, de modo que a migração pode ser retomada após uma falha.
+
+Ao final da cópia, as alterações feitas na coleção ativa durante a
+migração são sincronizadas, a coleção sombra é verificada e, com
+--switch, o nome lógico (MEMORY_COLLECTION) passa a apontar para ela em
+uma única atualização. A coleção anterior é mantida para eventual retorno.
+
+Uso:
+    python utils/reembed.py --model text-embedding-3-small --dims 512 [--switch]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+from typing import Callable, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+from psycopg2 import sql
+
+# Adiciona o diretório raiz ao path para importar os módulos do agente
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_ratelimit import TokenBucket
+from utils.setup_supabase import create_partition_indexes, create_partitioned_collection
+from voxy_store import (
+    DEFAULT_COLLECTION,
+    DEFAULT_EMBEDDING_DIMS,
+    DEFAULT_EMBEDDING_MODEL,
+    INDEX_FULLTEXT,
+    INDEX_HNSW,
+    INDEX_LISTING,
+    INDEX_SUFFIXES,
+    VECS_SCHEMA,
+    Record,
+    build_search,
+    collection_layout,
+    collection_table,
+    connect,
+    copy_records,
+    ensure_collection,
+    fulltext_index_sql,
+    get_collection_config,
+    get_dimension,
+    iter_record_batches,
+    list_partitions,
+    listing_index_sql,
+    quantized_index_sql,
+    resolve_collection,
+    set_collection_config,
+    switch_collection,
+)
+
+# Configuração de logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("reembed")
+
+# Versão do utilitário
+__version__ = "1.0.0"
+
+# Fases registradas no checkpoint
+PHASE_COPY = "copy"
+PHASE_COPIED = "copied"
+PHASE_SWITCHED = "switched"
+
+# Limites padrão (conta da OpenAI no nível 1 para modelos de embeddings)
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 1000000
+
+# Tentativas por lote em caso de limite de taxa ou falha temporária da API
+MAX_RETRIES = 5
+
+# Similaridade mínima entre um vetor gravado e o recalculado na verificação
+MIN_VERIFY_SIMILARITY = 0.99
+
+# Diferença tolerada na contagem da verificação (memórias gravadas na origem
+# entre a última sincronização e a contagem, com a aplicação em uso)
+DEFAULT_VERIFY_MAX_DELTA = 10
+
+# Função que recebe textos e devolve os vetores na mesma ordem
+EmbedFunction = Callable[[List[str]], List[List[float]]]
+
+def shadow_name(alias: str, model: str, dims: int) -> str:
+    """
+    Gera o nome padrão da coleção sombra para um modelo e uma dimensão.
+
+    Args:
+        alias: Nome lógico da coleção
+        model: Modelo de embeddings
+        dims: Dimensão dos embeddings
+
+    Returns:
+        str: Nome da coleção (ex.: 'voxy_memories_text_embedding_3_small_512')
+    """
+    slug = re.sub(r"[^a-z0-9]+", "_", model.lower()).strip("_")
+    return f"{alias}_{slug}_{dims}"
+
+def estimate_tokens(texts: Sequence[str]) -> int:
+    """Estima os tokens de uma lista de textos (cerca de 4 caracteres por token)."""
+    return sum(len(text) // 4 + 1 for text in texts)
+
+def memory_text(metadata: Dict) -> str:
+    """Retorna o texto da memória (campo 'data' gravado pelo mem0)."""
+    return (metadata.get("data") or "").replace("\n", " ")
+
+def make_openai_embedder(client, model: str, dims: int, requests_limit: TokenBucket,
+                         tokens_limit: TokenBucket, sleep: Callable[[float], None] = time.sleep) -> EmbedFunction:
+    """
+    Cria a função de embeddings com limitação de taxa e novas tentativas.
+
+    Args:
+        client: Cliente da OpenAI
+        model: Modelo de embeddings
+        dims: Dimensão dos embeddings
+        requests_limit: Limite de requisições
+        tokens_limit: Limite de tokens
+        sleep: Função de espera (substituível nos testes)
+
+    Returns:
+        EmbedFunction: Função que converte textos em vetores
+    """
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+
+    options = {"dimensions": dims} if model.startswith("text-embedding-3") else {}
+
+    def embed(texts: List[str]) -> List[List[float]]:
+        for attempt in range(1, MAX_RETRIES + 1):
+            requests_limit.acquire(1, sleep)
+            tokens_limit.acquire(estimate_tokens(texts), sleep)
+            try:
+                response = client.embeddings.create(model=model, input=texts, **options)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except (RateLimitError, APIConnectionError, APIStatusError) as e:
+                status = getattr(e, "status_code", None)
+                if attempt == MAX_RETRIES or (status is not None and status < 500 and status != 429):
+                    raise
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                logger.warning(f"Falha temporária na API de embeddings ({e.__class__.__name__}); "
+                               f"nova tentativa em {delay:.1f}s")
+                sleep(delay)
+
+    return embed
+
+def load_checkpoint(path: str, expected: Dict) -> Dict:
+    """
+    Carrega o checkpoint de uma migração anterior.
+
+    Args:
+        path: Caminho do arquivo de checkpoint
+        expected: Origem, destino, modelo e dimensão da migração atual
+
+    Returns:
+        dict: Checkpoint (novo, se o arquivo não existir)
+
+    Raises:
+        ValueError: Se o checkpoint pertencer a outra migração
+    """
+    if not os.path.exists(path):
+        return dict(expected, phase=PHASE_COPY, last_id=None, migrated=0, skipped=0)
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    mismatched = [key for key, value in expected.items() if checkpoint.get(key) != value]
+    if mismatched:
+        raise ValueError(f"O checkpoint {path} pertence a outra migração ({', '.join(mismatched)} diferente); "
+                         f"remova-o ou use outro --checkpoint")
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    """Grava o checkpoint de forma atômica (arquivo temporário + renomeação)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(temporary, path)
+
+def embed_records(records: Sequence[Record], embed: EmbedFunction) -> List[Record]:
+    """
+    Recalcula os vetores de um lote de registros.
+
+    Registros sem texto são descartados, pois não há o que reprocessar.
+
+    Returns:
+        list: Registros com os novos vetores
+    """
+    pending = [(record_id, metadata) for record_id, _, metadata in records if memory_text(metadata)]
+    if not pending:
+        return []
+    vectors = embed([memory_text(metadata) for _, metadata in pending])
+    if len(vectors) != len(pending):
+        raise ValueError(f"A API retornou {len(vectors)} vetores para {len(pending)} textos")
+    return [(record_id, vector, metadata) for (record_id, metadata), vector in zip(pending, vectors)]
+
+def copy_phase(conn, checkpoint: Dict, embed: EmbedFunction, checkpoint_path: str,
+               batch_size: int = DEFAULT_BATCH_SIZE) -> Dict:
+    """
+    Copia as memórias da coleção de origem para a sombra, retomando do checkpoint.
+
+    Cada lote é confirmado antes de o checkpoint avançar; como a gravação
+    substitui registros existentes, repetir o último lote após uma falha
+    é inofensivo.
+
+    Returns:
+        dict: Checkpoint atualizado
+    """
+    source, shadow = checkpoint["source"], checkpoint["shadow"]
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("SELECT count(*) FROM {};").format(collection_table(source)))
+        total = cursor.fetchone()[0]
+    conn.rollback()
+
+    started = time.monotonic()
+    done_at_start = checkpoint["migrated"] + checkpoint["skipped"]
+    for batch in iter_record_batches(conn, source, checkpoint["last_id"], batch_size, include_vectors=False):
+        conn.rollback()
+        records = embed_records(batch, embed)
+        copy_records(conn, shadow, records)
+        conn.commit()
+
+        checkpoint["last_id"] = batch[-1][0]
+        checkpoint["migrated"] += len(records)
+        checkpoint["skipped"] += len(batch) - len(records)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+        done = checkpoint["migrated"] + checkpoint["skipped"]
+        rate = (done - done_at_start) / max(time.monotonic() - started, 1e-9)
+        remaining = max(total - done, 0)
+        logger.info(f"{done}/{total} memórias processadas ({rate:.0f}/s, "
+                    f"restam ~{remaining / rate if rate else 0:.0f}s)")
+
+    checkpoint["phase"] = PHASE_COPIED
+    save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+def catch_up(conn, source: str, shadow: str, embed: EmbedFunction, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Sincroniza na sombra as alterações feitas na origem durante a migração.
+
+    Memórias novas ou alteradas são reprocessadas e memórias removidas da
+    origem são removidas da sombra.
+
+    Returns:
+        int: Número de memórias sincronizadas (gravadas ou removidas)
+    """
+    source_table, shadow_table = collection_table(source), collection_table(shadow)
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("""
+            SELECT s.id FROM {} s
+            LEFT JOIN {} t ON t.id = s.id
+            WHERE coalesce(s.metadata->>'data', '') <> ''
+            AND (t.id IS NULL OR t.metadata IS DISTINCT FROM s.metadata);
+        """).format(source_table, shadow_table))
+        changed = [row[0] for row in cursor.fetchall()]
+        cursor.execute(sql.SQL("""
+            DELETE FROM {} t
+            WHERE NOT EXISTS (SELECT 1 FROM {} s WHERE s.id = t.id);
+        """).format(shadow_table, source_table))
+        removed = cursor.rowcount
+    conn.commit()
+
+    for start in range(0, len(changed), batch_size):
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT id, NULL, metadata FROM {} WHERE id = ANY(%s);").format(source_table),
+                           (changed[start:start + batch_size],))
+            batch = cursor.fetchall()
+        conn.rollback()
+        copy_records(conn, shadow, embed_records(batch, embed))
+        conn.commit()
+
+    if changed or removed:
+        logger.info(f"Sincronização: {len(changed)} memórias gravadas, {removed} removidas")
+    return len(changed) + removed
+
+def create_shadow(conn, shadow: str, dims: int, layout: Dict):
+    """
+    Cria a coleção sombra com o layout da origem (particionada ou não), se ela não existir.
+
+    Args:
+        conn: Conexão com o banco de dados
+        shadow: Nome da coleção sombra
+        dims: Dimensão dos vetores
+        layout: Layout da origem (`collection_layout`)
+    """
+    if not layout["partitions"] or get_dimension(conn, shadow) is not None:
+        ensure_collection(conn, shadow, dims)
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {};").format(sql.Identifier(VECS_SCHEMA)))
+        create_partitioned_collection(cursor, shadow, shadow, dims, layout["partitions"])
+    conn.commit()
+
+def create_vector_index(conn, collection_name: str):
+    """Cria o índice HNSW de cosseno da coleção (mesmo nome usado pelo armazenamento vetorial)."""
+    logger.info(f"Criando índice HNSW da coleção {collection_name}...")
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING hnsw (vec vector_cosine_ops);").format(
+            sql.Identifier(f"ix_{collection_name}_vec_hnsw"), collection_table(collection_name)))
+    conn.commit()
+
+def create_shadow_indexes(conn, shadow: str, dims: int, layout: Dict):
+    """
+    Cria na sombra os índices da origem: HNSW (por partição, no layout particionado),
+    quantizados, de busca textual e de listagem, com os nomes usados por `utils/setup_supabase.py`.
+
+    Args:
+        conn: Conexão com o banco de dados
+        shadow: Nome da coleção sombra
+        dims: Dimensão dos vetores
+        layout: Layout da origem (`collection_layout`)
+    """
+    if layout["partitions"]:
+        create_partition_indexes(conn, shadow, layout["partitions"])
+        tables = list_partitions(conn, shadow)
+    else:
+        create_vector_index(conn, shadow)
+        tables = [shadow]
+
+    for index in layout["indexes"]:
+        if index == INDEX_HNSW:
+            continue
+        logger.info(f"Criando índices {index} da coleção {shadow}...")
+        for name in tables:
+            table, index_name = collection_table(name), f"ix_{name.lstrip('_')}_{INDEX_SUFFIXES[index]}"
+            if index == INDEX_FULLTEXT:
+                statement = fulltext_index_sql(table, index_name)
+            elif index == INDEX_LISTING:
+                statement = listing_index_sql(table, index_name)
+            else:
+                statement = quantized_index_sql(table, index_name, index, dims)
+            with conn.cursor() as cursor:
+                cursor.execute(statement)
+            conn.commit()
+
+def verify_shadow(conn, source: str, shadow: str, embed: EmbedFunction, samples: int = 20, k: int = 5,
+                  layout: Optional[Dict] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                  max_delta: int = DEFAULT_VERIFY_MAX_DELTA):
+    """
+    Verifica a coleção sombra antes da troca.
+
+    Confere se a sombra tem o layout da origem (partições e índices), se a
+    contagem de memórias com texto bate com a da origem, se vetores
+    recalculados para uma amostra coincidem com os gravados e se a busca
+    pelo índice encontra cada memória da amostra entre as k primeiras do
+    seu usuário.
+
+    Como a origem continua recebendo escritas, as alterações são
+    sincronizadas mais uma vez logo antes da contagem, e as duas coleções
+    são contadas na mesma consulta; diferenças de até `max_delta` memórias
+    são toleradas (a sincronização após a troca grava o restante).
+
+    Raises:
+        ValueError: Se alguma verificação falhar
+    """
+    if layout is not None:
+        found_layout = collection_layout(conn, shadow)
+        conn.rollback()
+        if found_layout["partitions"] != layout["partitions"]:
+            raise ValueError(f"A coleção {shadow} tem {found_layout['partitions']} partições, "
+                             f"mas a origem tem {layout['partitions']}")
+        missing = sorted(set(layout["indexes"]) - set(found_layout["indexes"]))
+        if missing:
+            raise ValueError(f"A coleção {shadow} não tem os índices da origem: {', '.join(missing)}")
+
+    catch_up(conn, source, shadow, embed, batch_size)
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("""
+            SELECT (SELECT count(*) FROM {} WHERE coalesce(metadata->>'data', '') <> ''),
+                   (SELECT count(*) FROM {});
+        """).format(collection_table(source), collection_table(shadow)))
+        expected, found = cursor.fetchone()
+        if abs(expected - found) > max_delta:
+            raise ValueError(f"A coleção {shadow} tem {found} memórias, mas a origem tem {expected}")
+        if expected != found:
+            logger.info(f"Contagem da verificação: {found} memórias na sombra e {expected} na origem "
+                        f"(escritas recentes, tolerância de {max_delta})")
+
+        cursor.execute(sql.SQL("SELECT id, vec::text, metadata FROM {} ORDER BY random() LIMIT %s;").format(
+            collection_table(shadow)), (samples,))
+        rows = [(record_id, json.loads(vector), metadata) for record_id, vector, metadata in cursor.fetchall()]
+    conn.rollback()
+    if not rows:
+        return
+
+    fresh = embed([memory_text(metadata) for _, _, metadata in rows])
+    misses = 0
+    for (record_id, stored, metadata), vector in zip(rows, fresh):
+        similarity = _cosine(stored, vector)
+        if similarity < MIN_VERIFY_SIMILARITY:
+            raise ValueError(f"O vetor gravado da memória {record_id} não corresponde ao modelo "
+                             f"(similaridade {similarity:.3f})")
+        filters = {"user_id": metadata["user_id"]} if metadata.get("user_id") else None
+        query, params = build_search(collection_table(shadow), stored, k, filters)
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            if record_id not in [row[0] for row in cursor.fetchall()]:
+                misses += 1
+        conn.rollback()
+
+    if misses:
+        raise ValueError(f"A busca não encontrou {misses} de {len(rows)} memórias da amostra na coleção {shadow}")
+    logger.info(f"✅ Coleção {shadow} verificada ({found} memórias, amostra de {len(rows)})")
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    """Calcula a similaridade de cosseno entre dois vetores."""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) ** 0.5) * (sum(y * y for y in b) ** 0.5)
+    return dot / norm if norm else 0.0
+
+def reembed(database_url: str, embed: EmbedFunction, model: str, dims: int,
+            alias: str = DEFAULT_COLLECTION, shadow: Optional[str] = None,
+            checkpoint_path: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+            switch: bool = False, verify_samples: int = 20) -> str:
+    """
+    Executa (ou retoma) a migração de embeddings.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        embed: Função de embeddings do novo modelo
+        model: Novo modelo de embeddings
+        dims: Nova dimensão dos embeddings
+        alias: Nome lógico da coleção (MEMORY_COLLECTION)
+        shadow: Nome da coleção sombra (padrão: derivado do modelo e da dimensão)
+        checkpoint_path: Arquivo de checkpoint (padrão: logs/reembed_<sombra>.json)
+        batch_size: Memórias por requisição de embeddings
+        switch: Se True, aponta o nome lógico para a sombra após a verificação
+        verify_samples: Tamanho da amostra verificada
+
+    Returns:
+        str: Nome da coleção sombra
+    """
+    shadow = shadow or shadow_name(alias, model, dims)
+    checkpoint_path = checkpoint_path or os.path.join("logs", f"reembed_{shadow}.json")
+
+    conn = connect(database_url)
+    try:
+        source = resolve_collection(conn, alias)
+        conn.rollback()
+        if source == shadow:
+            logger.info(f"✅ O nome {alias} já aponta para a coleção {shadow}.")
+            return shadow
+
+        config = {"embedding_model": model, "embedding_dims": dims}
+        checkpoint = load_checkpoint(checkpoint_path, dict(alias=alias, source=source, shadow=shadow, **config))
+
+        # A sombra reproduz o layout da origem: a troca não pode perder partições nem índices
+        layout = collection_layout(conn, source)
+        create_shadow(conn, shadow, dims, layout)
+        stored = get_collection_config(conn, shadow)
+        if stored is not None and stored != config:
+            raise ValueError(f"A coleção {shadow} já existe com outra configuração: {stored}")
+        set_collection_config(conn, shadow, config)
+        conn.commit()
+
+        if checkpoint["phase"] == PHASE_COPY:
+            if checkpoint["last_id"] is not None:
+                logger.info(f"Retomando a migração após o id {checkpoint['last_id']} "
+                            f"({checkpoint['migrated']} memórias já migradas)")
+            logger.info(f"Migrando {source} → {shadow} ({model}, {dims} dimensões)")
+            checkpoint = copy_phase(conn, checkpoint, embed, checkpoint_path, batch_size)
+
+        create_shadow_indexes(conn, shadow, dims, layout)
+        catch_up(conn, source, shadow, embed, batch_size)
+        verify_shadow(conn, source, shadow, embed, verify_samples, layout=layout, batch_size=batch_size)
+
+        if not switch:
+            logger.info(f"ℹ️ Execute novamente com --switch para apontar {alias} para {shadow}.")
+            return shadow
+
+        switch_collection(conn, alias, shadow)
+        conn.commit()
+        checkpoint["phase"] = PHASE_SWITCHED
+        save_checkpoint(checkpoint_path, checkpoint)
+        logger.info(f"✅ {alias} agora aponta para {shadow}; a coleção {source} foi mantida.")
+
+        # Grava as memórias salvas por instâncias ainda não reiniciadas até a troca
+        catch_up(conn, source, shadow, embed, batch_size)
+        return shadow
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Função principal que processa os argumentos da linha de comando.
+
+    Returns:
+        int: 0 em caso de sucesso, 1 caso contrário
+    """
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Migra as memórias para outro modelo ou dimensão de embeddings.')
+    parser.add_argument('--model', default=os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL),
+                        help='Novo modelo de embeddings (padrão: EMBEDDING_MODEL)')
+    parser.add_argument('--dims', type=int, default=int(os.getenv('EMBEDDING_DIMS', DEFAULT_EMBEDDING_DIMS)),
+                        help='Nova dimensão dos embeddings (padrão: EMBEDDING_DIMS)')
+    parser.add_argument('--collection', default=os.getenv('MEMORY_COLLECTION', DEFAULT_COLLECTION),
+                        help='Nome lógico da coleção (padrão: MEMORY_COLLECTION)')
+    parser.add_argument('--shadow', help='Nome da coleção sombra (padrão: derivado do modelo e da dimensão)')
+    parser.add_argument('--checkpoint', help='Arquivo de checkpoint (padrão: logs/reembed_<sombra>.json)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Memórias por requisição de embeddings (padrão: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--requests-per-minute', type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help=f'Limite de requisições por minuto (padrão: {DEFAULT_REQUESTS_PER_MINUTE})')
+    parser.add_argument('--tokens-per-minute', type=int, default=DEFAULT_TOKENS_PER_MINUTE,
+                        help=f'Limite de tokens por minuto (padrão: {DEFAULT_TOKENS_PER_MINUTE})')
+    parser.add_argument('--verify-samples', type=int, default=20,
+                        help='Memórias verificadas antes da troca (padrão: 20)')
+    parser.add_argument('--switch', action='store_true',
+                        help='Aponta a coleção para a sombra após a verificação')
+    args = parser.parse_args(argv)
+
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        logger.error("❌ Variável de ambiente DATABASE_URL não encontrada.")
+        return 1
+    if not os.environ.get('OPENAI_API_KEY'):
+        logger.error("❌ Variável de ambiente OPENAI_API_KEY não encontrada.")
+        return 1
+
+    from openai import OpenAI
+    embed = make_openai_embedder(OpenAI(), args.model, args.dims,
+                                 TokenBucket.per_minute(args.requests_per_minute),
+                                 TokenBucket.per_minute(args.tokens_per_minute))
+    try:
+        shadow = reembed(database_url, embed, args.model, args.dims, args.collection, args.shadow,
+                         args.checkpoint, args.batch_size, args.switch, args.verify_samples)
+    except Exception as e:
+        logger.error(f"❌ Erro na migração de embeddings: {str(e)}")
+        logger.error("📌 DICA: Execute o mesmo comando novamente para retomar do último checkpoint.")
+        return 1
+
+    if args.switch:
+        print(f"\n🔀 Coleção ativa: {shadow}")
+        print(f"   Defina EMBEDDING_MODEL={args.model} e EMBEDDING_DIMS={args.dims} no arquivo .env "
+              f"e reinicie o agente.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,46 @@
 """
 Utilitário para configurar o banco de dados Supabase para o Voxy-Mem0.
 Este script verifica e cria a extensão pgvector necessária para o armazenamento vetorial.
+
+Com a opção --partitions, cria (ou migra) a coleção para o layout
+particionado por hash do user_id, com índices próprios em cada partição.
+Com a opção --quantization, cria o índice quantizado (halfvec ou binário)
+usado pela busca em dois estágios. As opções --fts e --listing-index criam
+os índices da busca textual e da listagem paginada de memórias.
 """
 
 import os
 import sys
 import logging
+import argparse
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2 import sql
 import time
 
+# Adiciona o diretório raiz ao path para importar o módulo voxy_store
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voxy_store import (
+    DEFAULT_COLLECTION,
+    DEFAULT_EMBEDDING_DIMS,
+    DEFAULT_EMBEDDING_MODEL,
+    PARTITION_KEY,
+    QUANTIZATION_BINARY,
+    QUANTIZATION_HALFVEC,
+    collection_table,
+    fulltext_index_sql,
+    get_collection_config,
+    get_dimension,
+    is_partitioned,
+    list_partitions,
+    listing_index_sql,
+    partition_name,
+    quantized_index_sql,
+    resolve_collection,
+    set_collection_config,
+)
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -98,6 +128,370 @@ def list_vector_collections(database_url):
     
     return collections
 
+def create_partitioned_collection(cursor, table_name, collection_name, dimension, partitions):
+    """
+    Cria uma tabela particionada por hash do user_id, com o layout do vecs.
+
+    Os índices das partições são criados separadamente por
+    `create_partition_indexes`, depois da carga dos dados.
+
+    Args:
+        cursor: Cursor do banco de dados
+        table_name: Nome da tabela a criar (no esquema vecs)
+        collection_name: Nome da coleção (usado para nomear as partições)
+        dimension: Dimensão dos vetores
+        partitions: Número de partições
+    """
+    logger.info(f"⏳ Criando tabela particionada {table_name} ({partitions} partições)...")
+    parent = collection_table(table_name)
+    cursor.execute(sql.SQL("""
+        CREATE TABLE {} (
+            id varchar NOT NULL,
+            vec vector({}) NOT NULL,
+            metadata jsonb NOT NULL DEFAULT '{{}}'::jsonb
+        ) PARTITION BY HASH ({});
+    """).format(parent, sql.Literal(dimension), sql.SQL(PARTITION_KEY)))
+
+    for index in range(partitions):
+        cursor.execute(sql.SQL(
+            "CREATE TABLE {} PARTITION OF {} FOR VALUES WITH (MODULUS {}, REMAINDER {});"
+        ).format(
+            collection_table(partition_name(collection_name, index)), parent,
+            sql.Literal(partitions), sql.Literal(index)
+        ))
+
+def create_partition_indexes(conn, collection_name, partitions):
+    """
+    Cria, partição por partição, o índice único de id, o índice GIN dos
+    metadados e o índice HNSW dos vetores.
+
+    Cada partição é indexada em sua própria transação, então a manutenção
+    (e eventuais falhas) ficam restritas a uma partição por vez.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        partitions: Número de partições
+    """
+    for index in range(partitions):
+        name = partition_name(collection_name, index)
+        table = collection_table(name)
+        logger.info(f"⏳ Indexando partição {name} ({index + 1}/{partitions})...")
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} (id);").format(
+                sql.Identifier(f"ix{name}_id"), table))
+            cursor.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING gin (metadata jsonb_path_ops);").format(
+                sql.Identifier(f"ix{name}_metadata"), table))
+            cursor.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING hnsw (vec vector_cosine_ops);").format(
+                sql.Identifier(f"ix{name}_vec_hnsw"), table))
+        conn.commit()
+
+def track_changes(cursor, collection_name, table):
+    """
+    Registra, por gatilho, os ids inseridos, alterados ou removidos na tabela durante a migração.
+
+    Args:
+        cursor: Cursor do banco de dados
+        collection_name: Nome da coleção (usado nos nomes da tabela de alterações e do gatilho)
+        table: Tabela acompanhada (sql.Composable)
+
+    Returns:
+        sql.Composable: Tabela de alterações (uma linha por id pendente)
+    """
+    changes = collection_table(f"_{collection_name}_changes")
+    function = collection_table(f"_{collection_name}_track_changes")
+    cursor.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(changes))
+    cursor.execute(sql.SQL("CREATE TABLE {} (id text PRIMARY KEY);").format(changes))
+    cursor.execute(sql.SQL("""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO {changes} (id) VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END)
+            ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END;
+        $$;
+    """).format(function=function, changes=changes))
+    cursor.execute(sql.SQL("DROP TRIGGER IF EXISTS {trigger} ON {table};").format(
+        trigger=sql.Identifier(f"_{collection_name}_track_changes"), table=table))
+    cursor.execute(sql.SQL("""
+        CREATE TRIGGER {trigger} AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {function}();
+    """).format(trigger=sql.Identifier(f"_{collection_name}_track_changes"), table=table, function=function))
+    return changes
+
+def untrack_changes(cursor, collection_name, table):
+    """Remove o gatilho e a tabela de alterações criados por `track_changes`."""
+    cursor.execute(sql.SQL("DROP TRIGGER IF EXISTS {} ON {};").format(
+        sql.Identifier(f"_{collection_name}_track_changes"), table))
+    cursor.execute(sql.SQL("DROP FUNCTION IF EXISTS {}();").format(
+        collection_table(f"_{collection_name}_track_changes")))
+    cursor.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(collection_table(f"_{collection_name}_changes")))
+
+def sync_changes(cursor, source, target, changes, limit):
+    """
+    Aplica no destino um lote de ids alterados na origem (sem confirmar a transação).
+
+    Cada id do lote é removido do destino e copiado de novo da origem, se
+    ainda existir nela; ids alterados outra vez depois disso voltam para a
+    tabela de alterações pelo gatilho.
+
+    Args:
+        cursor: Cursor do banco de dados
+        source: Tabela de origem
+        target: Tabela de destino
+        changes: Tabela de alterações
+        limit: Ids por lote
+
+    Returns:
+        int: Número de ids sincronizados
+    """
+    cursor.execute(sql.SQL("""
+        DELETE FROM {changes} WHERE id IN (SELECT id FROM {changes} LIMIT %s) RETURNING id;
+    """).format(changes=changes), (limit,))
+    ids = [row[0] for row in cursor.fetchall()]
+    if ids:
+        cursor.execute(sql.SQL("DELETE FROM {} WHERE id = ANY(%s);").format(target), (ids,))
+        cursor.execute(sql.SQL("INSERT INTO {} (id, vec, metadata) SELECT id, vec, metadata FROM {} "
+                               "WHERE id = ANY(%s);").format(target, source), (ids,))
+    return len(ids)
+
+def setup_partitioned_collection(database_url, partitions, collection_name=DEFAULT_COLLECTION,
+                                 dimension=1536, batch_size=5000):
+    """
+    Cria a coleção no layout particionado ou migra a coleção existente.
+
+    A migração copia os dados em lotes para uma tabela particionada
+    auxiliar enquanto a coleção original continua em uso. Um gatilho
+    registra os ids alterados durante a cópia, que são sincronizados em
+    lotes, ainda sem bloqueio, até restarem menos de `batch_size`. Só então,
+    com escritas bloqueadas por alguns instantes, o restante é aplicado e as
+    tabelas são trocadas. A tabela original é mantida como
+    `_<coleção>_legacy` para permitir o retorno.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        partitions: Número de partições
+        collection_name: Nome da coleção
+        dimension: Dimensão dos vetores (usada apenas ao criar uma coleção nova)
+        batch_size: Registros copiados por lote durante a migração
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False caso contrário
+    """
+    if partitions < 2:
+        logger.error("❌ O layout particionado exige pelo menos 2 partições.")
+        return False
+
+    conn = psycopg2.connect(database_url)
+    try:
+        collection_name = resolve_collection(conn, collection_name)
+        existing_dimension = get_dimension(conn, collection_name)
+
+        if existing_dimension is None:
+            with conn.cursor() as cursor:
+                cursor.execute("CREATE SCHEMA IF NOT EXISTS vecs;")
+                create_partitioned_collection(cursor, collection_name, collection_name, dimension, partitions)
+            set_collection_config(conn, collection_name, {
+                "embedding_model": os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL),
+                "embedding_dims": dimension,
+            })
+            conn.commit()
+            create_partition_indexes(conn, collection_name, partitions)
+            logger.info(f"✅ Coleção {collection_name} criada com {partitions} partições.")
+            return True
+
+        if is_partitioned(conn, collection_name):
+            logger.info(f"✅ A coleção {collection_name} já usa o layout particionado.")
+            return True
+
+        legacy = collection_table(collection_name)
+        staging_name = f"_{collection_name}_partitioned"
+        staging = collection_table(staging_name)
+
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(staging))
+            create_partitioned_collection(cursor, staging_name, collection_name, existing_dimension, partitions)
+            # Registra as alterações a partir daqui: a cópia não vê as feitas em ids já copiados
+            changes = track_changes(cursor, collection_name, legacy)
+        # Preserva a configuração de embeddings registrada na coleção
+        stored_config = get_collection_config(conn, collection_name)
+        if stored_config:
+            set_collection_config(conn, staging_name, stored_config)
+        conn.commit()
+
+        # Cópia em lotes, em ordem de id, sem bloquear a coleção original
+        copied = 0
+        last_id = ""
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("""
+                    WITH batch AS (
+                        SELECT id, vec, metadata FROM {} WHERE id > %s ORDER BY id LIMIT %s
+                    )
+                    INSERT INTO {} (id, vec, metadata) SELECT id, vec, metadata FROM batch
+                    RETURNING id;
+                """).format(legacy, staging), (last_id, batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            if not ids:
+                break
+            copied += len(ids)
+            last_id = max(ids)
+            logger.info(f"   {copied} memórias copiadas...")
+
+        # Os índices são criados após a carga, que é muito mais rápida sem eles
+        create_partition_indexes(conn, collection_name, partitions)
+
+        # Sincroniza as alterações da cópia em lotes, sem bloquear, até sobrar pouco
+        logger.info("⏳ Sincronizando alterações feitas durante a cópia...")
+        while True:
+            with conn.cursor() as cursor:
+                synced = sync_changes(cursor, legacy, staging, changes, batch_size)
+            conn.commit()
+            if synced < batch_size:
+                break
+
+        logger.info("⏳ Aplicando as últimas alterações e trocando as tabelas...")
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE;").format(legacy))
+            while sync_changes(cursor, legacy, staging, changes, batch_size):
+                pass
+            untrack_changes(cursor, collection_name, legacy)
+            cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {};").format(
+                legacy, sql.Identifier(f"_{collection_name}_legacy")))
+            cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {};").format(
+                staging, sql.Identifier(collection_name)))
+        conn.commit()
+
+        logger.info(f"✅ Coleção {collection_name} migrada para {partitions} partições.")
+        logger.info(f"ℹ️ A tabela original foi mantida como vecs._{collection_name}_legacy; "
+                    "remova-a após validar a migração.")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"❌ Erro ao configurar o layout particionado: {str(e)}")
+        try:
+            # Sem migração em andamento, o gatilho só atrasaria as escritas da coleção
+            with conn.cursor() as cursor:
+                untrack_changes(cursor, collection_name, collection_table(collection_name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+def create_quantized_indexes(database_url, quantization, collection_name=DEFAULT_COLLECTION):
+    """
+    Cria o índice HNSW sobre a expressão quantizada dos vetores.
+
+    Os vetores float32 continuam na tabela para a reordenação exata; apenas
+    o índice usa a representação quantizada. No layout particionado, cada
+    partição recebe seu próprio índice.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        quantization: 'halfvec' ou 'binary'
+        collection_name: Nome da coleção
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False caso contrário
+    """
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    try:
+        collection_name = resolve_collection(conn, collection_name)
+        dimension = get_dimension(conn, collection_name)
+        if dimension is None:
+            logger.error(f"❌ A coleção {collection_name} não existe. Execute o agente ou importe memórias antes.")
+            return False
+
+        tables = list_partitions(conn, collection_name) or [collection_name]
+        for name in tables:
+            logger.info(f"⏳ Criando índice {quantization} em {name}...")
+            with conn.cursor() as cursor:
+                cursor.execute(quantized_index_sql(
+                    collection_table(name), f"ix_{name.lstrip('_')}_vec_{quantization}",
+                    quantization, dimension
+                ))
+
+        logger.info(f"✅ Índice {quantization} criado para a coleção {collection_name}.")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao criar o índice quantizado: {str(e)}")
+        if "halfvec" in str(e) or "binary_quantize" in str(e):
+            logger.error("📌 DICA: Índices quantizados exigem pgvector 0.7 ou superior.")
+        return False
+    finally:
+        conn.close()
+
+def create_collection_indexes(database_url, collection_name, index_sql, suffix, description):
+    """
+    Cria um índice em cada tabela da coleção (em cada partição, no layout particionado).
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        collection_name: Nome da coleção
+        index_sql: Função (tabela, nome do índice) -> comando CREATE INDEX
+        suffix: Sufixo do nome dos índices
+        description: Descrição do índice para os logs
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False caso contrário
+    """
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    try:
+        collection_name = resolve_collection(conn, collection_name)
+        if get_dimension(conn, collection_name) is None:
+            logger.error(f"❌ A coleção {collection_name} não existe. Execute o agente ou importe memórias antes.")
+            return False
+
+        tables = list_partitions(conn, collection_name) or [collection_name]
+        for name in tables:
+            logger.info(f"⏳ Criando índice de {description} em {name}...")
+            with conn.cursor() as cursor:
+                cursor.execute(index_sql(collection_table(name), f"ix_{name.lstrip('_')}_{suffix}"))
+
+        logger.info(f"✅ Índice de {description} criado para a coleção {collection_name}.")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao criar o índice de {description}: {str(e)}")
+        return False
+    finally:
+        conn.close()
+
+def create_fulltext_indexes(database_url, collection_name=DEFAULT_COLLECTION):
+    """
+    Cria o índice GIN de busca textual sobre o texto das memórias.
+
+    O índice atende à busca lexical usada por MEMORY_RETRIEVAL_MODE=lexical_first.
+    No layout particionado, cada partição recebe seu próprio índice.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        collection_name: Nome da coleção
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False caso contrário
+    """
+    return create_collection_indexes(database_url, collection_name, fulltext_index_sql, "fts", "busca textual")
+
+def create_listing_indexes(database_url, collection_name=DEFAULT_COLLECTION):
+    """
+    Cria o índice (user_id, data de criação, id) usado pela listagem paginada de memórias.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        collection_name: Nome da coleção
+
+    Returns:
+        bool: True se a operação for bem-sucedida, False caso contrário
+    """
+    return create_collection_indexes(database_url, collection_name, listing_index_sql, "user_created",
+                                     "listagem por usuário")
+
 def setup_database():
     """
     Configura o banco de dados Supabase para uso com o Voxy-Mem0.
@@ -206,9 +600,51 @@ def display_banner():
     print("  📊 Diagnóstico de conexão e coleções vetoriais\n")
 
 if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Configura o banco de dados Supabase para o Voxy-Mem0.')
+    parser.add_argument('--partitions', type=int,
+                        help='Cria ou migra a coleção para o layout particionado por hash do user_id')
+    parser.add_argument('--collection', default=os.getenv('MEMORY_COLLECTION', DEFAULT_COLLECTION),
+                        help=f'Nome da coleção (padrão: MEMORY_COLLECTION ou {DEFAULT_COLLECTION})')
+    parser.add_argument('--dimension', type=int, default=int(os.getenv('EMBEDDING_DIMS', DEFAULT_EMBEDDING_DIMS)),
+                        help='Dimensão dos vetores ao criar uma coleção nova (padrão: EMBEDDING_DIMS ou 1536)')
+    parser.add_argument('--quantization', choices=[QUANTIZATION_HALFVEC, QUANTIZATION_BINARY],
+                        help='Cria o índice quantizado usado pela busca em dois estágios')
+    parser.add_argument('--fts', action='store_true',
+                        help='Cria o índice de busca textual usado pela recuperação lexical')
+    parser.add_argument('--listing-index', action='store_true',
+                        help='Cria o índice da listagem paginada de memórias por usuário')
+    args = parser.parse_args()
+
     display_banner()
     
     success = setup_database()
+
+    if success and args.partitions:
+        success = setup_partitioned_collection(os.environ.get('DATABASE_URL'), args.partitions,
+                                               args.collection, args.dimension)
+        if success:
+            print("\n🧩 Layout particionado pronto.")
+            print("   Defina MEMORY_STORE_LAYOUT=partitioned no arquivo .env para usá-lo no agente.")
+
+    if success and args.quantization:
+        success = create_quantized_indexes(os.environ.get('DATABASE_URL'), args.quantization, args.collection)
+        if success:
+            print(f"\n🗜️ Índice {args.quantization} pronto.")
+            print(f"   Defina MEMORY_VECTOR_QUANTIZATION={args.quantization} no arquivo .env para usá-lo no agente.")
+            print("   Compare recall e latência com 'python run.py quantization-report'.")
+
+    if success and args.fts:
+        success = create_fulltext_indexes(os.environ.get('DATABASE_URL'), args.collection)
+        if success:
+            print("\n🔤 Índice de busca textual pronto.")
+            print("   Defina MEMORY_RETRIEVAL_MODE=lexical_first no arquivo .env para usá-lo no agente.")
+
+    if success and args.listing_index:
+        success = create_listing_indexes(os.environ.get('DATABASE_URL'), args.collection)
+        if success:
+            print("\n📄 Índice da listagem de memórias pronto.")
     
     if success:
         print("\n✅ Banco de dados configurado com sucesso!")
@@ -0,0 +1,347 @@
+"""
+Controle de admissão das mensagens do Voxy-Mem0.
+
+Antes de processar uma mensagem (chamadas à OpenAI e ao banco), o
+controlador verifica, nesta ordem:
+
+1. o balde de fichas do usuário (limite de mensagens por minuto, com rajadas);
+2. o limite global de mensagens simultâneas;
+3. a fila de espera, limitada e escalonada de forma justa entre usuários.
+
+A fila usa weighted fair queueing (start-time fair queueing): cada pedido
+recebe uma marca de tempo virtual que avança 1/peso a cada pedido do mesmo
+usuário, e o pedido com a menor marca é admitido primeiro. Assim, uma
+rajada de um usuário não atrasa os pedidos dos demais. Pedidos acima do
+limite do usuário ou com a fila cheia são recusados imediatamente com
+`AdmissionRejected`, que informa em quantos segundos tentar de novo.
+
+Os baldes ficam em ordem de uso: os menos usados são descartados quando
+já estão cheios (equivalentes a um balde novo) ou quando o número de
+usuários acompanhados passa de `max_users`.
+"""
+import os
+import heapq
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from voxy_metrics import metrics
+from voxy_ratelimit import TokenBucket
+
+# Mensagens processadas simultaneamente
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Mensagens aguardando na fila antes de recusar novas
+DEFAULT_MAX_QUEUE = 32
+
+# Mensagens por minuto e rajada máxima por usuário
+DEFAULT_USER_RATE_PER_MINUTE = 20
+DEFAULT_USER_BURST = 5
+
+# Segundos máximos de espera na fila
+DEFAULT_QUEUE_TIMEOUT = 60.0
+
+# Usuários com balde de fichas mantido em memória
+DEFAULT_MAX_USERS = 10000
+
+# Limites superiores (segundos) do histograma de tempo de fila
+QUEUE_TIME_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Motivos de recusa
+REJECTED_RATE_LIMITED = "rate_limited"
+REJECTED_QUEUE_FULL = "queue_full"
+REJECTED_TIMEOUT = "timeout"
+
+class AdmissionRejected(Exception):
+    """Mensagem recusada pelo controle de admissão."""
+
+    def __init__(self, reason: str, retry_after: float):
+        """
+        Args:
+            reason: 'rate_limited', 'queue_full' ou 'timeout'
+            retry_after: Segundos sugeridos antes de tentar novamente
+        """
+        super().__init__(f"Mensagem recusada ({reason}); tente novamente em {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Pedido de admissão de uma mensagem."""
+
+    def __init__(self, user_id: str, enqueued_at: float):
+        self.user_id = user_id
+        self.enqueued_at = enqueued_at
+        self.admitted_at: Optional[float] = None
+        self.cancelled = False
+        self._event = threading.Event()
+
+
+class AdmissionController:
+    """Limite global, limite por usuário e fila justa, seguros entre threads."""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_queue: int = DEFAULT_MAX_QUEUE,
+                 user_rate_per_minute: float = DEFAULT_USER_RATE_PER_MINUTE, user_burst: float = DEFAULT_USER_BURST,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT, weights: Optional[Dict[str, float]] = None,
+                 max_users: int = DEFAULT_MAX_USERS, clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o controlador.
+
+        Args:
+            max_concurrency: Mensagens processadas simultaneamente
+            max_queue: Mensagens aguardando antes de recusar novas
+            user_rate_per_minute: Mensagens por minuto por usuário (0 desativa o limite)
+            user_burst: Mensagens seguidas permitidas por usuário
+            queue_timeout: Segundos máximos de espera na fila
+            weights: Peso de cada usuário na fila (padrão: 1)
+            max_users: Usuários com balde de fichas mantido em memória
+            clock: Relógio monotônico (substituível nos testes)
+
+        Raises:
+            ValueError: Se algum limite for inválido
+        """
+        if (max_concurrency < 1 or max_queue < 0 or user_rate_per_minute < 0 or queue_timeout <= 0
+                or max_users < 1 or any(weight <= 0 for weight in (weights or {}).values())):
+            raise ValueError("Limites de admissão inválidos")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.user_rate_per_minute = user_rate_per_minute
+        self.user_burst = max(1.0, user_burst)
+        self.queue_timeout = queue_timeout
+        self.weights = weights or {}
+        self.max_users = max_users
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Baldes por usuário, do menos para o mais recentemente usado
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._active = 0
+        # Fila: (marca virtual de início, sequência, pedido)
+        self._queue = []
+        self._queued = 0
+        self._sequence = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        # Tempo médio de processamento (média móvel), usado para sugerir o retry-after
+        self._service_time = 1.0
+
+    @classmethod
+    def from_env(cls, **overrides) -> "AdmissionController":
+        """
+        Cria o controlador a partir das variáveis ADMISSION_*.
+
+        Args:
+            **overrides: Valores que substituem os do ambiente (ex.: max_concurrency)
+        """
+        options = {
+            "max_concurrency": int(os.getenv('ADMISSION_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)),
+            "max_queue": int(os.getenv('ADMISSION_MAX_QUEUE', DEFAULT_MAX_QUEUE)),
+            "user_rate_per_minute": float(os.getenv('ADMISSION_USER_RATE_PER_MINUTE', DEFAULT_USER_RATE_PER_MINUTE)),
+            "user_burst": float(os.getenv('ADMISSION_USER_BURST', DEFAULT_USER_BURST)),
+            "queue_timeout": float(os.getenv('ADMISSION_QUEUE_TIMEOUT', DEFAULT_QUEUE_TIMEOUT)),
+            "weights": parse_weights(os.getenv('ADMISSION_USER_WEIGHTS', '')),
+            "max_users": int(os.getenv('ADMISSION_MAX_USERS', DEFAULT_MAX_USERS)),
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def _bucket(self, user_id: str) -> Optional[TokenBucket]:
+        """Retorna o balde de fichas do usuário e descarta os baldes ociosos (chamado com o lock)."""
+        if not self.user_rate_per_minute:
+            return None
+        bucket = self._buckets.pop(user_id, None)
+        # Baldes cheios são iguais a um balde novo; os demais só saem acima de `max_users`
+        while self._buckets:
+            oldest = next(iter(self._buckets.values()))
+            if len(self._buckets) < self.max_users and not oldest.is_full():
+                break
+            self._buckets.popitem(last=False)
+            metrics.increment("admission.buckets.evicted")
+        if bucket is None:
+            bucket = TokenBucket(self.user_rate_per_minute / 60.0, self.user_burst, self.clock)
+        self._buckets[user_id] = bucket
+        return bucket
+
+    def enqueue(self, user_id: str) -> Ticket:
+        """
+        Registra uma mensagem sem bloquear.
+
+        Args:
+            user_id: Identificador do usuário
+
+        Returns:
+            Ticket: Pedido já admitido ou na fila (use `wait` para aguardar a vez)
+
+        Raises:
+            AdmissionRejected: Se o usuário excedeu o limite ou a fila está cheia
+        """
+        with self._lock:
+            free = self._active < self.max_concurrency and not self._queued
+            if not free and self._queued >= self.max_queue:
+                retry_after = max(1.0, self._service_time * (self._queued + 1) / self.max_concurrency)
+                metrics.increment(f"admission.rejected.{REJECTED_QUEUE_FULL}")
+                raise AdmissionRejected(REJECTED_QUEUE_FULL, retry_after)
+
+            bucket = self._bucket(user_id)
+            wait = bucket.try_acquire() if bucket else 0.0
+            if wait:
+                metrics.increment(f"admission.rejected.{REJECTED_RATE_LIMITED}")
+                raise AdmissionRejected(REJECTED_RATE_LIMITED, wait)
+
+            ticket = Ticket(user_id, self.clock())
+            if free:
+                self._admit(ticket)
+                return ticket
+
+            start = max(self._virtual_time, self._last_finish.get(user_id, 0.0))
+            self._last_finish[user_id] = start + 1.0 / self.weights.get(user_id, 1.0)
+            self._sequence += 1
+            heapq.heappush(self._queue, (start, self._sequence, ticket))
+            self._queued += 1
+            return ticket
+
+    def wait(self, ticket: Ticket, timeout: Optional[float] = None):
+        """
+        Aguarda a admissão de um pedido na fila.
+
+        Args:
+            ticket: Pedido retornado por `enqueue`
+            timeout: Segundos máximos de espera (padrão: `queue_timeout`)
+
+        Raises:
+            AdmissionRejected: Se o tempo de espera se esgotar
+        """
+        if ticket._event.wait(self.queue_timeout if timeout is None else timeout):
+            return
+        with self._lock:
+            if ticket.admitted_at is not None:
+                return
+            ticket.cancelled = True
+            self._queued -= 1
+        metrics.increment(f"admission.rejected.{REJECTED_TIMEOUT}")
+        raise AdmissionRejected(REJECTED_TIMEOUT, self._service_time)
+
+    def cancel(self, ticket: Ticket):
+        """
+        Desiste de um pedido (ex.: cliente desconectado), liberando a vaga se ele já foi admitido.
+
+        Args:
+            ticket: Pedido retornado por `enqueue`
+        """
+        with self._lock:
+            if ticket.admitted_at is None and not ticket.cancelled:
+                ticket.cancelled = True
+                self._queued -= 1
+                return
+        if ticket.admitted_at is not None:
+            self.release(ticket)
+
+    def release(self, ticket: Ticket):
+        """
+        Libera a vaga de um pedido concluído e admite o próximo da fila.
+
+        Args:
+            ticket: Pedido admitido
+        """
+        with self._lock:
+            elapsed = self.clock() - ticket.admitted_at
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._active -= 1
+            while self._queue and self._active < self.max_concurrency:
+                start, _, waiting = heapq.heappop(self._queue)
+                if waiting.cancelled:
+                    continue
+                self._virtual_time = start
+                self._queued -= 1
+                self._admit(waiting)
+            if not self._queued:
+                # Fila vazia: rajadas antigas não devem penalizar os próximos pedidos
+                self._last_finish.clear()
+
+    def _admit(self, ticket: Ticket):
+        """Ocupa uma vaga e libera o pedido (chamado com o lock)."""
+        self._active += 1
+        ticket.admitted_at = self.clock()
+        queue_time = ticket.admitted_at - ticket.enqueued_at
+        metrics.increment("admission.admitted")
+        metrics.increment("admission.queue_time.total", queue_time)
+        for bound in QUEUE_TIME_BUCKETS:
+            if queue_time <= bound:
+                metrics.increment(f"admission.queue_time.le_{bound:g}")
+                break
+        else:
+            metrics.increment("admission.queue_time.le_inf")
+        ticket._event.set()
+
+    @contextmanager
+    def admit(self, user_id: str, timeout: Optional[float] = None):
+        """
+        Mantém uma vaga de processamento durante o bloco `with`.
+
+        Args:
+            user_id: Identificador do usuário
+            timeout: Segundos máximos de espera na fila
+
+        Raises:
+            AdmissionRejected: Se a mensagem for recusada
+        """
+        ticket = self.enqueue(user_id)
+        self.wait(ticket, timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Resume o estado atual do controlador.
+
+        Returns:
+            dict: 'active', 'queued' e 'service_time' (média móvel em segundos)
+        """
+        with self._lock:
+            return {"active": self._active, "queued": self._queued, "service_time": self._service_time}
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """
+    Lê os pesos da fila no formato 'usuario=peso,usuario=peso'.
+
+    Args:
+        text: Pesos separados por vírgula (vazio: todos os usuários com peso 1)
+
+    Returns:
+        dict: Usuário → peso
+
+    Raises:
+        ValueError: Se algum item não tiver o formato 'usuario=peso' com peso positivo
+    """
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        user_id, separator, value = item.rpartition('=')
+        weight = float(value) if separator and user_id.strip() else 0.0
+        if weight <= 0:
+            raise ValueError(f"Peso de admissão inválido: {item}")
+        weights[user_id.strip()] = weight
+    return weights
+
+
+def admission_report() -> Dict[str, float]:
+    """
+    Resume as decisões de admissão e o tempo de fila.
+
+    Returns:
+        dict: 'admitted', recusas por motivo ('rejected_<motivo>'),
+            'avg_queue_time' e o histograma 'queue_time_le_<limite>'
+    """
+    admitted = metrics.get("admission.admitted")
+    report = {
+        "admitted": admitted,
+        "avg_queue_time": metrics.get("admission.queue_time.total") / admitted if admitted else 0.0,
+    }
+    for reason in (REJECTED_RATE_LIMITED, REJECTED_QUEUE_FULL, REJECTED_TIMEOUT):
+        report[f"rejected_{reason}"] = metrics.get(f"admission.rejected.{reason}")
+    for name, value in metrics.snapshot("admission.queue_time.le_").items():
+        report[name.replace("admission.", "").replace(".", "_", 1)] = value
+    return report
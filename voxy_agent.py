@@ -1,12 +1,46 @@
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APITimeoutError, OpenAI
 from mem0 import Memory
 import os
 import logging
 import sys
+import time
+import threading
+from collections import Counter
 from datetime import datetime
+from typing import Optional
 import colorama
 from colorama import Fore, Style
+from voxy_store import (
+    DEFAULT_COLLECTION,
+    DEFAULT_EMBEDDING_DIMS,
+    DEFAULT_EMBEDDING_MODEL,
+    DEFAULT_RERANK_FACTOR,
+    LAYOUT_DEFAULT,
+    LAYOUT_PARTITIONED,
+    QUANTIZATION_NONE,
+    QUANTIZATIONS,
+    active_collection,
+    ensure_embedding_config,
+    register_vector_store,
+)
+from voxy_budget import TurnBudget, degraded_report
+from voxy_buffer import ExtractionBuffer
+from voxy_embeddings import batch_options_from_env, embedding_batch_report, install_batcher
+from voxy_gates import ExtractionGate, RetrievalGate, extraction_report
+from voxy_metrics import metrics
+from voxy_profiling import profiled
+from voxy_prompt import (PROMPT_LAYOUT_INLINE, PROMPT_LAYOUTS, build_messages, conversation_messages,
+                         prompt_cache_report, record_usage)
+from voxy_router import ModelRouter, router_report
+from voxy_retrieval import (
+    DEFAULT_LEXICAL_MIN_RESULTS,
+    RETRIEVAL_LEXICAL_FIRST,
+    RETRIEVAL_MODES,
+    RETRIEVAL_VECTOR,
+    retrieval_report,
+    retrieve_memories,
+)
 
 # Informações da versão
 __version__ = "1.0.0"
@@ -59,6 +93,9 @@ logger.setLevel(logging.INFO)
 logger.addHandler(console_handler)
 logger.addHandler(file_handler)
 
+# Serializa o resumo de cada turno impresso no console
+_console_lock = threading.Lock()
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
@@ -102,6 +139,21 @@ def setup_memory():
         logger.error("Por favor, configure as variáveis de ambiente conforme o .env.example")
         raise ValueError("OPENAI_API_KEY não configurado")
 
+    # Nome lógico da coleção; a tabela ativa é resolvida na inicialização (ver utils/reembed.py)
+    collection_alias = os.getenv('MEMORY_COLLECTION', DEFAULT_COLLECTION)
+
+    # Modelo e dimensão dos embeddings (os modelos text-embedding-3 aceitam dimensões reduzidas)
+    embedding_model = os.getenv('EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL)
+    try:
+        embedding_dims = int(os.getenv('EMBEDDING_DIMS', DEFAULT_EMBEDDING_DIMS))
+    except ValueError:
+        raise ValueError(f"EMBEDDING_DIMS inválido: {os.getenv('EMBEDDING_DIMS')}")
+    if embedding_dims != DEFAULT_EMBEDDING_DIMS and not embedding_model.startswith("text-embedding-3"):
+        raise ValueError(f"O modelo {embedding_model} não suporta dimensões reduzidas (EMBEDDING_DIMS)")
+
+    # Agrupamento das chamadas de embeddings simultâneas (1 = desativado)
+    batch_size, batch_wait = batch_options_from_env()
+
     # Configuração do agente com memória
     config = {
         "llm": {
@@ -110,18 +162,84 @@ def setup_memory():
                 "model": os.getenv('MODEL_CHOICE', 'gpt-4o-mini')
             }
         },
+        "embedder": {
+            "provider": "openai",
+            "config": {
+                "model": embedding_model,
+                "embedding_dims": embedding_dims
+            }
+        },
         "vector_store": {
             "provider": "supabase",
             "config": {
                 "connection_string": os.environ.get('DATABASE_URL'),
-                "collection_name": "voxy_memories"
+                "collection_name": collection_alias,
+                "embedding_model_dims": embedding_dims
             }
         }
     }
 
+    # O layout particionado e a busca quantizada exigem o armazenamento vetorial com SQL direto
+    layout = os.getenv('MEMORY_STORE_LAYOUT', LAYOUT_DEFAULT)
+    if layout not in (LAYOUT_DEFAULT, LAYOUT_PARTITIONED):
+        raise ValueError(f"MEMORY_STORE_LAYOUT inválido: {layout}")
+
+    quantization = os.getenv('MEMORY_VECTOR_QUANTIZATION', QUANTIZATION_NONE)
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"MEMORY_VECTOR_QUANTIZATION inválido: {quantization}")
+
+    # A busca textual do modo lexical_first também usa o armazenamento com SQL direto
+    retrieval_mode = os.getenv('MEMORY_RETRIEVAL_MODE', RETRIEVAL_VECTOR)
+    if retrieval_mode not in RETRIEVAL_MODES:
+        raise ValueError(f"MEMORY_RETRIEVAL_MODE inválido: {retrieval_mode}")
     try:
+        int(os.getenv('MEMORY_LEXICAL_MIN_RESULTS', DEFAULT_LEXICAL_MIN_RESULTS))
+    except ValueError:
+        raise ValueError(f"MEMORY_LEXICAL_MIN_RESULTS inválido: {os.getenv('MEMORY_LEXICAL_MIN_RESULTS')}")
+    for gate, variable in ((RetrievalGate, 'MEMORY_RETRIEVAL_GATE_THRESHOLD'),
+                           (ExtractionGate, 'MEMORY_EXTRACTION_GATE_THRESHOLD')):
+        try:
+            gate.from_env()
+        except ValueError:
+            raise ValueError(f"{variable} inválido: {os.getenv(variable)}")
+    try:
+        ExtractionBuffer.from_env(save_memories)
+    except ValueError:
+        raise ValueError("MEMORY_EXTRACTION_WINDOW ou MEMORY_EXTRACTION_IDLE_SECONDS inválido: "
+                         f"{os.getenv('MEMORY_EXTRACTION_WINDOW')}, {os.getenv('MEMORY_EXTRACTION_IDLE_SECONDS')}")
+    if os.getenv('PROMPT_LAYOUT', PROMPT_LAYOUT_INLINE) not in PROMPT_LAYOUTS:
+        raise ValueError(f"PROMPT_LAYOUT inválido: {os.getenv('PROMPT_LAYOUT')}")
+    try:
+        TurnBudget.from_env()
+    except ValueError:
+        raise ValueError("TURN_DEADLINE_SECONDS, TURN_RETRIEVAL_BUDGET_SECONDS ou MEMORY_BREAKER_* inválido: "
+                         f"{os.getenv('TURN_DEADLINE_SECONDS')}, {os.getenv('TURN_RETRIEVAL_BUDGET_SECONDS')}, "
+                         f"{os.getenv('MEMORY_BREAKER_FAILURES')}, {os.getenv('MEMORY_BREAKER_RESET_SECONDS')}")
+    try:
+        ModelRouter.from_env()
+    except ValueError:
+        raise ValueError("MODEL_ROUTER_THRESHOLD ou MODEL_ROUTER_LATENCY_BUDGET inválido: "
+                         f"{os.getenv('MODEL_ROUTER_THRESHOLD')}, {os.getenv('MODEL_ROUTER_LATENCY_BUDGET')}")
+
+    if (layout == LAYOUT_PARTITIONED or quantization != QUANTIZATION_NONE
+            or retrieval_mode == RETRIEVAL_LEXICAL_FIRST):
+        register_vector_store(quantization, int(os.getenv('MEMORY_RERANK_FACTOR', DEFAULT_RERANK_FACTOR)))
+
+    try:
+        collection_name = active_collection(os.environ.get('DATABASE_URL'), collection_alias)
+        if collection_name != collection_alias:
+            logger.info(f"Coleção {collection_alias} redirecionada para {collection_name}")
+        config["vector_store"]["config"]["collection_name"] = collection_name
+
+        # Recusa iniciar se a coleção existente usar outro modelo ou dimensão
+        ensure_embedding_config(os.environ.get('DATABASE_URL'), collection_name, embedding_model, embedding_dims)
+
         openai_client = OpenAI()
         memory = Memory.from_config(config)
+        install_batcher(memory, embedding_model, embedding_dims, batch_size, batch_wait)
+
+        # Registra a configuração em coleções recém-criadas pelo mem0
+        ensure_embedding_config(os.environ.get('DATABASE_URL'), collection_name, embedding_model, embedding_dims)
         logger.info("Configuração da memória concluída com sucesso")
         return openai_client, memory
     except Exception as e:
@@ -137,7 +255,40 @@ def setup_memory():
 
         raise
 
-def chat_with_memories(message: str, user_id: str = "default_user", openai_client=None, memory=None) -> str:
+def save_memories(memory, messages, user_id: str) -> bool:
+    """
+    Envia a conversa ao mem0 para extração e armazenamento de memórias.
+
+    Args:
+        memory: Instância da camada de memória
+        messages: Mensagens da conversa
+        user_id: Identificador do usuário
+
+    Returns:
+        bool: True se novas memórias foram adicionadas
+
+    Raises:
+        Exception: O erro do `memory.add`, para que o buffer de extração mantenha os turnos
+    """
+    try:
+        add_result = memory.add(messages, user_id=user_id)
+    except Exception as add_error:
+        logger.error(f"Erro ao adicionar memória: {str(add_error)}")
+        print(f"\n{Fore.RED}⚠️ AVISO: Falha ao salvar memória: {str(add_error)}{Style.RESET_ALL}")
+        raise
+
+    # O mem0 informa o que fez com cada fato extraído (ADD, UPDATE, DELETE ou NONE): não é preciso
+    # contar as memórias do usuário antes e depois (duas buscas, cada uma com uma chamada de embeddings)
+    results = add_result.get("results", []) if isinstance(add_result, dict) else []
+    events = Counter(entry.get("event", "NONE") for entry in results if isinstance(entry, dict))
+    summary = ", ".join(f"{event}: {count}" for event, count in sorted(events.items())) or "nenhum fato extraído"
+    logger.info(f"Memória adicionada com sucesso ({summary})")
+    return events["ADD"] > 0
+
+@profiled
+def chat_with_memories(message: str, user_id: str = "default_user", openai_client=None, memory=None,
+                       buffer=None, on_token=None, model: Optional[str] = None, memory_limit: int = 5,
+                       router=None, budget=None, extraction_gate=None) -> str:
     """
     Processa uma mensagem do usuário usando a camada de memória.
 
@@ -146,6 +297,16 @@ def chat_with_memories(message: str, user_id: str = "default_user", openai_clien
         user_id: Identificador do usuário para personalização
         openai_client: Cliente da OpenAI
         memory: Instância da camada de memória
+        buffer: Buffer de extração em janelas (`ExtractionBuffer`); sem ele,
+            `memory.add` é chamado a cada mensagem
+        on_token: Função chamada com cada trecho da resposta; se fornecida,
+            a resposta é gerada em streaming
+        model: Modelo escolhido na sessão; sem ele, o roteador (se ativo) ou MODEL_CHOICE decide
+        memory_limit: Número máximo de memórias recuperadas
+        router: Roteador de modelos (`ModelRouter`)
+        budget: Prazo do turno (`TurnBudget`); se ativo, a busca de memórias é
+            limitada e, se falhar ou demorar, a resposta segue sem memórias
+        extraction_gate: Filtro de extração (padrão: `ExtractionGate.from_env()`)
 
     Returns:
         str: Resposta do assistente baseada na memória
@@ -162,69 +323,102 @@ def chat_with_memories(message: str, user_id: str = "default_user", openai_clien
         return "Erro: Sistema de memória não inicializado corretamente."
 
     try:
-        # Recupera memórias relevantes
-        relevant_memories = memory.search(query=message, user_id=user_id, limit=5)
+        turn_started = time.monotonic()
+        limited = budget is not None and budget.enabled
+
+        # Recupera memórias relevantes (busca textual primeiro, se configurada)
+        if limited:
+            relevant_memories = budget.retrieve(
+                user_id, lambda: retrieve_memories(memory, message, user_id, limit=memory_limit), memory_limit)
+        else:
+            relevant_memories = retrieve_memories(memory, message, user_id, limit=memory_limit)
         memories_str = "\n".join(f"- {entry['memory']}" for entry in relevant_memories["results"])
 
-        logger.info(f"Recuperadas {len(relevant_memories['results'])} memórias relevantes")
+        # Turnos ainda no buffer de extração continuam visíveis para o assistente
+        pending = buffer.pending_memories(user_id) if buffer is not None else []
+        if pending:
+            memories_str += "\nMensagens recentes do usuário (ainda não memorizadas):\n"
+            memories_str += "\n".join(f"- {text}" for text in pending)
 
-        # Gera resposta do assistente
-        system_prompt = (
-            "Você é um assistente útil e amigável da Voxy. "
-            "Responda à pergunta do usuário com base nas memórias disponíveis e na consulta atual.\n"
-            f"Memórias do Usuário:\n{memories_str}"
-        )
+        logger.info(f"Recuperadas {len(relevant_memories['results'])} memórias relevantes "
+                    f"(caminho: {relevant_memories['path']})")
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": message}
-        ]
+        # Gera resposta do assistente (no layout 'cached', o prefixo do prompt é fixo e aproveita o cache do provedor)
+        messages = build_messages(message, memories_str, os.getenv('PROMPT_LAYOUT', PROMPT_LAYOUT_INLINE))
+
+        # Modelo da sessão, do roteador (mensagens simples vão para o modelo rápido) ou do ambiente
+        if model is None:
+            if router is not None and router.enabled:
+                model = router.route(message)
+            else:
+                model = os.getenv('MODEL_CHOICE', 'gpt-4o-mini')
+
+        # A geração usa o tempo restante do prazo do turno
+        options = {"timeout": budget.generation_timeout(turn_started)} if limited else {}
 
         # Chamada para API da OpenAI com tratamento de erro melhorado
         try:
-            response = openai_client.chat.completions.create(
-                model=os.getenv('MODEL_CHOICE', 'gpt-4o-mini'),
-                messages=messages
-            )
-            assistant_response = response.choices[0].message.content
+            started = time.perf_counter()
+            if on_token is None:
+                response = openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **options
+                )
+                assistant_response = response.choices[0].message.content
+                record_usage(getattr(response, "usage", None))
+            else:
+                stream = openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=True,
+                    # O último trecho traz o uso de tokens (inclusive os atendidos pelo cache)
+                    stream_options={"include_usage": True},
+                    **options
+                )
+                parts = []
+                usage = None
+                for chunk in stream:
+                    usage = getattr(chunk, "usage", None) or usage
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        on_token(delta)
+                assistant_response = "".join(parts)
+                record_usage(usage)
+            if router is not None:
+                router.record(model, time.perf_counter() - started)
+        except APITimeoutError as timeout_error:
+            metrics.increment("budget.generation_timeouts")
+            logger.error(f"Resposta da OpenAI excedeu o prazo do turno: {str(timeout_error)}")
+            return "Desculpe, a resposta demorou mais que o esperado. Tente novamente em instantes."
         except Exception as api_error:
             logger.error(f"Erro na API OpenAI: {str(api_error)}")
             return f"Erro na comunicação com a OpenAI: {str(api_error)}"
 
-        # Cria novas memórias a partir da conversa
+        # Cria novas memórias a partir da conversa (sem as instruções fixas)
+        messages = conversation_messages(messages)
         messages.append({"role": "assistant", "content": assistant_response})
 
-        # Conta as memórias existentes antes de adicionar novas
-        try:
-            # Usa uma string não vazia para evitar erro na API de embeddings
-            existing_memories_count = len(memory.search(query="consulta", user_id=user_id, limit=100)["results"])
-            logger.info(f"Total existing memories: {existing_memories_count}")
-        except Exception as search_error:
-            logger.warning(f"Erro ao contar memórias existentes: {str(search_error)}")
-            existing_memories_count = 0
-
-        # Adiciona a nova memória
-        try:
-            add_result = memory.add(messages, user_id=user_id)
-            logger.info(f"Memória adicionada com sucesso: {add_result}")
-        except Exception as add_error:
-            logger.error(f"Erro ao adicionar memória: {str(add_error)}")
-            print(f"\n{Fore.RED}⚠️ AVISO: Falha ao salvar memória: {str(add_error)}{Style.RESET_ALL}")
-
-        # Verifica se novas memórias foram adicionadas
-        try:
-            # Usa uma string não vazia para evitar erro na API de embeddings
-            new_memories_count = len(memory.search(query="consulta", user_id=user_id, limit=100)["results"])
-            new_memories_added = new_memories_count > existing_memories_count
-        except Exception as verify_error:
-            logger.warning(f"Erro ao verificar novas memórias: {str(verify_error)}")
-            new_memories_added = True
+        # Dispensa a extração de fatos (chamada ao LLM do mem0) em mensagens sem fatos novos
+        extraction_gate = extraction_gate or ExtractionGate.from_env()
+        if not extraction_gate.should_extract(message, messages):
+            logger.info("Extração de memórias dispensada: mensagem sem fatos novos")
+            new_memories_added = False
+        elif buffer is None:
+            try:
+                new_memories_added = save_memories(memory, messages, user_id)
+            except Exception:
+                # A falha já foi registrada; a resposta ao usuário não depende dela
+                new_memories_added = False
+        else:
+            # A extração só é feita quando a janela do usuário fica completa
+            new_memories_added = bool(buffer.add_turn(user_id, message, assistant_response))
 
         logger.info("Processamento de memórias concluído")
 
-        # Inicializa o colorama para suporte a cores no terminal
-        colorama.init()
-
+        # O colorama é inicializado uma única vez em main(): cada init() envolve o sys.stdout atual
+        # de novo, e chamá-lo a cada turno acumulava camadas (memória e tempo crescentes por print)
         # Adiciona confirmação explícita no console com detalhes e cores
         timestamp = datetime.now().strftime("%H:%M:%S")
         user_message = message[:30] + "..." if len(message) > 30 else message
@@ -233,26 +427,71 @@ def chat_with_memories(message: str, user_id: str = "default_user", openai_clien
         separator = f"{Fore.CYAN}{'─' * 50}{Style.RESET_ALL}"
 
         if new_memories_added:
-            print(separator)
-            print(f"{Fore.GREEN}💾 [{timestamp}] Nova memória adicionada ao Supabase:{Style.RESET_ALL}")
-            print(f"{Fore.YELLOW}   • Usuário:{Style.RESET_ALL} {user_id}")
-            print(f"{Fore.YELLOW}   • Conteúdo:{Style.RESET_ALL} \"{user_message}\"")
-            print(f"{Fore.YELLOW}   • Coleção:{Style.RESET_ALL} voxy_memories")
-            print(f"{Fore.YELLOW}   • Status:{Style.RESET_ALL} {Fore.GREEN}✅ Sucesso{Style.RESET_ALL}")
-            print(separator)
+            lines = [
+                f"{Fore.GREEN}💾 [{timestamp}] Nova memória adicionada ao Supabase:{Style.RESET_ALL}",
+                f"{Fore.YELLOW}   • Usuário:{Style.RESET_ALL} {user_id}",
+                f"{Fore.YELLOW}   • Conteúdo:{Style.RESET_ALL} \"{user_message}\"",
+                f"{Fore.YELLOW}   • Coleção:{Style.RESET_ALL} voxy_memories",
+                f"{Fore.YELLOW}   • Status:{Style.RESET_ALL} {Fore.GREEN}✅ Sucesso{Style.RESET_ALL}",
+            ]
         else:
-            print(separator)
-            print(f"{Fore.BLUE}🔄 [{timestamp}] Memória existente utilizada (sem nova adição):{Style.RESET_ALL}")
-            print(f"{Fore.YELLOW}   • Usuário:{Style.RESET_ALL} {user_id}")
-            print(f"{Fore.YELLOW}   • Consulta:{Style.RESET_ALL} \"{user_message}\"")
-            print(f"{Fore.YELLOW}   • Memórias recuperadas:{Style.RESET_ALL} {len(relevant_memories['results'])}")
-            print(separator)
+            lines = [
+                f"{Fore.BLUE}🔄 [{timestamp}] Memória existente utilizada (sem nova adição):{Style.RESET_ALL}",
+                f"{Fore.YELLOW}   • Usuário:{Style.RESET_ALL} {user_id}",
+                f"{Fore.YELLOW}   • Consulta:{Style.RESET_ALL} \"{user_message}\"",
+                f"{Fore.YELLOW}   • Memórias recuperadas:{Style.RESET_ALL} {len(relevant_memories['results'])}",
+            ]
+        # Um único print sob o lock: turnos simultâneos (sessões da interface web) não intercalam
+        # as linhas, e escritas concorrentes no mesmo stream não retêm memória a cada turno
+        with _console_lock:
+            print("\n".join([separator, *lines, separator]))
 
         return assistant_response
     except Exception as e:
         logger.error(f"Erro ao processar mensagem: {str(e)}")
         return f"Desculpe, ocorreu um erro ao processar sua mensagem: {str(e)}"
 
+def display_session_stats():
+    """Exibe os caminhos de recuperação e as extrações de memórias dispensadas na sessão"""
+    report = retrieval_report()
+    if not any(entry["count"] for entry in report.values()):
+        return
+
+    print(f"{Fore.CYAN}📊 Recuperação de memórias nesta sessão:{Style.RESET_ALL}")
+    for path, entry in report.items():
+        print(f"{Fore.YELLOW}   • {path}:{Style.RESET_ALL} {entry['count']:.0f} ({entry['share']:.0%})")
+
+    extraction = extraction_report()
+    print(f"{Fore.CYAN}📊 Extração de memórias:{Style.RESET_ALL} "
+          f"{extraction['skipped']:.0f} de {extraction['skipped'] + extraction['performed']:.0f} dispensadas "
+          f"({extraction['skip_rate']:.0%}), ~{extraction['tokens_saved']:.0f} tokens economizados")
+
+    routing = router_report()
+    if routing["fast"] + routing["large"]:
+        print(f"{Fore.CYAN}📊 Roteamento de modelos:{Style.RESET_ALL} "
+              f"{routing['fast']:.0f} mensagens no modelo rápido ({routing['fast_share']:.0%}), "
+              f"{routing['large']:.0f} no modelo maior, ~{routing['saved_seconds']:.1f}s economizados")
+
+    degraded = degraded_report()
+    if degraded["turns"]:
+        print(f"{Fore.CYAN}📊 Prazo por turno:{Style.RESET_ALL} "
+              f"{degraded['degraded']:.0f} de {degraded['turns']:.0f} turnos sem a busca de memórias "
+              f"({degraded['degraded_share']:.0%}; {degraded['timeouts']:.0f} por tempo, "
+              f"{degraded['skipped']:.0f} com o disjuntor aberto)")
+
+    batching = embedding_batch_report()
+    if batching["requests"]:
+        histogram = ", ".join(f"{size}: {count:.0f}" for size, count in batching["histogram"].items())
+        print(f"{Fore.CYAN}📊 Lotes de embeddings:{Style.RESET_ALL} "
+              f"{batching['inputs']:.0f} textos em {batching['requests']:.0f} requisições "
+              f"(média {batching['average_batch']:.1f}; tamanhos {histogram})")
+
+    cache = prompt_cache_report()
+    if cache["requests"]:
+        print(f"{Fore.CYAN}📊 Cache de prompt:{Style.RESET_ALL} "
+              f"{cache['cached_tokens']:.0f} de {cache['prompt_tokens']:.0f} tokens de entrada em cache "
+              f"({cache['cached_share']:.0%}), {cache['hit_rate']:.0%} das chamadas com acerto")
+
 def main():
     """Função principal para executar o assistente em modo CLI"""
     # Inicializa o colorama para suporte a cores no terminal
@@ -260,6 +499,7 @@ def main():
 
     display_banner()
 
+    buffer = None
     try:
         # Verifica se o script de configuração já foi executado
         supabase_setup_path = os.path.join("utils", "setup_supabase.py")
@@ -270,6 +510,13 @@ def main():
         # Inicializa os componentes
         openai_client, memory = setup_memory()
 
+        # Acumula os turnos e chama memory.add uma vez por janela
+        buffer = ExtractionBuffer.from_env(lambda messages, uid: save_memories(memory, messages, uid))
+        buffer.start()
+        router = ModelRouter.from_env()
+        budget = TurnBudget.from_env()
+        extraction_gate = ExtractionGate.from_env()
+
         user_id = input(f"{Fore.CYAN}👤 Digite seu ID de usuário (ou deixe em branco para 'default_user'):{Style.RESET_ALL} ").strip()
         if not user_id:
             user_id = "default_user"
@@ -284,6 +531,7 @@ def main():
                 continue
 
             if user_input.lower() in ['sair', 'exit', 'quit', 'q']:
+                display_session_stats()
                 print(f"{Fore.CYAN}👋 Até logo!{Style.RESET_ALL}")
                 break
 
@@ -292,7 +540,11 @@ def main():
                 message=user_input,
                 user_id=user_id,
                 openai_client=openai_client,
-                memory=memory
+                memory=memory,
+                buffer=buffer,
+                router=router,
+                budget=budget,
+                extraction_gate=extraction_gate
             )
 
             print(" " * 40, end="\r")  # Limpa a linha do "pensando"
@@ -305,7 +557,9 @@ def main():
         print(f"{Fore.YELLOW}🔧 Por favor, configure as variáveis de ambiente conforme o .env.example{Style.RESET_ALL}")
         print(f"{Fore.RED}{'═' * 60}{Style.RESET_ALL}")
     except KeyboardInterrupt:
-        print(f"\n\n{Fore.CYAN}👋 Sessão encerrada pelo usuário.{Style.RESET_ALL}")
+        print()
+        display_session_stats()
+        print(f"\n{Fore.CYAN}👋 Sessão encerrada pelo usuário.{Style.RESET_ALL}")
     except Exception as e:
         logger.error(f"Erro na execução principal: {str(e)}")
         error_box = f"{Fore.RED}{'═' * 60}\n❌ ERRO CRÍTICO\n{'═' * 60}{Style.RESET_ALL}"
@@ -314,6 +568,10 @@ def main():
         print(f"{Fore.YELLOW}📋 Verifique os logs para mais detalhes.{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}🔧 Dica: Execute 'python utils/setup_supabase.py' para diagnosticar problemas de conexão.{Style.RESET_ALL}")
         print(f"{Fore.RED}{'═' * 60}{Style.RESET_ALL}")
+    finally:
+        # Salva os turnos que ainda estão no buffer ao encerrar a sessão
+        if buffer is not None:
+            buffer.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,288 @@
+"""
+Orçamento de latência por turno e modo degradado sem memórias.
+
+Quando o armazenamento de memórias (Supabase) fica lento, a busca de
+memórias não pode travar a resposta. Com TURN_DEADLINE_SECONDS definido,
+cada turno tem um prazo total, dividido em:
+
+- busca de memórias: no máximo TURN_RETRIEVAL_BUDGET_SECONDS. Se a busca
+  falhar ou não terminar a tempo, a resposta segue sem memórias (ou com as
+  últimas memórias recuperadas para o usuário, guardadas em um cache
+  local) e o turno é registrado como degradado;
+- geração da resposta: o tempo restante do prazo, usado como timeout da
+  chamada ao modelo de chat.
+
+Um disjuntor (circuit breaker) acompanha as falhas da busca: após
+MEMORY_BREAKER_FAILURES falhas seguidas, a busca deixa de ser tentada por
+MEMORY_BREAKER_RESET_SECONDS segundos; depois disso, uma única busca de
+teste decide se o armazenamento voltou ao normal.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional
+
+from voxy_metrics import metrics
+from voxy_retrieval import PATH_SKIPPED
+
+logger = logging.getLogger("voxy-agent.budget")
+
+# Caminho de recuperação dos turnos degradados
+PATH_DEGRADED = "degraded"
+
+# Prazo total do turno em segundos (0 desativa o orçamento)
+DEFAULT_TURN_DEADLINE = 0.0
+
+# Tempo máximo da busca de memórias
+DEFAULT_RETRIEVAL_BUDGET = 1.0
+
+# Tempo mínimo concedido à geração, mesmo com o prazo esgotado
+MIN_GENERATION_SECONDS = 1.0
+
+# Disjuntor: falhas seguidas até abrir e segundos aberto antes de testar de novo
+DEFAULT_BREAKER_FAILURES = 3
+DEFAULT_BREAKER_RESET_SECONDS = 30.0
+
+# Usuários com memórias guardadas no cache local
+DEFAULT_CACHE_USERS = 1024
+
+# Buscas de memórias simultâneas executadas com prazo
+RETRIEVAL_WORKERS = 8
+
+# Estados do disjuntor
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Disjuntor que suspende as chamadas a um serviço após falhas seguidas."""
+
+    def __init__(self, failure_threshold: int = DEFAULT_BREAKER_FAILURES,
+                 reset_timeout: float = DEFAULT_BREAKER_RESET_SECONDS, clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o disjuntor fechado.
+
+        Args:
+            failure_threshold: Falhas seguidas que abrem o disjuntor
+            reset_timeout: Segundos aberto antes de permitir uma chamada de teste
+            clock: Relógio monotônico (substituível nos testes)
+
+        Raises:
+            ValueError: Se os parâmetros forem inválidos
+        """
+        if failure_threshold < 1 or reset_timeout <= 0:
+            raise ValueError("Parâmetros do disjuntor inválidos")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = BREAKER_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        """Estado atual: 'closed', 'open' ou 'half_open'."""
+        with self._lock:
+            if self._state == BREAKER_OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return BREAKER_HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Indica se a chamada pode ser feita.
+
+        Com o disjuntor aberto, apenas uma chamada de teste é permitida
+        após `reset_timeout`.
+        """
+        with self._lock:
+            if self._state == BREAKER_OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = BREAKER_HALF_OPEN
+            if self._state == BREAKER_CLOSED:
+                return True
+            if self._state == BREAKER_HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        """Registra uma chamada bem-sucedida e fecha o disjuntor."""
+        with self._lock:
+            if self._state != BREAKER_CLOSED:
+                logger.info("Disjuntor da busca de memórias fechado: armazenamento respondendo novamente")
+            self._state = BREAKER_CLOSED
+            self._failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        """Registra uma falha, abrindo o disjuntor ao atingir o limite (ou se a chamada de teste falhar)."""
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != BREAKER_OPEN:
+                    metrics.increment("budget.breaker_opened")
+                    logger.warning(f"Disjuntor da busca de memórias aberto por {self.reset_timeout:.0f}s "
+                                   f"após {self._failures} falha(s)")
+                self._state = BREAKER_OPEN
+                self._opened_at = self.clock()
+
+
+class TurnBudget:
+    """Prazo por turno, com busca de memórias limitada e resposta degradada sem memórias."""
+
+    def __init__(self, deadline: float = DEFAULT_TURN_DEADLINE, retrieval_budget: float = DEFAULT_RETRIEVAL_BUDGET,
+                 breaker: Optional[CircuitBreaker] = None, cache_users: int = DEFAULT_CACHE_USERS):
+        """
+        Inicializa o orçamento.
+
+        Args:
+            deadline: Prazo total do turno em segundos (0 desativa)
+            retrieval_budget: Tempo máximo da busca de memórias
+            breaker: Disjuntor da busca (padrão: um novo `CircuitBreaker`)
+            cache_users: Usuários com memórias guardadas no cache local
+
+        Raises:
+            ValueError: Se o prazo ou o orçamento da busca forem inválidos
+        """
+        if deadline < 0 or retrieval_budget <= 0 or (deadline and retrieval_budget >= deadline):
+            raise ValueError("Prazo do turno ou orçamento da busca de memórias inválido")
+        self.deadline = deadline
+        self.retrieval_budget = retrieval_budget
+        self.breaker = breaker or CircuitBreaker()
+        self.cache_users = cache_users
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        # Geração do cache de cada usuário, incrementada por `forget`
+        self._generations: Dict[str, int] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "TurnBudget":
+        """Cria o orçamento a partir de TURN_DEADLINE_SECONDS, TURN_RETRIEVAL_BUDGET_SECONDS e MEMORY_BREAKER_*."""
+        breaker = CircuitBreaker(int(os.getenv('MEMORY_BREAKER_FAILURES', DEFAULT_BREAKER_FAILURES)),
+                                 float(os.getenv('MEMORY_BREAKER_RESET_SECONDS', DEFAULT_BREAKER_RESET_SECONDS)))
+        return cls(float(os.getenv('TURN_DEADLINE_SECONDS', DEFAULT_TURN_DEADLINE)),
+                   float(os.getenv('TURN_RETRIEVAL_BUDGET_SECONDS', DEFAULT_RETRIEVAL_BUDGET)), breaker)
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se o prazo por turno está ativo."""
+        return self.deadline > 0
+
+    def retrieve(self, user_id: str, fetch: Callable[[], Dict], limit: int) -> Dict:
+        """
+        Executa a busca de memórias dentro do orçamento.
+
+        Args:
+            user_id: Identificador do usuário
+            fetch: Função que faz a busca (ex.: `retrieve_memories` com os argumentos do turno)
+            limit: Número máximo de memórias
+
+        Returns:
+            dict: Resultado da busca ou, em modo degradado, {'results': memórias do
+                cache local (ou nenhuma), 'path': 'degraded', 'degraded': motivo}
+        """
+        metrics.increment("budget.turns")
+        if not self.breaker.allow():
+            metrics.increment("budget.skipped")
+            return self._fallback(user_id, limit, "disjuntor aberto")
+
+        with self._lock:
+            generation = self._generations.get(user_id, 0)
+        future = self._pool().submit(fetch)
+        # Resultados que chegam depois do prazo ainda atualizam o cache (se não houve `forget` no meio)
+        future.add_done_callback(lambda done: self._remember(user_id, done, generation))
+        try:
+            result = future.result(timeout=self.retrieval_budget)
+        except FutureTimeout:
+            self.breaker.record_failure()
+            metrics.increment("budget.timeouts")
+            return self._fallback(user_id, limit, f"busca excedeu {self.retrieval_budget:.1f}s")
+        except Exception as e:
+            self.breaker.record_failure()
+            metrics.increment("budget.errors")
+            return self._fallback(user_id, limit, f"erro na busca: {str(e)}")
+        self.breaker.record_success()
+        return result
+
+    def generation_timeout(self, started: float) -> float:
+        """
+        Retorna o tempo restante do prazo para gerar a resposta.
+
+        Args:
+            started: Início do turno (`time.monotonic()`)
+
+        Returns:
+            float: Segundos para a chamada ao modelo (no mínimo MIN_GENERATION_SECONDS)
+        """
+        return max(MIN_GENERATION_SECONDS, self.deadline - (time.monotonic() - started))
+
+    def forget(self, user_id: str):
+        """
+        Descarta as memórias do usuário guardadas no cache local (ex.: após apagá-las).
+
+        Buscas iniciadas antes do descarte e concluídas depois dele não voltam
+        a preencher o cache.
+        """
+        with self._lock:
+            self._cache.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def close(self):
+        """Libera as threads da busca, sem aguardar buscas travadas."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        """Retorna o executor das buscas, criando-o na primeira chamada."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(RETRIEVAL_WORKERS, thread_name_prefix="voxy-retrieval")
+            return self._executor
+
+    def _remember(self, user_id: str, future: Future, generation: int = 0):
+        """Guarda no cache local o resultado de uma busca concluída na geração atual do usuário."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if result.get("path") == PATH_SKIPPED:
+            return
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                return
+            self._cache[user_id] = result["results"]
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_users:
+                self._cache.popitem(last=False)
+
+    def _fallback(self, user_id: str, limit: int, reason: str) -> Dict:
+        """Monta o resultado degradado a partir do cache local."""
+        with self._lock:
+            cached = list(self._cache.get(user_id, []))[:limit]
+        metrics.increment("budget.degraded")
+        if cached:
+            metrics.increment("budget.cache_fallbacks")
+        logger.warning(f"Turno degradado para {user_id} ({reason}): respondendo com "
+                       f"{len(cached)} memória(s) do cache local")
+        return {"results": cached, "path": PATH_DEGRADED, "degraded": reason}
+
+
+def degraded_report() -> Dict[str, float]:
+    """
+    Resume os turnos com prazo e os degradados.
+
+    Returns:
+        dict: 'turns', 'degraded', 'timeouts', 'errors', 'skipped' (disjuntor aberto),
+            'cache_fallbacks', 'generation_timeouts', 'breaker_opened' e 'degraded_share'
+    """
+    turns = metrics.get("budget.turns")
+    degraded = metrics.get("budget.degraded")
+    report = {name: metrics.get(f"budget.{name}") for name in (
+        "timeouts", "errors", "skipped", "cache_fallbacks", "generation_timeouts", "breaker_opened")}
+    return {"turns": turns, "degraded": degraded, **report, "degraded_share": degraded / turns if turns else 0.0}
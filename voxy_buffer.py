@@ -0,0 +1,236 @@
+"""
+Extração de memórias em janelas de conversa.
+
+Em vez de chamar `memory.add` (e o LLM de extração de fatos do mem0) a
+cada mensagem, as trocas de cada usuário são acumuladas em um buffer e
+enviadas de uma só vez quando a janela atinge N turnos, quando o usuário
+fica inativo por um tempo ou quando a sessão termina. Enquanto não são
+salvos, os turnos pendentes continuam disponíveis para o prompt por meio
+de `pending_memories`.
+
+Se o envio falhar (a função de envio levanta uma exceção), os turnos
+voltam para o buffer e são reenviados no próximo envio do usuário.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from voxy_metrics import metrics
+
+logger = logging.getLogger("voxy-agent.buffer")
+
+# Turnos acumulados antes de chamar memory.add (1 = a cada mensagem)
+DEFAULT_EXTRACTION_WINDOW = 1
+
+# Segundos de inatividade após os quais os turnos pendentes são salvos
+DEFAULT_EXTRACTION_IDLE_SECONDS = 120.0
+
+# Janelas mantidas por usuário enquanto os envios falham (as mais antigas são descartadas além disso)
+MAX_PENDING_WINDOWS = 4
+
+class ExtractionBuffer:
+    """
+    Buffer de turnos pendentes de extração, separado por usuário e seguro entre threads.
+
+    Cada turno é um par de mensagens (usuário e assistente). A função
+    `save(messages, user_id) -> bool` recebe todos os turnos pendentes do
+    usuário em uma única lista e retorna se novas memórias foram criadas;
+    em caso de falha, ela deve levantar uma exceção para que os turnos
+    sejam mantidos e reenviados.
+    """
+
+    def __init__(self, save: Callable[[List[Dict], str], bool], window: int = DEFAULT_EXTRACTION_WINDOW,
+                 idle_timeout: float = DEFAULT_EXTRACTION_IDLE_SECONDS, clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o buffer.
+
+        Args:
+            save: Função que envia as mensagens ao mem0
+            window: Turnos acumulados antes do envio
+            idle_timeout: Segundos de inatividade antes do envio
+            clock: Relógio monotônico (substituível nos testes)
+
+        Raises:
+            ValueError: Se a janela ou o tempo de inatividade forem inválidos
+        """
+        if window < 1:
+            raise ValueError(f"Janela de extração inválida: {window}")
+        if idle_timeout <= 0:
+            raise ValueError(f"Tempo de inatividade inválido: {idle_timeout}")
+        self.save = save
+        self.window = window
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._turns: Dict[str, List[List[Dict]]] = {}
+        self._last_activity: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, save: Callable[[List[Dict], str], bool]) -> "ExtractionBuffer":
+        """Cria o buffer a partir de MEMORY_EXTRACTION_WINDOW e MEMORY_EXTRACTION_IDLE_SECONDS."""
+        window = int(os.getenv('MEMORY_EXTRACTION_WINDOW', DEFAULT_EXTRACTION_WINDOW))
+        idle_timeout = float(os.getenv('MEMORY_EXTRACTION_IDLE_SECONDS', DEFAULT_EXTRACTION_IDLE_SECONDS))
+        return cls(save, window, idle_timeout)
+
+    def add_turn(self, user_id: str, user_message: str, assistant_message: str) -> Optional[bool]:
+        """
+        Acumula um turno e salva a janela do usuário quando ela fica completa.
+
+        Args:
+            user_id: Identificador do usuário
+            user_message: Mensagem do usuário
+            assistant_message: Resposta do assistente
+
+        Returns:
+            bool: Resultado de `save` se a janela foi enviada, ou None se o turno ficou pendente
+        """
+        turn = [{"role": "user", "content": user_message}, {"role": "assistant", "content": assistant_message}]
+        with self._lock:
+            turns = self._turns.setdefault(user_id, [])
+            turns.append(turn)
+            self._last_activity[user_id] = self.clock()
+            full = len(turns) >= self.window
+        metrics.increment("extraction.buffer.turns")
+        if full:
+            return self.flush(user_id, reason="janela")
+        return None
+
+    def pending(self, user_id: str) -> List[Dict]:
+        """Retorna as mensagens pendentes do usuário, em ordem."""
+        with self._lock:
+            return [message for turn in self._turns.get(user_id, []) for message in turn]
+
+    def pending_memories(self, user_id: str) -> List[str]:
+        """
+        Retorna as mensagens do usuário ainda não enviadas ao mem0.
+
+        Returns:
+            list: Textos que podem ser incluídos no prompt junto com as memórias recuperadas
+        """
+        return [message["content"] for message in self.pending(user_id) if message["role"] == "user"]
+
+    def flush(self, user_id: str, reason: str = "manual") -> bool:
+        """
+        Envia ao mem0 todos os turnos pendentes do usuário.
+
+        Args:
+            user_id: Identificador do usuário
+            reason: Motivo do envio, registrado no log
+
+        Returns:
+            bool: True se novas memórias foram adicionadas (False também se o envio falhar;
+                nesse caso, os turnos voltam para o buffer)
+        """
+        with self._lock:
+            turns = self._turns.pop(user_id, [])
+            self._last_activity.pop(user_id, None)
+        if not turns:
+            return False
+
+        logger.info(f"Enviando {len(turns)} turno(s) pendente(s) de {user_id} ao mem0 ({reason})")
+        metrics.increment("extraction.buffer.flushes")
+        try:
+            return self.save([message for turn in turns for message in turn], user_id)
+        except Exception as e:
+            metrics.increment("extraction.buffer.failures")
+            logger.warning(f"Falha ao enviar os turnos de {user_id}; mantidos para um novo envio: {str(e)}")
+            self._requeue(user_id, turns)
+            return False
+
+    def _requeue(self, user_id: str, turns: List[List[Dict]]):
+        """Devolve ao buffer, antes dos turnos mais recentes, os turnos de um envio que falhou."""
+        limit = self.window * MAX_PENDING_WINDOWS
+        with self._lock:
+            pending = turns + self._turns.get(user_id, [])
+            dropped = max(0, len(pending) - limit)
+            self._turns[user_id] = pending[dropped:]
+            self._last_activity.setdefault(user_id, self.clock())
+        if dropped:
+            metrics.increment("extraction.buffer.dropped", dropped)
+            logger.error(f"{dropped} turno(s) antigo(s) de {user_id} descartado(s) após falhas seguidas no envio")
+
+    def discard(self, user_id: str) -> int:
+        """
+        Descarta os turnos pendentes do usuário sem enviá-los ao mem0.
+
+        Args:
+            user_id: Identificador do usuário
+
+        Returns:
+            int: Número de turnos descartados
+        """
+        with self._lock:
+            turns = self._turns.pop(user_id, [])
+            self._last_activity.pop(user_id, None)
+        return len(turns)
+
+    def flush_idle(self, flush: Optional[Callable[[str, str], bool]] = None) -> Dict[str, bool]:
+        """
+        Envia os turnos dos usuários inativos há mais de `idle_timeout` segundos.
+
+        Args:
+            flush: Função `flush(user_id, reason)` usada no envio (padrão: `self.flush`);
+                permite ao chamador envolver o envio com o seu próprio lock por usuário
+
+        Returns:
+            dict: Usuário → resultado do envio
+        """
+        flush = flush or self.flush
+        now = self.clock()
+        with self._lock:
+            idle = [user_id for user_id, last in self._last_activity.items() if now - last >= self.idle_timeout]
+        return {user_id: flush(user_id, "inatividade") for user_id in idle}
+
+    def flush_all(self, flush: Optional[Callable[[str, str], bool]] = None) -> Dict[str, bool]:
+        """
+        Envia os turnos pendentes de todos os usuários (fim de sessão).
+
+        Args:
+            flush: Função `flush(user_id, reason)` usada no envio (padrão: `self.flush`)
+
+        Returns:
+            dict: Usuário → resultado do envio
+        """
+        flush = flush or self.flush
+        with self._lock:
+            users = list(self._turns)
+        return {user_id: flush(user_id, "fim da sessão") for user_id in users}
+
+    def start(self, interval: Optional[float] = None, flush: Optional[Callable[[str, str], bool]] = None):
+        """
+        Inicia a verificação periódica de inatividade em uma thread de fundo.
+
+        Args:
+            interval: Segundos entre verificações (padrão: um quarto do tempo de inatividade)
+            flush: Função `flush(user_id, reason)` usada no envio (padrão: `self.flush`)
+        """
+        if self._thread is not None or self.window == 1:
+            return
+        interval = interval or max(1.0, self.idle_timeout / 4)
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.flush_idle(flush)
+                except Exception as e:
+                    logger.error(f"Erro ao salvar turnos pendentes: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="voxy-extraction-buffer", daemon=True)
+        self._thread.start()
+
+    def close(self, flush: Optional[Callable[[str, str], bool]] = None) -> Dict[str, bool]:
+        """
+        Interrompe a thread de fundo e envia todos os turnos pendentes.
+
+        Args:
+            flush: Função `flush(user_id, reason)` usada no envio (padrão: `self.flush`)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        return self.flush_all(flush)
@@ -0,0 +1,241 @@
+"""
+Agrupamento de chamadas de embeddings (micro-batching).
+
+O mem0 calcula um embedding por chamada de `embed`, e cada chamada vira
+uma requisição à API de embeddings com uma única entrada. Com várias
+sessões ativas, as chamadas simultâneas são reunidas por alguns
+milissegundos (ou até o tamanho máximo do lote) e enviadas em uma única
+requisição, que aceita uma lista de textos; cada chamada recebe de volta o
+seu vetor. Isso reduz o número de requisições (e o consumo do limite de
+requisições por minuto) nos horários de pico.
+
+A primeira chamada sem lote em formação torna-se a líder: aguarda as
+demais, envia o lote e distribui os resultados. Lotes diferentes podem
+estar em andamento ao mesmo tempo. Os tamanhos dos lotes enviados são
+registrados em um histograma nas métricas compartilhadas.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from voxy_metrics import metrics
+
+logger = logging.getLogger("voxy-agent.embeddings")
+
+# Textos por requisição (1 = sem agrupamento)
+DEFAULT_EMBEDDING_BATCH_SIZE = 1
+
+# Milissegundos de espera por outras chamadas antes de enviar o lote
+DEFAULT_EMBEDDING_BATCH_WAIT_MS = 5.0
+
+# Limite de entradas por requisição da API de embeddings da OpenAI
+MAX_EMBEDDING_BATCH_SIZE = 2048
+
+# Faixas do histograma de tamanhos de lote (limite superior de cada faixa)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# Função que calcula os embeddings de uma lista de textos, na mesma ordem
+BatchFunction = Callable[[List[str]], List[List[float]]]
+
+def batch_size_bucket(size: int) -> str:
+    """Retorna a faixa do histograma de um tamanho de lote (ex.: '3-4', '65+')."""
+    lower = 1
+    for upper in BATCH_SIZE_BUCKETS:
+        if size <= upper:
+            return str(upper) if lower == upper else f"{lower}-{upper}"
+        lower = upper + 1
+    return f"{lower}+"
+
+class _Request:
+    """Chamada de `embed` aguardando o resultado do lote."""
+
+    __slots__ = ("text", "taken", "done", "result", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.taken = False
+        self.done = threading.Event()
+        self.result: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+class EmbeddingBatcher:
+    """Reúne chamadas simultâneas de embeddings em requisições com vários textos."""
+
+    def __init__(self, embed_batch: BatchFunction, max_batch: int = 16,
+                 max_wait: float = DEFAULT_EMBEDDING_BATCH_WAIT_MS / 1000):
+        """
+        Inicializa o agrupador.
+
+        Args:
+            embed_batch: Função que calcula os embeddings de uma lista de textos
+            max_batch: Textos por requisição
+            max_wait: Segundos de espera por outras chamadas antes do envio
+
+        Raises:
+            ValueError: Se o tamanho do lote ou a espera forem inválidos
+        """
+        if not 1 <= max_batch <= MAX_EMBEDDING_BATCH_SIZE:
+            raise ValueError(f"Tamanho de lote de embeddings inválido: {max_batch}")
+        if max_wait < 0:
+            raise ValueError(f"Espera do lote de embeddings inválida: {max_wait}")
+        self.embed_batch = embed_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._queue: List[_Request] = []
+        self._collecting = False
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Calcula o embedding de um texto, agrupado com as chamadas simultâneas.
+
+        Args:
+            text: Texto
+
+        Returns:
+            list: Vetor do texto
+
+        Raises:
+            Exception: O erro da requisição do lote, se ela falhar
+        """
+        request = _Request(text)
+        with self._condition:
+            self._queue.append(request)
+            self._condition.notify_all()
+        while True:
+            with self._condition:
+                while not request.taken and self._collecting:
+                    self._condition.wait()
+                if request.taken:
+                    break
+                batch = self._collect()
+            self._send(batch)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self) -> List[_Request]:
+        """Aguarda outras chamadas e retira o próximo lote da fila (chamada com o lock)."""
+        self._collecting = True
+        try:
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            for request in batch:
+                request.taken = True
+            return batch
+        finally:
+            self._collecting = False
+            self._condition.notify_all()
+
+    def _send(self, batch: List[_Request]):
+        """Envia um lote e entrega os vetores (ou o erro) a cada chamada."""
+        metrics.increment("embeddings.requests")
+        metrics.increment("embeddings.inputs", len(batch))
+        metrics.increment(f"embeddings.batch_size.{batch_size_bucket(len(batch))}")
+        try:
+            vectors = self.embed_batch([request.text for request in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"A API retornou {len(vectors)} embeddings para {len(batch)} textos")
+            for request, vector in zip(batch, vectors):
+                request.result = vector
+        except Exception as e:
+            logger.error(f"Erro ao calcular embeddings de um lote com {len(batch)} textos: {str(e)}")
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+
+
+def openai_batch_function(client, model: str, dims: int) -> BatchFunction:
+    """
+    Cria a função de lote sobre a API de embeddings da OpenAI.
+
+    Args:
+        client: Cliente OpenAI
+        model: Modelo de embeddings
+        dims: Dimensão dos vetores (enviada apenas aos modelos text-embedding-3)
+
+    Returns:
+        function: Função que calcula os embeddings de uma lista de textos
+    """
+    options = {"model": model, "encoding_format": "float"}
+    if model.startswith("text-embedding-3"):
+        options["dimensions"] = dims
+
+    def embed_batch(texts: List[str]) -> List[List[float]]:
+        # Mesma normalização do embedder do mem0
+        response = client.embeddings.create(input=[text.replace("\n", " ") for text in texts], **options)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    return embed_batch
+
+def batch_options_from_env() -> Tuple[int, float]:
+    """
+    Lê EMBEDDING_BATCH_SIZE e EMBEDDING_BATCH_WAIT_MS.
+
+    Returns:
+        tuple: (textos por requisição, segundos de espera)
+
+    Raises:
+        ValueError: Se algum dos valores for inválido
+    """
+    try:
+        max_batch = int(os.getenv('EMBEDDING_BATCH_SIZE', DEFAULT_EMBEDDING_BATCH_SIZE))
+        max_wait = float(os.getenv('EMBEDDING_BATCH_WAIT_MS', DEFAULT_EMBEDDING_BATCH_WAIT_MS)) / 1000
+    except ValueError:
+        max_batch, max_wait = 0, -1.0
+    if not 1 <= max_batch <= MAX_EMBEDDING_BATCH_SIZE or max_wait < 0:
+        raise ValueError("EMBEDDING_BATCH_SIZE ou EMBEDDING_BATCH_WAIT_MS inválido: "
+                         f"{os.getenv('EMBEDDING_BATCH_SIZE')}, {os.getenv('EMBEDDING_BATCH_WAIT_MS')}")
+    return max_batch, max_wait
+
+def install_batcher(memory, model: str, dims: int, max_batch: int,
+                    max_wait: float) -> Optional[EmbeddingBatcher]:
+    """
+    Passa as chamadas de embeddings do mem0 pelo agrupador.
+
+    Args:
+        memory: Instância do mem0
+        model: Modelo de embeddings
+        dims: Dimensão dos vetores
+        max_batch: Textos por requisição (1 desativa o agrupamento)
+        max_wait: Segundos de espera por outras chamadas
+
+    Returns:
+        EmbeddingBatcher: Agrupador instalado, ou None se o agrupamento estiver desativado
+    """
+    if max_batch == 1:
+        return None
+    embedder = memory.embedding_model
+    batcher = EmbeddingBatcher(openai_batch_function(embedder.client, model, dims), max_batch, max_wait)
+    embedder.embed = lambda text, memory_action=None: batcher.embed(text)
+    logger.info(f"Agrupamento de embeddings ativado (até {max_batch} textos, {max_wait * 1000:.0f} ms de espera)")
+    return batcher
+
+def embedding_batch_report() -> Dict:
+    """
+    Resume o agrupamento das chamadas de embeddings.
+
+    Returns:
+        dict: 'requests', 'inputs', 'average_batch' e 'histogram' (faixa de tamanho → lotes)
+    """
+    requests = metrics.get("embeddings.requests")
+    inputs = metrics.get("embeddings.inputs")
+    prefix = "embeddings.batch_size."
+    counts = {name[len(prefix):]: value for name, value in metrics.snapshot(prefix).items()}
+    order = [batch_size_bucket(upper) for upper in BATCH_SIZE_BUCKETS] + [batch_size_bucket(BATCH_SIZE_BUCKETS[-1] + 1)]
+    return {
+        "requests": requests,
+        "inputs": inputs,
+        "average_batch": inputs / requests if requests else 0.0,
+        "histogram": {bucket: counts[bucket] for bucket in order if counts.get(bucket)},
+    }
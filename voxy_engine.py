@@ -0,0 +1,340 @@
+"""
+Motor compartilhado do Voxy-Mem0 para servidores com várias sessões.
+
+Um único conjunto de clientes (OpenAI, mem0 e o buffer de extração) é
+criado por processo, sob um lock, e compartilhado por todas as sessões.
+Mensagens de usuários diferentes são processadas em paralelo; mensagens
+do mesmo usuário são serializadas, para que `memory.add` e a busca de
+memórias de um usuário não concorram entre si.
+"""
+import os
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from voxy_agent import chat_with_memories, save_memories, setup_memory
+from voxy_budget import TurnBudget
+from voxy_buffer import ExtractionBuffer
+from voxy_gates import ExtractionGate
+from voxy_metrics import metrics
+from voxy_router import ModelRouter
+from voxy_retrieval import format_result
+from voxy_store import DEFAULT_COLLECTION, OutputData, VoxyVectorStore, delete_user_memories, list_user_memories
+
+# Conexões mantidas pelo motor para leituras diretas (quando o mem0 não usa o VoxyVectorStore)
+ENGINE_POOL_CONNECTIONS = 4
+
+logger = logging.getLogger("voxy-agent.engine")
+
+class KeyedLocks:
+    """Locks por chave, criados sob demanda e descartados quando ninguém mais os usa."""
+
+    def __init__(self):
+        """Inicializa o registro vazio."""
+        self._lock = threading.Lock()
+        # Chave → [lock, threads que o possuem ou aguardam]
+        self._entries: Dict[str, list] = {}
+
+    @contextmanager
+    def hold(self, key: str):
+        """
+        Mantém o lock da chave durante o bloco `with`.
+
+        Args:
+            key: Chave a serializar (ex.: user_id)
+        """
+        with self._lock:
+            entry = self._entries.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._entries[key]
+
+    def waiting(self) -> Dict[str, int]:
+        """Retorna, por chave, quantas threads aguardam o lock (sem contar a que o possui)."""
+        with self._lock:
+            return {key: entry[1] - 1 for key, entry in self._entries.items() if entry[1] > 1}
+
+
+class VoxyEngine:
+    """Clientes compartilhados e processamento de mensagens seguro entre threads."""
+
+    def __init__(self, openai_client, memory, buffer: Optional[ExtractionBuffer] = None,
+                 database_url: Optional[str] = None, router: Optional[ModelRouter] = None,
+                 budget: Optional[TurnBudget] = None, extraction_gate: Optional[ExtractionGate] = None):
+        """
+        Inicializa o motor.
+
+        Args:
+            openai_client: Cliente da OpenAI
+            memory: Instância da camada de memória
+            buffer: Buffer de extração em janelas (padrão: `ExtractionBuffer.from_env()`)
+            database_url: URL do banco para leituras diretas (padrão: DATABASE_URL)
+            router: Roteador de modelos (padrão: `ModelRouter.from_env()`)
+            budget: Prazo por turno e disjuntor da busca (padrão: `TurnBudget.from_env()`)
+            extraction_gate: Filtro de extração de fatos (padrão: `ExtractionGate.from_env()`)
+        """
+        self.openai_client = openai_client
+        self.memory = memory
+        self.database_url = database_url or os.environ.get('DATABASE_URL')
+        # Tabela ativa da coleção (o nome lógico já foi resolvido por setup_memory)
+        self.collection_name = getattr(memory, "collection_name", None) or DEFAULT_COLLECTION
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self.buffer = buffer or ExtractionBuffer.from_env(
+            lambda messages, user_id: save_memories(memory, messages, user_id))
+        # Compartilhado pelas sessões, para que as latências medidas valham para todas
+        self.router = router or ModelRouter.from_env()
+        # Compartilhado para que o disjuntor reflita a saúde do armazenamento para todas as sessões
+        self.budget = budget or TurnBudget.from_env()
+        self.extraction_gate = extraction_gate or ExtractionGate.from_env()
+        self._user_locks = KeyedLocks()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+        self._peak_in_flight = 0
+
+    def process_message(self, message: str, user_id: str, **options) -> str:
+        """
+        Processa uma mensagem, serializando as mensagens do mesmo usuário.
+
+        Args:
+            message: Mensagem do usuário
+            user_id: Identificador do usuário
+            **options: Argumentos adicionais para `chat_with_memories` (ex.: model, memory_limit)
+
+        Returns:
+            str: Resposta do assistente
+        """
+        with self._user_locks.hold(user_id):
+            with self._lock:
+                self._in_flight[user_id] = self._in_flight.get(user_id, 0) + 1
+                self._peak_in_flight = max(self._peak_in_flight, sum(self._in_flight.values()))
+            metrics.increment("engine.processed")
+            try:
+                return chat_with_memories(message=message, user_id=user_id, openai_client=self.openai_client,
+                                          memory=self.memory, buffer=self.buffer, router=self.router,
+                                          budget=self.budget, extraction_gate=self.extraction_gate, **options)
+            finally:
+                with self._lock:
+                    self._in_flight[user_id] -= 1
+                    if not self._in_flight[user_id]:
+                        del self._in_flight[user_id]
+
+    def ingest_turn(self, user_id: str, message: str, response: str) -> bool:
+        """
+        Registra um turno já respondido (ex.: conversas históricas), sem chamar o modelo de chat.
+
+        O turno passa pelo filtro de extração e pelo buffer de extração, como
+        as mensagens processadas por `process_message`.
+
+        Args:
+            user_id: Identificador do usuário
+            message: Mensagem do usuário
+            response: Resposta do assistente
+
+        Returns:
+            bool: True se novas memórias foram adicionadas
+        """
+        messages = [{"role": "user", "content": message}, {"role": "assistant", "content": response}]
+        with self._user_locks.hold(user_id):
+            metrics.increment("engine.ingested")
+            if not self.extraction_gate.should_extract(message, messages):
+                return False
+            return bool(self.buffer.add_turn(user_id, message, response))
+
+    @contextmanager
+    def connection(self):
+        """
+        Fornece uma conexão com o banco para leituras e operações em massa.
+
+        Usa o pool do VoxyVectorStore quando ele está ativo; caso contrário,
+        um pool próprio e pequeno, criado na primeira chamada. Transações
+        não confirmadas pelo chamador são desfeitas ao devolver a conexão.
+        """
+        store = getattr(self.memory, "vector_store", None)
+        if isinstance(store, VoxyVectorStore):
+            pool = store.pool
+        else:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(1, ENGINE_POOL_CONNECTIONS, self.database_url)
+                pool = self._pool
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+            pool.putconn(conn)
+
+    def get_user_memories(self, user_id: str, limit: int = 10) -> List[Dict]:
+        """
+        Recupera as memórias mais recentes de um usuário.
+
+        Args:
+            user_id: Identificador do usuário
+            limit: Número máximo de memórias
+
+        Returns:
+            list: Memórias do usuário
+        """
+        return self.list_memories(user_id, limit, with_total=False)["results"]
+
+    def list_memories(self, user_id: str, limit: int = 20, cursor: Optional[str] = None,
+                      descending: bool = True, with_total: Optional[bool] = None) -> Dict:
+        """
+        Lista as memórias de um usuário em páginas, lendo a coleção diretamente (sem embeddings).
+
+        Args:
+            user_id: Identificador do usuário
+            limit: Memórias por página
+            cursor: Cursor da página anterior (`next_cursor`), ou None para a primeira
+            descending: Se True, as memórias mais recentes vêm primeiro
+            with_total: Se True, inclui o total de memórias do usuário (padrão: apenas
+                na primeira página, para não repetir a contagem a cada página)
+
+        Returns:
+            dict: 'results' (página no formato de `memory.search`), 'next_cursor' e 'total'
+                (None quando não é contado)
+
+        Raises:
+            ValueError: Se o cursor for inválido
+        """
+        if with_total is None:
+            with_total = cursor is None
+        with self.connection() as conn:
+            page = list_user_memories(conn, self.collection_name, user_id, limit, cursor, descending, with_total)
+        return {
+            "results": [format_result(OutputData(id=record_id, score=None, payload=metadata))
+                        for record_id, metadata in page["records"]],
+            "next_cursor": page["next_cursor"],
+            "total": page["total"],
+        }
+
+    def delete_memories(self, user_id: str, older_than_days: Optional[float] = None,
+                        progress: Optional[Callable[[int, int], None]] = None, batch_size: int = 1000) -> int:
+        """
+        Remove as memórias de um usuário em lotes.
+
+        Sem `older_than_days`, os turnos ainda no buffer de extração também são
+        descartados, para que não recriem memórias depois da limpeza.
+
+        Args:
+            user_id: Identificador do usuário
+            older_than_days: Remove apenas as memórias criadas há mais de N dias (opcional)
+            progress: Função chamada após cada lote com (removidas, total)
+            batch_size: Linhas removidas por transação
+
+        Returns:
+            int: Número de memórias removidas
+        """
+        older_than = None
+        if older_than_days is not None:
+            older_than = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        with self._user_locks.hold(user_id):
+            if older_than is None:
+                self.buffer.discard(user_id)
+            # O modo degradado não deve reapresentar memórias removidas
+            self.budget.forget(user_id)
+            with self.connection() as conn:
+                deleted = delete_user_memories(conn, self.collection_name, user_id, older_than,
+                                               batch_size, progress)
+        logger.info(f"{deleted} memória(s) de {user_id} removida(s)")
+        metrics.increment("engine.deleted", deleted)
+        return deleted
+
+    def flush_user(self, user_id: str, reason: str = "fim da sessão") -> bool:
+        """
+        Salva os turnos pendentes do usuário sob o lock do usuário.
+
+        Todo envio do buffer (fim de sessão, inatividade ou encerramento) passa
+        por aqui, para que o `memory.add` não concorra com um turno do mesmo usuário.
+
+        Args:
+            user_id: Identificador do usuário
+            reason: Motivo do envio, registrado no log
+
+        Returns:
+            bool: True se novas memórias foram adicionadas
+        """
+        with self._user_locks.hold(user_id):
+            return self.buffer.flush(user_id, reason=reason)
+
+    def flush_all(self) -> Dict[str, bool]:
+        """Salva os turnos pendentes de todos os usuários, cada um sob o seu lock."""
+        return self.buffer.flush_all(self.flush_user)
+
+    def end_session(self, user_id: str) -> bool:
+        """Salva os turnos do usuário que ainda estão no buffer de extração."""
+        return self.flush_user(user_id, "fim da sessão")
+
+    def start(self):
+        """Inicia o envio periódico dos turnos de usuários inativos."""
+        self.buffer.start(flush=self.flush_user)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Resume a concorrência do motor.
+
+        Returns:
+            dict: 'in_flight' (mensagens em processamento), 'active_users',
+                'waiting' (mensagens aguardando o lock do usuário),
+                'peak_in_flight' e 'processed'
+        """
+        with self._lock:
+            in_flight = sum(self._in_flight.values())
+            active_users = len(self._in_flight)
+            peak = self._peak_in_flight
+        return {
+            "in_flight": in_flight,
+            "active_users": active_users,
+            "waiting": sum(self._user_locks.waiting().values()),
+            "peak_in_flight": peak,
+            "processed": int(metrics.get("engine.processed")),
+        }
+
+    def close(self):
+        """Salva os turnos pendentes e interrompe as tarefas de fundo."""
+        self.buffer.close(self.flush_user)
+        self.budget.close()
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+
+_engine: Optional[VoxyEngine] = None
+_engine_lock = threading.Lock()
+
+def get_engine(create: bool = True) -> Optional[VoxyEngine]:
+    """
+    Retorna o motor do processo, criando-o na primeira chamada.
+
+    A criação é feita sob um lock: sessões simultâneas aguardam a mesma
+    inicialização em vez de executar `setup_memory()` várias vezes.
+
+    Args:
+        create: Se False, retorna None em vez de criar o motor
+
+    Returns:
+        VoxyEngine: Motor compartilhado
+    """
+    global _engine
+    if _engine is None and create:
+        with _engine_lock:
+            if _engine is None:
+                openai_client, memory = setup_memory()
+                engine = VoxyEngine(openai_client, memory)
+                engine.start()
+                atexit.register(engine.close)
+                logger.info("Motor compartilhado inicializado")
+                _engine = engine
+    return _engine
@@ -0,0 +1,250 @@
+"""
+Filtros locais que evitam chamadas caras do Voxy-Mem0.
+
+Cada filtro atribui a uma mensagem uma pontuação entre 0 e 1, calculada
+localmente (sem chamadas de rede), e a compara com um limiar
+configurável. Os filtros são substituíveis: qualquer objeto com o método
+`score(message) -> float` pode ser usado no lugar das regras padrão
+(por exemplo, um classificador treinado).
+"""
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+from voxy_metrics import metrics
+
+# Limiar padrão de confiança para dispensar a busca de memórias
+DEFAULT_RETRIEVAL_GATE_THRESHOLD = 0.9
+
+# Pontuação mínima padrão para executar a extração de fatos (memory.add)
+DEFAULT_EXTRACTION_GATE_THRESHOLD = 0.5
+
+# Palavras de cumprimentos, agradecimentos e confirmações (sem acentos)
+TRIVIAL_WORDS = frozenset("""
+    oi ola opa eai e ai alo bom boa dia dias tarde tardes noite noites tudo bem beleza blz joia
+    ok okay okk certo claro valeu vlw obrigado obrigada obrigadao brigado brigada obg grato grata
+    muito mt muitissimo sim s nao n show legal massa top perfeito otimo otima entendi entendido
+    tchau ate logo mais depois falou flw abraco abracos bjs beijos de nada por favor pfv pf
+    hello hi hey thanks thank you thx ty yes yep no nope bye cool great nice good morning
+    afternoon evening night sure fine
+""".split())
+
+# Risadas e interjeições ('kkkk', 'hahaha', 'rsrs', 'hehe', 'hmm')
+_LAUGHTER = re.compile(r"^(k{2,}|(ha)+h?|(he)+h?|(hi)+h?|(rs)+|hu+m+|hm+|a+h+|o+h+)$")
+
+# Palavras que indicam que a mensagem depende do que o assistente sabe sobre o usuário
+MEMORY_CUES = frozenset("""
+    qual quais quem onde quando quanto quantos quantas como porque lembra lembrar lembre
+    lembrei esqueci sabe meu minha meus minhas eu mim comigo gosto prefiro
+    what who where when which remember my me i
+""".split())
+
+# Palavras que iniciam perguntas
+QUESTION_WORDS = frozenset("""
+    qual quais quem onde quando quanto quantos quantas como porque por que o voce sabe lembra
+    what who where when which how why do does did is are can
+""".split())
+
+# Indícios fortes de fatos duradouros sobre o usuário (texto normalizado por `tokenize`)
+_STRONG_FACT_CUES = re.compile(r"\b(" + "|".join([
+    r"me chamo", r"meu nome", r"sou (alergic|intoleran|vegetarian|vegan|casad|solteir|divorciad)\w*",
+    r"(eu )?(moro|morei|vivo|trabalho|trabalhei|estudo|estudei|nasci|prefiro|odeio|detesto|adoro)",
+    r"(eu )?(gosto|amo) d[eoa]s?", r"meu aniversario", r"(minha|meu) (esposa|marido|namorad[ao]|filh[ao]s?|"
+    r"mae|pai|irma[o]?|cachorro|gato|empresa|chefe|profissao|cidade|endereco|telefone|email)",
+    r"my name", r"i live", r"i work", r"i study", r"i was born", r"i prefer", r"i hate", r"i love",
+    r"i like", r"i m (allergic|vegetarian|vegan|married|single)",
+]) + r")\b")
+
+# Indícios fracos: primeira pessoa e posse
+_WEAK_FACT_CUES = re.compile(r"\b(eu|meu|minha|meus|minhas|sou|estou|tenho|tive|comecei|parei|quero|pretendo|"
+                             r"vou|fiz|faco|uso|i|my|mine|im|i m)\b")
+
+def estimate_tokens(text: str) -> int:
+    """Estima os tokens de um texto (cerca de 4 caracteres por token)."""
+    return len(text) // 4 + 1
+
+def _extraction_prompt_tokens() -> int:
+    """Estima os tokens do prompt de extração de fatos do mem0."""
+    try:
+        from mem0.configs.prompts import FACT_RETRIEVAL_PROMPT
+        return estimate_tokens(FACT_RETRIEVAL_PROMPT)
+    except ImportError:
+        return 800
+
+def tokenize(message: str) -> List[str]:
+    """
+    Normaliza a mensagem (minúsculas, sem acentos) e separa as palavras.
+
+    Args:
+        message: Mensagem do usuário
+
+    Returns:
+        list: Palavras da mensagem (pontuação e emojis são descartados)
+    """
+    text = unicodedata.normalize("NFKD", message.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"[a-z0-9]+", text)
+
+class RetrievalGate:
+    """
+    Decide, por regras, se uma mensagem é trivial o bastante para dispensar a busca de memórias.
+
+    Mensagens curtas compostas apenas de cumprimentos, agradecimentos,
+    confirmações ou risadas recebem confiança alta; qualquer pergunta ou
+    referência ao próprio usuário zera a confiança.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_RETRIEVAL_GATE_THRESHOLD, enabled: bool = True,
+                 max_words: int = 6):
+        """
+        Inicializa o filtro.
+
+        Args:
+            threshold: Confiança mínima para dispensar a busca
+            enabled: Se False, a busca nunca é dispensada
+            max_words: Mensagens mais longas nunca são consideradas triviais
+        """
+        self.threshold = threshold
+        self.enabled = enabled
+        self.max_words = max_words
+
+    @classmethod
+    def from_env(cls) -> "RetrievalGate":
+        """Cria o filtro a partir de MEMORY_RETRIEVAL_GATE e MEMORY_RETRIEVAL_GATE_THRESHOLD."""
+        enabled = os.getenv('MEMORY_RETRIEVAL_GATE', 'true').lower() not in ('false', '0', 'off', 'no')
+        threshold = float(os.getenv('MEMORY_RETRIEVAL_GATE_THRESHOLD', DEFAULT_RETRIEVAL_GATE_THRESHOLD))
+        return cls(threshold, enabled)
+
+    def score(self, message: str) -> float:
+        """
+        Calcula a confiança de que a mensagem não precisa de memórias.
+
+        Args:
+            message: Mensagem do usuário
+
+        Returns:
+            float: Confiança entre 0 e 1
+        """
+        words = tokenize(message)
+        if not words:
+            # Apenas emojis ou pontuação
+            return 1.0
+        if len(words) > self.max_words or any(word in MEMORY_CUES for word in words):
+            return 0.0
+
+        trivial = sum(1 for word in words if word in TRIVIAL_WORDS or _LAUGHTER.match(word))
+        ratio = trivial / len(words)
+        if ratio == 1.0:
+            return 0.95
+        if ratio >= 0.75:
+            return 0.6
+        return 0.0
+
+    def should_skip(self, message: str) -> bool:
+        """
+        Decide se a busca de memórias pode ser dispensada e registra a decisão.
+
+        Args:
+            message: Mensagem do usuário
+
+        Returns:
+            bool: True se a busca deve ser dispensada
+        """
+        skip = self.enabled and self.score(message) >= self.threshold
+        metrics.increment("gate.retrieval.skipped" if skip else "gate.retrieval.performed")
+        return skip
+
+
+class ExtractionGate:
+    """
+    Decide, por regras, se uma mensagem provavelmente contém fatos duradouros sobre o usuário.
+
+    Afirmações em primeira pessoa ("moro em Lisboa", "meu nome é Ana",
+    "sou alérgico a camarão") recebem pontuação alta; mensagens triviais,
+    perguntas e pedidos sem referência ao usuário recebem pontuação baixa
+    e dispensam a extração de fatos do mem0 (uma chamada ao LLM).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_EXTRACTION_GATE_THRESHOLD, enabled: bool = True):
+        """
+        Inicializa o filtro.
+
+        Args:
+            threshold: Pontuação mínima para executar a extração
+            enabled: Se False, a extração é sempre executada
+        """
+        self.threshold = threshold
+        self.enabled = enabled
+        self._trivial = RetrievalGate()
+
+    @classmethod
+    def from_env(cls) -> "ExtractionGate":
+        """Cria o filtro a partir de MEMORY_EXTRACTION_GATE e MEMORY_EXTRACTION_GATE_THRESHOLD."""
+        enabled = os.getenv('MEMORY_EXTRACTION_GATE', 'true').lower() not in ('false', '0', 'off', 'no')
+        threshold = float(os.getenv('MEMORY_EXTRACTION_GATE_THRESHOLD', DEFAULT_EXTRACTION_GATE_THRESHOLD))
+        return cls(threshold, enabled)
+
+    def score(self, message: str) -> float:
+        """
+        Calcula a probabilidade estimada de a mensagem conter fatos sobre o usuário.
+
+        Args:
+            message: Mensagem do usuário
+
+        Returns:
+            float: Pontuação entre 0 e 1
+        """
+        if self._trivial.score(message) >= DEFAULT_RETRIEVAL_GATE_THRESHOLD:
+            return 0.0
+        words = tokenize(message)
+        text = " ".join(words)
+        # Perguntas ("qual é o meu nome?") consultam fatos em vez de informá-los
+        question = message.rstrip().endswith("?") and words[0] in QUESTION_WORDS
+        if _STRONG_FACT_CUES.search(text):
+            return 0.3 if question else 0.9
+        if _WEAK_FACT_CUES.search(text):
+            return 0.3 if question else 0.6
+        return 0.2
+
+    def should_extract(self, message: str, messages: Optional[Sequence[Dict]] = None) -> bool:
+        """
+        Decide se a extração deve ser executada e registra a decisão.
+
+        Quando a extração é dispensada, registra também uma estimativa dos
+        tokens economizados (prompt de extração + conversa enviada).
+
+        Args:
+            message: Mensagem do usuário
+            messages: Mensagens que seriam enviadas ao `memory.add`
+
+        Returns:
+            bool: True se `memory.add` deve ser chamado
+        """
+        if not self.enabled or self.score(message) >= self.threshold:
+            metrics.increment("gate.extraction.performed")
+            return True
+
+        conversation = messages or [{"content": message}]
+        saved = _extraction_prompt_tokens() + sum(estimate_tokens(m.get("content") or "") for m in conversation)
+        metrics.increment("gate.extraction.skipped")
+        metrics.increment("gate.extraction.tokens_saved", saved)
+        return False
+
+
+def extraction_report() -> Dict[str, float]:
+    """
+    Resume as decisões do filtro de extração.
+
+    Returns:
+        dict: 'skipped', 'performed', 'skip_rate' e 'tokens_saved'
+    """
+    skipped = metrics.get("gate.extraction.skipped")
+    performed = metrics.get("gate.extraction.performed")
+    total = skipped + performed
+    return {
+        "skipped": skipped,
+        "performed": performed,
+        "skip_rate": skipped / total if total else 0.0,
+        "tokens_saved": metrics.get("gate.extraction.tokens_saved"),
+    }
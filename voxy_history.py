@@ -0,0 +1,389 @@
+"""
+Histórico de chat persistente e limitado para as sessões da interface web.
+
+Cada sessão mantém em memória apenas as mensagens mais recentes (uma
+janela de tamanho fixo); as mais antigas são relidas sob demanda quando o
+usuário pede para ver mensagens anteriores. Assim, a memória ocupada por
+sessão e o número de mensagens desenhadas a cada execução da página não
+crescem com o tamanho da conversa.
+
+`BoundedHistory` mantém a janela e entrega as mensagens que saem dela a
+um arquivo. `PersistentHistory`, usado pela interface, grava a conversa
+completa em um banco SQLite local (modo WAL, `TranscriptStore`), em lotes
+e apenas com acréscimos, para que um usuário que reconecta recupere a
+conversa sem nenhuma chamada ao LLM ou ao armazenamento vetorial. As
+conversas do banco pertencem a um dono definido pelo servidor (a
+identidade autenticada ou um token de retomada assinado), nunca a um
+identificador escolhido pelo usuário.
+"""
+import os
+import hmac
+import uuid
+import hashlib
+import secrets
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Mensagens mantidas em memória por sessão
+DEFAULT_HISTORY_WINDOW = 50
+
+# Mensagens desenhadas por página na interface
+DEFAULT_HISTORY_PAGE = 20
+
+# Banco padrão das conversas
+DEFAULT_HISTORY_DB = os.path.join("data", "chat_history.db")
+
+# Mensagens acumuladas antes de uma gravação forçada
+DEFAULT_WRITE_BATCH = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_conversation ON transcripts (owner, session_id, id);
+CREATE INDEX IF NOT EXISTS idx_transcripts_user ON transcripts (owner, user_id, id);
+CREATE TABLE IF NOT EXISTS transcript_keys (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+class BoundedHistory:
+    """Histórico de uma sessão: janela recente em memória e mensagens antigas no arquivo."""
+
+    def __init__(self, archive, window: int = DEFAULT_HISTORY_WINDOW):
+        """
+        Inicializa o histórico vazio.
+
+        Args:
+            archive: Arquivo das mensagens que saem da janela, com `append(session_id, messages)`,
+                `read(session_id, start, stop)` e `clear(session_id)`
+            window: Mensagens mantidas em memória
+
+        Raises:
+            ValueError: Se a janela for menor que 1
+        """
+        if window < 1:
+            raise ValueError(f"Janela de histórico inválida: {window}")
+        self.archive = archive
+        self.window = window
+        self.session_id = uuid.uuid4().hex
+        self.messages: List[Dict] = []
+        self.archived = 0
+
+    @property
+    def total(self) -> int:
+        """Número total de mensagens da conversa."""
+        return self.archived + len(self.messages)
+
+    def add(self, role: str, content: str):
+        """
+        Adiciona uma mensagem, arquivando as que saem da janela.
+
+        Args:
+            role: Papel do emissor ('user' ou 'assistant')
+            content: Conteúdo da mensagem
+        """
+        self.messages.append({"role": role, "content": content})
+        overflow = len(self.messages) - self.window
+        if overflow > 0:
+            self._archive_overflow(self.messages[:overflow])
+            self.archived += overflow
+            del self.messages[:overflow]
+
+    def _archive_overflow(self, messages: List[Dict]):
+        """Arquiva as mensagens que saíram da janela."""
+        self.archive.append(self.session_id, messages)
+
+    def recent(self, count: int) -> List[Dict]:
+        """
+        Retorna as `count` mensagens mais recentes, relendo do arquivo as que não estão na janela.
+
+        Args:
+            count: Número de mensagens
+
+        Returns:
+            list: Mensagens, da mais antiga para a mais recente
+        """
+        if count <= len(self.messages):
+            return self.messages[len(self.messages) - count:] if count > 0 else []
+        start = max(0, self.total - count)
+        return self.archive.read(self.session_id, start, self.archived) + self.messages
+
+    def clear(self):
+        """Descarta a conversa, inclusive as mensagens arquivadas."""
+        self.archive.clear(self.session_id)
+        self.session_id = uuid.uuid4().hex
+        self.messages = []
+        self.archived = 0
+
+
+class TranscriptStore:
+    """Conversas gravadas em SQLite (modo WAL), por dono e conversa, com uma conexão por thread."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_DB):
+        """
+        Inicializa o banco, criando o arquivo e as tabelas se necessário.
+
+        Args:
+            path: Caminho do arquivo SQLite (':memory:' não é compartilhado entre threads)
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+        self._key = self._signing_key()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, abrindo-a na primeira chamada."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            # Leitores não bloqueiam a gravação (e vice-versa); fsync apenas nos checkpoints
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _signing_key(self) -> bytes:
+        """Lê a chave que assina os tokens de retomada, criando-a no primeiro uso do banco."""
+        with self._connection() as conn:
+            conn.execute("INSERT OR IGNORE INTO transcript_keys (name, value) VALUES ('resume', ?)",
+                         (secrets.token_hex(32),))
+            return bytes.fromhex(conn.execute("SELECT value FROM transcript_keys WHERE name = 'resume'").fetchone()[0])
+
+    def _sign(self, value: str) -> str:
+        """Assinatura HMAC de um valor com a chave do banco."""
+        return hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def issue_token(self) -> str:
+        """
+        Emite um token de retomada para um novo dono anônimo.
+
+        Returns:
+            str: Token aleatório e assinado, no formato '<valor>.<assinatura>'
+        """
+        value = secrets.token_urlsafe(18)
+        return f"{value}.{self._sign(value)}"
+
+    def token_owner(self, token: Optional[str]) -> Optional[str]:
+        """
+        Valida um token de retomada.
+
+        Args:
+            token: Token emitido por `issue_token` (ex.: lido da URL)
+
+        Returns:
+            str: Dono das conversas do token, ou None se o token não foi emitido por este banco
+        """
+        value, _, signature = (token or "").partition(".")
+        if not value or not hmac.compare_digest(signature, self._sign(value)):
+            return None
+        return "token:" + value
+
+    def append(self, owner: str, session_id: str, user_id: str, messages: List[Dict]):
+        """
+        Acrescenta mensagens a uma conversa em uma única transação.
+
+        Args:
+            owner: Dono da conversa (definido pelo servidor)
+            session_id: Identificador da conversa
+            user_id: Usuário do mem0 da conversa
+            messages: Mensagens ('role', 'content'), da mais antiga para a mais recente
+        """
+        if not messages:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO transcripts (owner, session_id, user_id, role, content, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(owner, session_id, user_id, message["role"], message["content"], now) for message in messages])
+
+    def read(self, owner: str, session_id: str, start: int, stop: int) -> List[Dict]:
+        """
+        Lê as mensagens de uma conversa no intervalo [start, stop).
+
+        Args:
+            owner: Dono da conversa
+            session_id: Identificador da conversa
+            start: Posição da primeira mensagem (0 = mais antiga)
+            stop: Posição seguinte à última mensagem
+
+        Returns:
+            list: Mensagens do intervalo, em ordem
+        """
+        start = max(0, start)
+        if stop <= start:
+            return []
+        rows = self._connection().execute(
+            "SELECT role, content FROM transcripts WHERE owner = ? AND session_id = ? ORDER BY id LIMIT ? OFFSET ?",
+            (owner, session_id, stop - start, start)).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def count(self, owner: str, session_id: str) -> int:
+        """Retorna o número de mensagens de uma conversa."""
+        return self._connection().execute(
+            "SELECT count(*) FROM transcripts WHERE owner = ? AND session_id = ?", (owner, session_id)).fetchone()[0]
+
+    def latest_session(self, owner: str, user_id: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """
+        Retorna a conversa mais recente do dono.
+
+        Args:
+            owner: Dono das conversas
+            user_id: Considera apenas as conversas deste usuário do mem0 (opcional)
+
+        Returns:
+            tuple: (conversa, usuário do mem0), ou None se o dono não tiver mensagens
+        """
+        if user_id is None:
+            row = self._connection().execute(
+                "SELECT session_id, user_id FROM transcripts WHERE owner = ? ORDER BY id DESC LIMIT 1",
+                (owner,)).fetchone()
+        else:
+            row = self._connection().execute(
+                "SELECT session_id, user_id FROM transcripts WHERE owner = ? AND user_id = ? ORDER BY id DESC LIMIT 1",
+                (owner, user_id)).fetchone()
+        return tuple(row) if row else None
+
+    def session_user(self, owner: str, session_id: str) -> Optional[str]:
+        """Retorna o usuário do mem0 de uma conversa do dono (None se ela não existir)."""
+        row = self._connection().execute(
+            "SELECT user_id FROM transcripts WHERE owner = ? AND session_id = ? ORDER BY id DESC LIMIT 1",
+            (owner, session_id)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, owner: str, session_id: str):
+        """Remove as mensagens de uma conversa."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM transcripts WHERE owner = ? AND session_id = ?", (owner, session_id))
+
+
+class _TranscriptArchive:
+    """Conversas de um dono no banco, com a interface de arquivo esperada por `BoundedHistory`."""
+
+    def __init__(self, store: TranscriptStore, owner: str, history: "PersistentHistory"):
+        """
+        Args:
+            store: Banco das conversas
+            owner: Dono das conversas
+            history: Histórico que fornece o usuário do mem0 gravado com as mensagens
+        """
+        self.store = store
+        self.owner = owner
+        self.history = history
+
+    def append(self, session_id: str, messages: List[Dict]):
+        """Acrescenta mensagens à conversa."""
+        self.store.append(self.owner, session_id, self.history.user_id, messages)
+
+    def read(self, session_id: str, start: int, stop: int) -> List[Dict]:
+        """Lê as mensagens da conversa no intervalo [start, stop)."""
+        return self.store.read(self.owner, session_id, start, stop)
+
+    def clear(self, session_id: str):
+        """Remove as mensagens da conversa."""
+        self.store.delete(self.owner, session_id)
+
+
+class PersistentHistory(BoundedHistory):
+    """
+    Histórico limitado cuja conversa completa fica no banco.
+
+    Todas as mensagens são gravadas em lotes (ao fim de cada resposta do
+    assistente ou a cada `batch_size` mensagens); as posições no banco são
+    as mesmas da conversa, então as páginas anteriores à janela são lidas
+    diretamente dele.
+    """
+
+    def __init__(self, store: TranscriptStore, owner: str, user_id: str, session_id: Optional[str] = None,
+                 window: int = DEFAULT_HISTORY_WINDOW, batch_size: int = DEFAULT_WRITE_BATCH):
+        """
+        Abre uma conversa, carregando apenas as mensagens mais recentes.
+
+        Args:
+            store: Banco das conversas
+            owner: Dono da conversa (`TranscriptStore.token_owner` ou a identidade autenticada)
+            user_id: Usuário do mem0 da conversa
+            session_id: Conversa a retomar (padrão: uma conversa nova)
+            window: Mensagens mantidas em memória
+            batch_size: Mensagens acumuladas antes de uma gravação forçada
+
+        Raises:
+            ValueError: Se a janela for menor que 1
+        """
+        super().__init__(_TranscriptArchive(store, owner, self), window)
+        self.store = store
+        self.owner = owner
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self._pending: List[Dict] = []
+        if session_id:
+            self.session_id = session_id
+            self.archived = max(0, store.count(owner, session_id) - window)
+            self.messages = store.read(owner, session_id, self.archived, self.archived + window)
+
+    @classmethod
+    def resume(cls, store: TranscriptStore, owner: str, user_id: str, **options) -> "PersistentHistory":
+        """Retoma a conversa mais recente do dono com o usuário do mem0 (ou inicia uma nova)."""
+        latest = store.latest_session(owner, user_id)
+        return cls(store, owner, user_id, latest[0] if latest else None, **options)
+
+    def add(self, role: str, content: str):
+        """
+        Adiciona uma mensagem à janela e à fila de gravação.
+
+        Args:
+            role: Papel do emissor ('user' ou 'assistant')
+            content: Conteúdo da mensagem
+        """
+        super().add(role, content)
+        self._pending.append(self.messages[-1])
+        if role == "assistant" or len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _archive_overflow(self, messages: List[Dict]):
+        """As mensagens que saem da janela já estão (ou estarão) no banco."""
+
+    def flush(self):
+        """Grava as mensagens pendentes em uma única transação."""
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self.archive.append(self.session_id, pending)
+
+    def recent(self, count: int) -> List[Dict]:
+        """
+        Retorna as `count` mensagens mais recentes, lendo do banco as que não estão na janela.
+
+        Args:
+            count: Número de mensagens
+
+        Returns:
+            list: Mensagens, da mais antiga para a mais recente
+        """
+        if count > len(self.messages):
+            self.flush()
+        return super().recent(count)
+
+    def clear(self):
+        """Apaga a conversa e inicia uma nova."""
+        self._pending = []
+        super().clear()
+
+    def new_session(self):
+        """Inicia uma nova conversa, mantendo a atual gravada no banco."""
+        self.flush()
+        self.session_id = uuid.uuid4().hex
+        self.messages = []
+        self.archived = 0
@@ -0,0 +1,56 @@
+"""
+Métricas do Voxy-Mem0.
+
+Contadores simples e seguros para uso entre threads, compartilhados pelo
+agente, pela interface web e pelos utilitários. São mantidos apenas em
+memória, no processo atual.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+class Metrics:
+    """Registro de contadores nomeados (ex.: 'retrieval.lexical')."""
+
+    def __init__(self):
+        """Inicializa o registro vazio."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+
+    def increment(self, name: str, amount: float = 1):
+        """
+        Incrementa um contador.
+
+        Args:
+            name: Nome do contador
+            amount: Valor a somar
+        """
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, name: str) -> float:
+        """Retorna o valor atual de um contador (0 se não existir)."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self, prefix: str = "") -> Dict[str, float]:
+        """
+        Retorna uma cópia dos contadores.
+
+        Args:
+            prefix: Retorna apenas os contadores com este prefixo
+
+        Returns:
+            dict: Nome do contador → valor
+        """
+        with self._lock:
+            return {name: value for name, value in self._counters.items() if name.startswith(prefix)}
+
+    def reset(self):
+        """Zera todos os contadores."""
+        with self._lock:
+            self._counters.clear()
+
+
+# Registro compartilhado pelo processo
+metrics = Metrics()
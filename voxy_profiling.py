@@ -0,0 +1,242 @@
+"""
+Perfil de CPU opcional dos turnos do chat.
+
+Com PROFILE_EVERY=N (ou `run.py run|web|batch --profile N`), um a cada N
+turnos de `chat_with_memories` é executado sob um profiler por
+amostragem: uma thread auxiliar registra a pilha da thread do turno a
+cada PROFILE_INTERVAL_MS milissegundos, sem instrumentar as funções, o
+que mantém o custo baixo o bastante para uso em produção.
+
+Cada turno perfilado gera um arquivo `.folded` em PROFILE_DIR (uma pilha
+por linha, no formato "quadro;quadro;quadro contagem"), aceito pelos
+visualizadores de flame graph mais comuns (speedscope, flamegraph.pl,
+inferno), e um resumo das funções com mais amostras no log.
+
+Apenas a thread do turno é amostrada; trabalho feito em outras threads
+(ex.: buscas com prazo do `voxy_budget`) aparece como espera.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import functools
+from collections import Counter
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from voxy_metrics import metrics
+
+logger = logging.getLogger("voxy-agent.profiling")
+
+# Turnos entre perfis (0 desativa)
+DEFAULT_PROFILE_EVERY = 0
+
+# Intervalo entre amostras
+DEFAULT_PROFILE_INTERVAL_MS = 5.0
+
+# Diretório dos arquivos de perfil
+DEFAULT_PROFILE_DIR = os.path.join("logs", "profiles")
+
+# Funções listadas no resumo
+SUMMARY_TOP = 15
+
+def frame_label(frame) -> str:
+    """Retorna o rótulo de um quadro: 'função (arquivo:linha)', sem ';' (separador do formato)."""
+    code = frame.f_code
+    path = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in path:
+        path = path.split(marker, 1)[1]
+    else:
+        relative = os.path.relpath(path) if os.path.isabs(path) else path
+        path = relative if not relative.startswith("..") else os.path.basename(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+
+class StackSampler:
+    """Amostra periodicamente a pilha de uma thread."""
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_PROFILE_INTERVAL_MS / 1000):
+        """
+        Inicializa o amostrador.
+
+        Args:
+            thread_id: Identificador da thread amostrada (`threading.get_ident()`)
+            interval: Segundos entre amostras
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self):
+        """Inicia a amostragem em uma thread auxiliar."""
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="voxy-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Interrompe a amostragem e aguarda a thread auxiliar."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def sample(self):
+        """Registra a pilha atual da thread amostrada."""
+        frame = sys._current_frames().get(self.thread_id)
+        labels = []
+        while frame is not None:
+            labels.append(frame_label(frame))
+            frame = frame.f_back
+        if labels:
+            self.stacks[";".join(reversed(labels))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+def summarize(stacks: Counter, top: int = SUMMARY_TOP) -> List[Tuple[str, int, int]]:
+    """
+    Calcula as funções com mais amostras.
+
+    Args:
+        stacks: Pilhas no formato folded → amostras
+        top: Número de funções
+
+    Returns:
+        list: (função, amostras próprias, amostras incluindo as chamadas), por amostras próprias
+    """
+    own: Counter = Counter()
+    inclusive: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for label in set(frames):
+            inclusive[label] += count
+    ranked = sorted(inclusive, key=lambda label: (own[label], inclusive[label]), reverse=True)[:top]
+    return [(label, own[label], inclusive[label]) for label in ranked]
+
+def write_folded(stacks: Counter, path: str):
+    """Grava as pilhas no formato folded ('quadro;quadro contagem' por linha)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+class TurnProfiler:
+    """Perfila um a cada N turnos e grava as pilhas amostradas."""
+
+    def __init__(self, every: int, output_dir: str = DEFAULT_PROFILE_DIR,
+                 interval: float = DEFAULT_PROFILE_INTERVAL_MS / 1000, top: int = SUMMARY_TOP):
+        """
+        Inicializa o profiler.
+
+        Args:
+            every: Turnos entre perfis (1 = todos)
+            output_dir: Diretório dos arquivos `.folded`
+            interval: Segundos entre amostras
+            top: Funções listadas no resumo
+
+        Raises:
+            ValueError: Se o intervalo entre perfis ou entre amostras for inválido
+        """
+        if every < 1 or interval <= 0:
+            raise ValueError("Intervalo de perfil inválido")
+        self.every = every
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top = top
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["TurnProfiler"]:
+        """Cria o profiler a partir de PROFILE_EVERY, PROFILE_DIR e PROFILE_INTERVAL_MS (None se desativado)."""
+        every = int(os.getenv('PROFILE_EVERY', DEFAULT_PROFILE_EVERY))
+        if every < 0:
+            raise ValueError(f"PROFILE_EVERY inválido: {every}")
+        if not every:
+            return None
+        interval = float(os.getenv('PROFILE_INTERVAL_MS', DEFAULT_PROFILE_INTERVAL_MS)) / 1000
+        return cls(every, os.getenv('PROFILE_DIR', DEFAULT_PROFILE_DIR), interval)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Executa a função, perfilando-a se for a vez deste turno."""
+        with self._lock:
+            self._calls += 1
+            turn = self._calls
+        if turn % self.every:
+            return func(*args, **kwargs)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sampler.stop()
+            self._report(turn, sampler)
+
+    def _report(self, turn: int, sampler: StackSampler) -> Optional[str]:
+        """Grava o arquivo do turno e registra o resumo no log."""
+        metrics.increment("profile.turns")
+        if not sampler.stacks:
+            logger.info(f"Turno {turn} perfilado sem amostras ({sampler.duration * 1000:.0f} ms)")
+            return None
+        path = os.path.join(self.output_dir, f"turn_{datetime.now():%Y%m%d_%H%M%S}_{turn}.folded")
+        try:
+            write_folded(sampler.stacks, path)
+        except OSError as e:
+            logger.warning(f"Erro ao gravar o perfil do turno {turn}: {str(e)}")
+            path = None
+        total = sum(sampler.stacks.values())
+        lines = [f"Perfil do turno {turn}: {sampler.duration * 1000:.0f} ms, {total} amostras"
+                 + (f", pilhas em {path}" if path else ""),
+                 "   própria  total  função"]
+        for label, own, inclusive in summarize(sampler.stacks, self.top):
+            lines.append(f"   {own / total:6.1%} {inclusive / total:6.1%}  {label}")
+        logger.info("\n".join(lines))
+        return path
+
+
+_profiler: Optional[TurnProfiler] = None
+_configured = False
+_profiler_lock = threading.Lock()
+
+def get_profiler() -> Optional[TurnProfiler]:
+    """Retorna o profiler do processo, lido do ambiente na primeira chamada (None se desativado)."""
+    global _profiler, _configured
+    if not _configured:
+        with _profiler_lock:
+            if not _configured:
+                try:
+                    _profiler = TurnProfiler.from_env()
+                except ValueError as e:
+                    logger.warning(f"Perfil desativado: {str(e)}")
+                    _profiler = None
+                _configured = True
+    return _profiler
+
+def configure_profiler(profiler: Optional[TurnProfiler]):
+    """Define o profiler do processo (ex.: nos testes), em vez do lido do ambiente."""
+    global _profiler, _configured
+    with _profiler_lock:
+        _profiler = profiler
+        _configured = True
+
+def profiled(func: Callable) -> Callable:
+    """Decorador que perfila um a cada N chamadas quando o profiler do processo estiver ativo."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = get_profiler()
+        if profiler is None:
+            return func(*args, **kwargs)
+        return profiler.call(func, *args, **kwargs)
+
+    return wrapper
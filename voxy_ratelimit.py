@@ -0,0 +1,94 @@
+"""
+Limitação de taxa do Voxy-Mem0.
+
+Implementa um balde de fichas (token bucket) seguro para uso entre
+threads, usado para respeitar os limites de requisições e de tokens por
+minuto da API da OpenAI em operações em lote.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+class TokenBucket:
+    """
+    Balde de fichas com reposição contínua.
+
+    O balde começa cheio com `capacity` fichas e recebe `rate` fichas por
+    segundo, sem ultrapassar a capacidade.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o balde.
+
+        Args:
+            rate: Fichas repostas por segundo
+            capacity: Máximo de fichas acumuladas (padrão: `rate`, ou seja, um segundo)
+            clock: Relógio monotônico (substituível nos testes)
+        """
+        if rate <= 0:
+            raise ValueError("A taxa do balde de fichas deve ser positiva")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, amount: float, clock: Callable[[], float] = time.monotonic) -> "TokenBucket":
+        """Cria um balde para um limite por minuto, permitindo rajadas de até um minuto."""
+        return cls(amount / 60.0, amount, clock)
+
+    def _refill(self):
+        """Repõe as fichas acumuladas desde a última atualização."""
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def is_full(self) -> bool:
+        """Indica se o balde está cheio, ou seja, equivalente a um balde novo."""
+        with self._lock:
+            self._refill()
+            return self._tokens >= self.capacity
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """
+        Tenta consumir fichas sem bloquear.
+
+        Pedidos maiores que a capacidade são limitados a ela, para que
+        nunca fiquem bloqueados indefinidamente.
+
+        Args:
+            amount: Fichas desejadas
+
+        Returns:
+            float: 0 se as fichas foram consumidas, ou os segundos até haver fichas suficientes
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def acquire(self, amount: float = 1.0, sleep: Callable[[float], None] = time.sleep) -> float:
+        """
+        Consome fichas, aguardando se necessário.
+
+        Args:
+            amount: Fichas desejadas
+            sleep: Função de espera (substituível nos testes)
+
+        Returns:
+            float: Tempo total de espera em segundos
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(amount)
+            if not wait:
+                return waited
+            sleep(wait)
+            waited += wait
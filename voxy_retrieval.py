@@ -0,0 +1,164 @@
+"""
+Recuperação de memórias do Voxy-Mem0.
+
+No modo 'vector' (padrão), as memórias são recuperadas com `memory.search`
+(embedding da consulta + busca vetorial). No modo 'lexical_first', uma
+busca textual no Postgres é feita antes: se ela encontrar resultados
+suficientes, a chamada de embeddings e a busca vetorial são evitadas;
+caso contrário, as duas listas são combinadas por reciprocal rank fusion.
+
+Antes de qualquer busca, um filtro local (`voxy_gates.RetrievalGate`)
+dispensa a recuperação para mensagens triviais, como cumprimentos e
+agradecimentos.
+"""
+import os
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from voxy_gates import RetrievalGate
+from voxy_metrics import metrics
+from voxy_store import VoxyVectorStore
+
+logger = logging.getLogger("voxy-agent.retrieval")
+
+# Modos de recuperação
+RETRIEVAL_VECTOR = "vector"
+RETRIEVAL_LEXICAL_FIRST = "lexical_first"
+RETRIEVAL_MODES = (RETRIEVAL_VECTOR, RETRIEVAL_LEXICAL_FIRST)
+
+# Caminhos registrados nas métricas ('retrieval.<caminho>')
+PATH_VECTOR = "vector"
+PATH_LEXICAL = "lexical"
+PATH_HYBRID = "hybrid"
+PATH_SKIPPED = "skipped"
+PATHS = (PATH_SKIPPED, PATH_LEXICAL, PATH_HYBRID, PATH_VECTOR)
+
+# Resultados lexicais a partir dos quais a busca vetorial é dispensada
+DEFAULT_LEXICAL_MIN_RESULTS = 1
+
+# Constante de suavização do reciprocal rank fusion
+RRF_K = 60
+
+# Campos dos metadados promovidos ao resultado (mesmo formato do mem0)
+_PROMOTED_KEYS = ("user_id", "agent_id", "run_id", "actor_id", "role")
+_CORE_KEYS = ("data", "hash", "created_at", "updated_at")
+
+def format_result(output) -> Dict:
+    """
+    Converte um resultado do armazenamento vetorial no formato de `memory.search`.
+
+    Args:
+        output: Resultado com `id`, `score` e `payload`
+
+    Returns:
+        dict: Memória com 'id', 'memory', 'score' e os campos promovidos
+    """
+    payload = output.payload or {}
+    result = {
+        "id": output.id,
+        "memory": payload.get("data", ""),
+        "hash": payload.get("hash"),
+        "created_at": payload.get("created_at"),
+        "updated_at": payload.get("updated_at"),
+        "score": output.score,
+    }
+    result.update({key: payload[key] for key in _PROMOTED_KEYS if key in payload})
+    metadata = {key: value for key, value in payload.items() if key not in _CORE_KEYS + _PROMOTED_KEYS}
+    if metadata:
+        result["metadata"] = metadata
+    return result
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Dict]], limit: int, k: int = RRF_K) -> List[Dict]:
+    """
+    Combina listas ordenadas de memórias por reciprocal rank fusion.
+
+    Cada memória recebe a soma de 1 / (k + posição) nas listas em que
+    aparece; o resultado é ordenado por essa pontuação.
+
+    Args:
+        result_lists: Listas de resultados, cada uma em ordem de relevância
+        limit: Número máximo de resultados
+        k: Constante de suavização
+
+    Returns:
+        list: Memórias combinadas, com 'score' igual à pontuação da fusão
+    """
+    scores: Dict[str, float] = {}
+    items: Dict[str, Dict] = {}
+    for results in result_lists:
+        for rank, item in enumerate(results, 1):
+            key = item.get("id") or item.get("memory")
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            items.setdefault(key, item)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [dict(items[key], score=scores[key]) for key in ordered]
+
+def lexical_search(memory, query: str, user_id: str, limit: int) -> Optional[List[Dict]]:
+    """
+    Busca memórias pelo texto, sem calcular embeddings.
+
+    Returns:
+        list: Memórias encontradas, ou None se o armazenamento não suportar a busca textual
+    """
+    store = getattr(memory, "vector_store", None)
+    if not isinstance(store, VoxyVectorStore):
+        return None
+    return [format_result(output) for output in store.lexical_search(query, limit, {"user_id": user_id})]
+
+def retrieve_memories(memory, query: str, user_id: str, limit: int = 5, mode: Optional[str] = None,
+                      min_lexical_results: Optional[int] = None, gate=None) -> Dict:
+    """
+    Recupera as memórias relevantes para a mensagem do usuário.
+
+    Args:
+        memory: Instância da camada de memória
+        query: Mensagem do usuário
+        user_id: Identificador do usuário
+        limit: Número máximo de memórias
+        mode: 'vector' ou 'lexical_first' (padrão: MEMORY_RETRIEVAL_MODE)
+        min_lexical_results: Resultados lexicais que dispensam a busca vetorial
+            (padrão: MEMORY_LEXICAL_MIN_RESULTS)
+        gate: Filtro de mensagens triviais (padrão: `RetrievalGate.from_env()`)
+
+    Returns:
+        dict: {'results': memórias, 'path': 'skipped', 'lexical', 'hybrid' ou 'vector'}
+    """
+    gate = gate or RetrievalGate.from_env()
+    if gate.should_skip(query):
+        metrics.increment(f"retrieval.{PATH_SKIPPED}")
+        return {"results": [], "path": PATH_SKIPPED}
+
+    mode = mode or os.getenv('MEMORY_RETRIEVAL_MODE', RETRIEVAL_VECTOR)
+    if min_lexical_results is None:
+        min_lexical_results = int(os.getenv('MEMORY_LEXICAL_MIN_RESULTS', DEFAULT_LEXICAL_MIN_RESULTS))
+
+    lexical = None
+    if mode == RETRIEVAL_LEXICAL_FIRST:
+        try:
+            lexical = lexical_search(memory, query, user_id, limit)
+        except Exception as e:
+            logger.warning(f"Busca textual falhou, usando apenas a busca vetorial: {str(e)}")
+            metrics.increment("retrieval.lexical_errors")
+
+        if lexical is not None and len(lexical) >= max(1, min(min_lexical_results, limit)):
+            metrics.increment(f"retrieval.{PATH_LEXICAL}")
+            return {"results": lexical, "path": PATH_LEXICAL}
+
+    vector = memory.search(query=query, user_id=user_id, limit=limit)["results"]
+    if lexical:
+        metrics.increment(f"retrieval.{PATH_HYBRID}")
+        return {"results": reciprocal_rank_fusion([lexical, vector], limit), "path": PATH_HYBRID}
+
+    metrics.increment(f"retrieval.{PATH_VECTOR}")
+    return {"results": vector, "path": PATH_VECTOR}
+
+def retrieval_report() -> Dict[str, Dict[str, float]]:
+    """
+    Resume quantas vezes cada caminho de recuperação foi usado.
+
+    Returns:
+        dict: Caminho → {'count': ocorrências, 'share': fração do total}
+    """
+    counts = {path: metrics.get(f"retrieval.{path}") for path in PATHS}
+    total = sum(counts.values())
+    return {path: {"count": count, "share": count / total if total else 0.0} for path, count in counts.items()}
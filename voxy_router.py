@@ -0,0 +1,175 @@
+"""
+Roteamento de mensagens entre um modelo rápido e um modelo maior.
+
+O roteador atribui a cada mensagem uma pontuação de complexidade entre 0 e
+1, calculada localmente (tamanho, perguntas encadeadas, código, pedidos de
+análise ou de passo a passo), e envia ao modelo maior apenas as mensagens
+com pontuação igual ou acima do limiar. As demais vão para o modelo
+rápido, que é mais barato e responde antes.
+
+A latência de cada modelo é medida a cada resposta (média móvel). Quando a
+latência do modelo maior passa do orçamento configurado, o limiar sobe e
+somente as mensagens mais complexas continuam indo para ele. As decisões e
+o tempo economizado em relação ao modelo maior ficam registrados no log e
+nas métricas compartilhadas.
+"""
+import os
+import re
+import logging
+import threading
+from typing import Dict, Optional
+
+from voxy_gates import tokenize
+from voxy_metrics import metrics
+
+logger = logging.getLogger("voxy-agent.router")
+
+# Modelos padrão do roteador
+DEFAULT_FAST_MODEL = "gpt-4o-mini"
+DEFAULT_LARGE_MODEL = "gpt-4o"
+
+# Complexidade mínima para usar o modelo maior
+DEFAULT_ROUTER_THRESHOLD = 0.5
+
+# Peso da medição mais recente na média móvel de latência
+LATENCY_SMOOTHING = 0.2
+
+# Pedidos que costumam exigir raciocínio mais longo (texto normalizado por `tokenize`)
+_REASONING_CUES = re.compile(r"\b(" + "|".join([
+    r"expli\w*", r"analis\w*", r"compar\w*", r"avali\w*", r"justifi\w*", r"demonstr\w*", r"planej\w*",
+    r"estrateg\w*", r"resum\w*", r"revis\w*", r"refator\w*", r"otimiz\w*", r"depur\w*", r"passo a passo",
+    r"por que", r"vantagens", r"desvantagens", r"pros e contras", r"diferenca entre", r"escrev\w*",
+    r"redij\w*", r"traduz\w*", r"calcul\w*", r"explain", r"analy[sz]e", r"compare", r"evaluate", r"step by step",
+    r"why", r"design", r"debug", r"refactor", r"write",
+]) + r")\b")
+
+# Trechos de código ou dados estruturados
+_CODE = re.compile(r"```|\bdef |\bclass |\bselect .+ from\b|[{};]\s*$|=>|\bimport ", re.IGNORECASE | re.MULTILINE)
+
+class ModelRouter:
+    """Escolhe o modelo de cada mensagem pela complexidade estimada e pela latência medida."""
+
+    def __init__(self, fast_model: str = DEFAULT_FAST_MODEL, large_model: str = DEFAULT_LARGE_MODEL,
+                 threshold: float = DEFAULT_ROUTER_THRESHOLD, latency_budget: float = 0.0, enabled: bool = True):
+        """
+        Inicializa o roteador.
+
+        Args:
+            fast_model: Modelo usado nas mensagens simples
+            large_model: Modelo usado nas mensagens complexas
+            threshold: Complexidade mínima para usar o modelo maior
+            latency_budget: Segundos de latência média tolerados no modelo maior
+                antes de restringi-lo às mensagens mais complexas (0 desativa)
+            enabled: Se False, o roteador não escolhe modelos
+
+        Raises:
+            ValueError: Se o limiar ou o orçamento forem inválidos
+        """
+        if not 0 <= threshold <= 1 or latency_budget < 0:
+            raise ValueError("Limiar ou orçamento de latência do roteador inválido")
+        self.fast_model = fast_model
+        self.large_model = large_model
+        self.threshold = threshold
+        self.latency_budget = latency_budget
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._latency: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Cria o roteador a partir das variáveis MODEL_ROUTER*."""
+        enabled = os.getenv('MODEL_ROUTER', 'false').lower() in ('true', '1', 'on', 'yes')
+        return cls(
+            fast_model=os.getenv('MODEL_ROUTER_FAST', DEFAULT_FAST_MODEL),
+            large_model=os.getenv('MODEL_ROUTER_LARGE', DEFAULT_LARGE_MODEL),
+            threshold=float(os.getenv('MODEL_ROUTER_THRESHOLD', DEFAULT_ROUTER_THRESHOLD)),
+            latency_budget=float(os.getenv('MODEL_ROUTER_LATENCY_BUDGET', 0)),
+            enabled=enabled,
+        )
+
+    def score(self, message: str) -> float:
+        """
+        Estima a complexidade da mensagem.
+
+        Args:
+            message: Mensagem do usuário
+
+        Returns:
+            float: Pontuação entre 0 (simples) e 1 (complexa)
+        """
+        words = tokenize(message)
+        if not words:
+            return 0.0
+        score = min(0.4, len(words) / 150)
+        if _REASONING_CUES.search(" ".join(words)):
+            score += 0.5
+        if _CODE.search(message):
+            score += 0.4
+        if message.count("?") > 1 or message.count("\n") > 3:
+            score += 0.2
+        return min(1.0, score)
+
+    def latency(self, model: str) -> Optional[float]:
+        """Retorna a latência média medida de um modelo (None se ainda não houver medições)."""
+        with self._lock:
+            return self._latency.get(model)
+
+    def effective_threshold(self) -> float:
+        """Retorna o limiar atual, elevado quando o modelo maior excede o orçamento de latência."""
+        large = self.latency(self.large_model)
+        if self.latency_budget and large is not None and large > self.latency_budget:
+            return (self.threshold + 1.0) / 2
+        return self.threshold
+
+    def route(self, message: str) -> str:
+        """
+        Escolhe o modelo da mensagem e registra a decisão.
+
+        Args:
+            message: Mensagem do usuário
+
+        Returns:
+            str: Nome do modelo escolhido
+        """
+        score = self.score(message)
+        threshold = self.effective_threshold()
+        model = self.large_model if score >= threshold else self.fast_model
+        metrics.increment("router.large" if model == self.large_model else "router.fast")
+        logger.info(f"Modelo {model} escolhido (complexidade {score:.2f}, limiar {threshold:.2f})")
+        return model
+
+    def record(self, model: str, seconds: float):
+        """
+        Registra a latência de uma resposta e o tempo economizado em relação ao modelo maior.
+
+        Args:
+            model: Modelo que gerou a resposta
+            seconds: Duração da chamada
+        """
+        with self._lock:
+            previous = self._latency.get(model)
+            self._latency[model] = seconds if previous is None else (
+                (1 - LATENCY_SMOOTHING) * previous + LATENCY_SMOOTHING * seconds)
+            large = self._latency.get(self.large_model)
+        if model == self.fast_model and model != self.large_model and large is not None:
+            saved = max(0.0, large - seconds)
+            metrics.increment("router.saved_seconds", saved)
+            logger.info(f"Resposta de {model} em {seconds:.2f}s (~{saved:.2f}s a menos que {self.large_model})")
+
+
+def router_report() -> Dict[str, float]:
+    """
+    Resume as decisões do roteador.
+
+    Returns:
+        dict: 'fast', 'large', 'fast_share' e 'saved_seconds'
+    """
+    fast = metrics.get("router.fast")
+    large = metrics.get("router.large")
+    total = fast + large
+    return {
+        "fast": fast,
+        "large": large,
+        "fast_share": fast / total if total else 0.0,
+        "saved_seconds": metrics.get("router.saved_seconds"),
+    }
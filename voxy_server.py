@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Serviço HTTP assíncrono do Voxy-Mem0.
+
+Expõe o núcleo do `voxy_agent` (por meio do motor compartilhado de
+`voxy_engine`) para clientes HTTP:
+
+    POST /chat                  {"message": ..., "user_id": ..., "stream": false,
+                                 "model": null, "memory_limit": 5}
+    GET  /memories/{user_id}    ?limit=20&cursor=...&order=desc
+    DELETE /memories/{user_id}  ?older_than_days=30   (só com SERVER_ADMIN_TOKEN)
+    GET  /health
+
+Com "stream": true (ou o cabeçalho 'Accept: text/event-stream'), a resposta
+de /chat é enviada como server-sent events: um evento 'token' por trecho
+gerado e um evento final 'done' com a resposta completa. O campo "model"
+só aceita os modelos de SERVER_ALLOWED_MODELS (padrão: MODEL_CHOICE e os
+modelos do roteador); outros valores recebem 400. Em /memories, o
+total de memórias do usuário ('total') só é contado na primeira página
+(sem 'cursor'); nas demais, vem como null. A rota DELETE só existe com
+SERVER_ADMIN_TOKEN definido e exige o cabeçalho 'Authorization: Bearer
+<token>'; sem a variável, apagar memórias pelo HTTP fica desativado.
+
+O processamento (chamadas bloqueantes à OpenAI e ao banco) é feito em um
+pool de threads limitado. Cada mensagem passa antes pelo controle de
+admissão (`voxy_admission`): mensagens acima do limite do usuário recebem
+429 e, com a fila cheia, 503, ambos com o cabeçalho Retry-After. Ao
+encerrar, o serviço aguarda as mensagens em andamento e salva os turnos
+pendentes do buffer de extração.
+
+Uso:
+    python run.py serve --port 8000 --workers 8
+"""
+import os
+import sys
+import hmac
+import json
+import math
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Callable, Iterable, Optional, Set
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from voxy_admission import REJECTED_RATE_LIMITED, AdmissionController, AdmissionRejected, admission_report
+from voxy_budget import degraded_report
+from voxy_embeddings import embedding_batch_report
+from voxy_prompt import prompt_cache_report
+
+logger = logging.getLogger("voxy-agent.server")
+
+# Mensagens processadas simultaneamente (threads do pool)
+DEFAULT_MAX_WORKERS = 8
+
+# Tamanho padrão e máximo das páginas de /memories
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Memórias recuperadas por mensagem (padrão e máximo aceitos em /chat)
+DEFAULT_MEMORY_LIMIT = 5
+MAX_MEMORY_LIMIT = 20
+
+def allowed_models(engine) -> Set[str]:
+    """
+    Retorna os modelos aceitos no campo "model" de /chat.
+
+    Args:
+        engine: Motor do serviço (fornece os modelos do roteador)
+
+    Returns:
+        set: Modelos de SERVER_ALLOWED_MODELS (separados por vírgula) ou, sem
+            essa variável, MODEL_CHOICE e os modelos rápido e maior do roteador
+    """
+    configured = {model.strip() for model in os.getenv('SERVER_ALLOWED_MODELS', '').split(',') if model.strip()}
+    if configured:
+        return configured
+    return {os.getenv('MODEL_CHOICE', 'gpt-4o-mini'), engine.router.fast_model, engine.router.large_model}
+
+def sse_event(event: str, data: dict) -> str:
+    """
+    Formata um server-sent event.
+
+    Args:
+        event: Nome do evento
+        data: Conteúdo, serializado em JSON
+
+    Returns:
+        str: Evento pronto para envio
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _error(message: str, status_code: int) -> JSONResponse:
+    """Resposta de erro em JSON."""
+    return JSONResponse({"error": message}, status_code=status_code)
+
+def _rejected(error: AdmissionRejected) -> JSONResponse:
+    """Resposta para mensagens recusadas pelo controle de admissão."""
+    status_code = 429 if error.reason == REJECTED_RATE_LIMITED else 503
+    return JSONResponse({"error": str(error), "reason": error.reason}, status_code=status_code,
+                        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))})
+
+def create_app(engine_factory: Optional[Callable] = None, max_workers: int = DEFAULT_MAX_WORKERS,
+               admission: Optional[AdmissionController] = None, models: Optional[Iterable[str]] = None,
+               admin_token: Optional[str] = None) -> Starlette:
+    """
+    Cria a aplicação HTTP.
+
+    Args:
+        engine_factory: Função que retorna o motor (padrão: `voxy_engine.get_engine`)
+        max_workers: Mensagens processadas simultaneamente
+        admission: Controle de admissão (padrão: variáveis ADMISSION_*, com `max_workers` vagas)
+        models: Modelos aceitos no campo "model" de /chat (padrão: `allowed_models(engine)`)
+        admin_token: Token exigido em DELETE /memories (padrão: SERVER_ADMIN_TOKEN;
+            sem token, a rota não é registrada)
+
+    Returns:
+        Starlette: Aplicação ASGI
+    """
+    if engine_factory is None:
+        from voxy_engine import get_engine
+        engine_factory = get_engine
+    admission = admission or AdmissionController.from_env(max_concurrency=max_workers)
+    if admin_token is None:
+        admin_token = os.getenv('SERVER_ADMIN_TOKEN', '').strip()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Threads para as mensagens admitidas, as que aguardam na fila e as listagens
+        app.state.executor = ThreadPoolExecutor(admission.max_concurrency + admission.max_queue + 4,
+                                                thread_name_prefix="voxy-worker")
+        # Inicializa o motor antes de aceitar conexões, para que erros de configuração apareçam na partida
+        app.state.engine = await asyncio.get_running_loop().run_in_executor(app.state.executor, engine_factory)
+        app.state.models = set(models) if models is not None else allowed_models(app.state.engine)
+        logger.info(f"Serviço HTTP pronto ({max_workers} workers)")
+        try:
+            yield
+        finally:
+            # Aguarda as mensagens em andamento e salva os turnos pendentes
+            app.state.executor.shutdown(wait=True)
+            app.state.engine.close()
+            logger.info("Serviço HTTP encerrado")
+
+    async def run_blocking(app, func, *args, **kwargs):
+        """Executa uma chamada bloqueante no pool de threads."""
+        return await asyncio.get_running_loop().run_in_executor(app.state.executor, partial(func, *args, **kwargs))
+
+    async def chat(request: Request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return _error("Corpo da requisição deve ser JSON", 400)
+        if not isinstance(body, dict):
+            return _error("Corpo da requisição deve ser um objeto JSON", 400)
+
+        message = body.get("message") or ""
+        user_id = body.get("user_id") or ""
+        if not isinstance(message, str) or not isinstance(user_id, str):
+            return _error("Campos 'message' e 'user_id' devem ser texto", 400)
+        message, user_id = message.strip(), user_id.strip()
+        if not message or not user_id:
+            return _error("Campos 'message' e 'user_id' são obrigatórios", 400)
+
+        # Configurações opcionais da conversa (sem modelo: roteador ou MODEL_CHOICE)
+        model = body.get("model")
+        memory_limit = body.get("memory_limit", DEFAULT_MEMORY_LIMIT)
+        if (model is not None and not isinstance(model, str)) or type(memory_limit) is not int \
+                or not 1 <= memory_limit <= MAX_MEMORY_LIMIT:
+            return _error(f"'model' deve ser texto e 'memory_limit' um inteiro entre 1 e {MAX_MEMORY_LIMIT}", 400)
+        if model is not None and model not in request.app.state.models:
+            return _error(f"Modelo não permitido: {model} (aceitos: {', '.join(sorted(request.app.state.models))})", 400)
+        options = {"model": model, "memory_limit": memory_limit}
+
+        # Recusa imediata (limite do usuário ou fila cheia) e espera pela vez na fila justa
+        try:
+            ticket = admission.enqueue(user_id)
+        except AdmissionRejected as e:
+            return _rejected(e)
+        try:
+            await run_blocking(request.app, admission.wait, ticket)
+        except AdmissionRejected as e:
+            return _rejected(e)
+        except asyncio.CancelledError:
+            admission.cancel(ticket)
+            raise
+
+        engine = request.app.state.engine
+        stream = bool(body.get("stream")) or "text/event-stream" in request.headers.get("accept", "")
+        if not stream:
+            # A vaga só é liberada quando o worker termina, mesmo que o cliente desconecte antes
+            task = asyncio.ensure_future(run_blocking(request.app, engine.process_message, message, user_id, **options))
+            task.add_done_callback(lambda _: admission.release(ticket))
+            response = await asyncio.shield(task)
+            return JSONResponse({"response": response, "user_id": user_id})
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def on_token(delta: str):
+            # Chamado na thread do worker; entrega o trecho ao loop de eventos
+            loop.call_soon_threadsafe(queue.put_nowait, delta)
+
+        def finished(_):
+            # Libera a vaga mesmo que o cliente desconecte antes do fim do streaming
+            admission.release(ticket)
+            queue.put_nowait(None)
+
+        task = asyncio.ensure_future(
+            run_blocking(request.app, engine.process_message, message, user_id, on_token=on_token, **options))
+        task.add_done_callback(finished)
+
+        async def events():
+            while (delta := await queue.get()) is not None:
+                yield sse_event("token", {"content": delta})
+            try:
+                yield sse_event("done", {"response": task.result(), "user_id": user_id})
+            except Exception as e:
+                logger.error(f"Erro ao processar mensagem em streaming: {str(e)}")
+                yield sse_event("error", {"error": str(e)})
+
+        return StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    async def memories(request: Request):
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return _error("'limit' deve ser um inteiro", 400)
+        order = request.query_params.get("order", "desc")
+        if not 1 <= limit <= MAX_PAGE_SIZE or order not in ("asc", "desc"):
+            return _error(f"'limit' deve estar entre 1 e {MAX_PAGE_SIZE} e 'order' deve ser 'asc' ou 'desc'", 400)
+
+        engine = request.app.state.engine
+        try:
+            page = await run_blocking(request.app, engine.list_memories, request.path_params["user_id"], limit,
+                                      request.query_params.get("cursor"), order == "desc")
+        except ValueError as e:
+            return _error(str(e), 400)
+        return JSONResponse(page)
+
+    async def delete_memories(request: Request):
+        authorization = request.headers.get("authorization", "")
+        if not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {admin_token}".encode("utf-8")):
+            return _error("Token de administração inválido", 401)
+
+        older_than_days = request.query_params.get("older_than_days")
+        if older_than_days is not None:
+            try:
+                older_than_days = float(older_than_days)
+            except ValueError:
+                older_than_days = -1.0
+            if older_than_days < 0:
+                return _error("'older_than_days' deve ser um número não negativo", 400)
+
+        engine = request.app.state.engine
+        deleted = await run_blocking(request.app, engine.delete_memories, request.path_params["user_id"],
+                                     older_than_days)
+        return JSONResponse({"deleted": deleted, "user_id": request.path_params["user_id"]})
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok", "engine": request.app.state.engine.stats(),
+                             "admission": {**admission.stats(), **admission_report()},
+                             "prompt_cache": prompt_cache_report(),
+                             "embedding_batches": embedding_batch_report(),
+                             "degraded": {**degraded_report(),
+                                          "breaker": request.app.state.engine.budget.breaker.state}})
+
+    routes = [
+        Route("/chat", chat, methods=["POST"]),
+        Route("/memories/{user_id}", memories, methods=["GET"]),
+        Route("/health", health, methods=["GET"]),
+    ]
+    if admin_token:
+        routes.append(Route("/memories/{user_id}", delete_memories, methods=["DELETE"]))
+    return Starlette(routes=routes, lifespan=lifespan)
+
+def main(argv=None) -> int:
+    """Executa o serviço HTTP com o uvicorn."""
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Serviço HTTP do Voxy-Mem0")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta (padrão: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Porta de escuta (padrão: 8000)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Mensagens processadas simultaneamente (padrão: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--keep-alive", type=int, default=15,
+                        help="Segundos que conexões ociosas ficam abertas (padrão: 15)")
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Segundos para concluir as requisições em andamento ao encerrar (padrão: 30)")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers deve ser maior que zero")
+
+    import uvicorn
+    uvicorn.run(create_app(max_workers=args.workers), host=args.host, port=args.port,
+                timeout_keep_alive=args.keep_alive, timeout_graceful_shutdown=args.graceful_timeout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
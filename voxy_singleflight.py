@@ -0,0 +1,123 @@
+"""
+Deduplicação de chamadas idênticas simultâneas (single-flight).
+
+Chamadas com a mesma chave feitas enquanto a primeira ainda está em
+andamento aguardam e recebem o mesmo resultado, em vez de repetir o
+trabalho (chamadas ao LLM, embeddings e consultas ao banco). Resultados
+concluídos com sucesso continuam disponíveis por uma janela curta, o que
+absorve reexecuções do Streamlit e cliques duplos. Erros são repassados
+às chamadas que aguardavam, mas não ficam guardados.
+"""
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from voxy_metrics import metrics
+
+# Segundos em que um resultado concluído continua sendo reaproveitado
+DEFAULT_DEDUP_WINDOW = 5.0
+
+class _Call:
+    """Execução compartilhada por todas as chamadas de uma chave."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.done_at: Optional[float] = None
+
+
+class SingleFlight:
+    """Agrupa chamadas idênticas em uma única execução, de forma segura entre threads."""
+
+    def __init__(self, window: float = DEFAULT_DEDUP_WINDOW, clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o agrupador.
+
+        Args:
+            window: Segundos em que resultados concluídos são reaproveitados (0 desativa)
+            clock: Relógio monotônico (substituível nos testes)
+        """
+        if window < 0:
+            raise ValueError(f"Janela de deduplicação inválida: {window}")
+        self.window = window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    @classmethod
+    def from_env(cls) -> "SingleFlight":
+        """Cria o agrupador a partir de DEDUP_WINDOW_SECONDS."""
+        return cls(float(os.getenv('DEDUP_WINDOW_SECONDS', DEFAULT_DEDUP_WINDOW)))
+
+    def _evict(self, now: float):
+        """Descarta resultados fora da janela (chamado com o lock)."""
+        expired = [key for key, call in self._calls.items()
+                   if call.done_at is not None and now - call.done_at >= self.window]
+        for key in expired:
+            del self._calls[key]
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """
+        Executa `func` uma única vez para todas as chamadas simultâneas com a mesma chave.
+
+        Args:
+            key: Chave da chamada (ex.: ('chat', user_id, mensagem))
+            func: Função a executar
+            *args: Argumentos posicionais de `func`
+            **kwargs: Argumentos nomeados de `func`
+
+        Returns:
+            Any: Resultado de `func`, compartilhado entre as chamadas
+        """
+        with self._lock:
+            self._evict(self.clock())
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done_at is not None:
+                metrics.increment("singleflight.cached")
+            else:
+                metrics.increment("singleflight.coalesced")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.increment("singleflight.executed")
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.done_at = self.clock()
+                # Erros não são guardados; a próxima chamada tenta novamente
+                if (call.error is not None or not self.window) and self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def forget(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Descarta os resultados guardados cujas chaves satisfazem `predicate`.
+
+        Execuções em andamento não são interrompidas nem descartadas: as chamadas
+        que chegarem enquanto elas não terminam continuam aguardando o mesmo resultado.
+
+        Args:
+            predicate: Função que recebe a chave e retorna True para descartá-la
+
+        Returns:
+            int: Número de chaves descartadas
+        """
+        with self._lock:
+            keys = [key for key, call in self._calls.items() if call.done_at is not None and predicate(key)]
+            for key in keys:
+                del self._calls[key]
+        return len(keys)
@@ -0,0 +1,1160 @@
+"""
+Acesso direto (SQL) à coleção vetorial do Voxy-Mem0 no Supabase.
+
+O mem0 grava as memórias através da biblioteca vecs, que cria a tabela
+`vecs.<nome_da_coleção>` com as colunas `id`, `vec` e `metadata`. Operações
+em massa (exportação, importação, listagem, remoção) não passam pela API do
+mem0: são executadas aqui diretamente sobre essa tabela, em lotes.
+"""
+import base64
+import io
+import json
+import logging
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from pydantic import BaseModel
+from mem0.vector_stores.base import VectorStoreBase
+
+logger = logging.getLogger("voxy-agent.store")
+
+# Esquema onde o vecs cria as tabelas das coleções
+VECS_SCHEMA = "vecs"
+
+# Coleção padrão usada pelo agente
+DEFAULT_COLLECTION = "voxy_memories"
+
+# Modelo e dimensão de embeddings padrão
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_EMBEDDING_DIMS = 1536
+
+# Layouts de armazenamento da coleção
+LAYOUT_DEFAULT = "default"
+LAYOUT_PARTITIONED = "partitioned"
+
+# Expressão usada como chave de particionamento por hash
+PARTITION_KEY = "(metadata->>'user_id')"
+
+# Quantização usada no índice vetorial (busca em dois estágios)
+QUANTIZATION_NONE = "none"
+QUANTIZATION_HALFVEC = "halfvec"
+QUANTIZATION_BINARY = "binary"
+QUANTIZATIONS = (QUANTIZATION_NONE, QUANTIZATION_HALFVEC, QUANTIZATION_BINARY)
+
+# Operador de distância e classe de operadores do índice de cada quantização
+_QUANTIZED_OPERATORS = {QUANTIZATION_HALFVEC: "<=>", QUANTIZATION_BINARY: "<~>"}
+_QUANTIZED_OPCLASSES = {QUANTIZATION_HALFVEC: "halfvec_cosine_ops", QUANTIZATION_BINARY: "bit_hamming_ops"}
+
+# Configuração de busca textual do Postgres e documento indexado (texto da memória)
+FTS_CONFIG = "portuguese"
+FTS_DOCUMENT = f"to_tsvector('{FTS_CONFIG}', coalesce(metadata->>'data', ''))"
+
+# Chave de ordenação da listagem de memórias (data de criação gravada pelo mem0)
+LISTING_SORT_KEY = "coalesce(metadata->>'created_at', '')"
+
+# Índices criados por `utils/setup_supabase.py` em cada tabela (ou partição), pelo sufixo do nome
+INDEX_HNSW = "hnsw"
+INDEX_FULLTEXT = "fts"
+INDEX_LISTING = "listing"
+INDEX_SUFFIXES = {
+    INDEX_HNSW: "vec_hnsw",
+    QUANTIZATION_HALFVEC: f"vec_{QUANTIZATION_HALFVEC}",
+    QUANTIZATION_BINARY: f"vec_{QUANTIZATION_BINARY}",
+    INDEX_FULLTEXT: "fts",
+    INDEX_LISTING: "user_created",
+}
+
+# Candidatos buscados no índice quantizado para cada resultado reordenado
+DEFAULT_RERANK_FACTOR = 4
+
+# Número máximo de conexões mantidas pelo armazenamento vetorial
+MAX_POOL_CONNECTIONS = 10
+
+# Tabela que aponta cada nome lógico de coleção para a tabela ativa
+# (o prefixo '_' impede que o vecs a liste como coleção)
+ALIASES_TABLE = "_voxy_collection_aliases"
+
+# Registro de memória: (id, vetor, metadados)
+Record = Tuple[str, Optional[List[float]], Dict[str, Any]]
+
+def collection_table(collection_name: str) -> sql.Identifier:
+    """
+    Retorna o identificador SQL da tabela de uma coleção.
+
+    Args:
+        collection_name: Nome da coleção (ex.: 'voxy_memories')
+
+    Returns:
+        sql.Identifier: Identificador qualificado `vecs.<coleção>`
+    """
+    return sql.Identifier(VECS_SCHEMA, collection_name)
+
+def connect(database_url: str):
+    """
+    Abre uma conexão com o banco de dados.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+
+    Returns:
+        connection: Conexão psycopg2
+    """
+    return psycopg2.connect(database_url)
+
+def parse_vector(value: Optional[str]) -> Optional[List[float]]:
+    """
+    Converte a representação textual do pgvector ('[1,2,3]') em lista de floats.
+
+    Args:
+        value: Texto retornado pelo banco de dados
+
+    Returns:
+        list: Valores do vetor, ou None se o valor for nulo
+    """
+    if value is None:
+        return None
+    return json.loads(value)
+
+def format_vector(values: Sequence[float]) -> str:
+    """
+    Converte uma lista de floats no formato textual aceito pelo pgvector.
+
+    Args:
+        values: Valores do vetor
+
+    Returns:
+        str: Vetor no formato '[1.0,2.0,3.0]'
+    """
+    return "[" + ",".join(repr(float(v)) for v in values) + "]"
+
+def get_dimension(conn, collection_name: str) -> Optional[int]:
+    """
+    Obtém a dimensão dos vetores de uma coleção existente.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+
+    Returns:
+        int: Dimensão dos vetores, ou None se a coleção não existir
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT pa.atttypmod
+            FROM pg_class pc
+            JOIN pg_namespace pn ON pn.oid = pc.relnamespace
+            JOIN pg_attribute pa ON pa.attrelid = pc.oid
+            WHERE pn.nspname = %s
+            AND pc.relname = %s
+            AND pa.attname = 'vec';
+        """, (VECS_SCHEMA, collection_name))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+def is_partitioned(conn, collection_name: str) -> bool:
+    """
+    Verifica se a tabela da coleção usa o layout particionado.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+
+    Returns:
+        bool: True se a tabela for particionada
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT pc.relkind = 'p'
+            FROM pg_class pc
+            JOIN pg_namespace pn ON pn.oid = pc.relnamespace
+            WHERE pn.nspname = %s AND pc.relname = %s;
+        """, (VECS_SCHEMA, collection_name))
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+def partition_name(collection_name: str, index: int) -> str:
+    """
+    Retorna o nome da partição de índice `index` de uma coleção.
+
+    O prefixo '_' impede que o vecs liste as partições como coleções.
+    """
+    return f"_{collection_name}_p{index}"
+
+def list_partitions(conn, collection_name: str) -> List[str]:
+    """
+    Lista as partições de uma coleção particionada.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+
+    Returns:
+        list: Nomes das partições (vazia para o layout padrão)
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname
+            FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            JOIN pg_namespace pn ON pn.oid = parent.relnamespace
+            WHERE pn.nspname = %s AND parent.relname = %s
+            ORDER BY child.relname;
+        """, (VECS_SCHEMA, collection_name))
+        return [row[0] for row in cursor.fetchall()]
+
+def collection_layout(conn, collection_name: str) -> Dict[str, Any]:
+    """
+    Descreve o layout físico de uma coleção: partições e índices conhecidos.
+
+    Um índice só é considerado presente se existir em todas as tabelas da
+    coleção (em todas as partições, no layout particionado).
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+
+    Returns:
+        dict: 'partitions' (0 no layout padrão) e 'indexes' (chaves de INDEX_SUFFIXES, ordenadas)
+    """
+    partitions = list_partitions(conn, collection_name)
+    tables = partitions or [collection_name]
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT tablename, indexname FROM pg_indexes WHERE schemaname = %s AND tablename = ANY(%s);",
+                       (VECS_SCHEMA, tables))
+        rows = cursor.fetchall()
+    names = {table: [] for table in tables}
+    for table, index_name in rows:
+        names.setdefault(table, []).append(index_name)
+    indexes = sorted(index for index, suffix in INDEX_SUFFIXES.items()
+                     if all(any(name.endswith(f"_{suffix}") for name in names[table]) for table in tables))
+    return {"partitions": len(partitions), "indexes": indexes}
+
+def quantized_expression(quantization: str, dimension: int, value: sql.Composable) -> sql.Composed:
+    """
+    Retorna a expressão quantizada de um vetor, idêntica à do índice.
+
+    Args:
+        quantization: 'halfvec' ou 'binary'
+        dimension: Dimensão dos vetores
+        value: Expressão SQL do vetor (coluna ou parâmetro)
+
+    Returns:
+        sql.Composed: Expressão quantizada
+    """
+    if quantization == QUANTIZATION_HALFVEC:
+        return sql.SQL("({}::halfvec({}))").format(value, sql.Literal(dimension))
+    if quantization == QUANTIZATION_BINARY:
+        return sql.SQL("(binary_quantize({})::bit({}))").format(value, sql.Literal(dimension))
+    raise ValueError(f"Quantização inválida: {quantization}")
+
+def quantized_index_sql(table: sql.Identifier, index_name: str, quantization: str, dimension: int) -> sql.Composed:
+    """
+    Monta o comando que cria o índice HNSW sobre a expressão quantizada.
+
+    Args:
+        table: Tabela (ou partição) a indexar
+        index_name: Nome do índice
+        quantization: 'halfvec' ou 'binary'
+        dimension: Dimensão dos vetores
+
+    Returns:
+        sql.Composed: Comando CREATE INDEX
+    """
+    return sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING hnsw ({} {});").format(
+        sql.Identifier(index_name), table,
+        quantized_expression(quantization, dimension, sql.SQL("vec")),
+        sql.SQL(_QUANTIZED_OPCLASSES[quantization]),
+    )
+
+def build_where(filters: Optional[dict], partitioned: bool = False) -> Tuple[sql.Composable, list]:
+    """
+    Monta a cláusula WHERE para os filtros do mem0.
+
+    Filtros escalares usam o operador de contenção (`@>`), atendido pelo
+    índice GIN dos metadados. No layout particionado, o filtro de user_id
+    também é aplicado sobre a chave de particionamento.
+
+    Args:
+        filters: Filtros de metadados (ex.: {'user_id': 'alice'})
+        partitioned: Se a coleção usa o layout particionado
+
+    Returns:
+        tuple: (cláusula SQL, parâmetros)
+    """
+    if not filters:
+        return sql.SQL(""), []
+
+    clauses = [sql.SQL("metadata @> %s")]
+    params: list = [Json(filters)]
+    if partitioned and filters.get("user_id") is not None:
+        clauses.append(sql.SQL(PARTITION_KEY + " = %s"))
+        params.append(str(filters["user_id"]))
+    return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(clauses), params
+
+def build_search(table: sql.Identifier, query_vector: Sequence[float], top_k: int,
+                 filters: Optional[dict] = None, partitioned: bool = False,
+                 quantization: str = QUANTIZATION_NONE,
+                 rerank_factor: int = DEFAULT_RERANK_FACTOR) -> Tuple[sql.Composed, list]:
+    """
+    Monta a consulta de busca por similaridade (distância de cosseno).
+
+    Sem quantização, ordena diretamente pela distância exata. Com
+    quantização, faz a busca em dois estágios: seleciona
+    `top_k * rerank_factor` candidatos pelo índice quantizado (menor e
+    mais provável de caber em shared_buffers) e reordena esses candidatos
+    pela distância exata sobre os vetores float32.
+
+    Returns:
+        tuple: (consulta SQL, parâmetros)
+    """
+    where, where_params = build_where(filters, partitioned)
+    vector = format_vector(query_vector)
+
+    if quantization == QUANTIZATION_NONE:
+        query = sql.SQL("""
+            SELECT id, vec <=> %s::vector AS distance, metadata
+            FROM {}{}
+            ORDER BY distance
+            LIMIT %s;
+        """).format(table, where)
+        return query, [vector] + where_params + [top_k]
+
+    dimension = len(query_vector)
+    query = sql.SQL("""
+        SELECT id, vec <=> %s::vector AS distance, metadata
+        FROM (
+            SELECT id, vec, metadata
+            FROM {table}{where}
+            ORDER BY {column} {operator} {parameter}
+            LIMIT %s
+        ) candidates
+        ORDER BY distance
+        LIMIT %s;
+    """).format(
+        table=table,
+        where=where,
+        column=quantized_expression(quantization, dimension, sql.SQL("vec")),
+        operator=sql.SQL(_QUANTIZED_OPERATORS[quantization]),
+        parameter=quantized_expression(quantization, dimension, sql.SQL("%s::vector")),
+    )
+    return query, [vector] + where_params + [vector, top_k * rerank_factor, top_k]
+
+def resolve_collection(conn, alias: str) -> str:
+    """
+    Resolve o nome lógico de uma coleção para a tabela ativa.
+
+    Args:
+        conn: Conexão com o banco de dados
+        alias: Nome lógico (ex.: 'voxy_memories')
+
+    Returns:
+        str: Tabela ativa, ou o próprio nome se não houver redirecionamento
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (f'{VECS_SCHEMA}."{ALIASES_TABLE}"',))
+        if not cursor.fetchone()[0]:
+            return alias
+        cursor.execute(sql.SQL("SELECT collection_name FROM {} WHERE alias = %s;").format(
+            collection_table(ALIASES_TABLE)), (alias,))
+        row = cursor.fetchone()
+    return row[0] if row else alias
+
+def active_collection(database_url: str, alias: str) -> str:
+    """
+    Abre uma conexão e resolve o nome lógico da coleção (ver `resolve_collection`).
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        alias: Nome lógico da coleção
+
+    Returns:
+        str: Tabela ativa
+    """
+    conn = connect(database_url)
+    try:
+        return resolve_collection(conn, alias)
+    finally:
+        conn.close()
+
+def switch_collection(conn, alias: str, collection_name: str):
+    """
+    Aponta o nome lógico para outra tabela em uma única atualização.
+
+    Novas instâncias do agente passam a usar a nova tabela; as que já
+    estão em execução continuam na anterior até serem reiniciadas. A
+    transação não é confirmada aqui.
+
+    Args:
+        conn: Conexão com o banco de dados
+        alias: Nome lógico da coleção
+        collection_name: Tabela que passa a ser a ativa
+    """
+    table = collection_table(ALIASES_TABLE)
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
+                alias text PRIMARY KEY,
+                collection_name text NOT NULL,
+                previous_collection text,
+                switched_at timestamptz NOT NULL DEFAULT now()
+            );
+        """).format(table))
+        cursor.execute(sql.SQL("""
+            INSERT INTO {table} AS a (alias, collection_name, previous_collection)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (alias) DO UPDATE
+            SET previous_collection = a.collection_name,
+                collection_name = EXCLUDED.collection_name,
+                switched_at = now();
+        """).format(table=table), (alias, collection_name, alias))
+
+def build_keyword_search(table: sql.Identifier, query_text: str, top_k: int,
+                         filters: Optional[dict] = None, partitioned: bool = False) -> Tuple[sql.Composed, list]:
+    """
+    Monta a consulta de busca textual sobre o texto das memórias.
+
+    Todos os termos relevantes da consulta (exceto stopwords) precisam
+    aparecer na memória, o que torna a busca precisa para nomes, IDs e
+    palavras-chave exatas. A expressão é a mesma do índice GIN criado por
+    `utils/setup_supabase.py --fts`.
+
+    Returns:
+        tuple: (consulta SQL, parâmetros)
+    """
+    where, where_params = build_where(filters, partitioned)
+    match = sql.SQL(FTS_DOCUMENT + " @@ query")
+    where = where + sql.SQL(" AND ") + match if filters else sql.SQL(" WHERE ") + match
+    query = sql.SQL("""
+        SELECT id, ts_rank_cd({document}, query) AS rank, metadata
+        FROM {table}, websearch_to_tsquery({config}, %s) query{where}
+        ORDER BY rank DESC
+        LIMIT %s;
+    """).format(
+        document=sql.SQL(FTS_DOCUMENT),
+        table=table,
+        config=sql.Literal(FTS_CONFIG),
+        where=where,
+    )
+    return query, [query_text] + where_params + [top_k]
+
+def fulltext_index_sql(table: sql.Identifier, index_name: str) -> sql.Composed:
+    """
+    Monta o comando que cria o índice GIN de busca textual.
+
+    Args:
+        table: Tabela (ou partição) a indexar
+        index_name: Nome do índice
+
+    Returns:
+        sql.Composed: Comando CREATE INDEX
+    """
+    return sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING gin ({});").format(
+        sql.Identifier(index_name), table, sql.SQL(FTS_DOCUMENT))
+
+def encode_cursor(sort_value: str, record_id: str) -> str:
+    """
+    Codifica a posição de uma página da listagem em um cursor opaco.
+
+    Args:
+        sort_value: Valor da chave de ordenação do último registro
+        record_id: Id do último registro
+
+    Returns:
+        str: Cursor seguro para URLs
+    """
+    return base64.urlsafe_b64encode(json.dumps([sort_value, record_id]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decodifica um cursor criado por `encode_cursor`.
+
+    Raises:
+        ValueError: Se o cursor for inválido
+    """
+    try:
+        sort_value, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return str(sort_value), str(record_id)
+
+def build_listing(table: sql.Identifier, user_id: str, limit: int, cursor: Optional[str] = None,
+                  descending: bool = True) -> Tuple[sql.Composed, list]:
+    """
+    Monta a consulta de uma página das memórias de um usuário (paginação por chave).
+
+    A ordenação por (data de criação, id) e o filtro pela expressão do
+    user_id são atendidos pelo índice de `listing_index_sql`: cada página
+    lê apenas `limit` linhas, qualquer que seja a posição na listagem. No
+    layout particionado, o mesmo filtro seleciona uma única partição.
+
+    Args:
+        table: Tabela da coleção
+        user_id: Identificador do usuário
+        limit: Memórias por página
+        cursor: Cursor da página anterior (`next_cursor`), ou None para a primeira
+        descending: Se True, as memórias mais recentes vêm primeiro
+
+    Returns:
+        tuple: (consulta SQL, parâmetros); a consulta retorna até `limit + 1`
+            linhas (id, chave de ordenação, metadados)
+    """
+    direction, comparison = (sql.SQL("DESC"), sql.SQL("<")) if descending else (sql.SQL("ASC"), sql.SQL(">"))
+    after = sql.SQL("")
+    params: list = [user_id]
+    if cursor:
+        after = sql.SQL(" AND ({key}, id) {comparison} (%s, %s)").format(
+            key=sql.SQL(LISTING_SORT_KEY), comparison=comparison)
+        params.extend(decode_cursor(cursor))
+    query = sql.SQL("""
+        SELECT id, {key}, metadata FROM {table}
+        WHERE {user_key} = %s{after}
+        ORDER BY {key} {direction}, id {direction}
+        LIMIT %s;
+    """).format(key=sql.SQL(LISTING_SORT_KEY), table=table, user_key=sql.SQL(PARTITION_KEY),
+                after=after, direction=direction)
+    return query, params + [limit + 1]
+
+def listing_index_sql(table: sql.Identifier, index_name: str) -> sql.Composed:
+    """
+    Monta o comando que cria o índice da listagem por usuário e data de criação.
+
+    Args:
+        table: Tabela (ou partição) a indexar
+        index_name: Nome do índice
+
+    Returns:
+        sql.Composed: Comando CREATE INDEX
+    """
+    return sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} ({}, ({}), id);").format(
+        sql.Identifier(index_name), table, sql.SQL(PARTITION_KEY), sql.SQL(LISTING_SORT_KEY))
+
+def count_user_memories(conn, collection_name: str, user_id: str) -> int:
+    """
+    Conta as memórias de um usuário.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        user_id: Identificador do usuário
+
+    Returns:
+        int: Número de memórias
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("SELECT count(*) FROM {} WHERE {} = %s;").format(
+            collection_table(collection_name), sql.SQL(PARTITION_KEY)), (user_id,))
+        return cursor.fetchone()[0]
+
+def list_user_memories(conn, collection_name: str, user_id: str, limit: int = 20, cursor: Optional[str] = None,
+                       descending: bool = True, with_total: bool = True) -> Dict[str, Any]:
+    """
+    Lê uma página das memórias de um usuário diretamente da coleção, sem embeddings.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        user_id: Identificador do usuário
+        limit: Memórias por página
+        cursor: Cursor da página anterior, ou None para a primeira
+        descending: Se True, as memórias mais recentes vêm primeiro
+        with_total: Se True, inclui o total de memórias do usuário
+
+    Returns:
+        dict: 'records' (lista de (id, metadados)), 'next_cursor' (None na
+            última página) e 'total' (None se `with_total` for False)
+    """
+    query, params = build_listing(collection_table(collection_name), user_id, limit, cursor, descending)
+    with conn.cursor() as db_cursor:
+        db_cursor.execute(query, params)
+        rows = db_cursor.fetchall()
+
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(rows) > limit else None
+    return {
+        "records": [(record_id, metadata or {}) for record_id, _, metadata in page],
+        "next_cursor": next_cursor,
+        "total": count_user_memories(conn, collection_name, user_id) if with_total else None,
+    }
+
+def delete_user_memories(conn, collection_name: str, user_id: str, older_than: Optional[datetime] = None,
+                         batch_size: int = 1000, progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Remove as memórias de um usuário em lotes, confirmando cada lote.
+
+    Cada lote é uma transação curta que apaga no máximo `batch_size` linhas,
+    de modo que os locks sobre a tabela (ou a partição do usuário) duram
+    pouco e o tráfego das outras sessões não é bloqueado. O histórico de
+    alterações do mem0 (SQLite local) não é alterado.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        user_id: Identificador do usuário
+        older_than: Remove apenas as memórias criadas antes deste instante (opcional)
+        batch_size: Linhas removidas por transação
+        progress: Função chamada após cada lote com (removidas, total)
+
+    Returns:
+        int: Número de memórias removidas
+    """
+    table = collection_table(collection_name)
+    condition = sql.SQL(PARTITION_KEY + " = %s")
+    params: list = [user_id]
+    if older_than is not None:
+        condition += sql.SQL(" AND (metadata->>'created_at')::timestamptz < %s")
+        params.append(older_than)
+
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("SELECT count(*) FROM {} WHERE {};").format(table, condition), params)
+        total = cursor.fetchone()[0]
+    conn.commit()
+
+    # A condição também fica na consulta externa para que o Postgres acesse apenas a partição do usuário
+    delete = sql.SQL("""
+        DELETE FROM {table} WHERE {condition}
+        AND id IN (SELECT id FROM {table} WHERE {condition} LIMIT %s);
+    """).format(table=table, condition=condition)
+    deleted = 0
+    while deleted < total:
+        with conn.cursor() as cursor:
+            cursor.execute(delete, params + params + [batch_size])
+            removed = cursor.rowcount
+        conn.commit()
+        if not removed:
+            break
+        deleted += removed
+        if progress:
+            progress(deleted, total)
+    return deleted
+
+def get_collection_config(conn, collection_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Lê a configuração de embeddings gravada no comentário da tabela da coleção.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+
+    Returns:
+        dict: Configuração gravada, ou None se não houver
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT obj_description(to_regclass(%s), 'pg_class');",
+                       (f'{VECS_SCHEMA}."{collection_name}"',))
+        row = cursor.fetchone()
+    if not row or not row[0]:
+        return None
+    try:
+        config = json.loads(row[0])
+    except ValueError:
+        return None
+    return config if isinstance(config, dict) else None
+
+def set_collection_config(conn, collection_name: str, config: Dict[str, Any]):
+    """
+    Grava a configuração de embeddings no comentário da tabela da coleção.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        config: Configuração a gravar (ex.: modelo e dimensão)
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("COMMENT ON TABLE {} IS {};").format(
+            collection_table(collection_name), sql.Literal(json.dumps(config))
+        ))
+
+def ensure_embedding_config(database_url: str, collection_name: str, model: str, dimensions: int):
+    """
+    Garante que a coleção foi criada com o modelo e a dimensão configurados.
+
+    Se a coleção ainda não tiver a configuração gravada, ela é registrada
+    (desde que a dimensão dos vetores seja compatível). Coleções
+    inexistentes são ignoradas: o mem0 as cria na inicialização, e esta
+    função deve ser chamada novamente depois disso.
+
+    Args:
+        database_url: URL de conexão com o banco de dados
+        collection_name: Nome da coleção
+        model: Modelo de embeddings configurado
+        dimensions: Dimensão dos embeddings configurada
+
+    Raises:
+        ValueError: Se a coleção usar outro modelo ou outra dimensão
+    """
+    expected = {"embedding_model": model, "embedding_dims": dimensions}
+    conn = connect(database_url)
+    try:
+        column_dims = get_dimension(conn, collection_name)
+        if column_dims is None:
+            return
+
+        stored = get_collection_config(conn, collection_name)
+        if column_dims != dimensions or (stored is not None and stored != expected):
+            stored_model = (stored or {}).get("embedding_model", "desconhecido")
+            raise ValueError(
+                f"A coleção '{collection_name}' foi criada com {stored_model} ({column_dims} dimensões), "
+                f"mas a configuração atual usa {model} ({dimensions} dimensões). "
+                f"Use outra coleção ou migre as memórias para a nova configuração."
+            )
+
+        if stored is None:
+            logger.info(f"Registrando configuração de embeddings da coleção {collection_name}: {expected}")
+            set_collection_config(conn, collection_name, expected)
+            conn.commit()
+    finally:
+        conn.close()
+
+def ensure_collection(conn, collection_name: str, dimension: int):
+    """
+    Cria a tabela da coleção, com o mesmo layout do vecs, se ela não existir.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        dimension: Dimensão dos vetores
+
+    Raises:
+        ValueError: Se a coleção existir com outra dimensão
+    """
+    existing = get_dimension(conn, collection_name)
+    if existing is not None:
+        if existing != dimension:
+            raise ValueError(
+                f"A coleção '{collection_name}' usa vetores de dimensão {existing}, "
+                f"mas os dados têm dimensão {dimension}"
+            )
+        return
+
+    logger.info(f"Criando coleção {collection_name} (dimensão {dimension})")
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {};").format(sql.Identifier(VECS_SCHEMA)))
+        cursor.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
+                id varchar PRIMARY KEY,
+                vec vector({}) NOT NULL,
+                metadata jsonb NOT NULL DEFAULT '{{}}'::jsonb
+            );
+        """).format(collection_table(collection_name), sql.Literal(dimension)))
+    conn.commit()
+
+def iter_records(conn, collection_name: str, user_ids: Optional[Sequence[str]] = None,
+                 batch_size: int = 1000, include_vectors: bool = True) -> Iterator[Record]:
+    """
+    Percorre os registros de uma coleção com um cursor no servidor.
+
+    O cursor nomeado busca `batch_size` linhas por vez, de modo que o uso de
+    memória não depende do tamanho da coleção.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        user_ids: Restringe a leitura a estes usuários (opcional)
+        batch_size: Número de linhas buscadas por ida ao servidor
+        include_vectors: Se False, não transfere os vetores
+
+    Yields:
+        Record: Tuplas (id, vetor, metadados)
+    """
+    vector_column = sql.SQL("vec::text") if include_vectors else sql.SQL("NULL")
+    query = sql.SQL("SELECT id, {}, metadata FROM {}").format(
+        vector_column, collection_table(collection_name)
+    )
+    params: Tuple = ()
+    if user_ids:
+        query += sql.SQL(" WHERE metadata->>'user_id' = ANY(%s)")
+        params = (list(user_ids),)
+
+    cursor = conn.cursor(name=f"voxy_stream_{uuid.uuid4().hex[:12]}")
+    cursor.itersize = batch_size
+    try:
+        cursor.execute(query, params)
+        for record_id, vector, metadata in cursor:
+            yield record_id, parse_vector(vector), metadata or {}
+    finally:
+        cursor.close()
+
+def iter_record_batches(conn, collection_name: str, after_id: Optional[str] = None,
+                        batch_size: int = 1000, include_vectors: bool = True) -> Iterator[List[Record]]:
+    """
+    Percorre uma coleção em lotes ordenados por id (paginação por chave).
+
+    Diferente de `iter_records`, cada lote é uma consulta independente,
+    então a leitura pode ser retomada a partir do último id processado.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção
+        after_id: Retoma a leitura depois deste id (opcional)
+        batch_size: Número de registros por lote
+        include_vectors: Se False, não transfere os vetores
+
+    Yields:
+        list: Lotes de registros (id, vetor, metadados)
+    """
+    vector_column = sql.SQL("vec::text") if include_vectors else sql.SQL("NULL")
+    table = collection_table(collection_name)
+    while True:
+        with conn.cursor() as cursor:
+            if after_id is None:
+                cursor.execute(sql.SQL("SELECT id, {}, metadata FROM {} ORDER BY id LIMIT %s;").format(
+                    vector_column, table), (batch_size,))
+            else:
+                cursor.execute(sql.SQL("SELECT id, {}, metadata FROM {} WHERE id > %s ORDER BY id LIMIT %s;").format(
+                    vector_column, table), (after_id, batch_size))
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        yield [(record_id, parse_vector(vector), metadata or {}) for record_id, vector, metadata in rows]
+        after_id = rows[-1][0]
+
+def _copy_escape(value: str) -> str:
+    """Escapa um valor para o formato texto do COPY."""
+    return (value.replace("\\", "\\\\")
+                 .replace("\t", "\\t")
+                 .replace("\n", "\\n")
+                 .replace("\r", "\\r"))
+
+def _copy_buffer(records: Iterable[Record]) -> Tuple[io.StringIO, int]:
+    """
+    Serializa registros no formato texto do COPY.
+
+    Returns:
+        tuple: (buffer, número de linhas)
+    """
+    buffer = io.StringIO()
+    count = 0
+    for record_id, vector, metadata in records:
+        if vector is None:
+            raise ValueError(f"Registro '{record_id}' não possui vetor")
+        buffer.write(_copy_escape(str(record_id)))
+        buffer.write("\t")
+        buffer.write(format_vector(vector))
+        buffer.write("\t")
+        buffer.write(_copy_escape(json.dumps(metadata, ensure_ascii=False)))
+        buffer.write("\n")
+        count += 1
+    buffer.seek(0)
+    return buffer, count
+
+def copy_records(conn, collection_name: str, records: Iterable[Record], partitioned: Optional[bool] = None) -> int:
+    """
+    Grava um lote de registros com COPY em uma tabela temporária e mescla na coleção.
+
+    Registros com `id` já existente são atualizados (com `id` repetido no
+    lote, vale o último). A transação não é confirmada aqui; o chamador
+    decide quando executar `conn.commit()`.
+
+    Args:
+        conn: Conexão com o banco de dados
+        collection_name: Nome da coleção de destino
+        records: Registros a gravar
+        partitioned: Se a coleção usa o layout particionado (consultado no banco se omitido)
+
+    Returns:
+        int: Número de registros gravados
+    """
+    # Um mesmo id duas vezes no lote faria o INSERT alterar a mesma linha duas vezes
+    unique = {str(record[0]): record for record in records}
+    buffer, count = _copy_buffer(unique.values())
+    if not count:
+        return 0
+    if partitioned is None:
+        partitioned = is_partitioned(conn, collection_name)
+
+    table = collection_table(collection_name)
+    staging = sql.Identifier(f"_staging_{collection_name}")
+    with conn.cursor() as cursor:
+        cursor.execute(sql.SQL(
+            "CREATE TEMP TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS);"
+        ).format(staging, table))
+        cursor.copy_expert(
+            sql.SQL("COPY {} (id, vec, metadata) FROM STDIN").format(staging).as_string(conn),
+            buffer
+        )
+        if partitioned:
+            # Tabelas particionadas não têm chave única global para ON CONFLICT
+            cursor.execute(sql.SQL("DELETE FROM {} WHERE id IN (SELECT id FROM {});").format(table, staging))
+            cursor.execute(sql.SQL(
+                "INSERT INTO {} (id, vec, metadata) SELECT id, vec, metadata FROM {};"
+            ).format(table, staging))
+        else:
+            cursor.execute(sql.SQL("""
+                INSERT INTO {} (id, vec, metadata)
+                SELECT id, vec, metadata FROM {}
+                ON CONFLICT (id) DO UPDATE
+                SET vec = EXCLUDED.vec, metadata = EXCLUDED.metadata;
+            """).format(table, staging))
+        cursor.execute(sql.SQL("TRUNCATE {};").format(staging))
+    return count
+
+
+class OutputData(BaseModel):
+    """Resultado retornado ao mem0 pelo armazenamento vetorial."""
+    id: Optional[str]
+    score: Optional[float]
+    payload: Optional[dict]
+
+
+class VoxyVectorStore(VectorStoreBase):
+    """
+    Armazenamento vetorial do mem0 implementado com SQL direto.
+
+    Usa o mesmo layout de tabela do vecs (`vecs.<coleção>`), mas também
+    funciona com a tabela particionada por hash do user_id criada por
+    `utils/setup_supabase.py --partitions`. Nesse layout, as buscas
+    incluem o predicado sobre a chave de particionamento, de modo que o
+    Postgres consulta apenas a partição (e o índice) do usuário.
+
+    Com `quantization` igual a 'halfvec' ou 'binary', as buscas usam o
+    índice quantizado criado por `utils/setup_supabase.py --quantization`
+    e reordenam os candidatos pela distância exata (ver `build_search`).
+    """
+
+    # Configurados por `register_vector_store`
+    quantization = QUANTIZATION_NONE
+    rerank_factor = DEFAULT_RERANK_FACTOR
+
+    def __init__(self, connection_string: str, collection_name: str,
+                 embedding_model_dims: int = 1536, index_method=None, index_measure=None):
+        """
+        Inicializa o armazenamento vetorial.
+
+        Args:
+            connection_string: URL de conexão com o banco de dados
+            collection_name: Nome da coleção
+            embedding_model_dims: Dimensão dos vetores
+            index_method: Ignorado (mantido por compatibilidade com a configuração do mem0)
+            index_measure: Ignorado (a distância usada é sempre a de cosseno)
+        """
+        self.collection_name = collection_name
+        self.embedding_model_dims = embedding_model_dims
+        self.table = collection_table(collection_name)
+        self.pool = ThreadedConnectionPool(1, MAX_POOL_CONNECTIONS, connection_string)
+
+        with self._cursor() as cursor:
+            conn = cursor.connection
+            if get_dimension(conn, collection_name) is None:
+                self.create_col()
+            self.partitioned = is_partitioned(conn, collection_name)
+
+        logger.info(f"Armazenamento vetorial pronto: {collection_name} "
+                    f"({LAYOUT_PARTITIONED if self.partitioned else LAYOUT_DEFAULT})")
+
+    @contextmanager
+    def _cursor(self, commit: bool = False):
+        """Fornece um cursor de uma conexão do pool, confirmando a transação se solicitado."""
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                yield cursor
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+    def create_col(self, name=None, vector_size=None, distance=None):
+        """
+        Cria a coleção (layout padrão) com índice HNSW de cosseno.
+
+        O layout particionado é criado apenas por `utils/setup_supabase.py`.
+        """
+        dimension = vector_size or self.embedding_model_dims
+        with self._cursor(commit=True) as cursor:
+            ensure_collection(cursor.connection, self.collection_name, dimension)
+            cursor.execute(sql.SQL(
+                "CREATE INDEX IF NOT EXISTS {} ON {} USING hnsw (vec vector_cosine_ops);"
+            ).format(sql.Identifier(f"ix_{self.collection_name}_vec_hnsw"), self.table))
+
+    def insert(self, vectors, payloads=None, ids=None):
+        """
+        Insere (ou substitui) vetores na coleção.
+
+        Args:
+            vectors: Lista de vetores
+            payloads: Metadados correspondentes (opcional)
+            ids: Identificadores correspondentes (opcional)
+        """
+        ids = ids or [str(uuid.uuid4()) for _ in vectors]
+        payloads = payloads or [{} for _ in vectors]
+        rows = [(str(i), format_vector(v), Json(p)) for i, v, p in zip(ids, vectors, payloads)]
+        logger.info(f"Inserindo {len(rows)} vetores na coleção {self.collection_name}")
+
+        with self._cursor(commit=True) as cursor:
+            if self.partitioned:
+                # Tabelas particionadas não têm chave única global para ON CONFLICT
+                cursor.execute(sql.SQL("DELETE FROM {} WHERE id = ANY(%s);").format(self.table),
+                               ([row[0] for row in rows],))
+                execute_values(cursor, sql.SQL(
+                    "INSERT INTO {} (id, vec, metadata) VALUES %s"
+                ).format(self.table).as_string(cursor), rows)
+            else:
+                execute_values(cursor, sql.SQL("""
+                    INSERT INTO {} (id, vec, metadata) VALUES %s
+                    ON CONFLICT (id) DO UPDATE
+                    SET vec = EXCLUDED.vec, metadata = EXCLUDED.metadata
+                """).format(self.table).as_string(cursor), rows)
+
+    def search(self, query, vectors, top_k=5, filters=None):
+        """
+        Busca os vetores mais próximos (distância de cosseno).
+
+        Args:
+            query: Texto da consulta (não utilizado)
+            vectors: Vetor da consulta
+            top_k: Número de resultados
+            filters: Filtros de metadados (ex.: {'user_id': 'alice'})
+
+        Returns:
+            list: Resultados ordenados por similaridade
+        """
+        query_sql, params = build_search(self.table, vectors, top_k, filters, self.partitioned,
+                                         self.quantization, self.rerank_factor)
+        with self._cursor() as cursor:
+            if self.quantization != QUANTIZATION_NONE:
+                # O HNSW só devolve até ef_search candidatos
+                cursor.execute("SELECT set_config('hnsw.ef_search', %s, true);",
+                               (str(max(40, top_k * self.rerank_factor)),))
+            cursor.execute(query_sql, params)
+            rows = cursor.fetchall()
+
+        return [OutputData(id=str(row[0]), score=max(0.0, 1.0 - float(row[1])), payload=row[2])
+                for row in rows]
+
+    def lexical_search(self, query, top_k=5, filters=None):
+        """
+        Busca memórias pelo texto com a busca textual do Postgres (sem embeddings).
+
+        Não se chama `keyword_search` de propósito: o mem0 chama esse gancho
+        em toda busca para a pontuação híbrida (BM25), o que somaria uma
+        consulta textual por turno e mudaria o ranking. Só o voxy_retrieval
+        usa este método; o mem0 registra no início que a busca híbrida está
+        desativada.
+
+        Args:
+            query: Texto da consulta
+            top_k: Número de resultados
+            filters: Filtros de metadados (ex.: {'user_id': 'alice'})
+
+        Returns:
+            list: Resultados ordenados pela relevância textual
+        """
+        query_sql, params = build_keyword_search(self.table, query, top_k, filters, self.partitioned)
+        with self._cursor() as cursor:
+            cursor.execute(query_sql, params)
+            rows = cursor.fetchall()
+
+        return [OutputData(id=str(row[0]), score=float(row[1]), payload=row[2]) for row in rows]
+
+    def delete(self, vector_id):
+        """Remove um vetor pelo ID."""
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(sql.SQL("DELETE FROM {} WHERE id = %s;").format(self.table), (str(vector_id),))
+
+    def update(self, vector_id, vector=None, payload=None):
+        """
+        Atualiza o vetor e/ou os metadados de um registro.
+
+        No layout particionado, o Postgres move a linha de partição se o
+        user_id mudar.
+        """
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(sql.SQL("""
+                UPDATE {}
+                SET vec = COALESCE(%s::vector, vec), metadata = COALESCE(%s, metadata)
+                WHERE id = %s;
+            """).format(self.table), (
+                format_vector(vector) if vector is not None else None,
+                Json(payload) if payload is not None else None,
+                str(vector_id),
+            ))
+
+    def get(self, vector_id):
+        """Recupera um registro pelo ID."""
+        with self._cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT id, metadata FROM {} WHERE id = %s;").format(self.table),
+                           (str(vector_id),))
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return OutputData(id=str(row[0]), score=None, payload=row[1])
+
+    def list_cols(self):
+        """Lista as coleções existentes no esquema do vecs."""
+        with self._cursor() as cursor:
+            cursor.execute("""
+                SELECT pc.relname
+                FROM pg_class pc
+                JOIN pg_namespace pn ON pn.oid = pc.relnamespace
+                WHERE pn.nspname = %s
+                AND pc.relkind IN ('r', 'p')
+                AND NOT pc.relispartition
+                AND pc.relname NOT LIKE '\\_%%';
+            """, (VECS_SCHEMA,))
+            return [row[0] for row in cursor.fetchall()]
+
+    def delete_col(self):
+        """Remove a coleção (e suas partições)."""
+        with self._cursor(commit=True) as cursor:
+            cursor.execute(sql.SQL("DROP TABLE IF EXISTS {};").format(self.table))
+
+    def col_info(self):
+        """Retorna informações sobre a coleção."""
+        with self._cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT count(*) FROM {};").format(self.table))
+            count = cursor.fetchone()[0]
+        return {
+            "name": self.collection_name,
+            "count": count,
+            "dimension": self.embedding_model_dims,
+            "layout": LAYOUT_PARTITIONED if self.partitioned else LAYOUT_DEFAULT,
+            "quantization": self.quantization,
+        }
+
+    def list(self, filters=None, top_k=100):
+        """
+        Lista registros da coleção.
+
+        Returns:
+            list: Lista contendo a lista de resultados (formato do mem0)
+        """
+        where, params = build_where(filters, self.partitioned)
+        with self._cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT id, metadata FROM {}{} LIMIT %s;").format(self.table, where),
+                           params + [top_k])
+            rows = cursor.fetchall()
+        return [[OutputData(id=str(row[0]), score=None, payload=row[1]) for row in rows]]
+
+    def reset(self):
+        """Remove e recria a coleção."""
+        logger.warning(f"Recriando a coleção {self.collection_name}...")
+        self.delete_col()
+        self.create_col()
+
+
+def register_vector_store(quantization: str = QUANTIZATION_NONE, rerank_factor: int = DEFAULT_RERANK_FACTOR):
+    """
+    Substitui o armazenamento 'supabase' do mem0 pelo `VoxyVectorStore`.
+
+    Deve ser chamada antes de `Memory.from_config`.
+
+    Args:
+        quantization: Índice usado na busca ('none', 'halfvec' ou 'binary')
+        rerank_factor: Candidatos buscados no índice quantizado por resultado
+    """
+    from mem0.utils.factory import VectorStoreFactory
+    VoxyVectorStore.quantization = quantization
+    VoxyVectorStore.rerank_factor = rerank_factor
+    VectorStoreFactory.provider_to_class["supabase"] = "voxy_store.VoxyVectorStore"
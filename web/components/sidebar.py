@@ -3,6 +3,7 @@ Componente da barra lateral para a aplicação Streamlit.
 """
 import streamlit as st
 from utils.session import get_user_id, set_user_id
+from utils.api import end_session
 
 def render_sidebar():
     """
@@ -32,6 +33,8 @@ def render_sidebar():
         )
 
         if st.button("Atualizar ID"):
+            # Encerra a sessão do usuário anterior antes da troca
+            end_session(current_user_id)
             set_user_id(new_user_id)
             st.success(f"ID atualizado para: {new_user_id}")
 
@@ -2,8 +2,10 @@
 Página de chat do Voxy-Mem0.
 """
 import streamlit as st
-from utils.session import initialize_session, add_message, get_messages
-from utils.api import process_message
+from utils.session import (initialize_session, add_message, get_visible_messages, show_older_messages,
+                           clear_messages, new_conversation, get_chat_settings)
+from utils.api import process_message, end_session
+from voxy_admission import AdmissionRejected
 from components.sidebar import render_sidebar
 
 # Configuração da página
@@ -23,8 +25,13 @@ render_sidebar()
 # Título da página
 st.title("💬 Chat com Voxy-Mem0")
 
-# Exibe o histórico de mensagens
-for message in get_messages():
+# Exibe apenas as mensagens mais recentes; as anteriores são carregadas sob demanda
+messages, has_older = get_visible_messages()
+if has_older and st.button("⬆️ Carregar mensagens anteriores"):
+    show_older_messages()
+    st.rerun()
+
+for message in messages:
     with st.chat_message(message["role"]):
         st.write(message["content"])
 
@@ -41,20 +48,29 @@ if prompt := st.chat_input("Digite sua mensagem..."):
     with st.chat_message("assistant"):
         with st.spinner("Pensando..."):
             user_id = st.session_state.user_id
-            response = process_message(prompt, user_id)
-            st.write(response)
+            try:
+                response = process_message(prompt, user_id, **get_chat_settings())
+            except AdmissionRejected as e:
+                # Sobrecarga: a mensagem não foi processada
+                response = None
+                st.warning(f"O servidor está ocupado. Tente novamente em {e.retry_after:.0f} segundos.")
+            if response is not None:
+                st.write(response)
 
     # Adiciona a resposta do assistente ao histórico
-    add_message("assistant", response)
+    if response is not None:
+        add_message("assistant", response)
 
 # Botões de controle
 col1, col2 = st.columns(2)
 with col1:
     if st.button("Limpar Chat", type="secondary"):
-        st.session_state.messages = []
+        end_session(st.session_state.user_id)
+        clear_messages()
         st.rerun()
 
 with col2:
     if st.button("Nova Conversa", type="primary"):
-        st.session_state.messages = []
+        end_session(st.session_state.user_id)
+        new_conversation()
         st.rerun()
@@ -2,8 +2,11 @@
 Página de configurações do Voxy-Mem0.
 """
 import streamlit as st
-from utils.session import initialize_session, get_user_id, clear_messages
-from utils.api import get_user_memories
+from utils.session import initialize_session, get_user_id, clear_messages, get_chat_settings, set_chat_settings
+from utils.api import (list_user_memories, delete_user_memories, end_session, get_engine_stats,
+                       get_admission_stats, get_dedup_stats, get_router_stats,
+                       get_prompt_cache_stats, get_embedding_batch_stats,
+                       get_degraded_stats)
 from components.sidebar import render_sidebar
 
 # Configuração da página
@@ -32,13 +35,16 @@ st.info(f"ID do usuário atual: {user_id}")
 # Opções de configuração
 st.subheader("Opções de Chat")
 
-# Modelo de linguagem
-model_options = ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
+# Modelo de linguagem (automático: roteador de modelos ou MODEL_CHOICE)
+AUTOMATIC_MODEL = "Automático"
+model_options = [AUTOMATIC_MODEL, "gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"]
+chat_settings = get_chat_settings()
 selected_model = st.selectbox(
     "Modelo de Linguagem",
     options=model_options,
-    index=0,
-    help="Selecione o modelo de linguagem a ser utilizado"
+    index=model_options.index(chat_settings["model"]) if chat_settings["model"] in model_options else 0,
+    help="Selecione o modelo de linguagem a ser utilizado. No modo automático, mensagens simples "
+         "vão para o modelo rápido quando o roteador (MODEL_ROUTER) está ativo"
 )
 
 # Número de memórias a recuperar
@@ -46,31 +52,58 @@ memory_limit = st.slider(
     "Limite de Memórias",
     min_value=1,
     max_value=10,
-    value=5,
+    value=chat_settings["memory_limit"],
     help="Número máximo de memórias a serem recuperadas por consulta"
 )
 
 # Botão para salvar configurações
 if st.button("Salvar Configurações", type="primary"):
-    # Aqui implementaríamos a lógica para salvar as configurações
-    # Por enquanto, apenas mostramos uma mensagem de sucesso
+    # Vale para as próximas mensagens desta sessão
+    set_chat_settings(None if selected_model == AUTOMATIC_MODEL else selected_model, memory_limit)
     st.success("Configurações salvas com sucesso!")
 
 # Gerenciamento de memórias
 st.subheader("Gerenciamento de Memórias")
 
-# Exibir memórias do usuário
+# Exibir memórias do usuário em páginas (paginação por cursor, sem chamadas de embeddings)
 if st.button("Mostrar Minhas Memórias"):
+    st.session_state.memory_cursors = [None]
+
+if st.session_state.get("memory_cursors"):
+    page_size = st.selectbox("Memórias por página", options=[10, 25, 50, 100], index=1)
+    cursors = st.session_state.memory_cursors
+    if st.session_state.get("memory_page_size") != page_size:
+        # Outro tamanho de página: volta ao início da listagem
+        st.session_state.memory_page_size = page_size
+        cursors[:] = [None]
     with st.spinner("Carregando memórias..."):
         try:
-            memories = get_user_memories(user_id)
-
-            if memories:
-                st.write(f"Encontradas {len(memories)} memórias para o usuário {user_id}:")
-
-                for i, memory in enumerate(memories):
-                    with st.expander(f"Memória {i+1}"):
-                        st.json(memory)
+            page = list_user_memories(user_id, page_size, cursors[-1])
+            if page["total"] is not None:
+                # O total só é contado na primeira página; as seguintes reaproveitam-no
+                st.session_state.memory_total = page["total"]
+
+            if page["results"]:
+                first = (len(cursors) - 1) * page_size + 1
+                st.write(f"Memórias {first}–{first + len(page['results']) - 1} de "
+                         f"{st.session_state.get('memory_total', '?')} "
+                         f"para o usuário {user_id}:")
+                st.dataframe(
+                    [{"Criada em": memory.get("created_at"), "Memória": memory["memory"], "ID": memory["id"]}
+                     for memory in page["results"]],
+                    use_container_width=True,
+                    hide_index=True,
+                )
+
+                previous_col, next_col = st.columns(2)
+                with previous_col:
+                    if st.button("⬅️ Anterior", disabled=len(cursors) == 1):
+                        cursors.pop()
+                        st.rerun()
+                with next_col:
+                    if st.button("Próxima ➡️", disabled=page["next_cursor"] is None):
+                        cursors.append(page["next_cursor"])
+                        st.rerun()
             else:
                 st.info("Nenhuma memória encontrada para este usuário.")
         except Exception as e:
@@ -83,11 +116,78 @@ col1, col2 = st.columns(2)
 
 with col1:
     if st.button("Limpar Histórico de Chat", type="secondary"):
+        end_session(user_id)
         clear_messages()
         st.success("Histórico de chat limpo com sucesso!")
         st.rerun()
 
 with col2:
-    if st.button("Limpar Todas as Memórias", type="secondary"):
-        # Esta funcionalidade exigiria uma implementação adicional na API
-        st.warning("Esta funcionalidade ainda não está implementada.")
+    only_old = st.checkbox("Apenas memórias antigas")
+    older_than_days = None
+    if only_old:
+        older_than_days = st.number_input("Criadas há mais de (dias)", min_value=1, value=30, step=1)
+    confirmed = st.checkbox("Confirmo que quero remover as memórias (não pode ser desfeito)")
+    if st.button("Limpar Todas as Memórias", type="secondary", disabled=not confirmed):
+        progress_bar = st.progress(0.0, text="Removendo memórias...")
+
+        def update_progress(deleted: int, total: int):
+            progress_bar.progress(min(1.0, deleted / total), text=f"{deleted} de {total} memórias removidas")
+
+        try:
+            deleted = delete_user_memories(user_id, older_than_days, progress=update_progress)
+            progress_bar.progress(1.0, text="Concluído")
+            st.session_state.pop("memory_cursors", None)
+            st.success(f"{deleted} memória(s) removida(s) com sucesso!")
+        except Exception as e:
+            st.error(f"Erro ao remover memórias: {str(e)}")
+
+# Concorrência do servidor (compartilhada por todas as sessões)
+st.subheader("Status do Servidor")
+
+stats = get_engine_stats()
+if stats:
+    cols = st.columns(4)
+    cols[0].metric("Mensagens em processamento", stats["in_flight"])
+    cols[1].metric("Usuários ativos", stats["active_users"])
+    cols[2].metric("Mensagens aguardando", stats["waiting"])
+    cols[3].metric("Pico de concorrência", stats["peak_in_flight"])
+    st.caption(f"Total de mensagens processadas: {stats['processed']}")
+else:
+    st.info("O motor ainda não foi iniciado nesta instância.")
+
+# Controle de admissão (sobrecarga)
+admission = get_admission_stats()
+cols = st.columns(4)
+cols[0].metric("Na fila", admission["queued"])
+cols[1].metric("Tempo médio de fila", f"{admission['avg_queue_time']:.2f} s")
+cols[2].metric("Recusadas (limite do usuário)", f"{admission['rejected_rate_limited']:.0f}")
+cols[3].metric("Recusadas (fila cheia)", f"{admission['rejected_queue_full'] + admission['rejected_timeout']:.0f}")
+
+dedup = get_dedup_stats()
+st.caption(f"Chamadas duplicadas evitadas: {dedup['coalesced'] + dedup['cached']:.0f} "
+           f"(de {dedup['executed'] + dedup['coalesced'] + dedup['cached']:.0f})")
+
+routing = get_router_stats()
+if routing["fast"] + routing["large"]:
+    st.caption(f"Roteamento de modelos: {routing['fast']:.0f} mensagens no modelo rápido "
+               f"({routing['fast_share']:.0%}), {routing['large']:.0f} no modelo maior, "
+               f"~{routing['saved_seconds']:.1f} s economizados")
+
+prompt_cache = get_prompt_cache_stats()
+if prompt_cache["requests"]:
+    st.caption(f"Cache de prompt: {prompt_cache['cached_tokens']:.0f} de {prompt_cache['prompt_tokens']:.0f} "
+               f"tokens de entrada em cache ({prompt_cache['cached_share']:.0%}), "
+               f"{prompt_cache['hit_rate']:.0%} das chamadas com acerto")
+
+degraded = get_degraded_stats()
+if degraded["turns"]:
+    st.caption(f"Prazo por turno: {degraded['degraded']:.0f} de {degraded['turns']:.0f} turnos sem a busca de "
+               f"memórias ({degraded['degraded_share']:.0%}), {degraded['cache_fallbacks']:.0f} com memórias do "
+               f"cache local; disjuntor {'aberto' if degraded['breaker'] != 'closed' else 'fechado'}")
+
+embedding_batches = get_embedding_batch_stats()
+if embedding_batches["requests"]:
+    histogram = ", ".join(f"{size}: {count:.0f}" for size, count in embedding_batches["histogram"].items())
+    st.caption(f"Lotes de embeddings: {embedding_batches['inputs']:.0f} textos em "
+               f"{embedding_batches['requests']:.0f} requisições (média {embedding_batches['average_batch']:.1f}; "
+               f"lotes por tamanho: {histogram})")
@@ -1,19 +1,31 @@
 """
 API wrapper para integrar o Streamlit com o núcleo do Voxy-Mem0.
+
+Todas as sessões do Streamlit compartilham o mesmo motor (`voxy_engine`),
+criado uma única vez por processo.
 """
 import sys
 import os
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List, Optional
 
 # Adiciona o diretório raiz ao path para importar o módulo voxy_agent
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-# Importa as funções do módulo voxy_agent
-from voxy_agent import setup_memory, chat_with_memories
+# Importa o motor compartilhado e o controle de admissão
+from voxy_admission import AdmissionController, admission_report
+from voxy_budget import degraded_report
+from voxy_engine import get_engine
+from voxy_metrics import metrics
+from voxy_embeddings import embedding_batch_report
+from voxy_prompt import prompt_cache_report
+from voxy_router import router_report
+from voxy_singleflight import SingleFlight
+
+# Controle de admissão compartilhado pelas sessões
+_admission = AdmissionController.from_env()
 
-# Instâncias globais para reutilização
-_openai_client = None
-_memory = None
+# Agrupa chamadas idênticas simultâneas (reexecuções do Streamlit, cliques duplos)
+_flights = SingleFlight.from_env()
 
 def initialize_api():
     """
@@ -22,34 +34,127 @@ def initialize_api():
     Returns:
         tuple: (openai_client, memory) - Clientes inicializados
     """
-    global _openai_client, _memory
-
-    if _openai_client is None or _memory is None:
-        _openai_client, _memory = setup_memory()
+    engine = get_engine()
+    return engine.openai_client, engine.memory
 
-    return _openai_client, _memory
-
-def process_message(message: str, user_id: str) -> str:
+def process_message(message: str, user_id: str, model: Optional[str] = None, memory_limit: int = 5) -> str:
     """
     Processa uma mensagem do usuário usando o Voxy-Mem0.
 
+    Mensagens de usuários diferentes são processadas em paralelo; as do
+    mesmo usuário aguardam a anterior terminar. Antes do processamento, a
+    mensagem passa pelo controle de admissão (limite global, limite por
+    usuário e fila justa). Chamadas idênticas (mesmo usuário e mesma
+    mensagem) simultâneas ou dentro da janela de deduplicação compartilham
+    uma única execução e a mesma resposta.
+
     Args:
         message: Mensagem do usuário
         user_id: ID do usuário
+        model: Modelo escolhido na sessão (None: roteador ou MODEL_CHOICE)
+        memory_limit: Número máximo de memórias recuperadas
 
     Returns:
         str: Resposta do assistente
+
+    Raises:
+        AdmissionRejected: Se a mensagem for recusada por sobrecarga
     """
-    openai_client, memory = initialize_api()
+    return _flights.do(("chat", user_id, message, model, memory_limit), _process_admitted, message, user_id,
+                       model=model, memory_limit=memory_limit)
+
+def _process_admitted(message: str, user_id: str, **options) -> str:
+    """Processa a mensagem após o controle de admissão."""
+    with _admission.admit(user_id):
+        response = get_engine().process_message(message, user_id, **options)
+    # A mensagem pode ter criado memórias; a próxima listagem deve consultá-las de novo
+    _flights.forget(lambda key: key[:2] == ("memories", user_id))
+    return response
 
-    response = chat_with_memories(
-        message=message,
-        user_id=user_id,
-        openai_client=openai_client,
-        memory=memory
-    )
+def end_session(user_id: str) -> bool:
+    """
+    Salva no mem0 os turnos do usuário que ainda estão no buffer de extração.
 
-    return response
+    Args:
+        user_id: ID do usuário
+
+    Returns:
+        bool: True se novas memórias foram adicionadas
+    """
+    engine = get_engine(create=False)
+    if engine is None:
+        return False
+    forget_cached(user_id)
+    return engine.end_session(user_id)
+
+def get_engine_stats() -> Dict[str, int]:
+    """
+    Retorna as contagens de concorrência do motor compartilhado.
+
+    Returns:
+        dict: Mensagens em processamento, usuários ativos, mensagens aguardando,
+            pico de concorrência e total processado (vazio se o motor não foi iniciado)
+    """
+    engine = get_engine(create=False)
+    if engine is None:
+        return {}
+    return engine.stats()
+
+def get_admission_stats() -> Dict[str, float]:
+    """
+    Retorna o estado do controle de admissão e as métricas de tempo de fila.
+
+    Returns:
+        dict: Mensagens ativas e na fila, admissões, recusas por motivo e tempo de fila
+    """
+    return {**_admission.stats(), **admission_report()}
+
+def get_dedup_stats() -> Dict[str, float]:
+    """
+    Retorna quantas chamadas foram executadas e quantas reaproveitaram outra execução.
+
+    Returns:
+        dict: 'executed', 'coalesced' (aguardaram uma execução em andamento) e
+            'cached' (reaproveitaram um resultado dentro da janela)
+    """
+    return {name: metrics.get(f"singleflight.{name}") for name in ("executed", "coalesced", "cached")}
+
+def get_router_stats() -> Dict[str, float]:
+    """
+    Retorna as decisões do roteador de modelos.
+
+    Returns:
+        dict: Mensagens enviadas a cada modelo, fração no modelo rápido e segundos economizados
+    """
+    return router_report()
+
+def get_prompt_cache_stats() -> Dict[str, float]:
+    """
+    Retorna o uso do cache de prompt do provedor.
+
+    Returns:
+        dict: Chamadas, tokens de entrada, tokens em cache e taxas de acerto
+    """
+    return prompt_cache_report()
+
+def get_degraded_stats() -> Dict[str, Any]:
+    """
+    Retorna os turnos respondidos sem a busca de memórias e o estado do disjuntor.
+
+    Returns:
+        dict: Contagens de `degraded_report` e 'breaker' ('closed', 'open' ou 'half_open')
+    """
+    engine = get_engine(create=False)
+    return {**degraded_report(), "breaker": engine.budget.breaker.state if engine is not None else "closed"}
+
+def get_embedding_batch_stats() -> Dict[str, Any]:
+    """
+    Retorna o agrupamento das chamadas de embeddings.
+
+    Returns:
+        dict: Requisições, textos, tamanho médio e histograma dos tamanhos de lote
+    """
+    return embedding_batch_report()
 
 def get_user_memories(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
     """
@@ -62,9 +167,51 @@ def get_user_memories(user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
     Returns:
         List[Dict]: Lista de memórias do usuário
     """
-    _, memory = initialize_api()
+    # Lê as memórias mais recentes direto da coleção (sem embeddings); chamadas simultâneas compartilham a leitura
+    return _flights.do(("memories", user_id, limit), get_engine().get_user_memories, user_id, limit)
 
-    # Busca todas as memórias do usuário (query vazia)
-    memories = memory.search(query="", user_id=user_id, limit=limit)
+def list_user_memories(user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Lista uma página das memórias de um usuário, das mais recentes para as mais antigas.
 
-    return memories["results"]
+    Args:
+        user_id: ID do usuário
+        limit: Memórias por página
+        cursor: Cursor da página anterior ('next_cursor'), ou None para a primeira
+
+    Returns:
+        dict: 'results' (memórias), 'next_cursor' (None na última página) e 'total'
+            (contado apenas na primeira página; None nas demais)
+    """
+    return _flights.do(("memories", user_id, limit, cursor), get_engine().list_memories, user_id, limit, cursor)
+
+def delete_user_memories(user_id: str, older_than_days: Optional[float] = None,
+                         progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Remove as memórias de um usuário em lotes.
+
+    Args:
+        user_id: ID do usuário
+        older_than_days: Remove apenas as memórias criadas há mais de N dias (opcional)
+        progress: Função chamada após cada lote com (removidas, total)
+
+    Returns:
+        int: Número de memórias removidas
+    """
+    try:
+        return get_engine().delete_memories(user_id, older_than_days, progress)
+    finally:
+        # Listagens guardadas não devem mostrar memórias já removidas
+        forget_cached(user_id)
+
+def forget_cached(user_id: str) -> int:
+    """
+    Descarta os resultados deduplicados de um usuário (ex.: após alterar suas memórias).
+
+    Args:
+        user_id: ID do usuário
+
+    Returns:
+        int: Número de resultados descartados
+    """
+    return _flights.forget(lambda key: key[1] == user_id)
@@ -1,19 +1,82 @@
 """
 Utilitários para gerenciamento de sessão no Streamlit.
 """
+import os
+import sys
 import streamlit as st
 from datetime import datetime
 import uuid
 
+# Adiciona o diretório raiz ao path para importar o módulo voxy_history
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from voxy_history import (DEFAULT_HISTORY_DB, DEFAULT_HISTORY_PAGE, DEFAULT_HISTORY_WINDOW, PersistentHistory,
+                          TranscriptStore)
+
+# Mensagens mantidas em memória por sessão e desenhadas por página
+HISTORY_WINDOW = int(os.getenv('CHAT_HISTORY_WINDOW', DEFAULT_HISTORY_WINDOW))
+HISTORY_PAGE = int(os.getenv('CHAT_HISTORY_PAGE', DEFAULT_HISTORY_PAGE))
+
+# Configurações de chat padrão (modelo None: roteador ou MODEL_CHOICE)
+DEFAULT_CHAT_SETTINGS = {"model": None, "memory_limit": 5}
+
+@st.cache_resource
+def _transcript_store() -> TranscriptStore:
+    """Banco das conversas, compartilhado por todas as sessões do processo."""
+    return TranscriptStore(os.getenv('CHAT_HISTORY_DB', DEFAULT_HISTORY_DB))
+
+def _transcript_owner() -> str:
+    """
+    Define o dono das conversas da sessão, sem confiar em identificadores escolhidos pelo usuário.
+
+    Com login do Streamlit, o dono é a identidade autenticada. Sem login, é um
+    token de retomada emitido e assinado pelo servidor, guardado na URL para
+    sobreviver a recarregamentos; tokens que o servidor não emitiu são
+    substituídos por um novo (com uma conversa vazia).
+    """
+    user = getattr(st, "user", None)
+    if getattr(user, "is_logged_in", False) and getattr(user, "email", None):
+        return "user:" + user.email
+    store = _transcript_store()
+    token = st.query_params.get("resume")
+    owner = store.token_owner(token)
+    if owner is None:
+        token = store.issue_token()
+        owner = store.token_owner(token)
+    st.session_state.resume_token = token
+    return owner
+
+def _open_history(owner: str) -> PersistentHistory:
+    """Retoma a conversa da URL ou a mais recente do dono, carregando só a janela."""
+    store = _transcript_store()
+    session_id = st.query_params.get("conversation")
+    user_id = store.session_user(owner, session_id) if session_id else None
+    if user_id:
+        return PersistentHistory(store, owner, user_id, session_id, window=HISTORY_WINDOW)
+    latest = store.latest_session(owner)
+    user_id = latest[1] if latest else "web_user_" + str(uuid.uuid4())[:8]
+    return PersistentHistory.resume(store, owner, user_id, window=HISTORY_WINDOW)
+
+def _sync_query_params():
+    """Guarda o token de retomada e a conversa na URL, para retomá-los ao recarregar a página."""
+    if st.session_state.get("resume_token"):
+        st.query_params["resume"] = st.session_state.resume_token
+    st.query_params["conversation"] = st.session_state.history.session_id
+
 def initialize_session():
     """
     Inicializa a sessão do Streamlit com valores padrão.
     """
-    if "user_id" not in st.session_state:
-        st.session_state.user_id = "web_user_" + str(uuid.uuid4())[:8]
+    if "history" not in st.session_state:
+        # Retoma a conversa do dono da sessão, sem chamadas ao LLM ou ao mem0
+        st.session_state.history = _open_history(_transcript_owner())
+        st.session_state.user_id = st.session_state.history.user_id
+        st.session_state.history_shown = HISTORY_PAGE
 
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    _sync_query_params()
+
+    if "chat_settings" not in st.session_state:
+        st.session_state.chat_settings = dict(DEFAULT_CHAT_SETTINGS)
 
     if "session_start" not in st.session_state:
         st.session_state.session_start = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -26,9 +89,14 @@ def set_user_id(user_id: str):
         user_id: ID do usuário
     """
     if user_id and user_id.strip():
+        history = st.session_state.history
+        history.flush()
         st.session_state.user_id = user_id.strip()
-        # Limpa as mensagens ao trocar de usuário
-        st.session_state.messages = []
+        # Retoma a conversa mais recente deste dono com o novo usuário (nunca a de outro dono)
+        st.session_state.history = PersistentHistory.resume(history.store, history.owner, st.session_state.user_id,
+                                                             window=HISTORY_WINDOW)
+        st.session_state.history_shown = HISTORY_PAGE
+        _sync_query_params()
 
 def get_user_id() -> str:
     """
@@ -43,23 +111,73 @@ def add_message(role: str, content: str):
     """
     Adiciona uma mensagem ao histórico da sessão.
 
+    Apenas as mensagens mais recentes ficam na sessão; a conversa completa fica no banco local.
+
     Args:
         role: Papel do emissor ('user' ou 'assistant')
         content: Conteúdo da mensagem
     """
-    st.session_state.messages.append({"role": role, "content": content})
+    st.session_state.history.add(role, content)
+    # Uma nova mensagem volta a exibição para a página mais recente
+    st.session_state.history_shown = HISTORY_PAGE
 
 def get_messages():
     """
-    Obtém todas as mensagens da sessão atual.
+    Obtém as mensagens da sessão atual mantidas em memória (as mais recentes).
 
     Returns:
         list: Lista de mensagens
     """
-    return st.session_state.messages
+    return st.session_state.history.messages
+
+def get_visible_messages():
+    """
+    Obtém as mensagens a desenhar: a página mais recente e as páginas anteriores já carregadas.
+
+    Returns:
+        tuple: (mensagens, há mensagens anteriores não exibidas)
+    """
+    history = st.session_state.history
+    shown = st.session_state.history_shown
+    return history.recent(shown), history.total > shown
+
+def show_older_messages():
+    """
+    Inclui mais uma página de mensagens anteriores na exibição.
+    """
+    st.session_state.history_shown += HISTORY_PAGE
 
 def clear_messages():
     """
-    Limpa todas as mensagens da sessão atual.
+    Apaga a conversa atual e inicia uma nova.
+    """
+    st.session_state.history.clear()
+    st.session_state.history_shown = HISTORY_PAGE
+    _sync_query_params()
+
+def new_conversation():
+    """
+    Inicia uma nova conversa, mantendo a atual gravada.
+    """
+    st.session_state.history.new_session()
+    st.session_state.history_shown = HISTORY_PAGE
+    _sync_query_params()
+
+def get_chat_settings() -> dict:
+    """
+    Obtém as configurações de chat da sessão atual.
+
+    Returns:
+        dict: 'model' (None para escolha automática) e 'memory_limit'
+    """
+    return dict(st.session_state.get("chat_settings", DEFAULT_CHAT_SETTINGS))
+
+def set_chat_settings(model, memory_limit: int):
+    """
+    Define as configurações de chat da sessão atual.
+
+    Args:
+        model: Modelo de linguagem, ou None para escolha automática
+        memory_limit: Número máximo de memórias recuperadas por mensagem
     """
-    st.session_state.messages = []
+    st.session_state.chat_settings = {"model": model, "memory_limit": memory_limit}